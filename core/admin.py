@@ -1,5 +1,12 @@
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connection, models
+from django.db.models import Case, Count, ExpressionWrapper, F, Max, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
@@ -7,8 +14,138 @@ from .models import (
     User, CurrencySettings, Category, Product, Customer, 
     Sale, SaleItem, InventoryLog, DebtPayment, Receipt, AuditLog,
     SaleUSD, SaleSOS, SaleETB, SaleItemUSD, SaleItemSOS, SaleItemETB,
-    DebtPaymentUSD, DebtPaymentSOS, DebtPaymentETB, DebtCorrection
+    DebtPaymentUSD, DebtPaymentSOS, DebtPaymentETB, DebtCorrection,
+    Transaction, TransactionItem, SalesFact, StockTake, StockTakeLine, ProductBarcode,
+    DailyClose, DailyCloseTotal, ProductSalesDay, SalesHour, SalesRunningTotal,
+    get_usd_rate,
 )
+from .closes import DayClosedError, check_day_open, is_closed
+from .search import ranked_customer_ids
+
+CUSTOMER_ADMIN_SEARCH_LIMIT = 200
+# Changelists count exactly up to this many rows and estimate beyond it
+ADMIN_EXACT_COUNT_LIMIT = 10000
+AMOUNT_FIELD = models.DecimalField(max_digits=20, decimal_places=2)
+
+
+def estimated_row_count(model):
+    """Cheap table size: planner statistics on PostgreSQL, the highest id elsewhere"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    return model._default_manager.aggregate(highest=Max('pk'))['highest'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts at most ADMIN_EXACT_COUNT_LIMIT + 1 rows, so paging a huge table stays constant time"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        bounded = queryset.order_by()[:ADMIN_EXACT_COUNT_LIMIT + 1].count()
+        if bounded <= ADMIN_EXACT_COUNT_LIMIT:
+            return bounded
+        if not queryset.query.where:
+            return max(bounded, estimated_row_count(queryset.model))
+        return bounded
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow with every sale"""
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+class ClosedDayAdminForm(forms.ModelForm):
+    """Refuses changes to a closed day unless a superuser ticks the override"""
+    override_close = forms.BooleanField(
+        required=False, label="Override the day close",
+        help_text="Needed to change a record of a closed day; the day's Z-report keeps the closed figures.",
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        override = cleaned_data.get('override_close') and self.request.user.is_superuser
+        self.overridden_days = []
+        for day in sorted(self.model_admin.closed_days(self.instance, cleaned_data)):
+            if override:
+                # Audited by save_model once the change is actually saved
+                self.overridden_days.append(day)
+                continue
+            try:
+                check_day_open(day, self.request.user)
+            except DayClosedError as e:
+                raise forms.ValidationError(str(e))
+        return cleaned_data
+
+
+class ClosedDayAdminMixin:
+    """Guards admin edits and deletes of rows that feed a day's close figures.
+
+    Edits of a closed day need the override on the form, which is audited
+    like the override on the sale pages; rows of a closed day cannot be
+    deleted from the admin.
+    """
+    form = ClosedDayAdminForm
+
+    def affected_moments(self, obj, cleaned_data=None):
+        """Timestamps whose day the row counts towards (now for a row being added)"""
+        return [obj.date_created if obj.pk and obj.date_created else timezone.now()]
+
+    def closed_days(self, obj, cleaned_data=None):
+        days = {timezone.localtime(moment).date() for moment in self.affected_moments(obj, cleaned_data)}
+        return {day for day in days if is_closed(day)}
+
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        form.request = request
+        form.model_admin = self
+        return form
+
+    def get_fieldsets(self, request, obj=None):
+        fieldsets = super().get_fieldsets(request, obj)
+        if self.fieldsets:
+            fieldsets = list(fieldsets) + [('Closed Day', {'fields': ('override_close',)})]
+        return fieldsets
+
+    def save_model(self, request, obj, form, change):
+        for day in getattr(form, 'overridden_days', ()):
+            check_day_open(
+                day, request.user, override=True, ip_address=request.META.get('REMOTE_ADDR'),
+                action=f'admin change to {obj._meta.verbose_name} {obj.pk or "(new)"}',
+            )
+        super().save_model(request, obj, form, change)
+
+    def has_delete_permission(self, request, obj=None):
+        if obj is not None and self.closed_days(obj):
+            return False
+        return super().has_delete_permission(request, obj)
+
+
+class ClosedDaySaleItemAdminMixin(ClosedDayAdminMixin):
+    """Sale items count towards their sale's day, and the new sale's day when moved"""
+
+    def affected_moments(self, obj, cleaned_data=None):
+        sales = [obj.sale if obj.sale_id else None, (cleaned_data or {}).get('sale')]
+        return [sale.date_created for sale in sales if sale is not None]
+
+
+def format_etb(value):
+    return "N/A" if value is None else f"{value:,.2f} ETB"
+
+
+def etb_equivalents(queryset, factor):
+    """Annotate total/paid/debt amounts times `factor` (None when rates are missing)"""
+    annotations = {}
+    for field in ('total_amount', 'amount_paid', 'debt_amount'):
+        if factor is None:
+            annotations[f'{field}_etb_value'] = Value(None, output_field=AMOUNT_FIELD)
+        else:
+            annotations[f'{field}_etb_value'] = ExpressionWrapper(F(field) * Value(factor), output_field=AMOUNT_FIELD)
+    return queryset.annotate(**annotations)
 
 
 @admin.register(User)
@@ -62,17 +199,43 @@ class CategoryAdmin(admin.ModelAdmin):
     ordering = ('name',)
     
     def product_count(self, obj):
-        return obj.product_set.count()
+        return obj.product_total
     product_count.short_description = 'Products'
+    product_count.admin_order_field = 'product_total'
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.annotate(product_total=Count('product'))
+
+
+class ProductBarcodeInline(admin.TabularInline):
+    model = ProductBarcode
+    extra = 1
+    fields = ('code', 'label', 'pack_quantity')
+
+
+class LowStockFilter(admin.SimpleListFilter):
+    title = 'stock level'
+    parameter_name = 'low_stock'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Low stock'), ('no', 'In stock'))
+
+    def queryset(self, request, queryset):
+        if self.value() in ('yes', 'no'):
+            return queryset.filter(low_stock_flag=self.value() == 'yes')
+        return queryset
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'brand', 'category', 'selling_price', 'current_stock', 'low_stock_threshold', 'is_low_stock', 'profit_margin', 'is_active')
-    list_filter = ('category', 'brand', 'is_active')
-    search_fields = ('name', 'brand', 'category__name')
+    list_filter = ('category', 'brand', 'is_active', LowStockFilter)
+    list_select_related = ('category',)
+    search_fields = ('name', 'brand', 'category__name', 'barcodes__code')
     ordering = ('name',)
     readonly_fields = ('date_added', 'date_updated', 'profit_margin', 'is_low_stock')
+    inlines = [ProductBarcodeInline]
     
     fieldsets = (
         ('Basic Information', {
@@ -91,12 +254,29 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
     
+    def is_low_stock(self, obj):
+        return getattr(obj, 'low_stock_flag', None)
+    is_low_stock.boolean = True
+    is_low_stock.short_description = 'Low stock'
+    is_low_stock.admin_order_field = 'low_stock_flag'
+    
+    def profit_margin(self, obj):
+        return getattr(obj, 'margin', None)
+    profit_margin.short_description = 'Profit margin'
+    profit_margin.admin_order_field = 'margin'
+    
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        qs = super().get_queryset(request).annotate(
+            low_stock_flag=Case(
+                When(current_stock__lte=F('low_stock_threshold'), then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
         if not request.user.is_superuser:
             # Hide purchase price from non-superusers
             return qs.only('id', 'name', 'brand', 'category_id', 'selling_price', 'current_stock', 'low_stock_threshold', 'date_added', 'date_updated', 'is_active')
-        return qs
+        return qs.annotate(margin=ExpressionWrapper(F('selling_price') - F('purchase_price'), output_field=AMOUNT_FIELD))
 
 
 class DebtCorrectionInline(admin.TabularInline):
@@ -116,14 +296,36 @@ class DebtCorrectionInline(admin.TabularInline):
         return request.user.is_superuser
 
 
+class HasDebtFilter(admin.SimpleListFilter):
+    title = 'debt'
+    parameter_name = 'has_debt'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Has debt'), ('no', 'No debt'))
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(debt_usd_total__gt=0)
+        if self.value() == 'no':
+            return queryset.filter(debt_usd_total__lte=0)
+        return queryset
+
+
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(LargeTableAdmin):
     list_display = ('name', 'phone', 'total_debt_usd', 'total_debt_sos', 'debt_usd_equivalent', 'last_purchase_date', 'date_created', 'is_active')
-    list_filter = ('is_active', 'date_created', 'last_purchase_date')
+    list_filter = ('is_active', HasDebtFilter, 'date_created', 'last_purchase_date')
     search_fields = ('name', 'phone')
     ordering = ('-date_created',)
     readonly_fields = ('date_created', 'last_purchase_date', 'debt_usd_equivalent')
     inlines = [DebtCorrectionInline]
+
+    def get_search_results(self, request, queryset, search_term):
+        """Use the ranked phone/name index instead of LIKE scans (also serves autocomplete)"""
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        ranked_ids = ranked_customer_ids(search_term, limit=CUSTOMER_ADMIN_SEARCH_LIMIT)
+        return queryset.filter(pk__in=ranked_ids), False
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'phone', 'is_active')
@@ -140,12 +342,23 @@ class CustomerAdmin(admin.ModelAdmin):
     
     def debt_usd_equivalent(self, obj):
         """Display total debt in USD equivalent"""
-        return f"${obj.get_total_debt_usd_equivalent():.2f}"
+        total = getattr(obj, 'debt_usd_total', None)
+        if total is None:
+            total = obj.get_total_debt_usd_equivalent()
+        return f"${total:.2f}"
     debt_usd_equivalent.short_description = 'Total Debt (USD Eq.)'
+    debt_usd_equivalent.admin_order_field = 'debt_usd_total'
     
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.select_related()
+        currency_settings = CurrencySettings.objects.first()
+        # Float division so SQLite does not truncate integer-valued balances
+        return qs.annotate(debt_usd_total=ExpressionWrapper(
+            Cast('total_debt_usd', models.FloatField())
+            + Cast('total_debt_sos', models.FloatField()) / Value(float(get_usd_rate('SOS', currency_settings)))
+            + Cast('total_debt_etb', models.FloatField()) / Value(float(get_usd_rate('ETB', currency_settings))),
+            output_field=models.FloatField(),
+        ))
     
     def has_change_permission(self, request, obj=None):
         """Only allow superusers to edit customer debt"""
@@ -169,10 +382,11 @@ class SaleItemInline(admin.TabularInline):
 
 
 @admin.register(Sale)
-class SaleAdmin(admin.ModelAdmin):
+class SaleAdmin(LargeTableAdmin):
     list_display = ('transaction_id', 'customer', 'currency', 'total_amount', 'total_in_sos', 'debt_amount', 'date_created')
     list_filter = ('currency', 'date_created', 'is_completed')
     search_fields = ('transaction_id', 'customer__name', 'customer__phone')
+    autocomplete_fields = ('customer',)
     ordering = ('-date_created',)
     readonly_fields = ('transaction_id', 'debt_amount', 'date_created', 'total_in_sos', 'paid_in_sos', 'debt_in_sos')
     inlines = [SaleItemInline]
@@ -200,18 +414,24 @@ class SaleAdmin(admin.ModelAdmin):
     
     def total_in_sos(self, obj):
         """Display total amount in SOS"""
-        return f"{obj.get_amount_in_currency('SOS'):.0f} SOS"
+        # Legacy rows are stored in SOS
+        return f"{obj.total_amount:.0f} SOS"
     total_in_sos.short_description = 'Total (SOS)'
+    total_in_sos.admin_order_field = 'total_amount'
     
     def paid_in_sos(self, obj):
         """Display paid amount in SOS"""
-        return f"{obj.get_paid_amount_in_currency('SOS'):.0f} SOS"
+        # Legacy rows are stored in SOS
+        return f"{obj.amount_paid:.0f} SOS"
     paid_in_sos.short_description = 'Paid (SOS)'
+    paid_in_sos.admin_order_field = 'amount_paid'
     
     def debt_in_sos(self, obj):
         """Display debt amount in SOS"""
-        return f"{obj.get_debt_amount_in_currency('SOS'):.0f} SOS"
+        # Legacy rows are stored in SOS
+        return f"{obj.debt_amount:.0f} SOS"
     debt_in_sos.short_description = 'Debt (SOS)'
+    debt_in_sos.admin_order_field = 'debt_amount'
     
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -219,7 +439,7 @@ class SaleAdmin(admin.ModelAdmin):
 
 
 @admin.register(SaleItem)
-class SaleItemAdmin(admin.ModelAdmin):
+class SaleItemAdmin(LargeTableAdmin):
     list_display = ('sale', 'product', 'quantity', 'unit_price', 'total_price')
     list_filter = ('sale__currency', 'sale__date_created')
     search_fields = ('sale__transaction_id', 'product__name', 'product__brand')
@@ -253,10 +473,11 @@ class SaleItemETBInline(admin.TabularInline):
 
 
 @admin.register(SaleUSD)
-class SaleUSDAdmin(admin.ModelAdmin):
+class SaleUSDAdmin(ClosedDayAdminMixin, LargeTableAdmin):
     list_display = ('transaction_id', 'customer', 'total_amount', 'amount_paid', 'debt_amount', 'total_amount_etb', 'date_created', 'is_completed')
     list_filter = ('is_completed', 'date_created')
     search_fields = ('customer__name', 'customer__phone', 'transaction_id')
+    autocomplete_fields = ('customer',)
     ordering = ('-date_created',)
     readonly_fields = ('transaction_id', 'date_created', 'total_amount_etb', 'amount_paid_etb', 'debt_amount_etb')
     inlines = [SaleItemUSDInline]
@@ -281,44 +502,36 @@ class SaleUSDAdmin(admin.ModelAdmin):
     
     def total_amount_etb(self, obj):
         """Display total amount in ETB"""
-        from .models import CurrencySettings
-        settings = CurrencySettings.objects.first()
-        if settings:
-            etb_amount = obj.total_amount * settings.usd_to_etb_rate
-            return f"{etb_amount:,.2f} ETB"
-        return "N/A"
+        return format_etb(getattr(obj, 'total_amount_etb_value', None))
     total_amount_etb.short_description = 'Total (ETB)'
+    total_amount_etb.admin_order_field = 'total_amount_etb_value'
     
     def amount_paid_etb(self, obj):
         """Display amount paid in ETB"""
-        from .models import CurrencySettings
-        settings = CurrencySettings.objects.first()
-        if settings:
-            etb_amount = obj.amount_paid * settings.usd_to_etb_rate
-            return f"{etb_amount:,.2f} ETB"
-        return "N/A"
+        return format_etb(getattr(obj, 'amount_paid_etb_value', None))
     amount_paid_etb.short_description = 'Paid (ETB)'
+    amount_paid_etb.admin_order_field = 'amount_paid_etb_value'
     
     def debt_amount_etb(self, obj):
         """Display debt amount in ETB"""
-        from .models import CurrencySettings
-        settings = CurrencySettings.objects.first()
-        if settings:
-            etb_amount = obj.debt_amount * settings.usd_to_etb_rate
-            return f"{etb_amount:,.2f} ETB"
-        return "N/A"
+        return format_etb(getattr(obj, 'debt_amount_etb_value', None))
     debt_amount_etb.short_description = 'Debt (ETB)'
+    debt_amount_etb.admin_order_field = 'debt_amount_etb_value'
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.select_related('customer', 'user').prefetch_related('items')
+        qs = super().get_queryset(request).select_related('customer', 'user')
+        # Rates are read once per request, not once per row
+        settings = CurrencySettings.objects.first()
+        factor = settings.usd_to_etb_rate if settings else None
+        return etb_equivalents(qs, factor)
 
 
 @admin.register(SaleSOS)
-class SaleSOSAdmin(admin.ModelAdmin):
+class SaleSOSAdmin(ClosedDayAdminMixin, LargeTableAdmin):
     list_display = ('transaction_id', 'customer', 'total_amount', 'amount_paid', 'debt_amount', 'total_amount_etb', 'date_created', 'is_completed')
     list_filter = ('is_completed', 'date_created')
     search_fields = ('customer__name', 'customer__phone', 'transaction_id')
+    autocomplete_fields = ('customer',)
     ordering = ('-date_created',)
     readonly_fields = ('transaction_id', 'date_created', 'total_amount_etb', 'amount_paid_etb', 'debt_amount_etb')
     inlines = [SaleItemSOSInline]
@@ -343,47 +556,36 @@ class SaleSOSAdmin(admin.ModelAdmin):
     
     def total_amount_etb(self, obj):
         """Display total amount in ETB"""
-        from .models import CurrencySettings
-        settings = CurrencySettings.objects.first()
-        if settings and settings.usd_to_sos_rate > 0:
-            usd_amount = obj.total_amount / settings.usd_to_sos_rate
-            etb_amount = usd_amount * settings.usd_to_etb_rate
-            return f"{etb_amount:,.2f} ETB"
-        return "N/A"
+        return format_etb(getattr(obj, 'total_amount_etb_value', None))
     total_amount_etb.short_description = 'Total (ETB)'
+    total_amount_etb.admin_order_field = 'total_amount_etb_value'
     
     def amount_paid_etb(self, obj):
         """Display amount paid in ETB"""
-        from .models import CurrencySettings
-        settings = CurrencySettings.objects.first()
-        if settings and settings.usd_to_sos_rate > 0:
-            usd_amount = obj.amount_paid / settings.usd_to_sos_rate
-            etb_amount = usd_amount * settings.usd_to_etb_rate
-            return f"{etb_amount:,.2f} ETB"
-        return "N/A"
+        return format_etb(getattr(obj, 'amount_paid_etb_value', None))
     amount_paid_etb.short_description = 'Paid (ETB)'
+    amount_paid_etb.admin_order_field = 'amount_paid_etb_value'
     
     def debt_amount_etb(self, obj):
         """Display debt amount in ETB"""
-        from .models import CurrencySettings
-        settings = CurrencySettings.objects.first()
-        if settings and settings.usd_to_sos_rate > 0:
-            usd_amount = obj.debt_amount / settings.usd_to_sos_rate
-            etb_amount = usd_amount * settings.usd_to_etb_rate
-            return f"{etb_amount:,.2f} ETB"
-        return "N/A"
+        return format_etb(getattr(obj, 'debt_amount_etb_value', None))
     debt_amount_etb.short_description = 'Debt (ETB)'
+    debt_amount_etb.admin_order_field = 'debt_amount_etb_value'
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.select_related('customer', 'user').prefetch_related('items')
+        qs = super().get_queryset(request).select_related('customer', 'user')
+        # Rates are read once per request, not once per row
+        settings = CurrencySettings.objects.first()
+        factor = settings.usd_to_etb_rate / settings.usd_to_sos_rate if settings and settings.usd_to_sos_rate > 0 else None
+        return etb_equivalents(qs, factor)
 
 
 @admin.register(SaleETB)
-class SaleETBAdmin(admin.ModelAdmin):
+class SaleETBAdmin(ClosedDayAdminMixin, LargeTableAdmin):
     list_display = ('transaction_id', 'customer', 'total_amount', 'amount_paid', 'debt_amount', 'date_created', 'is_completed')
     list_filter = ('is_completed', 'date_created')
     search_fields = ('customer__name', 'customer__phone', 'transaction_id')
+    autocomplete_fields = ('customer',)
     ordering = ('-date_created',)
     readonly_fields = ('transaction_id', 'date_created', 'exchange_rate_at_sale')
     inlines = [SaleItemETBInline]
@@ -408,11 +610,11 @@ class SaleETBAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.select_related('customer', 'user').prefetch_related('items')
+        return qs.select_related('customer', 'user')
 
 
 @admin.register(SaleItemUSD)
-class SaleItemUSDAdmin(admin.ModelAdmin):
+class SaleItemUSDAdmin(ClosedDaySaleItemAdminMixin, LargeTableAdmin):
     list_display = ('sale', 'product', 'quantity', 'unit_price', 'total_price')
     list_filter = ('sale__date_created',)
     search_fields = ('sale__transaction_id', 'product__name', 'product__brand')
@@ -425,7 +627,7 @@ class SaleItemUSDAdmin(admin.ModelAdmin):
 
 
 @admin.register(SaleItemSOS)
-class SaleItemSOSAdmin(admin.ModelAdmin):
+class SaleItemSOSAdmin(ClosedDaySaleItemAdminMixin, LargeTableAdmin):
     list_display = ('sale', 'product', 'quantity', 'unit_price', 'total_price')
     list_filter = ('sale__date_created',)
     search_fields = ('sale__transaction_id', 'product__name', 'product__brand')
@@ -438,7 +640,7 @@ class SaleItemSOSAdmin(admin.ModelAdmin):
 
 
 @admin.register(SaleItemETB)
-class SaleItemETBAdmin(admin.ModelAdmin):
+class SaleItemETBAdmin(ClosedDaySaleItemAdminMixin, LargeTableAdmin):
     list_display = ('sale', 'product', 'quantity', 'unit_price', 'total_price')
     list_filter = ('sale__date_created',)
     search_fields = ('sale__transaction_id', 'product__name', 'product__brand')
@@ -451,7 +653,7 @@ class SaleItemETBAdmin(admin.ModelAdmin):
 
 
 @admin.register(InventoryLog)
-class InventoryLogAdmin(admin.ModelAdmin):
+class InventoryLogAdmin(LargeTableAdmin):
     list_display = ('product', 'action', 'quantity_change', 'old_quantity', 'new_quantity', 'date_created')
     list_filter = ('action', 'date_created', 'product__category')
     search_fields = ('product__name', 'product__brand', 'notes')
@@ -464,7 +666,7 @@ class InventoryLogAdmin(admin.ModelAdmin):
 
 
 @admin.register(DebtPaymentUSD)
-class DebtPaymentUSDAdmin(admin.ModelAdmin):
+class DebtPaymentUSDAdmin(ClosedDayAdminMixin, LargeTableAdmin):
     list_display = ('customer', 'amount', 'date_created')
     list_filter = ('date_created',)
     search_fields = ('customer__name', 'customer__phone', 'notes')
@@ -486,7 +688,7 @@ class DebtPaymentUSDAdmin(admin.ModelAdmin):
 
 
 @admin.register(DebtPaymentSOS)
-class DebtPaymentSOSAdmin(admin.ModelAdmin):
+class DebtPaymentSOSAdmin(ClosedDayAdminMixin, LargeTableAdmin):
     list_display = ('customer', 'amount', 'date_created')
     list_filter = ('date_created',)
     search_fields = ('customer__name', 'customer__phone', 'notes')
@@ -508,7 +710,7 @@ class DebtPaymentSOSAdmin(admin.ModelAdmin):
 
 
 @admin.register(DebtPaymentETB)
-class DebtPaymentETBAdmin(admin.ModelAdmin):
+class DebtPaymentETBAdmin(ClosedDayAdminMixin, LargeTableAdmin):
     list_display = ('customer', 'amount', 'date_created')
     list_filter = ('date_created',)
     search_fields = ('customer__name', 'customer__phone', 'notes')
@@ -531,7 +733,7 @@ class DebtPaymentETBAdmin(admin.ModelAdmin):
 
 # Legacy DebtPayment admin for backward compatibility
 @admin.register(DebtPayment)
-class DebtPaymentAdmin(admin.ModelAdmin):
+class DebtPaymentAdmin(ClosedDayAdminMixin, LargeTableAdmin):
     list_display = ('customer', 'amount', 'original_currency', 'original_amount', 'amount_in_sos', 'date_created')
     list_filter = ('original_currency', 'date_created')
     search_fields = ('customer__name', 'customer__phone', 'notes')
@@ -575,7 +777,7 @@ class ReceiptAdmin(admin.ModelAdmin):
 
 
 @admin.register(AuditLog)
-class AuditLogAdmin(admin.ModelAdmin):
+class AuditLogAdmin(LargeTableAdmin):
     list_display = ('user', 'action', 'object_type', 'object_id', 'date_created', 'ip_address')
     list_filter = ('action', 'object_type', 'date_created')
     search_fields = ('user__username', 'user__first_name', 'user__last_name', 'details')
@@ -628,3 +830,160 @@ class DebtCorrectionAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.select_related('customer')
+
+
+class TransactionItemInline(admin.TabularInline):
+    model = TransactionItem
+    extra = 0
+    fields = ('product', 'quantity', 'unit_price', 'total_price')
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(Transaction)
+class TransactionAdmin(LargeTableAdmin):
+    """Read-only view of the unified ledger (rows are mirrored from the per-currency tables)"""
+    list_display = ('transaction_id', 'source', 'customer', 'currency', 'total_amount', 'total_amount_usd', 'debt_amount', 'date_created')
+    list_filter = ('source', 'currency', 'date_created')
+    search_fields = ('transaction_id', 'customer__name', 'customer__phone', 'pno')
+    ordering = ('-date_created',)
+    inlines = [TransactionItemInline]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('customer', 'user')
+
+
+@admin.register(SalesFact)
+class SalesFactAdmin(LargeTableAdmin):
+    """Read-only view of the sales fact cube (rebuilt from the sale item tables)"""
+    list_display = ('day', 'product', 'category', 'currency', 'user', 'quantity', 'revenue', 'revenue_usd', 'profit_usd')
+    list_filter = ('currency', 'category', 'day')
+    search_fields = ('product__name',)
+    ordering = ('-day',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('product', 'category', 'user')
+
+
+@admin.register(ProductSalesDay)
+class ProductSalesDayAdmin(LargeTableAdmin):
+    """Read-only view of the best-seller window (derived from the sales fact cube)"""
+    list_display = ('day', 'product', 'category', 'quantity', 'revenue_usd')
+    list_filter = ('category',)
+    search_fields = ('product__name',)
+    ordering = ('-day',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('product', 'category')
+
+
+@admin.register(SalesRunningTotal)
+class SalesRunningTotalAdmin(LargeTableAdmin):
+    """Read-only view of the daily running totals (maintained by signals, rebuilt with the fact cube)"""
+    list_display = ('day', 'currency', 'sales_count', 'total_amount', 'total_amount_usd', 'cum_sales_count', 'cum_total_amount_usd')
+    list_filter = ('currency',)
+    ordering = ('-day', 'currency')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SalesHour)
+class SalesHourAdmin(LargeTableAdmin):
+    """Read-only view of the hourly sales rollup (maintained by signals, rebuilt with the fact cube)"""
+    list_display = ('hour', 'currency', 'sales_count', 'revenue_usd', 'quantity')
+    list_filter = ('currency',)
+    ordering = ('-hour', 'currency')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class DailyCloseTotalInline(admin.TabularInline):
+    model = DailyCloseTotal
+    extra = 0
+    fields = DailyCloseTotal.FIGURES
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(DailyClose)
+class DailyCloseAdmin(admin.ModelAdmin):
+    """Read-only view of the end-of-day snapshots; they are written by closing a day"""
+    list_display = ('day', 'closed_by', 'date_closed', 'stock_restocked', 'stock_sold', 'stock_adjusted', 'intact')
+    ordering = ('-day',)
+    readonly_fields = ('day', 'stock_restocked', 'stock_sold', 'stock_adjusted', 'content_hash', 'closed_by', 'date_closed')
+    inlines = [DailyCloseTotalInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('closed_by').prefetch_related('totals')
+
+    @admin.display(boolean=True, description='Hash OK')
+    def intact(self, obj):
+        return obj.is_intact
+
+
+class StockTakeLineInline(admin.TabularInline):
+    model = StockTakeLine
+    extra = 0
+    fields = ('product', 'expected_quantity', 'counted_quantity', 'variance', 'counted_by', 'date_counted')
+    readonly_fields = fields
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product', 'counted_by')
+
+
+@admin.register(StockTake)
+class StockTakeAdmin(admin.ModelAdmin):
+    """Read-only view of stock takes (counted and posted from the stock take pages)"""
+    list_display = ('id', 'category', 'status', 'started_by', 'date_started', 'posted_by', 'date_posted')
+    list_filter = ('status', 'date_started')
+    ordering = ('-date_started',)
+    inlines = [StockTakeLineInline]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('category', 'started_by', 'posted_by')
@@ -0,0 +1,98 @@
+# barcodes.py
+"""Barcode scan lookup with a small in-process LRU.
+
+A miss costs two indexed queries: the code joined to its product, and the
+precomputed ProductPrice rows. A hit re-reads only the product's
+catalog_version and stock by primary key. A changed version (any product
+save, price or rate change, or barcode edit) drops the entry, so cached
+prices never outlive the data they came from.
+"""
+import threading
+from collections import OrderedDict
+
+SCAN_CACHE_SIZE = 2048
+
+
+class LRUCache:
+    """Thread-safe least-recently-used mapping with a fixed size"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+scan_cache = LRUCache(SCAN_CACHE_SIZE)
+
+
+def _load(code):
+    from .models import ProductBarcode, ProductPrice
+
+    barcode = ProductBarcode.objects.select_related('product__category').filter(code=code).first()
+    if barcode is None:
+        return None
+    product = barcode.product
+    prices = ProductPrice.sell_price_map([product.id]).get(product.id, {})
+    return {
+        'catalog_version': product.catalog_version,
+        'pack_quantity': barcode.pack_quantity,
+        'label': barcode.label,
+        'product': {
+            'id': product.id,
+            'name': product.name,
+            'brand': product.brand,
+            'category': product.category.name,
+            'selling_price': float(prices.get('USD', product.selling_price)),
+            'selling_price_usd': float(prices.get('USD', product.selling_price)),
+            'selling_price_sos': float(prices.get('SOS', 0)),
+            'selling_price_etb': float(prices.get('ETB', 0)),
+            'current_stock': float(product.current_stock),
+            'low_stock_threshold': float(product.low_stock_threshold),
+            'selling_unit': product.selling_unit,
+            'minimum_sale_length': float(product.minimum_sale_length) if product.minimum_sale_length else None,
+            'is_active': product.is_active,
+        },
+    }
+
+
+def lookup_code(code):
+    """Scan result for `code` as a dict, or None when no product has it"""
+    from .models import Product
+
+    code = code.strip()
+    cached = scan_cache.get(code)
+    if cached is not None:
+        current = Product.objects.filter(pk=cached['product']['id']).values_list('catalog_version', 'current_stock').first()
+        if current is not None and current[0] == cached['catalog_version']:
+            return {**cached, 'product': {**cached['product'], 'current_stock': float(current[1])}}
+        scan_cache.discard(code)
+
+    result = _load(code)
+    if result is not None:
+        scan_cache.set(code, result)
+    return result
@@ -0,0 +1,285 @@
+# closes.py
+"""End-of-day close (Z-report) and the guard on edits to closed days.
+
+close_day() computes a day's figures per currency from the ledger once and
+freezes them in a DailyClose. From then on period_summary() reads that day
+from the snapshot: a range is one row per closed day plus a live
+computation for the open days only, and the closed figures stay put when
+rates or product prices change later.
+
+Edits that would change a closed day's figures go through check_day_open():
+refused for everyone unless a superuser explicitly overrides, which is
+written to the audit log.
+
+Reports built on the SalesRunningTotal rollup pass their range totals
+through apply_closed_days(), which swaps each closed day's live figures for
+its snapshot.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .reports import MONEY_FIELD, date_bounds
+
+CLOSE_CURRENCIES = ('USD', 'SOS', 'ETB')
+USD_FIGURES = (
+    'total_sales_usd', 'cash_collected_usd', 'debt_created_usd', 'payments_received_usd', 'cost_usd', 'profit_usd',
+)
+ZERO = Decimal('0.00')
+# SalesRunningTotal metric -> DailyCloseTotal figure it is frozen as; quantity has no snapshot and stays live
+CLOSED_METRICS = {
+    'sales_count': 'sales_count',
+    'total_amount': 'total_sales',
+    'amount_paid': 'cash_collected',
+    'total_amount_usd': 'total_sales_usd',
+    'amount_paid_usd': 'cash_collected_usd',
+    'debt_amount_usd': 'debt_created_usd',
+    'revenue_usd': 'total_sales_usd',
+    'cost_usd': 'cost_usd',
+    'profit_usd': 'profit_usd',
+}
+
+
+class DayClosedError(ValueError):
+    """Raised for a write to a closed day, or for closing a day twice"""
+
+
+def _cents(value):
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+def _empty_day():
+    from .models import DailyCloseTotal
+
+    stock = {'stock_restocked': ZERO, 'stock_sold': ZERO, 'stock_adjusted': ZERO}
+    totals = {currency: dict.fromkeys(DailyCloseTotal.FIGURES, ZERO) for currency in CLOSE_CURRENCIES}
+    return stock, totals
+
+
+def compute_days(start_date, end_date):
+    """{day: (stock movements, {currency: figures})} for a range, from the live rows.
+
+    Every figure is grouped by day in SQL, so the query count does not grow
+    with the length of the range.
+    """
+    from .models import InventoryLog, SALE_ITEM_MODELS, Transaction, TransactionPayment
+
+    days = {}
+    day = start_date
+    while day <= end_date:
+        days[day] = _empty_day()
+        day += timedelta(days=1)
+    start, end = date_bounds(start_date, end_date)
+
+    sales = Transaction.objects.exclude(source='Legacy').filter(
+        date_created__gte=start, date_created__lt=end,
+    ).annotate(day=TruncDate('date_created')).values('day', 'currency').annotate(
+        count=Count('id'),
+        total=Sum('total_amount'), total_usd=Sum('total_amount_usd'),
+        paid=Sum('amount_paid'), paid_usd=Sum('amount_paid_usd'),
+        debt=Sum('debt_amount'), debt_usd=Sum('debt_amount_usd'),
+    ).order_by()
+    for row in sales:
+        days[row['day']][1][row['currency']].update({
+            'sales_count': row['count'],
+            'total_sales': row['total'] or ZERO, 'total_sales_usd': row['total_usd'] or ZERO,
+            'cash_collected': row['paid'] or ZERO, 'cash_collected_usd': row['paid_usd'] or ZERO,
+            'debt_created': row['debt'] or ZERO, 'debt_created_usd': row['debt_usd'] or ZERO,
+        })
+
+    payments = TransactionPayment.objects.filter(date_created__gte=start, date_created__lt=end).annotate(
+        day=TruncDate('date_created'),
+    ).values('day', 'currency').annotate(amount=Sum('amount'), amount_usd=Sum('amount_usd')).order_by()
+    for row in payments:
+        days[row['day']][1][row['currency']].update({
+            'payments_received': row['amount'] or ZERO, 'payments_received_usd': row['amount_usd'] or ZERO,
+        })
+
+    for currency in CLOSE_CURRENCIES:
+        costs = SALE_ITEM_MODELS[currency].objects.filter(
+            sale__date_created__gte=start, sale__date_created__lt=end,
+        ).annotate(day=TruncDate('sale__date_created')).values('day').annotate(
+            cost=Sum(F('unit_cost_usd') * F('quantity'), output_field=MONEY_FIELD),
+        ).values_list('day', 'cost').order_by()
+        for day, cost in costs:
+            days[day][1][currency]['cost_usd'] = cost or ZERO
+    for _stock, totals in days.values():
+        for figures in totals.values():
+            figures['profit_usd'] = figures['total_sales_usd'] - figures['cost_usd']
+
+    movements = InventoryLog.objects.filter(date_created__gte=start, date_created__lt=end).annotate(
+        day=TruncDate('date_created'),
+    ).values('day', 'action').annotate(change=Sum('quantity_change')).values_list('day', 'action', 'change').order_by()
+    for day, action, change in movements:
+        stock = days[day][0]
+        change = change or ZERO
+        if action == 'RESTOCK':
+            stock['stock_restocked'] += change
+        elif action in ('SALE', 'SALE_ITEM_ADDED'):
+            # Sales log negative changes; report units sold as a positive count
+            stock['stock_sold'] -= change
+        else:
+            stock['stock_adjusted'] += change
+    return days
+
+
+def compute_day(day):
+    """(stock movements, {currency: figures}) for one day, from the live rows"""
+    return compute_days(day, day)[day]
+
+
+def is_closed(day):
+    from .models import DailyClose
+
+    return DailyClose.objects.filter(day=day).exists()
+
+
+def close_day(day, user=None, ip_address=None):
+    """Freeze `day` into a DailyClose; raises DayClosedError if it is already closed"""
+    from .models import AuditLog, DailyClose, DailyCloseTotal
+
+    if day > timezone.now().date():
+        raise ValueError("A day cannot be closed before it starts")
+    with transaction.atomic():
+        if is_closed(day):
+            raise DayClosedError(f"{day} is already closed")
+        stock, totals = compute_day(day)
+        # Round to the stored precision first, so the hash matches what is saved
+        stock = {field: _cents(value) for field, value in stock.items()}
+        totals = {
+            currency: {field: value if field == 'sales_count' else _cents(value) for field, value in figures.items()}
+            for currency, figures in totals.items()
+        }
+        close = DailyClose.objects.create(
+            day=day, closed_by=user, content_hash=DailyClose.hash_content(day, stock, totals), **stock,
+        )
+        DailyCloseTotal.objects.bulk_create([
+            DailyCloseTotal(close=close, currency=currency, **figures) for currency, figures in totals.items()
+        ])
+        AuditLog.objects.create(
+            user=user,
+            action='DAY_CLOSED',
+            object_type='DailyClose',
+            object_id=str(close.pk),
+            details=f"Closed {day} (hash {close.content_hash[:12]})",
+            ip_address=ip_address,
+        )
+    return close
+
+
+def check_day_open(day, user, override=False, ip_address=None, action=''):
+    """Allow a write dated `day`, or raise DayClosedError if the day is closed.
+
+    A superuser passing override=True may still write; the override is
+    audited, and the day's snapshot keeps the figures it was closed with.
+    """
+    from .models import AuditLog
+
+    if not is_closed(day):
+        return
+    if not (override and user.is_superuser):
+        raise DayClosedError(f"{day} is closed; a superuser override is required to change it")
+    AuditLog.objects.create(
+        user=user,
+        action='CLOSED_DAY_OVERRIDE',
+        object_type='DailyClose',
+        object_id=day.isoformat(),
+        details=f"Override on closed day {day}: {action}",
+        ip_address=ip_address,
+    )
+
+
+def apply_closed_days(totals, start_date, end_date):
+    """SalesRunningTotal.range_totals() output with the closed days of the range read from their snapshots.
+
+    The live day rows of the closed days are taken out and the frozen
+    figures put in their place, in two queries whatever the number of
+    closed days. `totals` is not modified.
+    """
+    from .models import DailyCloseTotal, SalesRunningTotal
+
+    snapshots = list(DailyCloseTotal.objects.filter(
+        close__day__gte=start_date, close__day__lte=end_date,
+    ).values('close__day', 'currency', *sorted(set(CLOSED_METRICS.values()))))
+    totals = {currency: dict(figures) for currency, figures in totals.items()}
+    if not snapshots:
+        return totals
+
+    def shift(currency, metric, change):
+        if currency in totals:
+            totals[currency][metric] += change
+            if metric in SalesRunningTotal.COMBINED_METRICS:
+                totals['ALL'][metric] += change
+
+    live = SalesRunningTotal.objects.filter(day__in={row['close__day'] for row in snapshots}).values(
+        'currency', *CLOSED_METRICS,
+    )
+    for row in live:
+        for metric in CLOSED_METRICS:
+            shift(row['currency'], metric, -row[metric])
+    for row in snapshots:
+        for metric, figure in CLOSED_METRICS.items():
+            shift(row['currency'], metric, row[figure])
+    return totals
+
+
+def _combined(totals):
+    combined = {field: ZERO for field in USD_FIGURES}
+    combined['sales_count'] = 0
+    for figures in totals.values():
+        for field in combined:
+            combined[field] += figures[field]
+    return combined
+
+
+def period_summary(start_date, end_date):
+    """Per-day rows and per-currency totals for a date range.
+
+    Closed days come from their snapshots; only open days are computed.
+    Each row is {'day', 'closed', 'close', 'stock', 'totals',
+    'all_currencies'}, newest first; 'all_currencies' adds up the sale
+    count and the USD figures.
+    """
+    from .models import DailyClose, DailyCloseTotal
+
+    closes = {
+        close.day: close
+        for close in DailyClose.objects.filter(day__gte=start_date, day__lte=end_date).prefetch_related('totals')
+    }
+    open_days = []
+    day = start_date
+    while day <= end_date:
+        if day not in closes:
+            open_days.append(day)
+        day += timedelta(days=1)
+    # One grouped computation spanning the open days, however many there are
+    live = compute_days(open_days[0], open_days[-1]) if open_days else {}
+
+    rows = []
+    day = end_date
+    while day >= start_date:
+        close = closes.get(day)
+        if close:
+            stock = {field: getattr(close, field) for field in DailyClose.STOCK_FIELDS}
+            totals = {
+                total.currency: {field: getattr(total, field) for field in DailyCloseTotal.FIGURES}
+                for total in close.totals.all()
+            }
+        else:
+            stock, totals = live[day]
+        rows.append({
+            'day': day, 'closed': close is not None, 'close': close, 'stock': stock, 'totals': totals,
+            'all_currencies': _combined(totals),
+        })
+        day -= timedelta(days=1)
+
+    grand = {currency: dict.fromkeys(DailyCloseTotal.FIGURES, ZERO) for currency in CLOSE_CURRENCIES}
+    for row in rows:
+        for currency, figures in row['totals'].items():
+            for field, value in figures.items():
+                grand[currency][field] += value
+    return rows, grand
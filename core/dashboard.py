@@ -0,0 +1,277 @@
+# dashboard.py
+"""Dashboard widgets served one at a time by `api/dashboard/<widget>/`.
+
+The dashboard page is a shell; each widget is fetched in parallel and
+carries its own ETag built from the data versions it reads (see
+DataVersion and CatalogVersion), so an unchanged widget costs one small
+query and a 304 instead of its aggregates.
+
+A widget handler takes the request and the CurrencySettings row and
+returns the context for its partial template under
+core/dashboard/. The context's `data` entry, if any, is sent to the page
+as JSON next to the rendered HTML.
+"""
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    CatalogVersion, Customer, DataVersion, Product, Transaction,
+    SaleItemETB, SaleItemSOS, SaleItemUSD,
+)
+from .topk import top_products
+
+WIDGETS = {}
+
+CENT = Decimal('0.01')
+
+
+def register_widget(name, versions, superuser_only=False, bucket='day', template=True):
+    """Decorator adding a widget handler to the registry.
+
+    `versions` are the DataVersion keys (or 'catalog') the widget reads.
+    `bucket` is 'day' for widgets that roll over at midnight, or 'minute'
+    for ones showing relative times. Widgets with template=False only
+    send their `data`.
+    """
+    def decorator(func):
+        WIDGETS[name] = {
+            'handler': func,
+            'versions': versions,
+            'superuser_only': superuser_only,
+            'bucket': bucket,
+            'template': f'core/dashboard/_{name}.html' if template else None,
+        }
+        return func
+    return decorator
+
+
+def can_view(user, name):
+    widget = WIDGETS.get(name)
+    return widget is not None and (user.is_superuser or not widget['superuser_only'])
+
+
+def widget_etag(name):
+    """ETag for a widget: its data versions plus the current time bucket"""
+    widget = WIDGETS[name]
+    keys = [key for key in widget['versions'] if key != 'catalog']
+    versions = DataVersion.current(*keys) if keys else {}
+    parts = [name] + [f'{key}{versions[key]}' for key in keys]
+    if 'catalog' in widget['versions']:
+        parts.append(f'catalog{CatalogVersion.current()}')
+    now = timezone.now()
+    parts.append(now.strftime('%Y%m%d%H%M') if widget['bucket'] == 'minute' else now.date().isoformat())
+    return '-'.join(parts)
+
+
+def _rates(currency_settings):
+    # Default rates if settings missing
+    usd_to_sos_rate = currency_settings.usd_to_sos_rate if currency_settings else Decimal('8000.00')
+    usd_to_etb_rate = currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00')
+    return usd_to_sos_rate, usd_to_etb_rate
+
+
+def _ledger_sales():
+    return Transaction.objects.exclude(source='Legacy')
+
+
+def _today_totals(today):
+    # Per-currency sales carry USD equivalents written at sale time, so the
+    # cross-currency totals are single SUMs over the ledger.
+    return _ledger_sales().filter(date_created__date=today).aggregate(
+        total_usd=Sum('total_amount_usd'),
+        paid_usd=Sum('amount_paid_usd'),
+        count=Count('id'),
+    )
+
+
+def _quantize(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+@register_widget('sales', ('sales', 'settings'))
+def sales_widget(request, currency_settings):
+    """Today's revenue, cash collected, outstanding balance and sale count"""
+    today = timezone.now().date()
+    _, usd_to_etb_rate = _rates(currency_settings)
+    totals = _today_totals(today)
+    total_sales_revenue_etb = (totals['total_usd'] or Decimal('0.00')) * usd_to_etb_rate
+    cash_collected_etb = (totals['paid_usd'] or Decimal('0.00')) * usd_to_etb_rate
+    outstanding_debt_today_etb = total_sales_revenue_etb - cash_collected_etb
+    collection_rate = Decimal('0.00')
+    if total_sales_revenue_etb > 0:
+        collection_rate = (cash_collected_etb / total_sales_revenue_etb * 100).quantize(CENT, rounding=ROUND_HALF_UP)
+    return {
+        'total_sales_revenue_etb': _quantize(total_sales_revenue_etb),
+        'cash_collected_etb': _quantize(cash_collected_etb),
+        'outstanding_debt_today_etb': _quantize(outstanding_debt_today_etb),
+        'collection_rate': collection_rate,
+        'today_transactions': totals['count'],
+        # Starting point for the deltas pushed by dashboard_events
+        'data': {
+            'today': today.isoformat(),
+            'usd_to_etb_rate': float(usd_to_etb_rate),
+            'total_sales_etb': float(total_sales_revenue_etb),
+            'cash_collected_etb': float(cash_collected_etb),
+            'transactions': totals['count'],
+        },
+    }
+
+
+@register_widget('profit', ('sales', 'settings'), superuser_only=True)
+def profit_widget(request, currency_settings):
+    """Expected and actual profit on today's sales"""
+    today = timezone.now().date()
+    _, usd_to_etb_rate = _rates(currency_settings)
+    # Purchase cost and margins are snapshotted on the items at sale time
+    expected_profit_usd = Decimal('0.00')
+    purchase_cost_usd = Decimal('0.00')
+    for item_model in (SaleItemUSD, SaleItemSOS, SaleItemETB):
+        totals = item_model.cost_totals(sale__date_created__date=today)
+        expected_profit_usd += totals['expected_profit_usd']
+        purchase_cost_usd += totals['cost_usd']
+    expected_profit_etb = expected_profit_usd * usd_to_etb_rate
+
+    # Actual profit (based on amount_paid)
+    paid_usd = _ledger_sales().filter(date_created__date=today).aggregate(total=Sum('amount_paid_usd'))['total']
+    actual_profit_etb = ((paid_usd or Decimal('0.00')) - purchase_cost_usd) * usd_to_etb_rate
+    bonus_profit_etb = _overpayments(today, usd_to_etb_rate)[1]
+    return {
+        'expected_profit_etb': _quantize(expected_profit_etb),
+        'actual_profit_etb': _quantize(actual_profit_etb),
+        'profit_variance_etb': _quantize(expected_profit_etb - actual_profit_etb),
+        'bonus_profit_etb': _quantize(bonus_profit_etb),
+    }
+
+
+def _overpayments(today, usd_to_etb_rate):
+    overpayments = _ledger_sales().filter(
+        date_created__date=today, amount_paid_usd__gt=F('total_amount_usd')
+    ).aggregate(
+        count=Count('id'),
+        total_usd=Sum(F('amount_paid_usd') - F('total_amount_usd')),
+    )
+    return overpayments['count'], (overpayments['total_usd'] or Decimal('0.00')) * usd_to_etb_rate
+
+
+@register_widget('overpayments', ('sales', 'settings'), superuser_only=True)
+def overpayments_widget(request, currency_settings):
+    """Today's sales paid beyond their total"""
+    _, usd_to_etb_rate = _rates(currency_settings)
+    overpayment_count, total_overpayments_etb = _overpayments(timezone.now().date(), usd_to_etb_rate)
+    return {
+        'overpayment_count': overpayment_count,
+        'total_overpayments_etb': _quantize(total_overpayments_etb),
+    }
+
+
+@register_widget('debt', ('debt', 'settings'))
+def debt_widget(request, currency_settings):
+    """Outstanding customer debt across currencies"""
+    _, usd_to_etb_rate = _rates(currency_settings)
+    total_debt_combined_etb = Customer.get_total_debt_usd_combined(currency_settings) * usd_to_etb_rate
+    return {
+        'total_debt_etb': _quantize(total_debt_combined_etb),
+        'customers_with_debt': Customer.get_customers_with_debt().count(),
+        'data': {'total_debt_etb': float(total_debt_combined_etb)},
+    }
+
+
+@register_widget('inventory', ('catalog', 'settings'))
+def inventory_widget(request, currency_settings):
+    """Product counts and the SOS exchange rate"""
+    usd_to_sos_rate, _ = _rates(currency_settings)
+    active = Product.objects.filter(is_active=True)
+    counts = active.aggregate(
+        total=Count('id'),
+        low_stock=Count('id', filter=Q(current_stock__lte=F('low_stock_threshold'))),
+        out_of_stock=Count('id', filter=Q(current_stock=0)),
+    )
+    return {
+        'total_products': counts['total'],
+        'low_stock_count': counts['low_stock'],
+        'out_of_stock_count': counts['out_of_stock'],
+        'exchange_rate': usd_to_sos_rate,
+        'data': {'low_stock': counts['low_stock'], 'out_of_stock': counts['out_of_stock']},
+    }
+
+
+@register_widget('chart', ('sales', 'settings'), template=False)
+def chart_widget(request, currency_settings):
+    """Cash collected per day over the last week, in ETB"""
+    today = timezone.now().date()
+    _, usd_to_etb_rate = _rates(currency_settings)
+    week_first_day = today - timedelta(days=6)
+    daily_paid_usd = dict(
+        _ledger_sales().filter(date_created__date__gte=week_first_day)
+        .annotate(day=TruncDate('date_created'))
+        .values('day')
+        .annotate(total=Sum('amount_paid_usd'))
+        .values_list('day', 'total')
+    )
+    days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+    return {
+        'data': {
+            'weekly_labels': [day.strftime('%a') for day in days],
+            'weekly_data': [float(_quantize((daily_paid_usd.get(day) or Decimal('0.00')) * usd_to_etb_rate)) for day in days],
+            'weekly_dates': [day.isoformat() for day in days],
+        },
+    }
+
+
+@register_widget('top_sellers', ('rollups', 'settings'))
+def top_sellers_widget(request, currency_settings):
+    """Best selling products over the last week"""
+    _, usd_to_etb_rate = _rates(currency_settings)
+    return {
+        'top_selling_items': [
+            {
+                'name': row['product'].name,
+                'total_qty': row['quantity'],
+                'total_revenue_usd': row['revenue_usd'],
+                'total_revenue_etb': _quantize(row['revenue_usd'] * usd_to_etb_rate),
+            }
+            for row in top_products(k=5, days=7)
+        ],
+    }
+
+
+@register_widget('recent_activity', ('sales', 'settings'), bucket='minute')
+def recent_activity_widget(request, currency_settings):
+    """The latest ledger sales"""
+    _, usd_to_etb_rate = _rates(currency_settings)
+    return {
+        'recent_activity': [
+            {
+                'id': sale.source_id,
+                'customer': sale.customer if sale.customer else "Walk-in Customer",
+                'user': sale.user,
+                'amount_etb': sale.amount_etb,
+                'original_amount': sale.total_amount,
+                'currency': sale.currency,
+                'date_created': sale.date_created,
+                'is_paid': sale.is_completed
+            }
+            for sale in _ledger_sales().select_related('customer', 'user').annotate(amount_etb=Transaction.amount_etb(usd_to_etb_rate))[:10]
+        ],
+    }
+
+
+@register_widget('low_stock', ('catalog',))
+def low_stock_widget(request, currency_settings):
+    """Active products at or under their low-stock threshold"""
+    return {
+        'low_stock_products': Product.objects.filter(
+            current_stock__lte=F('low_stock_threshold'),
+            is_active=True
+        ).order_by('current_stock')[:5],
+    }
+
+
+@register_widget('top_debtors', ('debt',))
+def top_debtors_widget(request, currency_settings):
+    """Customers owing the most"""
+    return {'top_debtors': Customer.get_customers_with_debt()[:5]}
@@ -0,0 +1,247 @@
+# dedupe.py
+"""Duplicate customer detection and merging.
+
+Candidates come from blocking keys instead of comparing every pair: the last
+digits of the normalized phone, and the soundex of the first and last name
+tokens. Each pair inside a block is scored on phone and name similarity;
+oversized blocks (common names) only compare neighbours in name order.
+Merging repoints every customer reference with one UPDATE per table per
+batch and sums the debt balances onto the surviving (oldest) record.
+"""
+import difflib
+from collections import defaultdict
+
+from django.db import models, transaction
+from django.db.models import Case, Value, When
+
+# Local Somaliland/Ethiopia numbers are 9 digits after the country code
+PHONE_SUFFIX_LENGTH = 9
+# Blocks up to this size compare all pairs, larger ones a sliding window
+BLOCK_COMPARE_ALL = 50
+NEIGHBOUR_WINDOW = 10
+DEFAULT_THRESHOLD = 0.85
+MERGE_BATCH_SIZE = 500
+
+SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+
+def soundex(word):
+    """American soundex: 'mohamed' and 'muhammad' both give 'm530'"""
+    letters = [char for char in word.lower() if char.isalpha()]
+    if not letters:
+        return word
+    code = letters[0]
+    previous = SOUNDEX_CODES.get(letters[0])
+    for char in letters[1:]:
+        digit = SOUNDEX_CODES.get(char)
+        if digit and digit != previous:
+            code += digit
+        if char not in 'hw':
+            previous = digit
+    return (code + '000')[:4]
+
+
+def phone_block(phone_key):
+    if len(phone_key) < 6:
+        return None
+    return phone_key[-PHONE_SUFFIX_LENGTH:]
+
+
+def name_block(name_key):
+    tokens = name_key.split()
+    if not tokens:
+        return None
+    return f'{soundex(tokens[0])}:{soundex(tokens[-1])}'
+
+
+def score_pair(first, second, threshold=0.0):
+    """Similarity of two (name_key, phone_key) pairs between 0 and 1.
+
+    Phone and name weigh equally when both records have them. When one
+    side lacks a field the other is discounted, so an identical name with
+    no phone to confirm it stays under the default threshold. Pairs that
+    cannot reach `threshold` return 0 without the full name comparison.
+    """
+    first_name, first_phone = first
+    second_name, second_phone = second
+    phone_score = None
+    if first_phone and second_phone:
+        if first_phone == second_phone:
+            phone_score = 1.0
+        elif phone_block(first_phone) and phone_block(first_phone) == phone_block(second_phone):
+            phone_score = 0.9
+        else:
+            phone_score = 0.0
+
+    if not (first_name and second_name):
+        return phone_score * 0.85 if phone_score is not None else 0.0
+
+    if phone_score is None:
+        weight, base = 0.8, 0.0
+    else:
+        weight, base = 0.5, phone_score / 2
+    needed = (threshold - base) / weight
+    matcher = difflib.SequenceMatcher(None, first_name, second_name)
+    # Cheap upper bounds first; ratio() is the expensive part
+    if needed > 1 or matcher.real_quick_ratio() < needed or matcher.quick_ratio() < needed:
+        return 0.0
+    return base + weight * matcher.ratio()
+
+
+def candidate_pairs(customers):
+    """(id, id) pairs sharing at least one blocking key, lower id first"""
+    blocks = defaultdict(list)
+    for customer_id, (name_key, phone_key) in customers.items():
+        phone = phone_block(phone_key)
+        if phone:
+            blocks['phone', phone].append(customer_id)
+        name = name_block(name_key)
+        if name:
+            blocks['name', name].append(customer_id)
+
+    pairs = set()
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        if len(members) <= BLOCK_COMPARE_ALL:
+            for index, first in enumerate(members):
+                for second in members[index + 1:]:
+                    pairs.add((min(first, second), max(first, second)))
+        else:
+            members = sorted(members, key=lambda customer_id: customers[customer_id])
+            for index, first in enumerate(members):
+                for second in members[index + 1:index + 1 + NEIGHBOUR_WINDOW]:
+                    pairs.add((min(first, second), max(first, second)))
+    return pairs
+
+
+def find_duplicates(threshold=DEFAULT_THRESHOLD, queryset=None):
+    """Scored duplicate pairs [(score, id, id)], best first"""
+    from .models import Customer
+
+    if queryset is None:
+        queryset = Customer.objects.all()
+    customers = {
+        customer_id: (name_key, phone_key)
+        for customer_id, name_key, phone_key in queryset.values_list('id', 'name_key', 'phone_key').iterator()
+    }
+    scored = []
+    for first, second in candidate_pairs(customers):
+        score = score_pair(customers[first], customers[second], threshold)
+        if score >= threshold:
+            scored.append((round(score, 3), first, second))
+    scored.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+    return scored
+
+
+def merge_plan(pairs):
+    """{duplicate_id: survivor_id} from scored pairs; the oldest record survives"""
+    parent = {}
+
+    def root(customer_id):
+        parent.setdefault(customer_id, customer_id)
+        while parent[customer_id] != customer_id:
+            parent[customer_id] = parent[parent[customer_id]]
+            customer_id = parent[customer_id]
+        return customer_id
+
+    for _score, first, second in pairs:
+        first_root, second_root = root(first), root(second)
+        if first_root != second_root:
+            parent[max(first_root, second_root)] = min(first_root, second_root)
+    return {customer_id: root(customer_id) for customer_id in parent if root(customer_id) != customer_id}
+
+
+def customer_reference_models():
+    from .models import (
+        DebtCorrection, DebtPayment, DebtPaymentETB, DebtPaymentSOS, DebtPaymentUSD,
+        Sale, SaleETB, SaleSOS, SaleUSD, Transaction, TransactionPayment,
+    )
+    return [
+        Sale, SaleUSD, SaleSOS, SaleETB,
+        DebtPayment, DebtPaymentUSD, DebtPaymentSOS, DebtPaymentETB,
+        DebtCorrection, Transaction, TransactionPayment,
+    ]
+
+
+def merge_customers(plan, user=None):
+    """Fold each duplicate into its survivor and delete the duplicates.
+
+    Returns the number of customers removed.
+    """
+    items = sorted(plan.items())
+    for start in range(0, len(items), MERGE_BATCH_SIZE):
+        batch = dict(items[start:start + MERGE_BATCH_SIZE])
+        with transaction.atomic():
+            _merge_batch(batch, user)
+    return len(items)
+
+
+def _merge_batch(batch, user):
+    from .models import AuditLog, Customer, CustomerNameToken, DataVersion
+
+    duplicate_ids = list(batch)
+    new_customer = Case(
+        *[When(customer_id=duplicate, then=Value(survivor)) for duplicate, survivor in batch.items()],
+        output_field=models.BigIntegerField(),
+    )
+    for model in customer_reference_models():
+        model.objects.filter(customer_id__in=duplicate_ids).update(customer=new_customer)
+    AuditLog.objects.filter(object_type='Customer', object_id__in=[str(duplicate) for duplicate in duplicate_ids]).update(
+        object_id=Case(
+            *[When(object_id=str(duplicate), then=Value(str(survivor))) for duplicate, survivor in batch.items()],
+            output_field=models.CharField(),
+        )
+    )
+
+    members = defaultdict(list)
+    for duplicate, survivor in batch.items():
+        members[survivor].append(duplicate)
+    records = Customer.objects.in_bulk(list(members) + duplicate_ids)
+    survivors = []
+    renamed = []
+    for survivor_id, duplicates in members.items():
+        survivor = records[survivor_id]
+        for duplicate in (records[duplicate_id] for duplicate_id in sorted(duplicates)):
+            survivor.total_debt_usd += duplicate.total_debt_usd
+            survivor.total_debt_sos += duplicate.total_debt_sos
+            survivor.total_debt_etb += duplicate.total_debt_etb
+            survivor.is_active = survivor.is_active or duplicate.is_active
+            if duplicate.last_purchase_date and (
+                not survivor.last_purchase_date or duplicate.last_purchase_date > survivor.last_purchase_date
+            ):
+                survivor.last_purchase_date = duplicate.last_purchase_date
+            if not survivor.name and duplicate.name:
+                survivor.name = duplicate.name
+                renamed.append(survivor)
+            survivor.phone = survivor.phone or duplicate.phone
+            survivor.pno = survivor.pno or duplicate.pno
+        survivor.update_search_keys()
+        survivors.append(survivor)
+
+    Customer.objects.bulk_update(survivors, [
+        'total_debt_usd', 'total_debt_sos', 'total_debt_etb', 'is_active', 'last_purchase_date',
+        'name', 'phone', 'pno', 'phone_key', 'phone_key_reversed', 'name_key',
+    ])
+    # bulk_update skips the save signals the dashboard's debt widgets watch
+    DataVersion.bump('debt')
+    for survivor in renamed:
+        CustomerNameToken.rebuild_for(survivor)
+    Customer.objects.filter(pk__in=duplicate_ids).delete()
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            user=user,
+            action='CUSTOMERS_MERGED',
+            object_type='Customer',
+            object_id=str(survivor_id),
+            details=f"Merged duplicate customers {', '.join(f'#{duplicate}' for duplicate in sorted(duplicates))}",
+        )
+        for survivor_id, duplicates in members.items()
+    ])
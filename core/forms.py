@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.core.exceptions import ValidationError
+from django.urls import reverse
 from django.utils import timezone
 from .models import User, Product, Customer, Sale, SaleItem, SaleItemUSD, SaleItemSOS, SaleItemETB, InventoryLog, DebtPayment, CurrencySettings, DebtCorrection
 
@@ -352,6 +353,45 @@ class DebtPaymentForm(forms.ModelForm):
         self.fields['notes'].widget.attrs.update({'class': 'form-control'})
 
 
+def customer_label(customer):
+    """Display text for a customer in pickers and dropdowns"""
+    if customer.phone:
+        return f"{customer.name} ({customer.phone})"
+    return customer.name or f"Customer #{customer.pk}"
+
+
+class CustomerPickerWidget(forms.Widget):
+    """Search-as-you-type customer picker backed by /api/customers/lookup/.
+
+    Renders a hidden input holding the customer id, so only the selected
+    customer is loaded instead of one <option> per customer.
+    """
+    template_name = 'core/widgets/customer_picker.html'
+
+    class Media:
+        js = ('js/customer-picker.js',)
+
+    def __init__(self, attrs=None, active_only=False, placeholder='Search by name or phone number...'):
+        super().__init__(attrs)
+        self.active_only = active_only
+        self.placeholder = placeholder
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        label = ''
+        if value:
+            customer = Customer.objects.filter(pk=value).only('id', 'name', 'phone').first()
+            if customer:
+                label = customer_label(customer)
+        context['widget'].update({
+            'label': label,
+            'lookup_url': reverse('core:api_customer_lookup'),
+            'active_only': self.active_only,
+            'placeholder': self.placeholder,
+        })
+        return context
+
+
 class CustomerSearchForm(forms.Form):
     """Customer search form"""
     search = forms.CharField(
@@ -362,6 +402,11 @@ class CustomerSearchForm(forms.Form):
             'class': 'form-control'
         })
     )
+    customer = forms.ModelChoiceField(
+        queryset=Customer.objects.all(),
+        required=False,
+        widget=CustomerPickerWidget(),
+    )
 
 
 class ProductSearchForm(forms.Form):
@@ -392,7 +437,7 @@ class CurrencySettingsForm(forms.ModelForm):
     
     class Meta:
         model = CurrencySettings
-        fields = ['usd_to_sos_rate', 'usd_to_etb_rate']
+        fields = ['usd_to_sos_rate', 'usd_to_etb_rate', 'sos_price_step', 'etb_price_step']
         widgets = {
             'usd_to_sos_rate': forms.NumberInput(attrs={
                 'step': '0.01',
@@ -405,6 +450,18 @@ class CurrencySettingsForm(forms.ModelForm):
                 'min': '0.01',
                 'class': 'form-control',
                 'placeholder': '100.00'
+            }),
+            'sos_price_step': forms.NumberInput(attrs={
+                'step': '0.01',
+                'min': '0.01',
+                'class': 'form-control',
+                'placeholder': '500.00'
+            }),
+            'etb_price_step': forms.NumberInput(attrs={
+                'step': '0.01',
+                'min': '0.01',
+                'class': 'form-control',
+                'placeholder': '1.00'
             })
         }
         
@@ -420,6 +477,18 @@ class CurrencySettingsForm(forms.ModelForm):
             raise ValidationError("Exchange rate must be greater than 0.")
         return rate
 
+    def clean_sos_price_step(self):
+        step = self.cleaned_data.get('sos_price_step')
+        if step <= 0:
+            raise ValidationError("Rounding step must be greater than 0.")
+        return step
+
+    def clean_etb_price_step(self):
+        step = self.cleaned_data.get('etb_price_step')
+        if step <= 0:
+            raise ValidationError("Rounding step must be greater than 0.")
+        return step
+
 
 class DebtCorrectionForm(forms.ModelForm):
     """Form for manual debt correction/adjustment"""
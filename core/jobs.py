@@ -0,0 +1,195 @@
+# jobs.py
+"""Background job handlers run by `manage.py run_worker`.
+
+A handler receives the Job and its params, may report progress with
+job.set_progress(), and returns either None or (filename, bytes) for a
+result file stored under MEDIA_ROOT/jobs/.
+"""
+import csv
+import io
+import traceback
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import Job, SalesFact, SalesHour, SalesRunningTotal, Transaction
+
+JOB_HANDLERS = {}
+JOB_LABELS = {}
+
+# Seconds to wait before retry N (last value repeats)
+RETRY_BACKOFF = [30, 120, 600]
+
+
+def register_job(job_type, label):
+    """Decorator adding a handler to the registry"""
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        JOB_LABELS[job_type] = label
+        return func
+    return decorator
+
+
+def enqueue(job_type, user=None, max_attempts=3, **params):
+    """Queue a job for the worker; raises ValueError for unknown job types"""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+    return Job.objects.create(job_type=job_type, params=params, created_by=user, max_attempts=max_attempts)
+
+
+def run_job(job):
+    """Execute a claimed job, storing its result or scheduling a retry"""
+    close_old_connections()
+    try:
+        handler = JOB_HANDLERS.get(job.job_type)
+        if handler is None:
+            raise ValueError(f"Unknown job type: {job.job_type}")
+        result = handler(job, job.params or {})
+        if result:
+            filename, content = result
+            job.result_file.save(filename, ContentFile(content), save=False)
+        job.status = 'SUCCEEDED'
+        job.progress = 100
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'progress', 'finished_at', 'result_file', 'message'])
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = RETRY_BACKOFF[min(job.attempts, len(RETRY_BACKOFF)) - 1]
+            job.status = 'PENDING'
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+            job.message = f"Attempt {job.attempts} failed, retrying in {delay}s"
+        else:
+            job.status = 'FAILED'
+            job.finished_at = timezone.now()
+            job.message = f"Failed after {job.attempts} attempt(s)"
+        job.save(update_fields=['status', 'run_after', 'error', 'message', 'finished_at'])
+    finally:
+        close_old_connections()
+    return job
+
+
+def _parse_date(value, default):
+    if not value:
+        return default
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _command_output(job, command, *args):
+    """Run a management command and return its output as a text result file"""
+    output = io.StringIO()
+    job.set_progress(10, f"Running {command}")
+    call_command(command, *args, stdout=output, stderr=output)
+    return f"{command}_{job.pk}.txt", output.getvalue().encode('utf-8')
+
+
+@register_job('rebuild_sales_facts', 'Rebuild sales fact cube')
+def rebuild_sales_facts(job, params):
+    start_date = _parse_date(params.get('start_date'), None)
+    end_date = _parse_date(params.get('end_date'), None)
+    job.set_progress(10, "Rebuilding sales facts")
+    created = SalesFact.rebuild(start_date=start_date, end_date=end_date)
+    job.set_progress(50, "Rebuilding hourly rollup")
+    hours = SalesHour.rebuild(start_date=start_date, end_date=end_date)
+    job.set_progress(80, "Rebuilding running totals")
+    days = SalesRunningTotal.rebuild()
+    job.set_progress(100, f"{created} cell(s), {hours} hour(s), {days} running total day(s) rebuilt")
+
+
+@register_job('fix_inventory', 'Verify inventory')
+def fix_inventory(job, params):
+    args = ['--fix'] if params.get('fix') else ['--verify-only']
+    return _command_output(job, 'fix_inventory', *args)
+
+
+@register_job('fix_customer_debt', 'Check customer debt fields')
+def fix_customer_debt(job, params):
+    args = [] if params.get('fix') else ['--dry-run']
+    return _command_output(job, 'fix_customer_debt', *args)
+
+
+def _report_transactions(params):
+    end_date = _parse_date(params.get('end_date'), timezone.now().date())
+    start_date = _parse_date(params.get('start_date'), end_date - timedelta(days=int(params.get('days', 30))))
+    sales = Transaction.objects.exclude(source='Legacy').filter(
+        date_created__date__gte=start_date,
+        date_created__date__lte=end_date,
+    ).select_related('customer', 'user')
+    if params.get('currency') in ('USD', 'SOS', 'ETB'):
+        sales = sales.filter(currency=params['currency'])
+    return start_date, end_date, sales
+
+
+@register_job('sales_export_csv', 'Export sales (CSV)')
+def sales_export_csv(job, params):
+    start_date, end_date, sales = _report_transactions(params)
+    total = sales.count() or 1
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Transaction ID', 'Date', 'Customer', 'Currency', 'Total', 'Paid', 'Debt', 'Total (USD)', 'PNO'])
+    for index, sale in enumerate(sales.iterator(chunk_size=500), start=1):
+        writer.writerow([
+            sale.transaction_id,
+            sale.date_created.strftime('%Y-%m-%d %H:%M'),
+            sale.customer.name if sale.customer else 'Walk-in Customer',
+            sale.currency,
+            sale.total_amount,
+            sale.amount_paid,
+            sale.debt_amount,
+            sale.total_amount_usd,
+            sale.pno or '',
+        ])
+        if index % 500 == 0:
+            job.set_progress(index * 100 // total, f"{index} of {total} sales")
+    return f"sales_{start_date}_{end_date}.csv", output.getvalue().encode('utf-8')
+
+
+@register_job('sales_report_pdf', 'Sales report (PDF)')
+def sales_report_pdf(job, params):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    start_date, end_date, sales = _report_transactions(params)
+    total = sales.count() or 1
+    rows = [['Date', 'Transaction', 'Customer', 'Currency', 'Total', 'Paid', 'Debt', 'Total (USD)']]
+    total_usd = Decimal('0.00')
+    for index, sale in enumerate(sales.iterator(chunk_size=500), start=1):
+        rows.append([
+            sale.date_created.strftime('%Y-%m-%d %H:%M'),
+            str(sale.transaction_id)[:8],
+            sale.customer.name if sale.customer else 'Walk-in Customer',
+            sale.currency,
+            f"{sale.total_amount:,.2f}",
+            f"{sale.amount_paid:,.2f}",
+            f"{sale.debt_amount:,.2f}",
+            f"{sale.total_amount_usd:,.2f}",
+        ])
+        total_usd += sale.total_amount_usd
+        if index % 500 == 0:
+            job.set_progress(index * 80 // total, f"{index} of {total} sales")
+    rows.append(['', '', '', '', '', '', 'Total', f"{total_usd:,.2f}"])
+
+    job.set_progress(90, "Rendering PDF")
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(buffer, pagesize=landscape(A4))
+    styles = getSampleStyleSheet()
+    table = Table(rows, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0d6efd')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ALIGN', (4, 1), (-1, -1), 'RIGHT'),
+    ]))
+    document.build([
+        Paragraph(f"Sales report {start_date} to {end_date}", styles['Title']),
+        Spacer(1, 12),
+        table,
+    ])
+    return f"sales_report_{start_date}_{end_date}.pdf", buffer.getvalue()
@@ -0,0 +1,175 @@
+# live.py
+"""In-process broadcaster behind the live dashboard stream.
+
+Write paths publish small deltas (a sale's change to today's totals, a debt
+payment, a product crossing its low-stock threshold) once their database
+transaction commits. Each open dashboard holds one Server-Sent Events
+connection on the ASGI server and waits on its own queue, so an idle
+dashboard costs a parked coroutine and a heartbeat every
+LIVE_HEARTBEAT_SECONDS.
+
+Subscribers only see events published in the same process: serve the
+stream and the write paths from one ASGI worker, or put a shared
+pub/sub in front of `broadcaster.publish` before scaling out.
+"""
+import asyncio
+import json
+import threading
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+LIVE_QUEUE_SIZE = 100
+LIVE_HEARTBEAT_SECONDS = 25
+LIVE_RETRY_MS = 5000
+
+
+class Subscription:
+    """One open stream: an asyncio queue bound to the loop it waits on"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event):
+        # Runs on the subscriber's loop; a client too slow to drain its queue
+        # is told to reload instead of holding an unbounded backlog
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'type': 'resync'})
+
+
+class Broadcaster:
+    """Fan events out to every subscription, from any thread"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscriptions)
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The loop has closed under a dropped connection
+                self.unsubscribe(subscription)
+
+
+broadcaster = Broadcaster()
+
+
+def publish_on_commit(build_event):
+    """Publish build_event() once the current transaction commits, if anyone is listening.
+
+    The event is built right away, while the instance still describes this
+    write; a rolled back transaction publishes nothing.
+    """
+    if not broadcaster.has_subscribers:
+        return
+    event = build_event()
+    if event is not None:
+        transaction.on_commit(lambda: broadcaster.publish(event))
+
+
+def format_event(event):
+    """Encode an event as an SSE message"""
+    payload = json.dumps(event, default=lambda value: float(value) if isinstance(value, Decimal) else str(value))
+    return f"event: {event['type']}\ndata: {payload}\n\n"
+
+
+async def event_stream(subscription):
+    """SSE body for one subscription, with heartbeats while nothing happens"""
+    yield f"retry: {LIVE_RETRY_MS}\n\n"
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_event(event)
+            if event['type'] == 'resync':
+                return
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+# === Deltas published from the write paths ===
+
+def sale_delta(instance, deleted=False):
+    """Change to the day's totals made by saving or deleting a ledger Transaction"""
+    before = getattr(instance, '_loaded_totals', None)
+    if deleted:
+        old_total, old_paid = before or (instance.total_amount_usd, instance.amount_paid_usd)
+        new_total, new_paid = 0, 0
+        count = -1
+    else:
+        old_total, old_paid = before or (0, 0)
+        new_total, new_paid = instance.total_amount_usd, instance.amount_paid_usd
+        count = 0 if before else 1
+    delta_total = Decimal(new_total or 0) - Decimal(old_total or 0)
+    delta_paid = Decimal(new_paid or 0) - Decimal(old_paid or 0)
+    if not (delta_total or delta_paid or count):
+        return None
+    return {
+        'type': 'sale',
+        'day': timezone.localdate(instance.date_created).isoformat() if instance.date_created else None,
+        'currency': instance.currency,
+        'amount': instance.total_amount,
+        'total_usd_delta': delta_total,
+        'paid_usd_delta': delta_paid,
+        'count_delta': count,
+    }
+
+
+def payment_event(instance):
+    return {
+        'type': 'payment',
+        'customer': instance.customer.name,
+        'currency': instance.currency,
+        'amount': instance.amount,
+        'amount_usd': instance.amount_usd,
+    }
+
+
+def stock_alert(log):
+    """Event for an inventory change that moves a product into or out of low or zero stock"""
+    product = log.product
+    threshold = product.low_stock_threshold
+    low_delta = int(log.new_quantity <= threshold) - int(log.old_quantity <= threshold)
+    out_delta = int(log.new_quantity <= 0) - int(log.old_quantity <= 0)
+    if not (low_delta or out_delta) or not product.is_active:
+        return None
+    return {
+        'type': 'stock_alert',
+        'product_id': product.id,
+        'product': product.name,
+        'current_stock': log.new_quantity,
+        'low_stock_threshold': threshold,
+        'low_stock_delta': low_delta,
+        'out_of_stock_delta': out_delta,
+    }
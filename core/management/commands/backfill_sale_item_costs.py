@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from core.models import SaleItemUSD, SaleItemSOS, SaleItemETB
+
+
+class Command(BaseCommand):
+    help = 'Backfill unit_cost_usd and min_price_usd on sale items from current product prices'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many items would be updated without saving',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows written per UPDATE batch',
+        )
+
+    def handle(self, *args, **options):
+        for item_model in (SaleItemUSD, SaleItemSOS, SaleItemETB):
+            items = item_model.objects.filter(
+                Q(unit_cost_usd__isnull=True) | Q(min_price_usd__isnull=True)
+            ).select_related('product')
+
+            if options['dry_run']:
+                self.stdout.write(f'{item_model._meta.verbose_name_plural}: {items.count()} item(s)')
+                continue
+
+            updated = []
+            for item in items.iterator():
+                item.snapshot_product_prices()
+                updated.append(item)
+            item_model.objects.bulk_update(updated, ['unit_cost_usd', 'min_price_usd'], batch_size=options['batch_size'])
+            self.stdout.write(f'{item_model._meta.verbose_name_plural}: {len(updated)} item(s)')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run - no changes saved'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                'Sale item costs backfilled. Historical items use the current product prices, '
+                'the closest record available for sales made before snapshots existed.'
+            ))
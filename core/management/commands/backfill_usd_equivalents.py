@@ -0,0 +1,132 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from core.models import (
+    CurrencySettings, DataVersion, SalesHour, SalesRunningTotal, Transaction, TransactionPayment,
+    SALE_MODELS, DEBT_PAYMENT_MODELS, get_usd_rate,
+)
+
+SALE_USD_FIELDS = ['total_amount_usd_equiv', 'amount_paid_usd_equiv', 'debt_amount_usd_equiv']
+
+
+class Command(BaseCommand):
+    help = 'Backfill the *_usd_equiv columns on per-currency sales and debt payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many rows would be updated without saving',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute every row instead of only rows that are missing values',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows written per UPDATE batch',
+        )
+
+    def handle(self, *args, **options):
+        currency_settings = CurrencySettings.objects.first()
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+
+        for source in ('USD', 'SOS', 'ETB'):
+            count = self.backfill_sales(source, currency_settings, options['all'], dry_run, batch_size)
+            self.stdout.write(f'{source} sales: {count} row(s)')
+
+        for source in ('USD', 'SOS', 'ETB', 'Legacy'):
+            count = self.backfill_payments(source, currency_settings, options['all'], dry_run, batch_size)
+            self.stdout.write(f'{source} debt payments: {count} row(s)')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Dry run - no changes saved'))
+        else:
+            DataVersion.bump('sales')
+            DataVersion.bump('debt')
+            # Bulk updates skip the signals that keep the running totals current
+            SalesHour.rebuild()
+            SalesRunningTotal.rebuild()
+            self.stdout.write(self.style.SUCCESS('USD equivalents backfilled'))
+
+    def backfill_sales(self, source, currency_settings, recompute_all, dry_run, batch_size):
+        """Fill sale USD equivalents, preferring the rate already captured in the ledger"""
+        sale_model = SALE_MODELS[source]
+        sales = sale_model.objects.all()
+        if not recompute_all:
+            sales = sales.filter(
+                Q(total_amount_usd_equiv__isnull=True) | Q(amount_paid_usd_equiv__isnull=True) | Q(debt_amount_usd_equiv__isnull=True)
+            )
+        if dry_run:
+            return sales.count()
+
+        ledger_rates = dict(
+            Transaction.objects.filter(source=source).values_list('source_id', 'exchange_rate_at_sale')
+        )
+        fields = list(SALE_USD_FIELDS)
+        if source != 'USD':
+            fields.append('exchange_rate_at_sale')
+
+        updated = []
+        for sale in sales.iterator():
+            if source != 'USD' and not sale.exchange_rate_at_sale:
+                sale.exchange_rate_at_sale = ledger_rates.get(sale.pk) or get_usd_rate(source, currency_settings)
+            sale.update_usd_equivalents()
+            updated.append(sale)
+
+        with transaction.atomic():
+            sale_model.objects.bulk_update(updated, fields, batch_size=batch_size)
+            ledger_rows = {
+                row.source_id: row for row in Transaction.objects.filter(source=source, source_id__in=[sale.pk for sale in updated])
+            }
+            for sale in updated:
+                row = ledger_rows.get(sale.pk)
+                if row is None:
+                    continue
+                row.exchange_rate_at_sale = sale.get_usd_rate()
+                row.total_amount_usd = sale.total_amount_usd_equiv
+                row.amount_paid_usd = sale.amount_paid_usd_equiv
+                row.debt_amount_usd = sale.debt_amount_usd_equiv
+            Transaction.objects.bulk_update(
+                ledger_rows.values(),
+                ['exchange_rate_at_sale', 'total_amount_usd', 'amount_paid_usd', 'debt_amount_usd'],
+                batch_size=batch_size,
+            )
+        return len(updated)
+
+    def backfill_payments(self, source, currency_settings, recompute_all, dry_run, batch_size):
+        """Fill debt payment USD equivalents, preferring the rate already captured in the ledger"""
+        payment_model = DEBT_PAYMENT_MODELS[source]
+        payments = payment_model.objects.all()
+        if not recompute_all:
+            payments = payments.filter(Q(amount_usd_equiv__isnull=True) | Q(exchange_rate__isnull=True))
+        if dry_run:
+            return payments.count()
+
+        ledger_rates = dict(
+            TransactionPayment.objects.filter(source=source).values_list('source_id', 'exchange_rate')
+        )
+        updated = []
+        for payment in payments.iterator():
+            if not payment.exchange_rate:
+                payment.exchange_rate = ledger_rates.get(payment.pk) or get_usd_rate(payment.get_payment_currency(), currency_settings)
+            payment.update_usd_equivalents()
+            updated.append(payment)
+
+        with transaction.atomic():
+            payment_model.objects.bulk_update(updated, ['exchange_rate', 'amount_usd_equiv'], batch_size=batch_size)
+            ledger_rows = {
+                row.source_id: row for row in TransactionPayment.objects.filter(source=source, source_id__in=[payment.pk for payment in updated])
+            }
+            for payment in updated:
+                row = ledger_rows.get(payment.pk)
+                if row is None:
+                    continue
+                row.exchange_rate = payment.exchange_rate
+                row.amount_usd = payment.amount_usd_equiv
+            TransactionPayment.objects.bulk_update(ledger_rows.values(), ['exchange_rate', 'amount_usd'], batch_size=batch_size)
+        return len(updated)
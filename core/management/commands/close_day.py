@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.closes import close_day
+
+
+class Command(BaseCommand):
+    help = 'Close a day (Z-report): freeze its totals into an immutable DailyClose snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Day to close (YYYY-MM-DD, default: yesterday)',
+        )
+
+    def handle(self, *args, **options):
+        day = timezone.now().date() - timedelta(days=1)
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Dates must be in YYYY-MM-DD format')
+        try:
+            close = close_day(day)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Closed {close.day} ({close.content_hash})'))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.dedupe import DEFAULT_THRESHOLD, find_duplicates, merge_customers, merge_plan
+from core.models import Customer
+
+
+class Command(BaseCommand):
+    help = 'Find duplicate customers by phone and name similarity and optionally merge them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help=f'Minimum pair score (0-1) treated as a duplicate (default {DEFAULT_THRESHOLD})',
+        )
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Merge the duplicates; without this only the pairs are listed',
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=50,
+            help='Number of pairs to print (default 50, 0 for all)',
+        )
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+        if not 0 < threshold <= 1:
+            raise CommandError('--threshold must be between 0 and 1')
+
+        started = time.monotonic()
+        pairs = find_duplicates(threshold)
+        plan = merge_plan(pairs)
+        self.stdout.write(
+            f'Found {len(pairs)} duplicate pair(s) covering {len(plan)} removable customer(s) '
+            f'in {time.monotonic() - started:.1f}s'
+        )
+
+        shown = pairs if options['show'] == 0 else pairs[:options['show']]
+        if shown:
+            names = Customer.objects.in_bulk({customer_id for _score, first, second in shown for customer_id in (first, second)})
+            for score, first, second in shown:
+                self.stdout.write(f'  {score:.3f}  #{first} {names[first]}  <->  #{second} {names[second]}')
+
+        if not options['apply']:
+            self.stdout.write(self.style.WARNING('DRY RUN - rerun with --apply to merge'))
+            return
+
+        merged = merge_customers(plan)
+        self.stdout.write(self.style.SUCCESS(f'Merged {merged} duplicate customer(s) into {len(set(plan.values()))} record(s)'))
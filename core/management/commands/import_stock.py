@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from core.stock_import import ManifestError, apply_manifest, parse_manifest, validate_manifest
+
+
+class Command(BaseCommand):
+    help = 'Restock and create products from a CSV or JSON manifest, validated up front and applied in one transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help='Path to a .csv or .json manifest')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'json'],
+            help='Manifest format (default: from the file extension)',
+        )
+        parser.add_argument('--notes', default='', help='Notes stored on the inventory logs')
+        parser.add_argument('--user', help='Username recorded on the logs')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the manifest without making changes',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['manifest'])
+        if not path.is_file():
+            raise CommandError(f'No such file: {path}')
+        file_format = options['format'] or ('json' if path.suffix.lower() == '.json' else 'csv')
+
+        user = None
+        if options['user']:
+            User = get_user_model()
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"No such user: {options['user']}")
+
+        try:
+            rows = parse_manifest(path.read_bytes(), file_format)
+        except ManifestError as e:
+            raise CommandError(str(e))
+
+        plan, errors = validate_manifest(rows)
+        for error in errors:
+            self.stdout.write(self.style.ERROR(f"Row {error['row']}: {'; '.join(error['errors'])}"))
+        if errors:
+            raise CommandError(f'{len(errors)} of {len(rows)} row(s) failed validation; nothing was imported')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'DRY RUN - {len(plan)} row(s) valid, no changes made'))
+            return
+
+        summary = apply_manifest(plan, user, notes=options['notes'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(plan)} row(s): {summary['created']} created, {summary['updated']} updated, "
+            f"{summary['restocked']} restocked (+{summary['units']} units)"
+        ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.models import ProductPrice
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-currency ProductPrice table from USD prices, rates and rounding steps'
+
+    def handle(self, *args, **options):
+        rows = ProductPrice.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt product prices: {rows} row(s)'))
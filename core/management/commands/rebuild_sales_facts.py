@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.models import SalesFact, SalesHour, SalesRunningTotal
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SalesFact cube and the hourly rollup from the per-currency sale tables, then the running totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Only rebuild the last N days (default: everything)',
+        )
+        parser.add_argument(
+            '--start-date',
+            help='First day to rebuild (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--end-date',
+            help='Last day to rebuild (YYYY-MM-DD)',
+        )
+
+    def handle(self, *args, **options):
+        start_date = end_date = None
+        try:
+            if options['start_date']:
+                start_date = datetime.strptime(options['start_date'], '%Y-%m-%d').date()
+            if options['end_date']:
+                end_date = datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+        if options['days']:
+            start_date = timezone.now().date() - timedelta(days=options['days'])
+
+        created = SalesFact.rebuild(start_date=start_date, end_date=end_date)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales facts: {created} cell(s)'))
+        hours = SalesHour.rebuild(start_date=start_date, end_date=end_date)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales hours: {hours} hour(s)'))
+        days = SalesRunningTotal.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt running totals: {days} day(s)'))
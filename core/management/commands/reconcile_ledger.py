@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.models import (
+    Transaction, TransactionItem, TransactionPayment,
+    SALE_MODELS, SALE_ITEM_MODELS, DEBT_PAYMENT_MODELS,
+)
+
+SALE_FIELDS = ('customer_id', 'user_id', 'total_amount', 'amount_paid', 'debt_amount', 'date_created')
+ITEM_FIELDS = ('product_id', 'quantity', 'unit_price', 'total_price')
+PAYMENT_FIELDS = ('customer_id', 'user_id', 'notes', 'date_created')
+
+
+def _drift(source_rows, ledger_rows):
+    """(missing, orphaned, changed) keys between {key: values} of the source table and of the ledger"""
+    missing = source_rows.keys() - ledger_rows.keys()
+    orphaned = ledger_rows.keys() - source_rows.keys()
+    changed = {key for key in source_rows.keys() & ledger_rows.keys() if source_rows[key] != ledger_rows[key]}
+    return missing, orphaned, changed
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the Transaction ledger with the per-currency sale, item and payment tables it mirrors. '
+        'The ledger is derived from those tables by signals, so writes that skip save() '
+        '(queryset update(), raw SQL) leave it behind; --fix re-syncs the drifted rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Re-sync drifted rows from the source tables and delete orphaned ledger rows',
+        )
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for source in SALE_MODELS:
+            with transaction.atomic():
+                drifted += self.reconcile_sales(source, options['fix'])
+                drifted += self.reconcile_items(source, options['fix'])
+                drifted += self.reconcile_payments(source, options['fix'])
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Ledger matches the source tables'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Re-synced {drifted} drifted ledger row(s)'))
+        else:
+            raise CommandError(f'{drifted} ledger row(s) drifted from the source tables; run with --fix to re-sync them')
+
+    def report(self, label, missing, orphaned, changed):
+        if missing or orphaned or changed:
+            self.stdout.write(self.style.WARNING(
+                f'{label}: {len(missing)} missing, {len(orphaned)} orphaned, {len(changed)} changed'
+            ))
+        return len(missing) + len(orphaned) + len(changed)
+
+    def reconcile_sales(self, source, fix):
+        sale_model = SALE_MODELS[source]
+        source_rows = {row[0]: row[1:] for row in sale_model.objects.values_list('pk', *SALE_FIELDS).iterator()}
+        ledger_rows = {
+            row[0]: row[1:]
+            for row in Transaction.objects.filter(source=source).values_list('source_id', *SALE_FIELDS).iterator()
+        }
+        missing, orphaned, changed = _drift(source_rows, ledger_rows)
+        count = self.report(f'{source} sales', missing, orphaned, changed)
+        if fix and count:
+            Transaction.objects.filter(source=source, source_id__in=orphaned).delete()
+            for sale in sale_model.objects.filter(pk__in=missing | changed).iterator():
+                Transaction.sync_from_sale(sale, source)
+        return count
+
+    def reconcile_items(self, source, fix):
+        item_model = SALE_ITEM_MODELS[source]
+        source_rows = {row[0]: row[1:] for row in item_model.objects.values_list('pk', 'sale_id', *ITEM_FIELDS).iterator()}
+        ledger_rows = {
+            row[0]: row[1:]
+            for row in TransactionItem.objects.filter(transaction__source=source).values_list(
+                'source_item_id', 'transaction__source_id', *ITEM_FIELDS,
+            ).iterator()
+        }
+        missing, orphaned, changed = _drift(source_rows, ledger_rows)
+        count = self.report(f'{source} sale items', missing, orphaned, changed)
+        if fix and count:
+            TransactionItem.objects.filter(transaction__source=source, source_item_id__in=orphaned | changed).delete()
+            for item in item_model.objects.filter(pk__in=missing | changed).select_related('sale').iterator():
+                TransactionItem.sync_from_item(item, source)
+        return count
+
+    def reconcile_payments(self, source, fix):
+        payment_model = DEBT_PAYMENT_MODELS[source]
+        source_rows = {
+            payment.pk: (payment.get_payment_amount(), *(getattr(payment, field) for field in PAYMENT_FIELDS))
+            for payment in payment_model.objects.iterator()
+        }
+        ledger_rows = {
+            row[0]: row[1:]
+            for row in TransactionPayment.objects.filter(source=source).values_list(
+                'source_id', 'amount', *PAYMENT_FIELDS,
+            ).iterator()
+        }
+        missing, orphaned, changed = _drift(source_rows, ledger_rows)
+        count = self.report(f'{source} payments', missing, orphaned, changed)
+        if fix and count:
+            TransactionPayment.objects.filter(source=source, source_id__in=orphaned).delete()
+            for payment in payment_model.objects.filter(pk__in=missing | changed).iterator():
+                TransactionPayment.sync_from_payment(payment, source)
+        return count
@@ -4,7 +4,7 @@ from core.models import (
     SaleUSD, SaleSOS, Sale, SaleItemUSD, SaleItemSOS, SaleItem,
     DebtPaymentUSD, DebtPaymentSOS, DebtPayment,
     Customer, InventoryLog, AuditLog, Receipt,
-    Product, User, CurrencySettings, Category
+    Product, User, CurrencySettings, Category, DataVersion
 )
 from decimal import Decimal
 
@@ -67,6 +67,7 @@ class Command(BaseCommand):
                     total_debt_sos=Decimal('0.00'),
                     last_purchase_date=None
                 )
+                DataVersion.bump('debt')
 
                 # 4. Delete inventory logs
                 self.stdout.write('Deleting inventory logs...')
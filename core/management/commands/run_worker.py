@@ -0,0 +1,73 @@
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.jobs import run_job
+from core.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (reports, exports, rollup rebuilds) outside the web workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=2,
+            help='Number of jobs to run concurrently',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep when the queue is empty',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=60,
+            help='Requeue RUNNING jobs started more than N minutes ago (crashed workers)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run every job that is currently due, then exit',
+        )
+
+    def handle(self, *args, **options):
+        worker_name = f'{socket.gethostname()}:{os.getpid()}'
+        threads = max(1, options['threads'])
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_name} started with {threads} thread(s)'))
+
+        requeued = Job.requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale job(s)'))
+
+        running = set()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            try:
+                while True:
+                    close_old_connections()
+                    while len(running) < threads:
+                        job = Job.claim_next(worker_name)
+                        if job is None:
+                            break
+                        self.stdout.write(f'Starting {job}')
+                        running.add(pool.submit(run_job, job))
+
+                    if running:
+                        done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                        for future in done:
+                            job = future.result()
+                            style = self.style.SUCCESS if job.status == 'SUCCEEDED' else self.style.WARNING
+                            self.stdout.write(style(f'Finished {job}: {job.message}'))
+                        running = set(running)
+                    elif options['once']:
+                        break
+                    else:
+                        time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING('Stopping worker, waiting for running jobs...'))
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_saleetb_pno_salesos_pno_saleusd_pno'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Transaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('USD', 'USD Sale'), ('SOS', 'SOS Sale'), ('ETB', 'ETB Sale'), ('Legacy', 'Legacy Sale')], help_text='Per-currency table this row mirrors', max_length=10)),
+                ('source_id', models.BigIntegerField(help_text='Primary key of the mirrored sale')),
+                ('transaction_id', models.UUIDField(editable=False, unique=True)),
+                ('currency', models.CharField(choices=[('USD', 'US Dollar'), ('SOS', 'Somaliland Shilling'), ('ETB', 'Ethiopian Birr')], max_length=3)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0.0, help_text='Total amount in sale currency', max_digits=20)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=0.0, help_text='Amount paid in sale currency', max_digits=20)),
+                ('debt_amount', models.DecimalField(decimal_places=2, default=0.0, help_text='Debt amount in sale currency', max_digits=20)),
+                ('exchange_rate_at_sale', models.DecimalField(decimal_places=6, default=1, help_text='USD to sale currency rate in effect when the sale was made', max_digits=20)),
+                ('total_amount_usd', models.DecimalField(decimal_places=2, default=0.0, help_text='Total amount normalized to USD', max_digits=20)),
+                ('amount_paid_usd', models.DecimalField(decimal_places=2, default=0.0, help_text='Amount paid normalized to USD', max_digits=20)),
+                ('debt_amount_usd', models.DecimalField(decimal_places=2, default=0.0, help_text='Debt amount normalized to USD', max_digits=20)),
+                ('pno', models.CharField(blank=True, max_length=50, null=True, verbose_name='Sale PNO')),
+                ('date_created', models.DateTimeField(db_index=True)),
+                ('is_completed', models.BooleanField(default=True)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='core.customer')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Transaction',
+                'verbose_name_plural': 'Transactions',
+                'ordering': ['-date_created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TransactionItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_item_id', models.BigIntegerField(help_text='Primary key of the mirrored sale item')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('unit_price', models.DecimalField(decimal_places=2, help_text='Unit price in sale currency', max_digits=20)),
+                ('total_price', models.DecimalField(decimal_places=2, help_text='Total price in sale currency', max_digits=20)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_items', to='core.product')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.transaction')),
+            ],
+            options={
+                'verbose_name': 'Transaction Item',
+                'verbose_name_plural': 'Transaction Items',
+            },
+        ),
+        migrations.CreateModel(
+            name='TransactionPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('USD', 'USD Payment'), ('SOS', 'SOS Payment'), ('ETB', 'ETB Payment'), ('Legacy', 'Legacy Payment')], max_length=10)),
+                ('source_id', models.BigIntegerField()),
+                ('currency', models.CharField(choices=[('USD', 'US Dollar'), ('SOS', 'Somaliland Shilling'), ('ETB', 'Ethiopian Birr')], max_length=3)),
+                ('amount', models.DecimalField(decimal_places=2, help_text='Payment amount in payment currency', max_digits=20)),
+                ('exchange_rate', models.DecimalField(decimal_places=6, default=1, help_text='USD to payment currency rate at time of payment', max_digits=20)),
+                ('amount_usd', models.DecimalField(decimal_places=2, default=0.0, help_text='Payment amount normalized to USD', max_digits=20)),
+                ('pno', models.CharField(blank=True, max_length=50, null=True, verbose_name='Receipt Number (PNO)')),
+                ('notes', models.TextField(blank=True)),
+                ('date_created', models.DateTimeField(db_index=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_payments', to='core.customer')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_payments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Transaction Payment',
+                'verbose_name_plural': 'Transaction Payments',
+                'ordering': ['-date_created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['customer', '-date_created'], name='transaction_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['currency', '-date_created'], name='transaction_currency_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('source', 'source_id'), name='unique_transaction_source'),
+        ),
+        migrations.AddConstraint(
+            model_name='transactionitem',
+            constraint=models.UniqueConstraint(fields=('transaction', 'source_item_id'), name='unique_transaction_item_source'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionpayment',
+            index=models.Index(fields=['customer', '-date_created'], name='txn_payment_customer_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='transactionpayment',
+            constraint=models.UniqueConstraint(fields=('source', 'source_id'), name='unique_transaction_payment_source'),
+        ),
+    ]
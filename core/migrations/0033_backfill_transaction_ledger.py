@@ -0,0 +1,124 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations
+
+
+BATCH_SIZE = 500
+
+
+def _to_usd(amount, rate):
+    if not rate or rate <= 0:
+        return Decimal('0.00')
+    return (Decimal(amount) / Decimal(rate)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def backfill_ledger(apps, schema_editor):
+    CurrencySettings = apps.get_model('core', 'CurrencySettings')
+    Transaction = apps.get_model('core', 'Transaction')
+    TransactionItem = apps.get_model('core', 'TransactionItem')
+    TransactionPayment = apps.get_model('core', 'TransactionPayment')
+
+    currency_settings = CurrencySettings.objects.first()
+    current_rates = {
+        'USD': Decimal('1'),
+        'SOS': currency_settings.usd_to_sos_rate if currency_settings else Decimal('8000.00'),
+        'ETB': currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00'),
+    }
+
+    sale_sources = [
+        ('USD', 'SaleUSD', 'SaleItemUSD'),
+        ('SOS', 'SaleSOS', 'SaleItemSOS'),
+        ('ETB', 'SaleETB', 'SaleItemETB'),
+        ('Legacy', 'Sale', 'SaleItem'),
+    ]
+    for source, sale_name, item_name in sale_sources:
+        SaleModel = apps.get_model('core', sale_name)
+        ItemModel = apps.get_model('core', item_name)
+
+        ledger_rows = []
+        for sale in SaleModel.objects.all().iterator():
+            if source == 'Legacy':
+                currency = sale.currency
+                rate = sale.exchange_rate if currency == 'SOS' and sale.exchange_rate else current_rates[currency]
+            else:
+                currency = source
+                rate = getattr(sale, 'exchange_rate_at_sale', None) or current_rates[currency]
+            ledger_rows.append(Transaction(
+                source=source,
+                source_id=sale.pk,
+                transaction_id=sale.transaction_id,
+                customer_id=sale.customer_id,
+                user_id=sale.user_id,
+                currency=currency,
+                total_amount=sale.total_amount,
+                amount_paid=sale.amount_paid,
+                debt_amount=sale.debt_amount,
+                exchange_rate_at_sale=rate,
+                total_amount_usd=_to_usd(sale.total_amount, rate),
+                amount_paid_usd=_to_usd(sale.amount_paid, rate),
+                debt_amount_usd=_to_usd(sale.debt_amount, rate),
+                pno=getattr(sale, 'pno', None),
+                date_created=sale.date_created,
+                is_completed=sale.is_completed,
+            ))
+        Transaction.objects.bulk_create(ledger_rows, batch_size=BATCH_SIZE)
+
+        ledger_ids = dict(
+            Transaction.objects.filter(source=source).values_list('source_id', 'id')
+        )
+        item_rows = [
+            TransactionItem(
+                transaction_id=ledger_ids[item.sale_id],
+                source_item_id=item.pk,
+                product_id=item.product_id,
+                quantity=item.quantity,
+                unit_price=item.unit_price,
+                total_price=item.total_price,
+            )
+            for item in ItemModel.objects.all().iterator()
+            if item.sale_id in ledger_ids
+        ]
+        TransactionItem.objects.bulk_create(item_rows, batch_size=BATCH_SIZE)
+
+    payment_sources = [
+        ('USD', 'DebtPaymentUSD'),
+        ('SOS', 'DebtPaymentSOS'),
+        ('ETB', 'DebtPaymentETB'),
+        ('Legacy', 'DebtPayment'),
+    ]
+    for source, payment_name in payment_sources:
+        PaymentModel = apps.get_model('core', payment_name)
+        payment_rows = []
+        for payment in PaymentModel.objects.all().iterator():
+            if source == 'Legacy':
+                currency = payment.original_currency or 'SOS'
+                amount = payment.original_amount or payment.amount
+            else:
+                currency = source
+                amount = payment.amount
+            rate = current_rates[currency]
+            payment_rows.append(TransactionPayment(
+                source=source,
+                source_id=payment.pk,
+                customer_id=payment.customer_id,
+                user_id=payment.user_id,
+                currency=currency,
+                amount=amount,
+                exchange_rate=rate,
+                amount_usd=_to_usd(amount, rate),
+                pno=getattr(payment, 'pno', None),
+                notes=payment.notes,
+                date_created=payment.date_created,
+            ))
+        TransactionPayment.objects.bulk_create(payment_rows, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_unified_transaction_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:57
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_backfill_transaction_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='debtpayment',
+            name='amount_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Payment amount in USD at the rate in effect at payment time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='debtpayment',
+            name='exchange_rate',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='USD to payment currency rate at time of payment', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='debtpaymentetb',
+            name='amount_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Payment amount in USD at the rate in effect at payment time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='debtpaymentetb',
+            name='exchange_rate',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='USD to payment currency rate at time of payment', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='debtpaymentsos',
+            name='amount_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Payment amount in USD at the rate in effect at payment time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='debtpaymentsos',
+            name='exchange_rate',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='USD to payment currency rate at time of payment', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='debtpaymentusd',
+            name='amount_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Payment amount in USD at the rate in effect at payment time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='debtpaymentusd',
+            name='exchange_rate',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='USD to payment currency rate at time of payment', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleetb',
+            name='amount_paid_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Amount paid in USD at the rate in effect at sale time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleetb',
+            name='debt_amount_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Debt amount in USD at the rate in effect at sale time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleetb',
+            name='total_amount_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Total amount in USD at the rate in effect at sale time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='salesos',
+            name='amount_paid_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Amount paid in USD at the rate in effect at sale time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='salesos',
+            name='debt_amount_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Debt amount in USD at the rate in effect at sale time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='salesos',
+            name='exchange_rate_at_sale',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='USD to SOS exchange rate at time of sale', max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))]),
+        ),
+        migrations.AddField(
+            model_name='salesos',
+            name='total_amount_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Total amount in USD at the rate in effect at sale time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleusd',
+            name='amount_paid_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Amount paid in USD at the rate in effect at sale time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleusd',
+            name='debt_amount_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Debt amount in USD at the rate in effect at sale time', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleusd',
+            name='total_amount_usd_equiv',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Total amount in USD at the rate in effect at sale time', max_digits=20, null=True),
+        ),
+    ]
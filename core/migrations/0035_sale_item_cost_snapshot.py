@@ -0,0 +1,56 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:01
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_costs(apps, schema_editor):
+    # Items sold before snapshots existed take the product's current prices,
+    # the closest record there is; profit would otherwise count them at zero cost
+    Product = apps.get_model('core', 'Product')
+    for currency in ('USD', 'SOS', 'ETB'):
+        item_model = apps.get_model('core', f'SaleItem{currency}')
+        product = Product.objects.filter(pk=OuterRef('product_id'))
+        item_model.objects.filter(unit_cost_usd__isnull=True).update(unit_cost_usd=Subquery(product.values('purchase_price')[:1]))
+        item_model.objects.filter(min_price_usd__isnull=True).update(min_price_usd=Subquery(product.values('selling_price')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_usd_equivalent_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saleitemetb',
+            name='min_price_usd',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Product minimum selling price (USD) at time of sale', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleitemetb',
+            name='unit_cost_usd',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Product purchase price (USD) at time of sale', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleitemsos',
+            name='min_price_usd',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Product minimum selling price (USD) at time of sale', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleitemsos',
+            name='unit_cost_usd',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Product purchase price (USD) at time of sale', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleitemusd',
+            name='min_price_usd',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Product minimum selling price (USD) at time of sale', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleitemusd',
+            name='unit_cost_usd',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Product purchase price (USD) at time of sale', max_digits=10, null=True),
+        ),
+        migrations.RunPython(fill_costs, migrations.RunPython.noop),
+    ]
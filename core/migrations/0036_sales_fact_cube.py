@@ -0,0 +1,85 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:02
+
+import django.db.models.deletion
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def fill_facts(apps, schema_editor):
+    SalesFact = apps.get_model('core', 'SalesFact')
+    CurrencySettings = apps.get_model('core', 'CurrencySettings')
+    currency_settings = CurrencySettings.objects.first()
+    fallback_rates = {
+        'USD': Decimal('1'),
+        'SOS': currency_settings.usd_to_sos_rate if currency_settings else Decimal('8000.00'),
+        'ETB': currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00'),
+    }
+    decimal_field = models.DecimalField(max_digits=20, decimal_places=2)
+    for currency in ('USD', 'SOS', 'ETB'):
+        item_model = apps.get_model('core', f'SaleItem{currency}')
+        group_fields = ['sale__date_created__date', 'product_id', 'product__category_id', 'sale__user_id']
+        if currency != 'USD':
+            group_fields.append('sale__exchange_rate_at_sale')
+        groups = item_model.objects.values(*group_fields).annotate(
+            total_quantity=Sum('quantity'),
+            total_lines=Count('id'),
+            total_revenue=Sum('total_price'),
+            total_cost_usd=Sum(F('unit_cost_usd') * F('quantity'), output_field=decimal_field),
+        ).order_by()
+
+        facts = {}
+        for group in groups:
+            key = (group['sale__date_created__date'], group['product_id'], group['product__category_id'], group['sale__user_id'])
+            fact = facts.get(key)
+            if fact is None:
+                fact = facts[key] = SalesFact(
+                    day=key[0], product_id=key[1], category_id=key[2], currency=currency, user_id=key[3],
+                    quantity=0, line_count=0, revenue=0, revenue_usd=0, cost_usd=0,
+                )
+            rate = group.get('sale__exchange_rate_at_sale') or fallback_rates[currency]
+            revenue = group['total_revenue'] or 0
+            fact.quantity += group['total_quantity'] or 0
+            fact.line_count += group['total_lines']
+            fact.revenue += revenue
+            fact.revenue_usd += (Decimal(revenue) / Decimal(rate)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) if rate > 0 else 0
+            fact.cost_usd += group['total_cost_usd'] or 0
+        for fact in facts.values():
+            fact.profit_usd = fact.revenue_usd - fact.cost_usd
+        SalesFact.objects.bulk_create(facts.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_sale_item_cost_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('currency', models.CharField(choices=[('USD', 'US Dollar'), ('SOS', 'Somaliland Shilling'), ('ETB', 'Ethiopian Birr')], max_length=3)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('line_count', models.PositiveIntegerField(default=0, help_text='Number of sale items in this cell')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Revenue in sale currency', max_digits=20)),
+                ('revenue_usd', models.DecimalField(decimal_places=2, default=0, help_text='Revenue in USD at the rate stored on each sale', max_digits=20)),
+                ('cost_usd', models.DecimalField(decimal_places=2, default=0, help_text='Purchase cost snapshotted on the sale items', max_digits=20)),
+                ('profit_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_facts', to='core.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_facts', to='core.product')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_facts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Sales Fact',
+                'verbose_name_plural': 'Sales Facts',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day', 'product'], name='sales_fact_day_product_idx'), models.Index(fields=['day', 'category'], name='sales_fact_day_category_idx')],
+            },
+        ),
+        migrations.RunPython(fill_facts, migrations.RunPython.noop),
+    ]
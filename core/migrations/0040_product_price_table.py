@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_catalog_delta_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='currencysettings',
+            name='etb_price_step',
+            field=models.DecimalField(decimal_places=2, default=0.01, help_text='Converted ETB selling prices are rounded to a multiple of this', max_digits=10, verbose_name='ETB Price Rounding Step'),
+        ),
+        migrations.AddField(
+            model_name='currencysettings',
+            name='sos_price_step',
+            field=models.DecimalField(decimal_places=2, default=1.0, help_text='Converted SOS selling prices are rounded to a multiple of this (e.g. 500)', max_digits=10, verbose_name='SOS Price Rounding Step'),
+        ),
+        migrations.CreateModel(
+            name='ProductPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('USD', 'USD'), ('SOS', 'SOS'), ('ETB', 'ETB')], max_length=3)),
+                ('sell_price', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('floor_price', models.DecimalField(decimal_places=2, help_text='Purchase price converted; sales below it are rejected', max_digits=14)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prices', to='core.product')),
+            ],
+            options={
+                'verbose_name': 'Product Price',
+                'verbose_name_plural': 'Product Prices',
+                'constraints': [models.UniqueConstraint(fields=('product', 'currency'), name='unique_product_price_currency')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.search import name_tokens, normalize_name, normalize_phone
+
+
+def build_search_keys(apps, schema_editor):
+    Customer = apps.get_model('core', 'Customer')
+    CustomerNameToken = apps.get_model('core', 'CustomerNameToken')
+    customers = []
+    tokens = []
+    for customer in Customer.objects.only('id', 'name', 'phone').iterator():
+        customer.phone_key = normalize_phone(customer.phone)[:20]
+        customer.phone_key_reversed = customer.phone_key[::-1]
+        customer.name_key = normalize_name(customer.name)[:200]
+        customers.append(customer)
+        tokens.extend(CustomerNameToken(customer_id=customer.id, token=token) for token in name_tokens(customer.name))
+    Customer.objects.bulk_update(customers, ['phone_key', 'phone_key_reversed', 'name_key'], batch_size=500)
+    CustomerNameToken.objects.bulk_create(tokens, batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_product_price_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_key_reversed',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.CreateModel(
+            name='CustomerNameToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=50)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_tokens', to='core.customer')),
+            ],
+            options={
+                'verbose_name': 'Customer Name Token',
+                'verbose_name_plural': 'Customer Name Tokens',
+                'constraints': [models.UniqueConstraint(fields=('customer', 'token'), name='unique_customer_name_token')],
+            },
+        ),
+        migrations.RunPython(build_search_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_customer_search_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockTake',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('POSTED', 'Posted'), ('CANCELLED', 'Cancelled')], db_index=True, default='OPEN', max_length=10)),
+                ('notes', models.TextField(blank=True)),
+                ('date_started', models.DateTimeField(auto_now_add=True)),
+                ('date_posted', models.DateTimeField(blank=True, null=True)),
+                ('category', models.ForeignKey(blank=True, help_text='Limit the count to one category', null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.category')),
+                ('posted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_takes_posted', to=settings.AUTH_USER_MODEL)),
+                ('started_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_takes_started', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Stock Take',
+                'verbose_name_plural': 'Stock Takes',
+                'ordering': ['-date_started'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockTakeLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_quantity', models.DecimalField(decimal_places=2, help_text='current_stock when the session started', max_digits=10)),
+                ('counted_quantity', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('variance', models.DecimalField(blank=True, decimal_places=2, help_text='Set when the session is posted', max_digits=10, null=True)),
+                ('date_counted', models.DateTimeField(blank=True, null=True)),
+                ('counted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_take_counts', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_take_lines', to='core.product')),
+                ('stock_take', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='core.stocktake')),
+            ],
+            options={
+                'verbose_name': 'Stock Take Line',
+                'verbose_name_plural': 'Stock Take Lines',
+                'constraints': [models.UniqueConstraint(fields=('stock_take', 'product'), name='unique_stock_take_product')],
+            },
+        ),
+    ]
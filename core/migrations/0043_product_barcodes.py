@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:37
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0042_stock_take'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductBarcode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=64, unique=True)),
+                ('pack_quantity', models.DecimalField(decimal_places=2, default=1, help_text='Units added to the cart per scan (e.g. 12 for a box of 12)', max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('label', models.CharField(blank=True, help_text='e.g. Unit, Box of 12', max_length=50)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='barcodes', to='core.product')),
+            ],
+            options={
+                'verbose_name': 'Product Barcode',
+                'verbose_name_plural': 'Product Barcodes',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0043_product_barcodes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='saleetb',
+            index=models.Index(fields=['date_created'], name='sale_etb_date_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesos',
+            index=models.Index(fields=['date_created'], name='sale_sos_date_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saleusd',
+            index=models.Index(fields=['date_created'], name='sale_usd_date_created_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0045_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyClose',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('stock_restocked', models.DecimalField(decimal_places=2, default=0, help_text='Units added by restocks', max_digits=20)),
+                ('stock_sold', models.DecimalField(decimal_places=2, default=0, help_text='Units removed by sales', max_digits=20)),
+                ('stock_adjusted', models.DecimalField(decimal_places=2, default=0, help_text='Net units from manual adjustments and stock takes', max_digits=20)),
+                ('content_hash', models.CharField(editable=False, max_length=64)),
+                ('date_closed', models.DateTimeField(auto_now_add=True)),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_closes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Close',
+                'verbose_name_plural': 'Daily Closes',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCloseTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('USD', 'US Dollar'), ('SOS', 'Somaliland Shilling'), ('ETB', 'Ethiopian Birr')], max_length=3)),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('total_sales_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cash_collected', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cash_collected_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('debt_created', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('debt_created_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('payments_received', models.DecimalField(decimal_places=2, default=0, help_text='Debt payments received', max_digits=20)),
+                ('payments_received_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cost_usd', models.DecimalField(decimal_places=2, default=0, help_text='Purchase cost snapshotted on the sale items', max_digits=20)),
+                ('profit_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('close', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='totals', to='core.dailyclose')),
+            ],
+            options={
+                'verbose_name': 'Daily Close Total',
+                'verbose_name_plural': 'Daily Close Totals',
+                'constraints': [models.UniqueConstraint(fields=('close', 'currency'), name='unique_daily_close_currency')],
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:04
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+METRICS = [
+    'sales_count', 'total_amount', 'amount_paid', 'total_amount_usd', 'amount_paid_usd',
+    'quantity', 'revenue_usd', 'cost_usd', 'profit_usd',
+]
+
+
+def fill_totals(apps, schema_editor):
+    SalesRunningTotal = apps.get_model('core', 'SalesRunningTotal')
+    Transaction = apps.get_model('core', 'Transaction')
+    SalesFact = apps.get_model('core', 'SalesFact')
+    for currency in ('USD', 'SOS', 'ETB'):
+        days = {}
+        sales = Transaction.objects.filter(source=currency).values('date_created__date').annotate(
+            count=Count('id'), total=Sum('total_amount'), paid=Sum('amount_paid'),
+            total_usd=Sum('total_amount_usd'), paid_usd=Sum('amount_paid_usd'),
+        ).order_by()
+        for row in sales:
+            values = days.setdefault(row['date_created__date'], dict.fromkeys(METRICS, 0))
+            values.update({
+                'sales_count': row['count'], 'total_amount': row['total'] or 0, 'amount_paid': row['paid'] or 0,
+                'total_amount_usd': row['total_usd'] or 0, 'amount_paid_usd': row['paid_usd'] or 0,
+            })
+        facts = SalesFact.objects.filter(currency=currency).values('day').annotate(
+            total_quantity=Sum('quantity'), total_revenue_usd=Sum('revenue_usd'),
+            total_cost_usd=Sum('cost_usd'), total_profit_usd=Sum('profit_usd'),
+        ).order_by()
+        for row in facts:
+            values = days.setdefault(row['day'], dict.fromkeys(METRICS, 0))
+            values.update({
+                'quantity': row['total_quantity'] or 0, 'revenue_usd': row['total_revenue_usd'] or 0,
+                'cost_usd': row['total_cost_usd'] or 0, 'profit_usd': row['total_profit_usd'] or 0,
+            })
+
+        running = dict.fromkeys(METRICS, 0)
+        rows = []
+        for day, values in sorted(days.items()):
+            for metric, value in values.items():
+                running[metric] += value
+            rows.append(SalesRunningTotal(
+                day=day, currency=currency, **values,
+                **{f'cum_{metric}': value for metric, value in running.items()},
+            ))
+        SalesRunningTotal.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0046_daily_close'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRunningTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('currency', models.CharField(choices=[('USD', 'US Dollar'), ('SOS', 'Somaliland Shilling'), ('ETB', 'Ethiopian Birr')], max_length=3)),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, help_text='Sales total in the sale currency', max_digits=20)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('total_amount_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('amount_paid_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('revenue_usd', models.DecimalField(decimal_places=2, default=0, help_text='Item revenue in USD', max_digits=20)),
+                ('cost_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('profit_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cum_sales_count', models.PositiveIntegerField(default=0)),
+                ('cum_total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cum_amount_paid', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cum_total_amount_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cum_amount_paid_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cum_quantity', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cum_revenue_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cum_cost_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cum_profit_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'verbose_name': 'Sales Running Total',
+                'verbose_name_plural': 'Sales Running Totals',
+                'ordering': ['-day', 'currency'],
+                'constraints': [models.UniqueConstraint(fields=('currency', 'day'), name='unique_sales_running_total_day')],
+            },
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
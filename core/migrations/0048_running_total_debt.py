@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:07
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_debt(apps, schema_editor):
+    SalesRunningTotal = apps.get_model('core', 'SalesRunningTotal')
+    Transaction = apps.get_model('core', 'Transaction')
+    for currency in ('USD', 'SOS', 'ETB'):
+        daily = dict(
+            Transaction.objects.filter(source=currency).values('date_created__date')
+            .annotate(debt=Sum('debt_amount_usd')).values_list('date_created__date', 'debt').order_by()
+        )
+        running = 0
+        rows = list(SalesRunningTotal.objects.filter(currency=currency).order_by('day'))
+        for row in rows:
+            row.debt_amount_usd = daily.get(row.day) or 0
+            running += row.debt_amount_usd
+            row.cum_debt_amount_usd = running
+        SalesRunningTotal.objects.bulk_update(rows, ['debt_amount_usd', 'cum_debt_amount_usd'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0047_sales_running_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesrunningtotal',
+            name='cum_debt_amount_usd',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='salesrunningtotal',
+            name='debt_amount_usd',
+            field=models.DecimalField(decimal_places=2, default=0, help_text="Debt created by the day's sales", max_digits=20),
+        ),
+        migrations.RunPython(fill_debt, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:10
+
+from datetime import timezone as dt_timezone
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncHour
+
+
+def fill_hours(apps, schema_editor):
+    SalesHour = apps.get_model('core', 'SalesHour')
+    Transaction = apps.get_model('core', 'Transaction')
+    decimal_field = models.DecimalField(max_digits=20, decimal_places=2)
+    for currency in ('USD', 'SOS', 'ETB'):
+        rows = {}
+        sales = Transaction.objects.filter(source=currency).annotate(
+            bucket=TruncHour('date_created', tzinfo=dt_timezone.utc),
+        ).values('bucket').annotate(
+            count=Count('id'), revenue=Sum('total_amount_usd'), paid=Sum('amount_paid_usd'), debt=Sum('debt_amount_usd'),
+        ).order_by()
+        for group in sales:
+            rows[group['bucket']] = SalesHour(
+                hour=group['bucket'], currency=currency, sales_count=group['count'],
+                revenue_usd=group['revenue'] or 0, amount_paid_usd=group['paid'] or 0, debt_amount_usd=group['debt'] or 0,
+            )
+        items = apps.get_model('core', f'SaleItem{currency}').objects.annotate(
+            bucket=TruncHour('sale__date_created', tzinfo=dt_timezone.utc),
+        ).values('bucket').annotate(
+            total_quantity=Sum('quantity'),
+            total_cost=Sum(F('unit_cost_usd') * F('quantity'), output_field=decimal_field),
+        ).order_by()
+        for group in items:
+            row = rows.get(group['bucket'])
+            if row is None:
+                row = rows[group['bucket']] = SalesHour(hour=group['bucket'], currency=currency)
+            row.quantity = group['total_quantity'] or 0
+            row.cost_usd = group['total_cost'] or 0
+        SalesHour.objects.bulk_create(rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0048_running_total_debt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Start of the hour, in UTC')),
+                ('currency', models.CharField(choices=[('USD', 'US Dollar'), ('SOS', 'Somaliland Shilling'), ('ETB', 'Ethiopian Birr')], max_length=3)),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('revenue_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('amount_paid_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('debt_amount_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, help_text='Items sold', max_digits=20)),
+                ('cost_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'verbose_name': 'Sales Hour',
+                'verbose_name_plural': 'Sales Hours',
+                'ordering': ['-hour', 'currency'],
+                'indexes': [models.Index(fields=['hour'], name='sales_hour_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('currency', 'hour'), name='unique_sales_hour')],
+            },
+        ),
+        migrations.RunPython(fill_hours, migrations.RunPython.noop),
+    ]
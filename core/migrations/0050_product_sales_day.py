@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:13
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+
+def fill_window(apps, schema_editor):
+    SalesFact = apps.get_model('core', 'SalesFact')
+    ProductSalesDay = apps.get_model('core', 'ProductSalesDay')
+    rows = SalesFact.objects.filter(day__gte=timezone.now().date() - timedelta(days=89)).values('day', 'product_id').annotate(
+        total_quantity=Sum('quantity'), total_revenue_usd=Sum('revenue_usd'), category=Max('category_id'),
+    ).order_by()
+    ProductSalesDay.objects.bulk_create([
+        ProductSalesDay(
+            day=row['day'], product_id=row['product_id'], category_id=row['category'],
+            quantity=row['total_quantity'] or 0, revenue_usd=row['total_revenue_usd'] or 0,
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0049_sales_hour'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('revenue_usd', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='product_sales_days', to='core.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_days', to='core.product')),
+            ],
+            options={
+                'verbose_name': 'Product Sales Day',
+                'verbose_name_plural': 'Product Sales Days',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'product'), name='unique_product_sales_day')],
+            },
+        ),
+        migrations.RunPython(fill_window, migrations.RunPython.noop),
+    ]
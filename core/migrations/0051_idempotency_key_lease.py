@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0050_product_sales_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, help_text='Lease on an IN_PROGRESS key; a retry may take it over once it has run out', null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:56
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_cells(apps, schema_editor):
+    # Racing refreshes could insert a cell twice; each copy is a full recompute, so keep one
+    SalesFact = apps.get_model('core', 'SalesFact')
+    duplicates = SalesFact.objects.values('day', 'product_id', 'currency', 'user_id').annotate(
+        rows=Count('id'), keep=Max('id'),
+    ).filter(rows__gt=1).order_by()
+    for cell in duplicates:
+        SalesFact.objects.filter(
+            day=cell['day'], product_id=cell['product_id'], currency=cell['currency'], user_id=cell['user_id'],
+        ).exclude(pk=cell['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0051_idempotency_key_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_cells, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='salesfact',
+            constraint=models.UniqueConstraint(models.F('day'), models.F('product'), models.F('currency'), django.db.models.functions.comparison.Coalesce('user', models.Value(0)), name='unique_sales_fact_cell'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0052_sales_fact_unique_cell'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dataversion',
+            name='key',
+            field=models.CharField(choices=[('sales', 'Sales ledger'), ('rollups', 'Sales rollups'), ('debt', 'Customer debt'), ('settings', 'Currency settings')], max_length=20, unique=True),
+        ),
+    ]
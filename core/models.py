@@ -1,9 +1,15 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
-from django.db.models import Sum, Q
-from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from django.utils import timezone
+from datetime import timedelta, timezone as dt_timezone
+from django.db.models import Sum, Q, F, Value, Case, When
+from django.db.models.functions import Cast, Coalesce, TruncHour
+from decimal import Decimal, ROUND_HALF_UP, ROUND_UP, InvalidOperation
+import hashlib
 import uuid
+from . import live
+from .search import name_tokens, normalize_name, normalize_phone, search_customers
 
 class User(AbstractUser):
     """Admin user model - all logged-in users are trusted admins"""
@@ -45,6 +51,20 @@ class CurrencySettings(models.Model):
         default=0.01,
         verbose_name="ETB to USD Exchange Rate"
     )
+    sos_price_step = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=1.00,
+        verbose_name="SOS Price Rounding Step",
+        help_text="Converted SOS selling prices are rounded to a multiple of this (e.g. 500)"
+    )
+    etb_price_step = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0.01,
+        verbose_name="ETB Price Rounding Step",
+        help_text="Converted ETB selling prices are rounded to a multiple of this"
+    )
     date_updated = models.DateTimeField(auto_now=True)
     updated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
 
@@ -62,6 +82,9 @@ class CurrencySettings(models.Model):
         if self.usd_to_etb_rate > 0:
             self.etb_to_usd_rate = Decimal('1.000000') / self.usd_to_etb_rate
         super().save(*args, **kwargs)
+        ProductPrice.rebuild(currency_settings=self)
+        # Converted prices change for every product, so clients must refetch them
+        Product.objects.update(catalog_version=CatalogVersion.bump())
 
     def convert_usd_to_sos(self, usd_amount):
         """Convert USD amount to SOS"""
@@ -84,11 +107,86 @@ class CurrencySettings(models.Model):
         return Decimal('0.00')
 
 
-class Category(models.Model):
+def get_usd_rate(currency, currency_settings=None):
+    """Current USD to `currency` rate from CurrencySettings (1 for USD)"""
+    if currency == 'USD':
+        return Decimal('1')
+    if currency_settings is None:
+        currency_settings = CurrencySettings.objects.first()
+    if currency == 'SOS':
+        return currency_settings.usd_to_sos_rate if currency_settings else Decimal('8000.00')
+    return currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00')
+
+
+def to_usd_equiv(amount, rate):
+    """Convert a native-currency amount to USD using a USD to currency rate"""
+    if amount is None or not rate or rate <= 0:
+        return Decimal('0.00')
+    return (Decimal(amount) / Decimal(rate)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class CatalogVersionedMixin:
+    """Stamps catalog_version from the global counter on every save, for delta sync.
+
+    Stock is part of the delta (the POS checks it offline), so stock-only
+    saves bump the counter too. Writes that touch many rows at once, such as
+    a sale or a stock take, bump it once and stamp the rows with update().
+    """
+
+    def save(self, *args, **kwargs):
+        self.catalog_version = CatalogVersion.bump()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'catalog_version'}
+        super().save(*args, **kwargs)
+
+
+class USDEquivalentSaleMixin:
+    """Keeps the *_usd_equiv columns of a sale in step with its native amounts.
+
+    The rate is the one stored on the sale, so edits after a rate change
+    still convert at the rate that was in effect when the sale was made.
+    """
+
+    def get_usd_rate(self):
+        return Decimal('1')
+
+    def update_usd_equivalents(self):
+        rate = self.get_usd_rate()
+        self.total_amount_usd_equiv = to_usd_equiv(self.total_amount, rate)
+        self.amount_paid_usd_equiv = to_usd_equiv(self.amount_paid, rate)
+        self.debt_amount_usd_equiv = to_usd_equiv(self.debt_amount, rate)
+
+
+
+class SaleItemCostSnapshotMixin:
+    """Captures the product's USD purchase cost and minimum price on the item at sale time.
+
+    Profit then reads only the item row, so repricing a product does not
+    change the margin of sales that were already made.
+    """
+
+    def snapshot_product_prices(self):
+        if self.unit_cost_usd is None:
+            self.unit_cost_usd = self.product.purchase_price
+        if self.min_price_usd is None:
+            self.min_price_usd = self.product.selling_price
+
+    @classmethod
+    def cost_totals(cls, **filters):
+        """Sum purchase cost and expected margin (both USD) over the item table"""
+        decimal_field = models.DecimalField(max_digits=20, decimal_places=2)
+        totals = cls.objects.filter(**filters).aggregate(
+            cost_usd=Sum(F('unit_cost_usd') * F('quantity'), output_field=decimal_field),
+            expected_profit_usd=Sum((F('min_price_usd') - F('unit_cost_usd')) * F('quantity'), output_field=decimal_field),
+        )
+        return {key: value or Decimal('0.00') for key, value in totals.items()}
+
+class Category(CatalogVersionedMixin, models.Model):
     """Product categories"""
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     date_created = models.DateTimeField(auto_now_add=True)
+    catalog_version = models.BigIntegerField(default=0, db_index=True, editable=False)
 
     class Meta:
         verbose_name = "Category"
@@ -98,7 +196,7 @@ class Category(models.Model):
         return self.name
 
 
-class Product(models.Model):
+class Product(CatalogVersionedMixin, models.Model):
     """Product model with purchase price hidden from non-superusers"""
     name = models.CharField(max_length=200)
     brand = models.CharField(max_length=100)
@@ -130,6 +228,7 @@ class Product(models.Model):
     date_added = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    catalog_version = models.BigIntegerField(default=0, db_index=True, editable=False)
 
     class Meta:
         verbose_name = "Product"
@@ -148,6 +247,166 @@ class Product(models.Model):
         """Check if product is low on stock"""
         return self.current_stock <= self.low_stock_threshold
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_prices = (instance.__dict__.get('selling_price'), instance.__dict__.get('purchase_price'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        prices_changed = getattr(self, '_loaded_prices', None) != (self.selling_price, self.purchase_price)
+        super().save(*args, **kwargs)
+        if prices_changed:
+            ProductPrice.rebuild(products=[self])
+            self._loaded_prices = (self.selling_price, self.purchase_price)
+
+
+class ProductPrice(models.Model):
+    """Selling and floor price per product and currency, precomputed from the USD prices"""
+    CURRENCY_CHOICES = [
+        ('USD', 'USD'),
+        ('SOS', 'SOS'),
+        ('ETB', 'ETB'),
+    ]
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='prices')
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES)
+    sell_price = models.DecimalField(max_digits=14, decimal_places=2)
+    floor_price = models.DecimalField(max_digits=14, decimal_places=2, help_text="Purchase price converted; sales below it are rejected")
+    date_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Product Price"
+        verbose_name_plural = "Product Prices"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'currency'], name='unique_product_price_currency'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} - {self.sell_price} {self.currency}"
+
+    @staticmethod
+    def currency_rules(currency_settings=None):
+        """(rate, rounding step) per currency"""
+        if currency_settings is None:
+            currency_settings = CurrencySettings.objects.first()
+        if currency_settings is None:
+            return {
+                'USD': (Decimal('1'), Decimal('0.01')),
+                'SOS': (Decimal('8000.00'), Decimal('1.00')),
+                'ETB': (Decimal('100.00'), Decimal('0.01')),
+            }
+        return {
+            'USD': (Decimal('1'), Decimal('0.01')),
+            'SOS': (currency_settings.usd_to_sos_rate, currency_settings.sos_price_step or Decimal('0.01')),
+            'ETB': (currency_settings.usd_to_etb_rate, currency_settings.etb_price_step or Decimal('0.01')),
+        }
+
+    @staticmethod
+    def compute(selling_price, purchase_price, rate, step):
+        """Round the converted selling price up to a multiple of `step`.
+
+        Rounding up keeps the default price at or above the converted
+        selling price, which sale items enforce as their minimum.
+        """
+        rate, step = Decimal(str(rate)), Decimal(str(step))
+        floor_price = (Decimal(purchase_price or 0) * rate).quantize(Decimal('0.01'), rounding=ROUND_UP)
+        raw_price = Decimal(selling_price or 0) * rate
+        sell_price = ((raw_price / step).quantize(Decimal('1'), rounding=ROUND_UP) * step).quantize(Decimal('0.01'), rounding=ROUND_UP)
+        return sell_price, floor_price
+
+    @classmethod
+    def rebuild(cls, products=None, currency_settings=None):
+        """Recompute prices for the given products (default: all) in one bulk upsert"""
+        rules = cls.currency_rules(currency_settings)
+        if products is None:
+            products = Product.objects.only('id', 'selling_price', 'purchase_price').iterator(chunk_size=1000)
+        rows = []
+        for product in products:
+            for currency, (rate, step) in rules.items():
+                sell_price, floor_price = cls.compute(product.selling_price, product.purchase_price, rate, step)
+                rows.append(cls(product_id=product.pk, currency=currency, sell_price=sell_price, floor_price=floor_price))
+        cls.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['product', 'currency'],
+            update_fields=['sell_price', 'floor_price', 'date_updated'],
+        )
+        return len(rows)
+
+    @classmethod
+    def lookup(cls, product_ids, currency):
+        """{product_id: (sell_price, floor_price)}, rebuilding rows that are missing"""
+        def fetch(ids):
+            return {
+                product_id: (sell_price, floor_price)
+                for product_id, sell_price, floor_price in cls.objects.filter(
+                    product_id__in=ids, currency=currency
+                ).values_list('product_id', 'sell_price', 'floor_price')
+            }
+
+        product_ids = set(product_ids)
+        prices = fetch(product_ids)
+        missing = product_ids - prices.keys()
+        if missing:
+            cls.rebuild(products=Product.objects.filter(pk__in=missing))
+            prices.update(fetch(missing))
+        return prices
+
+    @classmethod
+    def sell_price_map(cls, product_ids):
+        """{product_id: {currency: sell_price}} for listing endpoints, in one query"""
+        product_ids = set(product_ids)
+        price_map = {}
+        for product_id, currency, sell_price in cls.objects.filter(
+            product_id__in=product_ids
+        ).values_list('product_id', 'currency', 'sell_price'):
+            price_map.setdefault(product_id, {})[currency] = sell_price
+        missing = product_ids - price_map.keys()
+        if missing:
+            cls.rebuild(products=Product.objects.filter(pk__in=missing))
+            for product_id, currency, sell_price in cls.objects.filter(
+                product_id__in=missing
+            ).values_list('product_id', 'currency', 'sell_price'):
+                price_map.setdefault(product_id, {})[currency] = sell_price
+        return price_map
+
+
+class ProductBarcode(models.Model):
+    """Scannable code (barcode or SKU) for a product; a pack code adds pack_quantity units"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='barcodes')
+    code = models.CharField(max_length=64, unique=True)
+    pack_quantity = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=1,
+        validators=[MinValueValidator(Decimal('0.01'))],
+        help_text="Units added to the cart per scan (e.g. 12 for a box of 12)"
+    )
+    label = models.CharField(max_length=50, blank=True, help_text="e.g. Unit, Box of 12")
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Product Barcode"
+        verbose_name_plural = "Product Barcodes"
+
+    def __str__(self):
+        return f"{self.code} - {self.product}"
+
+    def touch_product(self):
+        # A new catalog version invalidates cached scan results in every process
+        Product.objects.filter(pk=self.product_id).update(catalog_version=CatalogVersion.bump())
+
+    def save(self, *args, **kwargs):
+        self.code = self.code.strip()
+        super().save(*args, **kwargs)
+        self.touch_product()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.touch_product()
+        return result
+
 
 class Customer(models.Model):
     """Customer model with separate USD and SOS debt tracking"""
@@ -160,6 +419,10 @@ class Customer(models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     last_purchase_date = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # Search keys maintained by save(); see core/search.py
+    phone_key = models.CharField(max_length=20, blank=True, default='', db_index=True, editable=False)
+    phone_key_reversed = models.CharField(max_length=20, blank=True, default='', db_index=True, editable=False)
+    name_key = models.CharField(max_length=200, blank=True, default='', db_index=True, editable=False)
 
     class Meta:
         verbose_name = "Customer"
@@ -168,6 +431,26 @@ class Customer(models.Model):
     def __str__(self):
         return f"{self.name} ({self.phone})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_name_key = instance.__dict__.get('name_key')
+        return instance
+
+    def update_search_keys(self):
+        self.phone_key = normalize_phone(self.phone)[:20]
+        self.phone_key_reversed = self.phone_key[::-1]
+        self.name_key = normalize_name(self.name)[:200]
+
+    def save(self, *args, **kwargs):
+        self.update_search_keys()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'phone_key', 'phone_key_reversed', 'name_key'}
+        super().save(*args, **kwargs)
+        if getattr(self, '_loaded_name_key', None) != self.name_key:
+            CustomerNameToken.rebuild_for(self)
+            self._loaded_name_key = self.name_key
+
     def update_debt(self, amount, currency='USD'):
         """Update customer's debt in the specified currency"""
         if currency == 'USD':
@@ -235,11 +518,30 @@ class Customer(models.Model):
         """Get total ETB debt across all customers"""
         return cls.objects.aggregate(total=Sum('total_debt_etb'))['total'] or Decimal('0.00')
 
+    @classmethod
+    def get_total_debt_usd_combined(cls, currency_settings=None):
+        """Get total debt across all currencies in USD, summed in a single query"""
+        sos_rate = get_usd_rate('SOS', currency_settings)
+        etb_rate = get_usd_rate('ETB', currency_settings)
+        # Float division so SQLite does not truncate integer-valued balances
+        total = cls.objects.aggregate(total=Sum(
+            Cast('total_debt_usd', models.FloatField())
+            + Cast('total_debt_sos', models.FloatField()) / Value(float(sos_rate))
+            + Cast('total_debt_etb', models.FloatField()) / Value(float(etb_rate)),
+            output_field=models.FloatField(),
+        ))['total']
+        return Decimal(str(total or 0)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
     @classmethod
     def get_total_debt(cls):
         """Backward compatibility method - returns total SOS debt (base currency)"""
         return cls.get_total_debt_sos()
 
+    @classmethod
+    def search(cls, query, limit=10):
+        """Ranked lookup by phone (exact, prefix, last digits) then name"""
+        return search_customers(query, limit)
+
     @classmethod
     def get_customers_with_debt(cls):
         """Get customers who have debt in either currency"""
@@ -248,7 +550,28 @@ class Customer(models.Model):
         ).order_by('-total_debt_usd', '-total_debt_sos', '-total_debt_etb')
 
 
-class SaleUSD(models.Model):
+class CustomerNameToken(models.Model):
+    """One normalized word of a customer's name, for indexed token-prefix search"""
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='name_tokens')
+    token = models.CharField(max_length=50, db_index=True)
+
+    class Meta:
+        verbose_name = "Customer Name Token"
+        verbose_name_plural = "Customer Name Tokens"
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'token'], name='unique_customer_name_token'),
+        ]
+
+    def __str__(self):
+        return self.token
+
+    @classmethod
+    def rebuild_for(cls, customer):
+        cls.objects.filter(customer=customer).delete()
+        cls.objects.bulk_create([cls(customer=customer, token=token) for token in name_tokens(customer.name)])
+
+
+class SaleUSD(USDEquivalentSaleMixin, models.Model):
     """USD Sales transaction model - completely separate from SOS"""
     transaction_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, help_text="Optional - allows anonymous sales")
@@ -256,6 +579,9 @@ class SaleUSD(models.Model):
     total_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Total amount in USD")
     amount_paid = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Amount paid in USD")
     debt_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Debt amount in USD")
+    total_amount_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Total amount in USD at the rate in effect at sale time")
+    amount_paid_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Amount paid in USD at the rate in effect at sale time")
+    debt_amount_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Debt amount in USD at the rate in effect at sale time")
     pno = models.CharField(max_length=50, null=True, blank=True, verbose_name="Sale PNO")
     date_created = models.DateTimeField(auto_now_add=True)
     is_completed = models.BooleanField(default=True)
@@ -263,6 +589,9 @@ class SaleUSD(models.Model):
     class Meta:
         verbose_name = "USD Sale"
         verbose_name_plural = "USD Sales"
+        indexes = [
+            models.Index(fields=['date_created'], name='sale_usd_date_created_idx'),
+        ]
 
     def __str__(self):
         customer_name = self.customer.name if self.customer else "Anonymous"
@@ -287,18 +616,21 @@ class SaleUSD(models.Model):
                 })
 
     def save(self, *args, **kwargs):
-        """Override save to automatically recalculate debt_amount"""
+        """Override save to automatically recalculate debt_amount and USD equivalents"""
         if self.total_amount is not None and self.amount_paid is not None:
             debt = max(Decimal('0.00'), self.total_amount - self.amount_paid)
             self.debt_amount = debt.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        self.update_usd_equivalents()
         super().save(*args, **kwargs)
 
     @property
     def expected_profit_usd(self):
         """Calculate expected profit if paid in full at selling price (in USD)"""
         profit = Decimal('0.00')
-        for item in self.items.all():
-            margin = item.product.selling_price - item.product.purchase_price
+        for item in self.items.select_related('product'):
+            # Items sold before snapshots existed fall back to the product's prices
+            item.snapshot_product_prices()
+            margin = item.min_price_usd - item.unit_cost_usd
             profit += margin * item.quantity
         return profit.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
@@ -306,8 +638,9 @@ class SaleUSD(models.Model):
     def actual_profit_usd(self):
         """Calculate actual profit based on amount paid (in USD)"""
         purchase_cost = Decimal('0.00')
-        for item in self.items.all():
-            purchase_cost += item.product.purchase_price * item.quantity
+        for item in self.items.select_related('product'):
+            item.snapshot_product_prices()
+            purchase_cost += item.unit_cost_usd * item.quantity
         profit = self.amount_paid - purchase_cost
         return profit.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
@@ -325,7 +658,7 @@ class SaleUSD(models.Model):
         return Decimal('0.00')
 
 
-class SaleSOS(models.Model):
+class SaleSOS(USDEquivalentSaleMixin, models.Model):
     """SOS Sales transaction model - completely separate from USD"""
     transaction_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, help_text="Optional - allows anonymous sales")
@@ -333,6 +666,17 @@ class SaleSOS(models.Model):
     total_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Total amount in SOS")
     amount_paid = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Amount paid in SOS")
     debt_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Debt amount in SOS")
+    exchange_rate_at_sale = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(Decimal('0.01'))],
+        help_text="USD to SOS exchange rate at time of sale"
+    )
+    total_amount_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Total amount in USD at the rate in effect at sale time")
+    amount_paid_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Amount paid in USD at the rate in effect at sale time")
+    debt_amount_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Debt amount in USD at the rate in effect at sale time")
     pno = models.CharField(max_length=50, null=True, blank=True, verbose_name="Sale PNO")
     date_created = models.DateTimeField(auto_now_add=True)
     is_completed = models.BooleanField(default=True)
@@ -340,11 +684,20 @@ class SaleSOS(models.Model):
     class Meta:
         verbose_name = "SOS Sale"
         verbose_name_plural = "SOS Sales"
+        indexes = [
+            models.Index(fields=['date_created'], name='sale_sos_date_created_idx'),
+        ]
 
     def __str__(self):
         customer_name = self.customer.name if self.customer else "Anonymous"
         return f"SOS Sale {self.transaction_id} - {customer_name}"
 
+    def get_usd_rate(self):
+        """Rate captured at sale time; the current rate is captured on first save"""
+        if not self.exchange_rate_at_sale:
+            self.exchange_rate_at_sale = get_usd_rate('SOS')
+        return self.exchange_rate_at_sale
+
     def calculate_total(self):
         """Calculate and update the total amount for this sale"""
         total = self.items.aggregate(total=Sum('total_price'))['total'] or Decimal('0.00')
@@ -364,30 +717,32 @@ class SaleSOS(models.Model):
                 })
 
     def save(self, *args, **kwargs):
-        """Override save to automatically recalculate debt_amount"""
+        """Override save to automatically recalculate debt_amount and USD equivalents"""
         if self.total_amount is not None and self.amount_paid is not None:
             debt = max(Decimal('0.00'), self.total_amount - self.amount_paid)
             self.debt_amount = debt.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        self.update_usd_equivalents()
         super().save(*args, **kwargs)
 
     @property
     def expected_profit_usd(self):
         """Calculate expected profit if paid in full at selling price (in USD)"""
         profit = Decimal('0.00')
-        for item in self.items.all():
-            margin = item.product.selling_price - item.product.purchase_price
+        for item in self.items.select_related('product'):
+            # Items sold before snapshots existed fall back to the product's prices
+            item.snapshot_product_prices()
+            margin = item.min_price_usd - item.unit_cost_usd
             profit += margin * item.quantity
         return profit.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
     @property
     def actual_profit_usd(self):
-        """Calculate actual profit based on amount paid (converted to USD)"""
-        currency_settings = CurrencySettings.objects.first()
-        usd_to_sos_rate = currency_settings.usd_to_sos_rate if currency_settings else Decimal('8000.00')
+        """Calculate actual profit based on amount paid (converted to USD using stored rate)"""
         purchase_cost = Decimal('0.00')
-        for item in self.items.all():
-            purchase_cost += item.product.purchase_price * item.quantity
-        amount_paid_usd = self.amount_paid / usd_to_sos_rate if usd_to_sos_rate > 0 else Decimal('0.00')
+        for item in self.items.select_related('product'):
+            item.snapshot_product_prices()
+            purchase_cost += item.unit_cost_usd * item.quantity
+        amount_paid_usd = to_usd_equiv(self.amount_paid, self.get_usd_rate())
         profit = amount_paid_usd - purchase_cost
         return profit.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
@@ -405,7 +760,7 @@ class SaleSOS(models.Model):
         return Decimal('0.00')
 
 
-class SaleETB(models.Model):
+class SaleETB(USDEquivalentSaleMixin, models.Model):
     """ETB Sales transaction model - completely separate from USD/SOS"""
     transaction_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, help_text="Optional - allows anonymous sales")
@@ -420,6 +775,9 @@ class SaleETB(models.Model):
         validators=[MinValueValidator(Decimal('0.01'))],
         help_text="USD to ETB exchange rate at time of sale"
     )
+    total_amount_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Total amount in USD at the rate in effect at sale time")
+    amount_paid_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Amount paid in USD at the rate in effect at sale time")
+    debt_amount_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Debt amount in USD at the rate in effect at sale time")
     pno = models.CharField(max_length=50, null=True, blank=True, verbose_name="Sale PNO")
     date_created = models.DateTimeField(auto_now_add=True)
     is_completed = models.BooleanField(default=True)
@@ -427,11 +785,20 @@ class SaleETB(models.Model):
     class Meta:
         verbose_name = "ETB Sale"
         verbose_name_plural = "ETB Sales"
+        indexes = [
+            models.Index(fields=['date_created'], name='sale_etb_date_created_idx'),
+        ]
 
     def __str__(self):
         customer_name = self.customer.name if self.customer else "Anonymous"
         return f"ETB Sale {self.transaction_id} - {customer_name}"
 
+    def get_usd_rate(self):
+        """Rate captured at sale time"""
+        if not self.exchange_rate_at_sale:
+            self.exchange_rate_at_sale = get_usd_rate('ETB')
+        return self.exchange_rate_at_sale
+
     def calculate_total(self):
         """Calculate and update the total amount for this sale"""
         total = self.items.aggregate(total=Sum('total_price'))['total'] or Decimal('0.00')
@@ -451,18 +818,21 @@ class SaleETB(models.Model):
                 })
 
     def save(self, *args, **kwargs):
-        """Override save to automatically recalculate debt_amount"""
+        """Override save to automatically recalculate debt_amount and USD equivalents"""
         if self.total_amount is not None and self.amount_paid is not None:
             debt = max(Decimal('0.00'), self.total_amount - self.amount_paid)
             self.debt_amount = debt.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        self.update_usd_equivalents()
         super().save(*args, **kwargs)
 
     @property
     def expected_profit_usd(self):
         """Calculate expected profit if paid in full at selling price (in USD)"""
         profit = Decimal('0.00')
-        for item in self.items.all():
-            margin = item.product.selling_price - item.product.purchase_price
+        for item in self.items.select_related('product'):
+            # Items sold before snapshots existed fall back to the product's prices
+            item.snapshot_product_prices()
+            margin = item.min_price_usd - item.unit_cost_usd
             profit += margin * item.quantity
         return profit.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
@@ -470,10 +840,10 @@ class SaleETB(models.Model):
     def actual_profit_usd(self):
         """Calculate actual profit based on amount paid (converted to USD using stored rate)"""
         purchase_cost = Decimal('0.00')
-        for item in self.items.all():
-            purchase_cost += item.product.purchase_price * item.quantity
-        rate = self.exchange_rate_at_sale if self.exchange_rate_at_sale else Decimal('100.00')
-        amount_paid_usd = self.amount_paid / rate if rate > 0 else Decimal('0.00')
+        for item in self.items.select_related('product'):
+            item.snapshot_product_prices()
+            purchase_cost += item.unit_cost_usd * item.quantity
+        amount_paid_usd = to_usd_equiv(self.amount_paid, self.get_usd_rate())
         profit = amount_paid_usd - purchase_cost
         return profit.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
@@ -626,13 +996,15 @@ class Sale(models.Model):
         super().save(*args, **kwargs)
 
 
-class SaleItemUSD(models.Model):
+class SaleItemUSD(SaleItemCostSnapshotMixin, models.Model):
     """Individual items in a USD sale"""
     sale = models.ForeignKey(SaleUSD, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.DecimalField(max_digits=20, decimal_places=2, help_text="Quantity bought")
     unit_price = models.DecimalField(max_digits=20, decimal_places=2, help_text="Unit price in USD")
     total_price = models.DecimalField(max_digits=20, decimal_places=2, help_text="Total price in USD")
+    unit_cost_usd = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Product purchase price (USD) at time of sale")
+    min_price_usd = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Product minimum selling price (USD) at time of sale")
 
     class Meta:
         verbose_name = "USD Sale Item"
@@ -654,10 +1026,10 @@ class SaleItemUSD(models.Model):
     def get_base_profit_usd(self):
         """Calculate base profit (minimum price - purchase price)"""
         try:
-            if not self.product.purchase_price or not self.product.selling_price or not self.quantity:
+            if not self.unit_cost_usd or not self.min_price_usd or not self.quantity:
                 return Decimal('0.00')
-            purchase_price_usd = Decimal(str(self.product.purchase_price))
-            minimum_price_usd = Decimal(str(self.product.selling_price))
+            purchase_price_usd = Decimal(str(self.unit_cost_usd))
+            minimum_price_usd = Decimal(str(self.min_price_usd))
             quantity = Decimal(str(self.quantity))
             base_profit_usd = (minimum_price_usd - purchase_price_usd) * quantity
             return base_profit_usd.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
@@ -667,10 +1039,10 @@ class SaleItemUSD(models.Model):
     def get_premium_profit_usd(self):
         """Calculate premium profit (actual price - minimum price + overpayment)"""
         try:
-            if not self.unit_price or not self.product.selling_price or not self.quantity:
+            if not self.unit_price or not self.min_price_usd or not self.quantity:
                 return Decimal('0.00')
             unit_price_usd = Decimal(str(self.unit_price))
-            minimum_price_usd = Decimal(str(self.product.selling_price))
+            minimum_price_usd = Decimal(str(self.min_price_usd))
             quantity = Decimal(str(self.quantity))
             price_premium = (unit_price_usd - minimum_price_usd) * quantity
             overpayment_premium = Decimal('0.00')
@@ -708,8 +1080,9 @@ class SaleItemUSD(models.Model):
                 })
 
     def save(self, *args, **kwargs):
-        # Calculate total price before saving
+        # Calculate total price and snapshot product prices before saving
         self.total_price = (self.quantity * self.unit_price).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        self.snapshot_product_prices()
         super().save(*args, **kwargs)
 
     @property
@@ -720,13 +1093,15 @@ class SaleItemUSD(models.Model):
         return 0
 
 
-class SaleItemSOS(models.Model):
+class SaleItemSOS(SaleItemCostSnapshotMixin, models.Model):
     """Individual items in a SOS sale"""
     sale = models.ForeignKey(SaleSOS, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.DecimalField(max_digits=20, decimal_places=2, help_text="Quantity bought")
     unit_price = models.DecimalField(max_digits=20, decimal_places=2, help_text="Unit price in SOS")
     total_price = models.DecimalField(max_digits=20, decimal_places=2, help_text="Total price in SOS")
+    unit_cost_usd = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Product purchase price (USD) at time of sale")
+    min_price_usd = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Product minimum selling price (USD) at time of sale")
 
     class Meta:
         verbose_name = "SOS Sale Item"
@@ -748,10 +1123,10 @@ class SaleItemSOS(models.Model):
     def get_base_profit_usd(self):
         """Calculate base profit (minimum price - purchase price)"""
         try:
-            if not self.product.purchase_price or not self.product.selling_price or not self.quantity:
+            if not self.unit_cost_usd or not self.min_price_usd or not self.quantity:
                 return Decimal('0.00')
-            purchase_price_usd = Decimal(str(self.product.purchase_price))
-            minimum_price_usd = Decimal(str(self.product.selling_price))
+            purchase_price_usd = Decimal(str(self.unit_cost_usd))
+            minimum_price_usd = Decimal(str(self.min_price_usd))
             quantity = Decimal(str(self.quantity))
             base_profit_usd = (minimum_price_usd - purchase_price_usd) * quantity
             return base_profit_usd.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
@@ -761,21 +1136,21 @@ class SaleItemSOS(models.Model):
     def get_premium_profit_usd(self):
         """Calculate premium profit (actual price - minimum price + overpayment)"""
         try:
-            if not self.unit_price or not self.product.selling_price or not self.quantity:
+            if not self.unit_price or not self.min_price_usd or not self.quantity:
                 return Decimal('0.00')
-            currency_settings = CurrencySettings.objects.first()
-            if not currency_settings or currency_settings.usd_to_sos_rate <= 0:
+            exchange_rate = self.sale.get_usd_rate()
+            if not exchange_rate or exchange_rate <= 0:
                 return Decimal('0.00')
             unit_price_sos = Decimal(str(self.unit_price))
-            minimum_price_usd = Decimal(str(self.product.selling_price))
+            minimum_price_usd = Decimal(str(self.min_price_usd))
             quantity = Decimal(str(self.quantity))
-            actual_price_usd = (unit_price_sos * quantity) / currency_settings.usd_to_sos_rate
+            actual_price_usd = (unit_price_sos * quantity) / exchange_rate
             minimum_revenue_usd = minimum_price_usd * quantity
             price_premium = actual_price_usd - minimum_revenue_usd
             overpayment_premium = Decimal('0.00')
             if self.sale.amount_paid > self.sale.total_amount:
                 overpayment_sos = self.sale.amount_paid - self.sale.total_amount
-                overpayment_premium = overpayment_sos / currency_settings.usd_to_sos_rate
+                overpayment_premium = overpayment_sos / exchange_rate
             total_premium_profit = price_premium + overpayment_premium
             return total_premium_profit.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
         except (ValueError, TypeError, AttributeError, InvalidOperation, ZeroDivisionError) as e:
@@ -799,8 +1174,9 @@ class SaleItemSOS(models.Model):
                 })
 
     def save(self, *args, **kwargs):
-        # Calculate total price before saving
+        # Calculate total price and snapshot product prices before saving
         self.total_price = (self.quantity * self.unit_price).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        self.snapshot_product_prices()
         super().save(*args, **kwargs)
 
     @property
@@ -811,13 +1187,15 @@ class SaleItemSOS(models.Model):
         return 0
 
 
-class SaleItemETB(models.Model):
+class SaleItemETB(SaleItemCostSnapshotMixin, models.Model):
     """Individual items in a ETB sale"""
     sale = models.ForeignKey(SaleETB, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.DecimalField(max_digits=20, decimal_places=2, help_text="Quantity bought")
     unit_price = models.DecimalField(max_digits=20, decimal_places=2, help_text="Unit price in ETB")
     total_price = models.DecimalField(max_digits=20, decimal_places=2, help_text="Total price in ETB")
+    unit_cost_usd = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Product purchase price (USD) at time of sale")
+    min_price_usd = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Product minimum selling price (USD) at time of sale")
 
     class Meta:
         verbose_name = "ETB Sale Item"
@@ -839,10 +1217,10 @@ class SaleItemETB(models.Model):
     def get_base_profit_usd(self):
         """Calculate base profit (minimum price - purchase price)"""
         try:
-            if not self.product.purchase_price or not self.product.selling_price or not self.quantity:
+            if not self.unit_cost_usd or not self.min_price_usd or not self.quantity:
                 return Decimal('0.00')
-            purchase_price_usd = Decimal(str(self.product.purchase_price))
-            minimum_price_usd = Decimal(str(self.product.selling_price))
+            purchase_price_usd = Decimal(str(self.unit_cost_usd))
+            minimum_price_usd = Decimal(str(self.min_price_usd))
             quantity = Decimal(str(self.quantity))
             base_profit_usd = (minimum_price_usd - purchase_price_usd) * quantity
             return base_profit_usd.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
@@ -854,7 +1232,7 @@ class SaleItemETB(models.Model):
         Uses the exchange rate stored at time of sale for accurate static profit.
         """
         try:
-            if not self.unit_price or not self.product.selling_price or not self.quantity:
+            if not self.unit_price or not self.min_price_usd or not self.quantity:
                 return Decimal('0.00')
             exchange_rate = self.sale.exchange_rate_at_sale
             if not exchange_rate or exchange_rate <= 0:
@@ -863,7 +1241,7 @@ class SaleItemETB(models.Model):
                     return Decimal('0.00')
                 exchange_rate = currency_settings.usd_to_etb_rate
             unit_price_etb = Decimal(str(self.unit_price))
-            minimum_price_usd = Decimal(str(self.product.selling_price))
+            minimum_price_usd = Decimal(str(self.min_price_usd))
             quantity = Decimal(str(self.quantity))
             actual_price_usd = (unit_price_etb * quantity) / exchange_rate
             minimum_revenue_usd = minimum_price_usd * quantity
@@ -907,8 +1285,9 @@ class SaleItemETB(models.Model):
                 })
 
     def save(self, *args, **kwargs):
-        # Calculate total price before saving
+        # Calculate total price and snapshot product prices before saving
         self.total_price = (self.quantity * self.unit_price).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        self.snapshot_product_prices()
         super().save(*args, **kwargs)
 
     @property
@@ -1061,10 +1440,31 @@ class InventoryLog(models.Model):
         return f"{self.product.name} - {self.action} ({self.quantity_change:+.2f})"
 
 
-class DebtPaymentUSD(models.Model):
+class USDEquivalentPaymentMixin:
+    """Keeps amount_usd_equiv of a debt payment at the rate in effect when it was recorded"""
+
+    def get_payment_currency(self):
+        return 'USD'
+
+    def get_payment_amount(self):
+        return self.amount
+
+    def update_usd_equivalents(self):
+        if not self.exchange_rate:
+            self.exchange_rate = get_usd_rate(self.get_payment_currency())
+        self.amount_usd_equiv = to_usd_equiv(self.get_payment_amount(), self.exchange_rate)
+
+    def save(self, *args, **kwargs):
+        self.update_usd_equivalents()
+        super().save(*args, **kwargs)
+
+
+class DebtPaymentUSD(USDEquivalentPaymentMixin, models.Model):
     """USD debt payments - completely separate from SOS"""
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2, help_text="Payment amount in USD")
+    exchange_rate = models.DecimalField(max_digits=20, decimal_places=6, null=True, blank=True, help_text="USD to payment currency rate at time of payment")
+    amount_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Payment amount in USD at the rate in effect at payment time")
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='usd_debt_payments')
     date_created = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(blank=True)
@@ -1077,10 +1477,12 @@ class DebtPaymentUSD(models.Model):
         return f"{self.customer.name} - ${self.amount} USD"
 
 
-class DebtPaymentSOS(models.Model):
+class DebtPaymentSOS(USDEquivalentPaymentMixin, models.Model):
     """SOS debt payments - completely separate from USD"""
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2, help_text="Payment amount in SOS")
+    exchange_rate = models.DecimalField(max_digits=20, decimal_places=6, null=True, blank=True, help_text="USD to payment currency rate at time of payment")
+    amount_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Payment amount in USD at the rate in effect at payment time")
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='sos_debt_payments')
     date_created = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(blank=True)
@@ -1092,11 +1494,16 @@ class DebtPaymentSOS(models.Model):
     def __str__(self):
         return f"{self.customer.name} - {self.amount} SOS"
 
+    def get_payment_currency(self):
+        return 'SOS'
+
 
-class DebtPaymentETB(models.Model):
+class DebtPaymentETB(USDEquivalentPaymentMixin, models.Model):
     """ETB debt payments - completely separate from USD/SOS"""
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2, help_text="Payment amount in ETB")
+    exchange_rate = models.DecimalField(max_digits=20, decimal_places=6, null=True, blank=True, help_text="USD to payment currency rate at time of payment")
+    amount_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Payment amount in USD at the rate in effect at payment time")
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='etb_debt_payments')
     date_created = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(blank=True)
@@ -1108,8 +1515,11 @@ class DebtPaymentETB(models.Model):
     def __str__(self):
         return f"{self.customer.name} - {self.amount} ETB"
 
+    def get_payment_currency(self):
+        return 'ETB'
+
 
-class DebtPayment(models.Model):
+class DebtPayment(USDEquivalentPaymentMixin, models.Model):
     """Legacy Customer debt payments - kept for backward compatibility"""
     CURRENCY_CHOICES = [
         ('USD', 'US Dollar'),
@@ -1121,6 +1531,8 @@ class DebtPayment(models.Model):
     original_currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default='SOS', help_text="Original payment currency")
     original_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, help_text="Original payment amount in original currency")
     pno = models.CharField(max_length=50, null=True, blank=False, verbose_name="Receipt Number (PNO)")
+    exchange_rate = models.DecimalField(max_digits=20, decimal_places=6, null=True, blank=True, help_text="USD to payment currency rate at time of payment")
+    amount_usd_equiv = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, help_text="Payment amount in USD at the rate in effect at payment time")
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='legacy_debt_payments')
     date_created = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(blank=True)
@@ -1132,6 +1544,12 @@ class DebtPayment(models.Model):
     def __str__(self):
         return f"{self.customer.name} - {self.original_currency} {self.original_amount}"
 
+    def get_payment_currency(self):
+        return self.original_currency or 'SOS'
+
+    def get_payment_amount(self):
+        return self.original_amount or self.amount
+
     def convert_to_sos_and_save_original(self, original_currency, original_amount):
         """Convert payment to SOS (base currency) and save original amounts"""
         currency_settings = CurrencySettings.objects.first()
@@ -1212,6 +1630,7 @@ class AuditLog(models.Model):
         ('DEBT_MANUALLY_ADJUSTED', 'Debt Manually Adjusted'),
         ('CUSTOMER_ADDED', 'Customer Added'),
         ('CURRENCY_UPDATED', 'Currency Rate Updated'),
+        ('JOB_QUEUED', 'Background Job Queued'),
     ]
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, help_text="Admin user who performed the action (null for anonymous/system actions)")
     action = models.CharField(max_length=50, choices=ACTION_CHOICES)
@@ -1228,4 +1647,1155 @@ class AuditLog(models.Model):
 
     def __str__(self):
         username = self.user.username if self.user else "System"
-        return f"{username} - {self.action} - {self.date_created}"
\ No newline at end of file
+        return f"{username} - {self.action} - {self.date_created}"
+
+class Transaction(models.Model):
+    """Unified sales ledger - one row per sale regardless of currency.
+
+    Mirrors SaleUSD, SaleSOS, SaleETB and the legacy Sale table so that
+    cross-currency questions can be answered with a single query. Rows are
+    derived: the signals in core/signals.py keep them in sync on save and
+    delete, and the reconcile_ledger command repairs writes that skipped them.
+    """
+    SOURCE_CHOICES = [
+        ('USD', 'USD Sale'),
+        ('SOS', 'SOS Sale'),
+        ('ETB', 'ETB Sale'),
+        ('Legacy', 'Legacy Sale'),
+    ]
+    CURRENCY_CHOICES = [
+        ('USD', 'US Dollar'),
+        ('SOS', 'Somaliland Shilling'),
+        ('ETB', 'Ethiopian Birr'),
+    ]
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, help_text="Per-currency table this row mirrors")
+    source_id = models.BigIntegerField(help_text="Primary key of the mirrored sale")
+    transaction_id = models.UUIDField(unique=True, editable=False)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES)
+    total_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Total amount in sale currency")
+    amount_paid = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Amount paid in sale currency")
+    debt_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Debt amount in sale currency")
+    exchange_rate_at_sale = models.DecimalField(
+        max_digits=20,
+        decimal_places=6,
+        default=1,
+        help_text="USD to sale currency rate in effect when the sale was made"
+    )
+    total_amount_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Total amount normalized to USD")
+    amount_paid_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Amount paid normalized to USD")
+    debt_amount_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Debt amount normalized to USD")
+    pno = models.CharField(max_length=50, null=True, blank=True, verbose_name="Sale PNO")
+    date_created = models.DateTimeField(db_index=True)
+    is_completed = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = "Transaction"
+        verbose_name_plural = "Transactions"
+        ordering = ['-date_created']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'source_id'], name='unique_transaction_source'),
+        ]
+        indexes = [
+            models.Index(fields=['customer', '-date_created'], name='transaction_customer_idx'),
+            models.Index(fields=['currency', '-date_created'], name='transaction_currency_idx'),
+        ]
+
+    def __str__(self):
+        customer_name = self.customer.name if self.customer else "Anonymous"
+        return f"{self.get_source_display()} {self.transaction_id} - {customer_name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'total_amount_usd' in field_names and 'amount_paid_usd' in field_names:
+            # Stored totals, so a save can publish how much it changed them (core/live.py)
+            instance._loaded_totals = (instance.total_amount_usd, instance.amount_paid_usd)
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_totals = (self.total_amount_usd, self.amount_paid_usd)
+
+    @property
+    def items_summary(self):
+        """Short 'product (qty)' listing, uses prefetched items when available"""
+        return ", ".join(f"{item.product.name} ({item.quantity})" for item in self.items.all())
+
+    @staticmethod
+    def amount_etb(usd_to_etb_rate):
+        """Expression for a sale's amount in ETB (its total, or what was paid when the total is zero).
+
+        ETB sales show their native amount, so the figure never moves with
+        the rate. USD and SOS sales go through the USD equivalent stored at
+        the sale's own rate, and only that is converted at `usd_to_etb_rate`.
+        """
+        decimal_field = models.DecimalField(max_digits=20, decimal_places=2)
+        rate = Value(usd_to_etb_rate, output_field=decimal_field)
+        return Case(
+            When(currency='ETB', total_amount__gt=0, then=F('total_amount')),
+            When(currency='ETB', then=F('amount_paid')),
+            When(total_amount__gt=0, then=F('total_amount_usd') * rate),
+            default=F('amount_paid_usd') * rate,
+            output_field=decimal_field,
+        )
+
+    @staticmethod
+    def rate_for(currency, currency_settings=None, stored_rate=None):
+        """Return the USD to `currency` rate to normalize a row with"""
+        if currency != 'USD' and stored_rate:
+            return Decimal(stored_rate)
+        return get_usd_rate(currency, currency_settings)
+
+    @classmethod
+    def sync_from_sale(cls, sale, source):
+        """Create or update the ledger row mirroring a per-currency sale"""
+        existing = cls.objects.filter(source=source, source_id=sale.pk).first()
+        if source == 'Legacy':
+            currency = sale.currency
+            stored_rate = sale.exchange_rate if currency == 'SOS' else None
+        else:
+            currency = source
+            stored_rate = getattr(sale, 'exchange_rate_at_sale', None)
+        if existing and not stored_rate:
+            # Keep the rate captured when the sale was first recorded
+            stored_rate = existing.exchange_rate_at_sale
+        rate = cls.rate_for(currency, stored_rate=stored_rate)
+        if source == 'Legacy':
+            usd_amounts = [to_usd_equiv(amount, rate) for amount in (sale.total_amount, sale.amount_paid, sale.debt_amount)]
+        else:
+            # Per-currency sales carry their own USD equivalents from save()
+            usd_amounts = [sale.total_amount_usd_equiv, sale.amount_paid_usd_equiv, sale.debt_amount_usd_equiv]
+
+        values = {
+            'transaction_id': sale.transaction_id,
+            'customer_id': sale.customer_id,
+            'user_id': sale.user_id,
+            'currency': currency,
+            'total_amount': sale.total_amount,
+            'amount_paid': sale.amount_paid,
+            'debt_amount': sale.debt_amount,
+            'exchange_rate_at_sale': rate,
+            'total_amount_usd': usd_amounts[0],
+            'amount_paid_usd': usd_amounts[1],
+            'debt_amount_usd': usd_amounts[2],
+            'pno': getattr(sale, 'pno', None),
+            'date_created': sale.date_created,
+            'is_completed': sale.is_completed,
+        }
+        if existing:
+            for field, value in values.items():
+                setattr(existing, field, value)
+            existing.save()
+            return existing
+        return cls.objects.create(source=source, source_id=sale.pk, **values)
+
+
+class TransactionItem(models.Model):
+    """Unified line items for the Transaction ledger"""
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='items')
+    source_item_id = models.BigIntegerField(help_text="Primary key of the mirrored sale item")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='transaction_items')
+    quantity = models.DecimalField(max_digits=20, decimal_places=2)
+    unit_price = models.DecimalField(max_digits=20, decimal_places=2, help_text="Unit price in sale currency")
+    total_price = models.DecimalField(max_digits=20, decimal_places=2, help_text="Total price in sale currency")
+
+    class Meta:
+        verbose_name = "Transaction Item"
+        verbose_name_plural = "Transaction Items"
+        constraints = [
+            models.UniqueConstraint(fields=['transaction', 'source_item_id'], name='unique_transaction_item_source'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} x{self.quantity} ({self.transaction.currency})"
+
+    @classmethod
+    def sync_from_item(cls, item, source):
+        """Create or update the ledger line mirroring a per-currency sale item"""
+        ledger = Transaction.objects.filter(source=source, source_id=item.sale_id).first()
+        if ledger is None:
+            ledger = Transaction.sync_from_sale(item.sale, source)
+        cls.objects.update_or_create(
+            transaction=ledger,
+            source_item_id=item.pk,
+            defaults={
+                'product_id': item.product_id,
+                'quantity': item.quantity,
+                'unit_price': item.unit_price,
+                'total_price': item.total_price,
+            },
+        )
+
+
+class TransactionPayment(models.Model):
+    """Unified debt payment ledger mirroring the per-currency payment tables"""
+    SOURCE_CHOICES = [
+        ('USD', 'USD Payment'),
+        ('SOS', 'SOS Payment'),
+        ('ETB', 'ETB Payment'),
+        ('Legacy', 'Legacy Payment'),
+    ]
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    source_id = models.BigIntegerField()
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='ledger_payments')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_payments')
+    currency = models.CharField(max_length=3, choices=Transaction.CURRENCY_CHOICES)
+    amount = models.DecimalField(max_digits=20, decimal_places=2, help_text="Payment amount in payment currency")
+    exchange_rate = models.DecimalField(max_digits=20, decimal_places=6, default=1, help_text="USD to payment currency rate at time of payment")
+    amount_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, help_text="Payment amount normalized to USD")
+    pno = models.CharField(max_length=50, null=True, blank=True, verbose_name="Receipt Number (PNO)")
+    notes = models.TextField(blank=True)
+    date_created = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Transaction Payment"
+        verbose_name_plural = "Transaction Payments"
+        ordering = ['-date_created']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'source_id'], name='unique_transaction_payment_source'),
+        ]
+        indexes = [
+            models.Index(fields=['customer', '-date_created'], name='txn_payment_customer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer.name} - {self.amount} {self.currency}"
+
+    @classmethod
+    def sync_from_payment(cls, payment, source):
+        """Create or update the ledger row mirroring a debt payment"""
+        values = {
+            'customer_id': payment.customer_id,
+            'user_id': payment.user_id,
+            'currency': payment.get_payment_currency(),
+            'amount': payment.get_payment_amount(),
+            'exchange_rate': payment.exchange_rate,
+            'amount_usd': payment.amount_usd_equiv,
+            'pno': getattr(payment, 'pno', None),
+            'notes': payment.notes,
+            'date_created': payment.date_created,
+        }
+        cls.objects.update_or_create(source=source, source_id=payment.pk, defaults=values)
+
+
+class SalesFact(models.Model):
+    """Pre-aggregated sales at day x product x category x currency x user granularity"""
+    DIMENSIONS = {
+        'day': 'day',
+        'product': 'product_id',
+        'category': 'category_id',
+        'currency': 'currency',
+        'user': 'user_id',
+    }
+    MEASURES = ['quantity', 'line_count', 'revenue', 'revenue_usd', 'cost_usd', 'profit_usd']
+
+    day = models.DateField(db_index=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_facts')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='sales_facts')
+    currency = models.CharField(max_length=3, choices=Transaction.CURRENCY_CHOICES)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sales_facts')
+    quantity = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    line_count = models.PositiveIntegerField(default=0, help_text="Number of sale items in this cell")
+    revenue = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Revenue in sale currency")
+    revenue_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Revenue in USD at the rate stored on each sale")
+    cost_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Purchase cost snapshotted on the sale items")
+    profit_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Sales Fact"
+        verbose_name_plural = "Sales Facts"
+        ordering = ['-day']
+        indexes = [
+            models.Index(fields=['day', 'product'], name='sales_fact_day_product_idx'),
+            models.Index(fields=['day', 'category'], name='sales_fact_day_category_idx'),
+        ]
+        constraints = [
+            # One row per cell; walk-in sales have no user, so it is compared as 0
+            models.UniqueConstraint(
+                'day', 'product', 'currency', Coalesce('user', Value(0)), name='unique_sales_fact_cell',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product_id} {self.currency}: {self.quantity}"
+
+    @classmethod
+    def _aggregate_items(cls, currency, **item_filters):
+        """Group per-currency sale items into unsaved fact rows"""
+        item_model = SALE_ITEM_MODELS[currency]
+        decimal_field = models.DecimalField(max_digits=20, decimal_places=2)
+        rate_field = 'sale__exchange_rate_at_sale' if currency != 'USD' else None
+        group_fields = ['sale__date_created__date', 'product_id', 'product__category_id', 'sale__user_id']
+        if rate_field:
+            # Rates differ per sale, so group on them and convert each group in Python
+            group_fields.append(rate_field)
+        groups = item_model.objects.filter(**item_filters).values(*group_fields).annotate(
+            total_quantity=Sum('quantity'),
+            total_lines=models.Count('id'),
+            total_revenue=Sum('total_price'),
+            total_cost_usd=Sum(F('unit_cost_usd') * F('quantity'), output_field=decimal_field),
+        ).order_by()
+
+        facts = {}
+        for group in groups:
+            key = (group['sale__date_created__date'], group['product_id'], group['product__category_id'], group['sale__user_id'])
+            fact = facts.get(key)
+            if fact is None:
+                fact = facts[key] = cls(
+                    day=key[0], product_id=key[1], category_id=key[2], currency=currency, user_id=key[3],
+                )
+            rate = group[rate_field] if rate_field else Decimal('1')
+            if not rate:
+                rate = get_usd_rate(currency)
+            fact.quantity += group['total_quantity'] or 0
+            fact.line_count += group['total_lines']
+            fact.revenue += group['total_revenue'] or 0
+            fact.revenue_usd += to_usd_equiv(group['total_revenue'] or 0, rate)
+            fact.cost_usd += group['total_cost_usd'] or 0
+        for fact in facts.values():
+            fact.profit_usd = fact.revenue_usd - fact.cost_usd
+        return list(facts.values())
+
+    @classmethod
+    def refresh_cells(cls, day, currency, product_ids):
+        """Recompute the cells touched by a sale write (one day, one currency, a few products)"""
+        product_ids = [product_id for product_id in product_ids if product_id]
+        if currency not in ('USD', 'SOS', 'ETB') or not product_ids:
+            return
+        for attempt in range(2):
+            try:
+                # Delete and insert together, so a concurrent refresh of the same cells
+                # either waits for this one or fails on the unique constraint and runs again
+                with transaction.atomic():
+                    cls.objects.filter(day=day, currency=currency, product_id__in=product_ids).delete()
+                    cls.objects.bulk_create(cls._aggregate_items(
+                        currency, sale__date_created__date=day, product_id__in=product_ids,
+                    ))
+                    ProductSalesDay.refresh(day, product_ids)
+                return
+            except IntegrityError:
+                if attempt:
+                    raise
+
+    @classmethod
+    def rebuild(cls, start_date=None, end_date=None):
+        """Rebuild the cube for a date range (or entirely) from the sale item tables"""
+        facts = cls.objects.all()
+        item_filters = {}
+        if start_date:
+            facts = facts.filter(day__gte=start_date)
+            item_filters['sale__date_created__date__gte'] = start_date
+        if end_date:
+            facts = facts.filter(day__lte=end_date)
+            item_filters['sale__date_created__date__lte'] = end_date
+        facts.delete()
+        created = 0
+        for currency in ('USD', 'SOS', 'ETB'):
+            rows = cls._aggregate_items(currency, **item_filters)
+            cls.objects.bulk_create(rows, batch_size=500)
+            created += len(rows)
+        ProductSalesDay.rebuild()
+        return created
+
+    @classmethod
+    def summarize(cls, group_by=(), start_date=None, end_date=None, order_by=None, **filters):
+        """Sum the measures over any combination of dimensions.
+
+        `group_by` takes names from DIMENSIONS; extra values such as
+        'product__name' may be passed as well. Remaining keyword arguments
+        are regular queryset filters, e.g. category_id=3 or currency='SOS'.
+        Without `group_by` a single dict of grand totals is returned.
+        """
+        facts = cls.objects.filter(**filters)
+        if start_date:
+            facts = facts.filter(day__gte=start_date)
+        if end_date:
+            facts = facts.filter(day__lte=end_date)
+        totals = {f'total_{measure}': Sum(measure) for measure in cls.MEASURES}
+        totals['last_day'] = models.Max('day')
+        if not group_by:
+            return facts.aggregate(**totals)
+        fields = [cls.DIMENSIONS.get(name, name) for name in group_by]
+        rows = facts.values(*fields).annotate(**totals)
+        if order_by:
+            rows = rows.order_by(*order_by)
+        else:
+            rows = rows.order_by()
+        return rows
+
+
+class ProductSalesDay(models.Model):
+    """Per-product sales per day over the last WINDOW_DAYS, for the best-seller rankings.
+
+    One row per product and day, with currencies and users already added
+    up, derived from the SalesFact cube whenever its cells change. Rows
+    older than the window are dropped as new ones are written, so the
+    table stays at a few thousand rows at most.
+    """
+    WINDOW_DAYS = 90
+
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_days')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='product_sales_days')
+    quantity = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    revenue_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Product Sales Day"
+        verbose_name_plural = "Product Sales Days"
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_product_sales_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product_id}: {self.quantity}"
+
+    @classmethod
+    def window_start(cls):
+        """First day of the window; WINDOW_DAYS days including today"""
+        return timezone.now().date() - timedelta(days=cls.WINDOW_DAYS - 1)
+
+    @classmethod
+    def _from_facts(cls, **fact_filters):
+        rows = SalesFact.objects.filter(**fact_filters).values('day', 'product_id').annotate(
+            total_quantity=Sum('quantity'), total_revenue_usd=Sum('revenue_usd'), category=models.Max('category_id'),
+        ).order_by()
+        return [
+            cls(
+                day=row['day'], product_id=row['product_id'], category_id=row['category'],
+                quantity=row['total_quantity'] or 0, revenue_usd=row['total_revenue_usd'] or 0,
+            )
+            for row in rows
+        ]
+
+    @classmethod
+    def refresh(cls, day, product_ids):
+        """Recompute a day's rows for a few products and drop the days that left the window"""
+        window_start = cls.window_start()
+        cls.objects.filter(day__lt=window_start).delete()
+        if day < window_start:
+            return
+        cls.objects.filter(day=day, product_id__in=product_ids).delete()
+        cls.objects.bulk_create(cls._from_facts(day=day, product_id__in=product_ids))
+
+    @classmethod
+    def rebuild(cls):
+        """Rebuild the window from the SalesFact cube"""
+        cls.objects.all().delete()
+        rows = cls._from_facts(day__gte=cls.window_start())
+        cls.objects.bulk_create(rows, batch_size=500)
+        return len(rows)
+
+
+class SalesRunningTotal(models.Model):
+    """Per-day sales totals per currency, next to running sums since the first day.
+
+    The total over any date range is the running sum at its last day minus
+    the running sum before its first day: two indexed lookups per currency,
+    whatever the length of the range. Header figures come from the
+    Transaction ledger, item figures from the SalesFact cube.
+    """
+    METRICS = [
+        'sales_count', 'total_amount', 'amount_paid', 'total_amount_usd', 'amount_paid_usd', 'debt_amount_usd',
+        'quantity', 'revenue_usd', 'cost_usd', 'profit_usd',
+    ]
+    # Figures that can be added up across currencies
+    COMBINED_METRICS = [
+        'sales_count', 'total_amount_usd', 'amount_paid_usd', 'debt_amount_usd', 'quantity', 'revenue_usd', 'cost_usd', 'profit_usd',
+    ]
+
+    day = models.DateField()
+    currency = models.CharField(max_length=3, choices=Transaction.CURRENCY_CHOICES)
+    sales_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Sales total in the sale currency")
+    amount_paid = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    total_amount_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    amount_paid_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    debt_amount_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Debt created by the day's sales")
+    quantity = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    revenue_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Item revenue in USD")
+    cost_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    profit_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cum_sales_count = models.PositiveIntegerField(default=0)
+    cum_total_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cum_amount_paid = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cum_total_amount_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cum_amount_paid_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cum_debt_amount_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cum_quantity = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cum_revenue_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cum_cost_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cum_profit_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Sales Running Total"
+        verbose_name_plural = "Sales Running Totals"
+        ordering = ['-day', 'currency']
+        constraints = [
+            # Also the index behind the "latest row on or before a day" lookups
+            models.UniqueConstraint(fields=['currency', 'day'], name='unique_sales_running_total_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.currency}: {self.sales_count} sale(s)"
+
+    @classmethod
+    def _zeros(cls):
+        return {metric: 0 if metric == 'sales_count' else Decimal('0.00') for metric in cls.METRICS}
+
+    @classmethod
+    def _daily_values(cls, currency, start_date=None, end_date=None):
+        """{day: {metric: value}} for one currency, grouped by day in SQL"""
+        sales = Transaction.objects.filter(source=currency)
+        facts = SalesFact.objects.filter(currency=currency)
+        if start_date:
+            sales = sales.filter(date_created__date__gte=start_date)
+            facts = facts.filter(day__gte=start_date)
+        if end_date:
+            sales = sales.filter(date_created__date__lte=end_date)
+            facts = facts.filter(day__lte=end_date)
+        sales = sales.values('date_created__date').annotate(
+            count=models.Count('id'),
+            total=Sum('total_amount'), paid=Sum('amount_paid'),
+            total_usd=Sum('total_amount_usd'), paid_usd=Sum('amount_paid_usd'), debt_usd=Sum('debt_amount_usd'),
+        ).order_by()
+        facts = facts.values('day').annotate(
+            quantity=Sum('quantity'), revenue_usd=Sum('revenue_usd'), cost_usd=Sum('cost_usd'), profit_usd=Sum('profit_usd'),
+        ).order_by()
+
+        days = {}
+        for row in sales:
+            values = days.setdefault(row['date_created__date'], cls._zeros())
+            values.update({
+                'sales_count': row['count'],
+                'total_amount': row['total'] or Decimal('0.00'), 'amount_paid': row['paid'] or Decimal('0.00'),
+                'total_amount_usd': row['total_usd'] or Decimal('0.00'), 'amount_paid_usd': row['paid_usd'] or Decimal('0.00'),
+                'debt_amount_usd': row['debt_usd'] or Decimal('0.00'),
+            })
+        for row in facts:
+            values = days.setdefault(row['day'], cls._zeros())
+            for metric in ('quantity', 'revenue_usd', 'cost_usd', 'profit_usd'):
+                values[metric] = row[metric] or Decimal('0.00')
+        return days
+
+    @classmethod
+    def refresh_day(cls, day, currency):
+        """Recompute one day of one currency and shift the later running sums by the change"""
+        if currency not in ('USD', 'SOS', 'ETB'):
+            return
+        with transaction.atomic():
+            values = cls._daily_values(currency, day, day).get(day, cls._zeros())
+            row = cls.objects.select_for_update().filter(day=day, currency=currency).first()
+            if row is None:
+                if not any(values.values()):
+                    return
+                previous = cls.objects.filter(currency=currency, day__lt=day).order_by('-day').first()
+                cls.objects.create(day=day, currency=currency, **values, **{
+                    f'cum_{metric}': (getattr(previous, f'cum_{metric}') if previous else 0) + value
+                    for metric, value in values.items()
+                })
+                delta = values
+            else:
+                delta = {metric: value - getattr(row, metric) for metric, value in values.items()}
+                if not any(delta.values()):
+                    return
+                cls.objects.filter(pk=row.pk).update(**values, **{
+                    f'cum_{metric}': F(f'cum_{metric}') + change for metric, change in delta.items()
+                })
+            cls.objects.filter(currency=currency, day__gt=day).update(**{
+                f'cum_{metric}': F(f'cum_{metric}') + change for metric, change in delta.items() if change
+            })
+
+    @classmethod
+    def rebuild(cls):
+        """Rebuild every day and running sum from the ledger and the SalesFact cube"""
+        cls.objects.all().delete()
+        created = 0
+        for currency in ('USD', 'SOS', 'ETB'):
+            running = cls._zeros()
+            rows = []
+            for day, values in sorted(cls._daily_values(currency).items()):
+                for metric, value in values.items():
+                    running[metric] += value
+                rows.append(cls(
+                    day=day, currency=currency, **values,
+                    **{f'cum_{metric}': value for metric, value in running.items()},
+                ))
+            cls.objects.bulk_create(rows, batch_size=500)
+            created += len(rows)
+        return created
+
+    @classmethod
+    def _running_sums(cls, day, currencies):
+        """{currency: running sums} as of the end of `day` (zeros before the first sale)"""
+        sums = {}
+        for currency in currencies:
+            row = cls.objects.filter(currency=currency, day__lte=day).order_by('-day').values(
+                *(f'cum_{metric}' for metric in cls.METRICS)
+            ).first()
+            sums[currency] = {metric: row[f'cum_{metric}'] for metric in cls.METRICS} if row else cls._zeros()
+        return sums
+
+    @classmethod
+    def range_totals(cls, start_date, end_date, currencies=('USD', 'SOS', 'ETB')):
+        """{currency: {metric: total}} for start_date..end_date inclusive, plus 'ALL' with COMBINED_METRICS"""
+        upper = cls._running_sums(end_date, currencies)
+        lower = cls._running_sums(start_date - timedelta(days=1), currencies)
+        totals = {
+            currency: {metric: upper[currency][metric] - lower[currency][metric] for metric in cls.METRICS}
+            for currency in currencies
+        }
+        totals['ALL'] = {
+            metric: sum((totals[currency][metric] for currency in currencies), 0 if metric == 'sales_count' else Decimal('0.00'))
+            for metric in cls.COMBINED_METRICS
+        }
+        return totals
+
+
+class SalesHour(models.Model):
+    """Sales per hour (in UTC) and currency, kept current by signals on the sale tables.
+
+    Reports that look at the time of day (the heatmap, hourly charts) read
+    these rows instead of the sales themselves: a year is under 9,000 rows
+    per currency.
+    """
+    MEASURES = ['sales_count', 'revenue_usd', 'amount_paid_usd', 'debt_amount_usd', 'quantity', 'cost_usd']
+
+    hour = models.DateTimeField(help_text="Start of the hour, in UTC")
+    currency = models.CharField(max_length=3, choices=Transaction.CURRENCY_CHOICES)
+    sales_count = models.PositiveIntegerField(default=0)
+    revenue_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    amount_paid_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    debt_amount_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    quantity = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Items sold")
+    cost_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Sales Hour"
+        verbose_name_plural = "Sales Hours"
+        ordering = ['-hour', 'currency']
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'hour'], name='unique_sales_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='sales_hour_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H}:00 {self.currency}: {self.sales_count} sale(s)"
+
+    @classmethod
+    def _aggregate(cls, currency, **date_filters):
+        """Unsaved rows grouped by hour by the database; filters are date_created lookups on the sale"""
+        decimal_field = models.DecimalField(max_digits=20, decimal_places=2)
+        sales = Transaction.objects.filter(source=currency, **date_filters)
+        items = SALE_ITEM_MODELS[currency].objects.filter(
+            **{f'sale__{lookup}': value for lookup, value in date_filters.items()}
+        )
+        rows = {}
+        sales = sales.annotate(bucket=TruncHour('date_created', tzinfo=dt_timezone.utc)).values('bucket').annotate(
+            count=models.Count('id'), revenue=Sum('total_amount_usd'),
+            paid=Sum('amount_paid_usd'), debt=Sum('debt_amount_usd'),
+        ).order_by()
+        for group in sales:
+            rows[group['bucket']] = cls(
+                hour=group['bucket'], currency=currency, sales_count=group['count'],
+                revenue_usd=group['revenue'] or 0, amount_paid_usd=group['paid'] or 0, debt_amount_usd=group['debt'] or 0,
+            )
+        items = items.annotate(bucket=TruncHour('sale__date_created', tzinfo=dt_timezone.utc)).values('bucket').annotate(
+            total_quantity=Sum('quantity'),
+            total_cost=Sum(F('unit_cost_usd') * F('quantity'), output_field=decimal_field),
+        ).order_by()
+        for group in items:
+            row = rows.get(group['bucket'])
+            if row is None:
+                row = rows[group['bucket']] = cls(hour=group['bucket'], currency=currency)
+            row.quantity = group['total_quantity'] or 0
+            row.cost_usd = group['total_cost'] or 0
+        return list(rows.values())
+
+    @classmethod
+    def refresh_hour(cls, moment, currency):
+        """Recompute the hour containing `moment` for one currency"""
+        if currency not in ('USD', 'SOS', 'ETB'):
+            return
+        start = moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+        with transaction.atomic():
+            cls.objects.filter(currency=currency, hour=start).delete()
+            cls.objects.bulk_create(cls._aggregate(
+                currency, date_created__gte=start, date_created__lt=start + timedelta(hours=1),
+            ))
+
+    @classmethod
+    def rebuild(cls, start_date=None, end_date=None):
+        """Rebuild the hours of a date range (or all of them) from the sales"""
+        hours = cls.objects.all()
+        date_filters = {}
+        if start_date:
+            hours = hours.filter(hour__date__gte=start_date)
+            date_filters['date_created__date__gte'] = start_date
+        if end_date:
+            hours = hours.filter(hour__date__lte=end_date)
+            date_filters['date_created__date__lte'] = end_date
+        hours.delete()
+        created = 0
+        for currency in ('USD', 'SOS', 'ETB'):
+            rows = cls._aggregate(currency, **date_filters)
+            cls.objects.bulk_create(rows, batch_size=500)
+            created += len(rows)
+        return created
+
+
+class Job(models.Model):
+    """Background job picked up by `manage.py run_worker` (the database is the queue)"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+    job_type = models.CharField(max_length=50, db_index=True)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete (0-100)")
+    message = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Not picked up before this time (retry backoff)")
+    result_file = models.FileField(upload_to='jobs/', null=True, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    date_created = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Background Job"
+        verbose_name_plural = "Background Jobs"
+        ordering = ['-date_created']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_type} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('SUCCEEDED', 'FAILED')
+
+    @classmethod
+    def claim_next(cls, worker_name):
+        """Atomically move the oldest due PENDING job to RUNNING; returns None when idle"""
+        now = timezone.now()
+        candidates = cls.objects.filter(status='PENDING', run_after__lte=now).order_by('run_after', 'id')
+        for job_id in candidates.values_list('id', flat=True)[:5]:
+            claimed = cls.objects.filter(pk=job_id, status='PENDING').update(
+                status='RUNNING', worker=worker_name, started_at=now,
+                attempts=F('attempts') + 1, progress=0, error='',
+            )
+            if claimed:
+                return cls.objects.get(pk=job_id)
+        return None
+
+    @classmethod
+    def requeue_stale(cls, minutes):
+        """Return RUNNING jobs abandoned by a crashed worker to the queue"""
+        cutoff = timezone.now() - timedelta(minutes=minutes)
+        return cls.objects.filter(status='RUNNING', started_at__lt=cutoff).update(
+            status='PENDING', run_after=timezone.now(), message='Requeued after worker timeout',
+        )
+
+    def set_progress(self, progress, message=''):
+        """Record progress without touching other columns"""
+        self.progress = max(0, min(100, int(progress)))
+        self.message = message[:255]
+        Job.objects.filter(pk=self.pk).update(progress=self.progress, message=self.message)
+
+
+
+class IdempotencyKey(models.Model):
+    """First response to a POST sent with an Idempotency-Key header, replayed for retries"""
+    STATUS_CHOICES = [
+        ('IN_PROGRESS', 'In progress'),
+        ('COMPLETE', 'Complete'),
+    ]
+    # sha256 of "<user id or anon>:<Idempotency-Key>" so keys never collide across users
+    fingerprint = models.CharField(max_length=64, unique=True)
+    request_hash = models.CharField(max_length=64, help_text="sha256 of path and body, to reject a reused key")
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='IN_PROGRESS')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_headers = models.JSONField(default=dict, blank=True)
+    response_body = models.BinaryField(blank=True, default=b'')
+    date_created = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    locked_until = models.DateTimeField(null=True, blank=True, help_text="Lease on an IN_PROGRESS key; a retry may take it over once it has run out")
+
+    class Meta:
+        verbose_name = "Idempotency Key"
+        verbose_name_plural = "Idempotency Keys"
+
+    def __str__(self):
+        return f"{self.fingerprint[:12]} ({self.status})"
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+    @property
+    def is_abandoned(self):
+        """An IN_PROGRESS key whose worker has held it past its lease, e.g. because the process died"""
+        return self.status == 'IN_PROGRESS' and (self.locked_until is None or self.locked_until <= timezone.now())
+
+    @classmethod
+    def purge_expired(cls):
+        """Delete keys past their TTL; returns the number removed"""
+        deleted, _ = cls.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+
+class CatalogVersion(models.Model):
+    """Single-row counter behind the catalog delta-sync cursor"""
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Catalog Version"
+
+    def __str__(self):
+        return f"Catalog version {self.value}"
+
+    @classmethod
+    def bump(cls):
+        """Increment and return the counter; the row lock keeps versions in commit order"""
+        with transaction.atomic():
+            cls.objects.get_or_create(pk=1)
+            cls.objects.filter(pk=1).update(value=F('value') + 1)
+            return cls.objects.values_list('value', flat=True).get(pk=1)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list('value', flat=True).first() or 0
+
+
+class DataVersion(models.Model):
+    """Named change counters; dashboard widgets derive their ETags from them"""
+    KEY_CHOICES = [
+        ('sales', 'Sales ledger'),
+        ('rollups', 'Sales rollups'),
+        ('debt', 'Customer debt'),
+        ('settings', 'Currency settings'),
+    ]
+    key = models.CharField(max_length=20, choices=KEY_CHOICES, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Data Version"
+        verbose_name_plural = "Data Versions"
+
+    def __str__(self):
+        return f"{self.key} v{self.value}"
+
+    @classmethod
+    def bump(cls, key):
+        """Increment a counter in place; the row is created on first use"""
+        if not cls.objects.filter(key=key).update(value=F('value') + 1):
+            version, created = cls.objects.get_or_create(key=key, defaults={'value': 1})
+            if not created:
+                cls.objects.filter(key=key).update(value=F('value') + 1)
+
+    @classmethod
+    def current(cls, *keys):
+        """{key: value} for the given counters, 0 for ones never bumped"""
+        values = dict(cls.objects.filter(key__in=keys).values_list('key', 'value'))
+        return {key: values.get(key, 0) for key in keys}
+
+
+class CatalogTombstone(models.Model):
+    """Marks a deleted product or category so delta-sync clients can drop it"""
+    OBJECT_TYPE_CHOICES = [
+        ('product', 'Product'),
+        ('category', 'Category'),
+    ]
+    object_type = models.CharField(max_length=10, choices=OBJECT_TYPE_CHOICES)
+    object_id = models.IntegerField()
+    catalog_version = models.BigIntegerField(db_index=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Catalog Tombstone"
+        verbose_name_plural = "Catalog Tombstones"
+
+    def __str__(self):
+        return f"Deleted {self.object_type} #{self.object_id} (v{self.catalog_version})"
+
+
+class StockTake(models.Model):
+    """Physical count session; variances are measured against a snapshot of stock taken at start.
+
+    Posting applies each variance (counted - snapshot) as a delta on the live
+    stock, so sales made while counting are kept rather than overwritten.
+    """
+    STATUS_CHOICES = [
+        ('OPEN', 'Open'),
+        ('POSTED', 'Posted'),
+        ('CANCELLED', 'Cancelled'),
+    ]
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, help_text="Limit the count to one category")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='OPEN', db_index=True)
+    notes = models.TextField(blank=True)
+    started_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='stock_takes_started')
+    posted_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_takes_posted')
+    date_started = models.DateTimeField(auto_now_add=True)
+    date_posted = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Stock Take"
+        verbose_name_plural = "Stock Takes"
+        ordering = ['-date_started']
+
+    def __str__(self):
+        return f"Stock take #{self.pk} ({self.get_status_display()})"
+
+    @classmethod
+    def start(cls, user=None, category=None, notes=''):
+        """Open a session and snapshot current_stock of every active product in scope"""
+        with transaction.atomic():
+            stock_take = cls.objects.create(started_by=user, category=category, notes=notes)
+            products = Product.objects.filter(is_active=True)
+            if category is not None:
+                products = products.filter(category=category)
+            StockTakeLine.objects.bulk_create([
+                StockTakeLine(stock_take=stock_take, product_id=product_id, expected_quantity=stock)
+                for product_id, stock in products.values_list('id', 'current_stock').iterator(chunk_size=1000)
+            ], batch_size=500)
+        return stock_take
+
+    def record_counts(self, counts, user=None):
+        """Apply a batch of counts [(product_id, quantity, add)].
+
+        Counts apply in order: `add` counts are added to the running total
+        (one scan per unit), the others replace it, so a set discards the
+        adds before it. Products missing from the snapshot (added after the
+        session started) get a line snapshotted now. Returns the number of
+        lines touched.
+        """
+        if self.status != 'OPEN':
+            raise ValueError(f"Stock take #{self.pk} is {self.get_status_display().lower()}")
+        product_ids = {product_id for product_id, _quantity, _add in counts}
+        with transaction.atomic():
+            known = set(self.lines.filter(product_id__in=product_ids).values_list('product_id', flat=True))
+            StockTakeLine.objects.bulk_create([
+                StockTakeLine(stock_take=self, product_id=product_id, expected_quantity=stock)
+                for product_id, stock in Product.objects.filter(pk__in=product_ids - known).values_list('id', 'current_stock')
+            ], ignore_conflicts=True)
+
+            # Fold each product's counts into one write: a set (plus the adds after
+            # it) becomes a new total, adds alone go on top of the stored one
+            sets = {}
+            adds = {}
+            for product_id, quantity, add in counts:
+                if not add:
+                    sets[product_id] = quantity
+                    adds.pop(product_id, None)
+                elif product_id in sets:
+                    sets[product_id] += quantity
+                else:
+                    adds[product_id] = adds.get(product_id, Decimal('0')) + quantity
+            now = timezone.now()
+            quantity_field = models.DecimalField(max_digits=10, decimal_places=2)
+            for batch, add in ((sets, False), (adds, True)):
+                if not batch:
+                    continue
+                value = Case(
+                    *[When(product_id=product_id, then=Value(quantity)) for product_id, quantity in batch.items()],
+                    output_field=quantity_field,
+                )
+                if add:
+                    value = Coalesce(F('counted_quantity'), Value(Decimal('0')), output_field=quantity_field) + value
+                self.lines.filter(product_id__in=batch).update(counted_quantity=value, counted_by=user, date_counted=now)
+            return self.lines.filter(product_id__in=product_ids).count()
+
+    def post(self, user=None, ip_address=None):
+        """Apply all variances in one transaction; returns a summary dict"""
+        with transaction.atomic():
+            now = timezone.now()
+            claimed = StockTake.objects.filter(pk=self.pk, status='OPEN').update(status='POSTED', posted_by=user, date_posted=now)
+            if not claimed:
+                raise ValueError(f"Stock take #{self.pk} is not open")
+            self.status, self.posted_by, self.date_posted = 'POSTED', user, now
+
+            lines = list(self.lines.filter(counted_quantity__isnull=False).exclude(counted_quantity=F('expected_quantity')))
+            for line in lines:
+                line.variance = line.counted_quantity - line.expected_quantity
+            if lines:
+                # update() skips Product.save(), so the catalog version is stamped here
+                Product.objects.filter(pk__in=[line.product_id for line in lines]).update(
+                    current_stock=F('current_stock') + Case(
+                        *[When(pk=line.product_id, then=Value(line.variance)) for line in lines],
+                        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+                    ),
+                    catalog_version=CatalogVersion.bump(),
+                    date_updated=now,
+                )
+                StockTakeLine.objects.bulk_update(lines, ['variance'], batch_size=500)
+            stock = dict(Product.objects.filter(pk__in=[line.product_id for line in lines]).values_list('id', 'current_stock'))
+            logs = InventoryLog.objects.bulk_create([
+                InventoryLog(
+                    product_id=line.product_id,
+                    action='ADJUSTMENT',
+                    quantity_change=line.variance,
+                    old_quantity=stock[line.product_id] - line.variance,
+                    new_quantity=stock[line.product_id],
+                    user=user,
+                    notes=f"Stock take #{self.pk}",
+                )
+                for line in lines
+            ], batch_size=500)
+            # bulk_create sends no post_save, so the stock alerts are published here
+            for log in logs:
+                live.publish_on_commit(lambda log=log: live.stock_alert(log))
+
+            counted = self.lines.filter(counted_quantity__isnull=False).count()
+            summary = {
+                'counted': counted,
+                'adjusted': len(lines),
+                'net_change': sum((line.variance for line in lines), Decimal('0')),
+            }
+            AuditLog.objects.create(
+                user=user,
+                action='STOCK_TAKE_POSTED',
+                object_type='StockTake',
+                object_id=str(self.pk),
+                details=f"Posted stock take #{self.pk}: {counted} counted, {len(lines)} adjusted (net {summary['net_change']:+})",
+                ip_address=ip_address,
+            )
+        return summary
+
+
+class StockTakeLine(models.Model):
+    """Snapshot and count of one product in a stock take"""
+    stock_take = models.ForeignKey(StockTake, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_take_lines')
+    expected_quantity = models.DecimalField(max_digits=10, decimal_places=2, help_text="current_stock when the session started")
+    counted_quantity = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    variance = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Set when the session is posted")
+    counted_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_take_counts')
+    date_counted = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Stock Take Line"
+        verbose_name_plural = "Stock Take Lines"
+        constraints = [
+            models.UniqueConstraint(fields=['stock_take', 'product'], name='unique_stock_take_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} - expected {self.expected_quantity}, counted {self.counted_quantity}"
+
+
+
+class DailyClose(models.Model):
+    """End-of-day close (Z-report): the day's totals frozen when the day was closed.
+
+    Rows are written once by core.closes.close_day() and never change, so
+    reports over closed days read these instead of recomputing from sale
+    rows at today's rates and prices. content_hash covers every stored
+    figure; `is_intact` recomputes it to detect tampering.
+    """
+    day = models.DateField(unique=True)
+    stock_restocked = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Units added by restocks")
+    stock_sold = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Units removed by sales")
+    stock_adjusted = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Net units from manual adjustments and stock takes")
+    content_hash = models.CharField(max_length=64, editable=False)
+    closed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_closes')
+    date_closed = models.DateTimeField(auto_now_add=True)
+
+    STOCK_FIELDS = ('stock_restocked', 'stock_sold', 'stock_adjusted')
+
+    class Meta:
+        verbose_name = "Daily Close"
+        verbose_name_plural = "Daily Closes"
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"Close {self.day}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError(f"The close for {self.day} is immutable")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError(f"The close for {self.day} is immutable")
+
+    @classmethod
+    def hash_content(cls, day, stock, totals):
+        """SHA-256 over the day, its stock movements and its per-currency totals"""
+        lines = [day.isoformat()]
+        lines.extend(f"{field}={Decimal(stock[field]):.2f}" for field in cls.STOCK_FIELDS)
+        for currency in sorted(totals):
+            lines.extend(
+                f"{currency}.{field}={Decimal(totals[currency][field]):.2f}" for field in DailyCloseTotal.FIGURES
+            )
+        return hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+
+    @property
+    def is_intact(self):
+        stock = {field: getattr(self, field) for field in self.STOCK_FIELDS}
+        totals = {
+            total.currency: {field: getattr(total, field) for field in DailyCloseTotal.FIGURES}
+            for total in self.totals.all()
+        }
+        return self.hash_content(self.day, stock, totals) == self.content_hash
+
+
+class DailyCloseTotal(models.Model):
+    """One currency's figures in a DailyClose; amounts in that currency and in USD at the sale-time rates"""
+    FIGURES = (
+        'sales_count', 'total_sales', 'total_sales_usd', 'cash_collected', 'cash_collected_usd',
+        'debt_created', 'debt_created_usd', 'payments_received', 'payments_received_usd',
+        'cost_usd', 'profit_usd',
+    )
+
+    close = models.ForeignKey(DailyClose, on_delete=models.PROTECT, related_name='totals')
+    currency = models.CharField(max_length=3, choices=Transaction.CURRENCY_CHOICES)
+    sales_count = models.PositiveIntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    total_sales_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cash_collected = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cash_collected_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    debt_created = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    debt_created_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    payments_received = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Debt payments received")
+    payments_received_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cost_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Purchase cost snapshotted on the sale items")
+    profit_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Daily Close Total"
+        verbose_name_plural = "Daily Close Totals"
+        constraints = [
+            models.UniqueConstraint(fields=['close', 'currency'], name='unique_daily_close_currency'),
+        ]
+
+    def __str__(self):
+        return f"{self.close.day} {self.currency}: {self.total_sales}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Daily close totals are immutable")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Daily close totals are immutable")
+
+
+# Per-currency tables keyed by the currency segment used in URLs and the ledger
+SALE_MODELS = {'USD': SaleUSD, 'SOS': SaleSOS, 'ETB': SaleETB, 'Legacy': Sale}
+SALE_ITEM_MODELS = {'USD': SaleItemUSD, 'SOS': SaleItemSOS, 'ETB': SaleItemETB, 'Legacy': SaleItem}
+DEBT_PAYMENT_MODELS = {'USD': DebtPaymentUSD, 'SOS': DebtPaymentSOS, 'ETB': DebtPaymentETB, 'Legacy': DebtPayment}
@@ -0,0 +1,284 @@
+# reports.py
+"""SQL-side building blocks for the sales reports.
+
+Each report row is computed by the database from the sale item joined to
+its sale header, so no report walks sale objects in Python. Pages use
+keyset pagination on (sale date, currency, item id): every page is an
+indexed range scan of at most `limit` rows per currency, whatever the
+length of the reporting period.
+"""
+import base64
+import calendar
+import heapq
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import models
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+REPORT_CURRENCIES = ('USD', 'SOS', 'ETB')
+TRANSACTION_REPORT_PAGE_SIZE = 100
+
+MONEY_FIELD = models.DecimalField(max_digits=20, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=MONEY_FIELD)
+LINE_COLUMNS = (
+    'unit_purchase_price', 'unit_minimum_selling_price', 'item_profit_without_overpayment',
+    'surplus', 'allocated_overpayment', 'profit',
+)
+
+
+def money(expression):
+    return Cast(expression, MONEY_FIELD)
+
+
+def date_bounds(start_date, end_date):
+    """Aware datetimes covering whole days, so filters can use the date_created index"""
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return start, end
+
+
+def _line_expressions(currency, fallback_rate):
+    """Per-item report columns, in the sale's own currency"""
+    if currency == 'USD':
+        rate = Value(Decimal('1'), output_field=MONEY_FIELD)
+    else:
+        rate = Coalesce('sale__exchange_rate_at_sale', Value(fallback_rate, output_field=MONEY_FIELD))
+    unit_cost = Coalesce('unit_cost_usd', ZERO) * rate
+    unit_min = Coalesce('min_price_usd', ZERO) * rate
+    overpayment = Case(
+        When(sale__amount_paid__gt=F('sale__total_amount'), then=F('sale__amount_paid') - F('sale__total_amount')),
+        default=ZERO,
+    )
+    # The sale header carries its own total, so each item's share of an
+    # overpayment needs no second pass over its siblings. Floats keep
+    # SQLite from truncating the division when amounts are stored as integers.
+    allocated = Case(
+        When(
+            sale__total_amount__gt=0,
+            then=Cast(F('total_price') * overpayment, models.FloatField()) / Cast(F('sale__total_amount'), models.FloatField()),
+        ),
+        default=Value(0.0),
+        output_field=models.FloatField(),
+    )
+    profit = (F('unit_price') - unit_cost) * F('quantity')
+    return {
+        'unit_purchase_price': money(unit_cost),
+        'unit_minimum_selling_price': money(unit_min),
+        'item_profit_without_overpayment': money(profit),
+        'surplus': money(Case(
+            When(unit_price__gt=unit_min, then=(F('unit_price') - unit_min) * F('quantity')),
+            default=ZERO,
+        )),
+        'allocated_overpayment': money(allocated),
+        'profit': money(profit + allocated),
+    }
+
+
+def _item_rows(currency, start_date, end_date, product_id, currency_settings):
+    from .models import SALE_ITEM_MODELS, get_usd_rate
+
+    # Sales without a stored rate fall back to today's, as sale.get_usd_rate() does
+    fallback_rate = get_usd_rate(currency, currency_settings)
+    start, end = date_bounds(start_date, end_date)
+    items = SALE_ITEM_MODELS[currency].objects.filter(sale__date_created__gte=start, sale__date_created__lt=end)
+    if product_id:
+        items = items.filter(product_id=product_id)
+    return items.annotate(**_line_expressions(currency, fallback_rate))
+
+
+def encode_cursor(row):
+    raw = f"{row['sale_date'].isoformat()}|{row['currency']}|{row['item_id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """(sale date, currency, item id) from a cursor, or None if it is malformed"""
+    try:
+        sale_date, currency, item_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(sale_date), currency, int(item_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def _after(currency, cursor):
+    """Rows of `currency` that sort after `cursor` in (date, currency, id) descending order"""
+    sale_date, cursor_currency, item_id = cursor
+    if currency < cursor_currency:
+        return Q(sale__date_created__lte=sale_date)
+    if currency == cursor_currency:
+        return Q(sale__date_created__lt=sale_date) | Q(sale__date_created=sale_date, id__lt=item_id)
+    return Q(sale__date_created__lt=sale_date)
+
+
+def transaction_report_page(start_date, end_date, currencies=REPORT_CURRENCIES, product_id=None,
+                            cursor=None, limit=TRANSACTION_REPORT_PAGE_SIZE):
+    """One page of report rows, newest first, and the cursor for the next page (or None)"""
+    from .models import CurrencySettings
+
+    currency_settings = CurrencySettings.objects.first()
+    position = decode_cursor(cursor) if cursor else None
+    streams = []
+    for currency in currencies:
+        items = _item_rows(currency, start_date, end_date, product_id, currency_settings)
+        if position:
+            items = items.filter(_after(currency, position))
+        rows = items.annotate(
+            item_id=F('id'),
+            currency=Value(currency, output_field=models.CharField()),
+            sale_date=F('sale__date_created'),
+            transaction_id=F('sale__transaction_id'),
+            sale_amount_paid=F('sale__amount_paid'),
+            sale_total_amount=F('sale__total_amount'),
+            customer_name=Coalesce('sale__customer__name', Value('Walk-in Customer')),
+            customer_phone=Coalesce('sale__customer__phone', Value('')),
+            product_name=F('product__name'),
+            product_brand=F('product__brand'),
+            unit_price_sold=F('unit_price'),
+            total_sale_amount=F('total_price'),
+        ).values(
+            'item_id', 'currency', 'sale_date', 'transaction_id', 'sale_amount_paid', 'sale_total_amount',
+            'customer_name', 'customer_phone', 'product_name', 'product_brand', 'quantity',
+            'unit_price_sold', 'total_sale_amount', *LINE_COLUMNS,
+        ).order_by('-sale__date_created', '-id')[:limit + 1]
+        streams.append(list(rows))
+
+    merged = heapq.merge(
+        *streams, key=lambda row: (row['sale_date'], row['currency'], row['item_id']), reverse=True,
+    )
+    page = []
+    for row in merged:
+        page.append(row)
+        if len(page) > limit:
+            break
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+def transaction_report_totals(start_date, end_date, currencies=REPORT_CURRENCIES, product_id=None):
+    """Sums of the report columns per currency, from one aggregate query"""
+    from .models import CurrencySettings
+
+    currency_settings = CurrencySettings.objects.first()
+    parts = []
+    for currency in currencies:
+        parts.append(_item_rows(currency, start_date, end_date, product_id, currency_settings).values(
+            currency_code=Value(currency, output_field=models.CharField()),
+        ).annotate(
+            quantity_total=Coalesce(Sum('quantity'), ZERO),
+            sale_amount_total=Coalesce(Sum('total_price'), ZERO),
+            profit_total=Coalesce(Sum('profit'), ZERO),
+            surplus_total=Coalesce(Sum('surplus'), ZERO),
+            overpayment_total=Coalesce(Sum('allocated_overpayment'), ZERO),
+        ).order_by())
+    totals = {currency: {
+        'quantity': Decimal('0.00'), 'sale_amount': Decimal('0.00'), 'profit': Decimal('0.00'),
+        'surplus': Decimal('0.00'), 'allocated_overpayment': Decimal('0.00'),
+    } for currency in REPORT_CURRENCIES}
+    if not parts:
+        return totals
+    query = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+    cent = Decimal('0.01')
+    for row in query:
+        # Compound queries skip the per-column decimal converters on some backends
+        totals[row['currency_code']] = {
+            key: Decimal(row[f'{column}_total']).quantize(cent)
+            for key, column in (('quantity', 'quantity'), ('sale_amount', 'sale_amount'), ('profit', 'profit'),
+                                ('surplus', 'surplus'), ('allocated_overpayment', 'overpayment'))
+        }
+    return totals
+
+
+REVENUE_LINES_PAGE_SIZE = 25
+
+
+def product_sale_lines(product_id, start_date, end_date, page=1, page_size=REVENUE_LINES_PAGE_SIZE):
+    """One page of a product's sale lines from the ledger, newest first, and whether more follow"""
+    from .models import TransactionItem
+
+    start, end = date_bounds(start_date, end_date)
+    offset = (max(page, 1) - 1) * page_size
+    lines = list(TransactionItem.objects.filter(
+        product_id=product_id,
+        transaction__date_created__gte=start,
+        transaction__date_created__lt=end,
+        transaction__source__in=REPORT_CURRENCIES,
+    ).annotate(
+        currency=F('transaction__currency'),
+        date=F('transaction__date_created'),
+    ).values(
+        'id', 'quantity', 'unit_price', 'total_price', 'currency', 'date',
+    ).order_by('-transaction__date_created', '-id')[offset:offset + page_size + 1])
+    return lines[:page_size], len(lines) > page_size
+
+
+COMPARISON_PERIODS = ('week', 'month', 'custom')
+
+
+def _shift_months(day, months):
+    """The same day of the month `months` away, clamped to that month's last day"""
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    return day.replace(year=year, month=month + 1, day=min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def period_range(period, today=None):
+    """(start, end) of the week or month to date"""
+    today = today or timezone.now().date()
+    if period == 'week':
+        return today - timedelta(days=today.weekday()), today
+    if period == 'month':
+        return today.replace(day=1), today
+    raise ValueError(f"Unknown period: {period}")
+
+
+def comparison_ranges(start_date, end_date, period='custom'):
+    """{'previous': (start, end), 'last_year': (start, end)} to compare a range against.
+
+    A week or month to date is compared with the same days of the week or
+    month before; a custom range with the equally long range just before it.
+    """
+    if period == 'week':
+        previous = (start_date - timedelta(days=7), end_date - timedelta(days=7))
+    elif period == 'month':
+        previous = (_shift_months(start_date, -1), _shift_months(end_date, -1))
+    else:
+        length = end_date - start_date + timedelta(days=1)
+        previous = (start_date - length, end_date - length)
+    return {
+        'previous': previous,
+        'last_year': (_shift_months(start_date, -12), _shift_months(end_date, -12)),
+    }
+
+
+def _change(current, baseline):
+    """Percent change, or None when there is nothing to compare against"""
+    if not baseline:
+        return None
+    return round(float(current - baseline) / float(abs(baseline)) * 100, 1)
+
+
+def period_comparison(start_date, end_date, period='custom'):
+    """Range totals for a period and for the periods it is compared with.
+
+    Every range is read from the SalesRunningTotal running sums, so the
+    cost does not depend on how long the ranges are.
+    """
+    from .models import SalesRunningTotal
+
+    current = SalesRunningTotal.range_totals(start_date, end_date)
+    result = {'current': {'start_date': start_date, 'end_date': end_date, 'totals': current}}
+    for name, (start, end) in comparison_ranges(start_date, end_date, period).items():
+        totals = SalesRunningTotal.range_totals(start, end)
+        result[name] = {
+            'start_date': start,
+            'end_date': end,
+            'totals': totals,
+            'change': {
+                metric: _change(current['ALL'][metric], totals['ALL'][metric])
+                for metric in SalesRunningTotal.COMBINED_METRICS
+            },
+        }
+    return result
@@ -0,0 +1,125 @@
+# search.py
+"""Customer lookup keys and ranked search.
+
+Phones are stored as digits only (phone_key) and reversed
+(phone_key_reversed) so both prefix and "last digits" lookups are index
+range scans. Names are split into CustomerNameToken rows for token-prefix
+matching. Prefix matches use >= / < ranges instead of LIKE so they stay on
+the index on every backend.
+"""
+import difflib
+import re
+import unicodedata
+
+from django.db.models import Case, IntegerField, When
+
+NAME_TOKEN_MAX_LENGTH = 50
+# Sorts after every character that can appear in a key
+RANGE_END = '\uffff'
+
+
+def normalize_phone(value):
+    """Digits only, without the 00 international prefix: '+252 63 400' -> '25263400'"""
+    digits = re.sub(r'\D', '', value or '')
+    if digits.startswith('00'):
+        digits = digits[2:]
+    return digits
+
+
+def normalize_name(value):
+    """Casefolded, accent-free, punctuation collapsed to single spaces"""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^\w]+', ' ', stripped.casefold()).split())
+
+
+def name_tokens(value):
+    return {token[:NAME_TOKEN_MAX_LENGTH] for token in normalize_name(value).split()}
+
+
+def prefix_filter(field, prefix):
+    return {f'{field}__gte': prefix, f'{field}__lt': prefix + RANGE_END}
+
+
+def ranked_customer_ids(query, limit=10):
+    """Customer ids matching `query`, best first.
+
+    Order: exact phone, phone prefix, phone suffix, name prefix, all name
+    tokens prefixed, then close spellings of the name tokens.
+    """
+    from .models import Customer, CustomerNameToken
+
+    ranked = []
+    seen = set()
+
+    def take(ids):
+        for customer_id in ids:
+            if len(ranked) >= limit:
+                break
+            if customer_id not in seen:
+                seen.add(customer_id)
+                ranked.append(customer_id)
+        return len(ranked) >= limit
+
+    def ids_of(queryset):
+        return queryset.values_list('id', flat=True)[:limit]
+
+    digits = normalize_phone(query)
+    if len(digits) >= 3:
+        if take(ids_of(Customer.objects.filter(phone_key=digits))):
+            return ranked
+        if take(ids_of(Customer.objects.filter(**prefix_filter('phone_key', digits)).order_by('phone_key'))):
+            return ranked
+        if take(ids_of(Customer.objects.filter(**prefix_filter('phone_key_reversed', digits[::-1])).order_by('phone_key_reversed'))):
+            return ranked
+
+    name = normalize_name(query)
+    terms = name.split()
+    # Phone-looking queries (no letters) never match names
+    if not terms or not any(char.isalpha() for char in name):
+        return ranked
+    if take(ids_of(Customer.objects.filter(**prefix_filter('name_key', name)).order_by('name_key'))):
+        return ranked
+
+    def customers_with_tokens(term_filters):
+        matching = None
+        for term_filter in term_filters:
+            ids = set(CustomerNameToken.objects.filter(**term_filter).values_list('customer_id', flat=True)[:limit * 50])
+            matching = ids if matching is None else matching & ids
+            if not matching:
+                return []
+        return sorted(matching)
+
+    if take(customers_with_tokens(prefix_filter('token', term) for term in terms)):
+        return ranked
+
+    # Typo tolerance: swap each term for close tokens sharing its first letter
+    fuzzy_filters = []
+    for term in terms:
+        candidates = CustomerNameToken.objects.filter(**prefix_filter('token', term[0])).values_list('token', flat=True).distinct()[:5000]
+        close = difflib.get_close_matches(term, list(candidates), n=5, cutoff=0.75)
+        if not close:
+            return ranked
+        fuzzy_filters.append({'token__in': close})
+    take(customers_with_tokens(fuzzy_filters))
+    return ranked
+
+
+def search_customers(query, limit=10, queryset=None):
+    """Customers matching `query` in rank order"""
+    from .models import Customer
+
+    ids = ranked_customer_ids(query, limit)
+    if queryset is None:
+        queryset = Customer.objects.all()
+    return queryset.filter(pk__in=ids).order_by(rank_ordering(ids))
+
+
+def rank_ordering(ids):
+    """Expression ordering rows in the order of `ids`"""
+    if not ids:
+        return 'pk'
+    return Case(
+        *[When(pk=customer_id, then=position) for position, customer_id in enumerate(ids)],
+        output_field=IntegerField(),
+    )
@@ -1,8 +1,18 @@
 # signals.py
+import threading
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.db.models import Sum
-from .models import Sale, SaleItem, Product, InventoryLog
+from . import live
+from .models import (
+    Sale, SaleItem, Product, InventoryLog,
+    Transaction, TransactionItem, TransactionPayment, SalesFact, SalesHour, SalesRunningTotal,
+    Category, CatalogTombstone, CatalogVersion, Customer, CurrencySettings, DataVersion,
+    SALE_MODELS, SALE_ITEM_MODELS, DEBT_PAYMENT_MODELS,
+)
 
 @receiver(post_save, sender=SaleItem)
 def update_sale_total_on_item_save(sender, instance, **kwargs):
@@ -18,4 +28,203 @@ def update_customer_last_purchase(sender, instance, **kwargs):
     """Update customer's last purchase date"""
     if instance.customer and instance.date_created:
         instance.customer.last_purchase_date = instance.date_created
-        instance.customer.save()
\ No newline at end of file
+        instance.customer.save()
+
+
+# === Unified ledger sync ===
+# The per-currency tables remain the write model; every save/delete is
+# mirrored into Transaction/TransactionItem/TransactionPayment, which are
+# derived and read-only. Queryset update() and raw SQL skip these signals;
+# `manage.py reconcile_ledger` reports the drift and --fix re-syncs it.
+
+def _connect_ledger_sync(source, sale_model, item_model, payment_model):
+    def sync_sale(sender, instance, raw=False, **kwargs):
+        if not raw:
+            Transaction.sync_from_sale(instance, source)
+
+    def delete_sale(sender, instance, **kwargs):
+        Transaction.objects.filter(source=source, source_id=instance.pk).delete()
+
+    def sync_item(sender, instance, raw=False, **kwargs):
+        if not raw:
+            TransactionItem.sync_from_item(instance, source)
+
+    def delete_item(sender, instance, **kwargs):
+        TransactionItem.objects.filter(
+            transaction__source=source,
+            transaction__source_id=instance.sale_id,
+            source_item_id=instance.pk,
+        ).delete()
+
+    def sync_payment(sender, instance, raw=False, **kwargs):
+        if not raw:
+            TransactionPayment.sync_from_payment(instance, source)
+
+    def delete_payment(sender, instance, **kwargs):
+        TransactionPayment.objects.filter(source=source, source_id=instance.pk).delete()
+
+    uid = f'ledger_sync_{source}'
+    post_save.connect(sync_sale, sender=sale_model, weak=False, dispatch_uid=f'{uid}_sale')
+    post_delete.connect(delete_sale, sender=sale_model, weak=False, dispatch_uid=f'{uid}_sale')
+    post_save.connect(sync_item, sender=item_model, weak=False, dispatch_uid=f'{uid}_item')
+    post_delete.connect(delete_item, sender=item_model, weak=False, dispatch_uid=f'{uid}_item')
+    post_save.connect(sync_payment, sender=payment_model, weak=False, dispatch_uid=f'{uid}_payment')
+    post_delete.connect(delete_payment, sender=payment_model, weak=False, dispatch_uid=f'{uid}_payment')
+
+
+for _source in SALE_MODELS:
+    _connect_ledger_sync(
+        _source, SALE_MODELS[_source], SALE_ITEM_MODELS[_source], DEBT_PAYMENT_MODELS[_source]
+    )
+
+
+# === Sales rollups ===
+# A sale write touches its rollup cells once per item and again for the
+# sale itself. The cells are collected per thread and recomputed once when
+# the transaction commits (right away outside a transaction).
+
+class _RollupRefresh:
+    """Rollup cells touched since the last refresh"""
+
+    def __init__(self):
+        self.fact_cells = {}
+        self.days = set()
+        self.hours = set()
+
+    def add(self, currency, moment, product_ids=()):
+        day = moment.date()
+        self.fact_cells.setdefault((day, currency), set()).update(product_ids)
+        self.days.add((day, currency))
+        self.hours.add((moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0), currency))
+
+    def __call__(self):
+        for (day, currency), product_ids in sorted(self.fact_cells.items()):
+            SalesFact.refresh_cells(day, currency, product_ids)
+        # Running totals read their item figures from the cube, so they follow it
+        for day, currency in sorted(self.days):
+            SalesRunningTotal.refresh_day(day, currency)
+        for hour, currency in sorted(self.hours):
+            SalesHour.refresh_hour(hour, currency)
+        # Only now, so a widget never caches rollups from before this write under a newer ETag
+        DataVersion.bump('rollups')
+
+
+_pending_rollups = threading.local()
+
+
+def _flush_rollups():
+    # Every write registers this; the first to run takes the batch and the rest find it gone
+    refresh = getattr(_pending_rollups, 'batch', None)
+    _pending_rollups.batch = None
+    if refresh is not None:
+        refresh()
+
+
+def _refresh_on_commit(currency, moment, product_ids=()):
+    if not transaction.get_connection().in_atomic_block:
+        refresh = _RollupRefresh()
+        refresh.add(currency, moment, product_ids)
+        refresh()
+        return
+    refresh = getattr(_pending_rollups, 'batch', None)
+    if refresh is None:
+        refresh = _pending_rollups.batch = _RollupRefresh()
+    refresh.add(currency, moment, product_ids)
+    # Registered per write, not per batch: a rolled back savepoint drops its
+    # own callbacks, and its cells are then refreshed by a later one (a
+    # refresh recomputes from the sale tables, so extra cells are harmless)
+    transaction.on_commit(_flush_rollups)
+
+
+def _connect_rollup_sync(currency, sale_model, item_model):
+    def refresh_for_item(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        sale = sale_model.objects.filter(pk=instance.sale_id).only('date_created').first()
+        if sale is None or sale.date_created is None:
+            return
+        _refresh_on_commit(currency, sale.date_created, [instance.product_id])
+
+    def refresh_for_sale(sender, instance, raw=False, **kwargs):
+        # Attribution (user, rate) and the header figures live on the sale
+        if raw or instance.date_created is None:
+            return
+        _refresh_on_commit(currency, instance.date_created, instance.items.values_list('product_id', flat=True))
+
+    def refresh_for_removed_sale(sender, instance, **kwargs):
+        # The items went first (with their own refresh); only the header figures remain
+        if instance.date_created is not None:
+            _refresh_on_commit(currency, instance.date_created)
+
+    uid = f'rollup_sync_{currency}'
+    post_save.connect(refresh_for_item, sender=item_model, weak=False, dispatch_uid=f'{uid}_item')
+    post_delete.connect(refresh_for_item, sender=item_model, weak=False, dispatch_uid=f'{uid}_item')
+    post_save.connect(refresh_for_sale, sender=sale_model, weak=False, dispatch_uid=f'{uid}_sale')
+    post_delete.connect(refresh_for_removed_sale, sender=sale_model, weak=False, dispatch_uid=f'{uid}_sale')
+
+
+for _currency in ('USD', 'SOS', 'ETB'):
+    _connect_rollup_sync(_currency, SALE_MODELS[_currency], SALE_ITEM_MODELS[_currency])
+
+
+# === Catalog delta sync ===
+# Saves stamp catalog_version on the row itself; deletes leave a tombstone.
+
+def _connect_catalog_tombstones(object_type, model):
+    def record_tombstone(sender, instance, **kwargs):
+        CatalogTombstone.objects.create(
+            object_type=object_type, object_id=instance.pk, catalog_version=CatalogVersion.bump(),
+        )
+
+    post_delete.connect(record_tombstone, sender=model, weak=False, dispatch_uid=f'catalog_tombstone_{object_type}')
+
+
+_connect_catalog_tombstones('product', Product)
+_connect_catalog_tombstones('category', Category)
+
+
+# === Live dashboard ===
+# Deltas are pushed to open dashboards after commit; nothing is built
+# while no dashboard is connected.
+
+@receiver(post_save, sender=Transaction)
+def publish_sale_delta(sender, instance, raw=False, **kwargs):
+    if not raw and instance.source != 'Legacy':
+        live.publish_on_commit(lambda: live.sale_delta(instance))
+
+
+@receiver(post_delete, sender=Transaction)
+def publish_sale_removal(sender, instance, **kwargs):
+    if instance.source != 'Legacy':
+        live.publish_on_commit(lambda: live.sale_delta(instance, deleted=True))
+
+
+@receiver(post_save, sender=TransactionPayment)
+def publish_payment(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        live.publish_on_commit(lambda: live.payment_event(instance))
+
+
+@receiver(post_save, sender=InventoryLog)
+def publish_stock_alert(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        live.publish_on_commit(lambda: live.stock_alert(instance))
+
+
+# === Dashboard data versions ===
+# Any write that can change a dashboard widget bumps the counter its ETag uses.
+
+def _connect_data_version(key, model):
+    def bump(sender, raw=False, **kwargs):
+        if not raw:
+            DataVersion.bump(key)
+
+    post_save.connect(bump, sender=model, weak=False, dispatch_uid=f'data_version_{key}_{model.__name__}')
+    post_delete.connect(bump, sender=model, weak=False, dispatch_uid=f'data_version_{key}_{model.__name__}')
+
+
+for _model in (Transaction, TransactionItem):
+    _connect_data_version('sales', _model)
+for _model in (Customer, TransactionPayment):
+    _connect_data_version('debt', _model)
+_connect_data_version('settings', CurrencySettings)
@@ -0,0 +1,268 @@
+# stock_import.py
+"""Bulk restock and product import from a CSV or JSON manifest.
+
+Every row is validated before anything is written. The manifest then
+applies in one transaction: new products with bulk_create, field changes
+with bulk_update, stock as a single F() increment, one InventoryLog per
+restocked row and one summarizing AuditLog entry.
+
+A row names an existing product by `id`, or by `brand` + `name`
+(case-insensitive). Otherwise it creates one, which needs name, brand,
+category (id or name), purchase_price and selling_price. `quantity` is
+added to stock; the other columns overwrite the product when present.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+MAX_MANIFEST_ROWS = 5000
+DECIMAL_FIELDS = ['purchase_price', 'selling_price', 'low_stock_threshold', 'minimum_sale_length']
+UPDATABLE_FIELDS = DECIMAL_FIELDS + ['selling_unit', 'is_active', 'category']
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off'}
+
+
+class ManifestError(ValueError):
+    """The manifest itself could not be read"""
+
+
+def parse_manifest(content, file_format=None):
+    """Rows (dicts) from CSV or JSON text; JSON may be a list or {"rows": [...]}"""
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if file_format is None:
+        file_format = 'json' if content.lstrip()[:1] in ('[', '{') else 'csv'
+    if file_format == 'json':
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise ManifestError(f'Invalid JSON: {e}')
+        rows = data.get('rows') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ManifestError('JSON manifest must be a list of objects')
+    elif file_format == 'csv':
+        rows = list(csv.DictReader(io.StringIO(content)))
+    else:
+        raise ManifestError(f'Unsupported format: {file_format}')
+    if not rows:
+        raise ManifestError('Manifest has no rows')
+    if len(rows) > MAX_MANIFEST_ROWS:
+        raise ManifestError(f'Manifest has {len(rows)} rows; the limit is {MAX_MANIFEST_ROWS}')
+    return [{str(key).strip().lower(): value for key, value in row.items() if key is not None} for row in rows]
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def validate_manifest(rows):
+    """Match and validate rows without writing.
+
+    Returns (plan, errors). `plan` holds one dict per row with the matched
+    product (or None for a new one), the quantity and the field values;
+    `errors` is [{'row': n, 'errors': [...]}] with 1-based row numbers.
+    """
+    from .models import Category, Product
+
+    ids = set()
+    for row in rows:
+        if _clean(row.get('id')).isdigit():
+            ids.add(int(_clean(row['id'])))
+    by_id = Product.objects.in_bulk(ids)
+    by_name = {
+        (product.brand.strip().lower(), product.name.strip().lower()): product
+        for product in Product.objects.annotate(name_lower=Lower('name')).filter(
+            name_lower__in={_clean(row.get('name')).lower() for row in rows if _clean(row.get('name'))}
+        )
+    }
+    categories_by_id = {}
+    categories_by_name = {}
+    for category in Category.objects.all():
+        categories_by_id[str(category.id)] = category
+        categories_by_name[category.name.strip().lower()] = category
+
+    plan = []
+    errors = []
+    seen = {}
+    for number, row in enumerate(rows, start=1):
+        row_errors = []
+        product = None
+        raw_id = _clean(row.get('id'))
+        name = _clean(row.get('name'))
+        brand = _clean(row.get('brand'))
+        if raw_id:
+            product = by_id.get(int(raw_id)) if raw_id.isdigit() else None
+            if product is None:
+                row_errors.append(f'Unknown product id {raw_id}')
+        elif name and brand:
+            product = by_name.get((brand.lower(), name.lower()))
+
+        fields = {}
+        if name:
+            fields['name'] = name
+        if brand:
+            fields['brand'] = brand
+        for field in DECIMAL_FIELDS:
+            value = _clean(row.get(field))
+            if value:
+                try:
+                    fields[field] = Decimal(value)
+                except InvalidOperation:
+                    row_errors.append(f'{field} is not a number: {value}')
+                    continue
+                if fields[field] < 0:
+                    row_errors.append(f'{field} cannot be negative')
+        unit = _clean(row.get('selling_unit')).upper()
+        if unit:
+            if unit in dict(Product.UNIT_CHOICES):
+                fields['selling_unit'] = unit
+            else:
+                row_errors.append(f'selling_unit must be UNIT or METER, not {unit}')
+        active = _clean(row.get('is_active')).lower()
+        if active:
+            if active in TRUE_VALUES | FALSE_VALUES:
+                fields['is_active'] = active in TRUE_VALUES
+            else:
+                row_errors.append(f'is_active must be true or false, not {active}')
+        category_value = _clean(row.get('category'))
+        if category_value:
+            category = categories_by_id.get(category_value) or categories_by_name.get(category_value.lower())
+            if category is None:
+                row_errors.append(f'Unknown category {category_value}')
+            else:
+                fields['category'] = category
+
+        quantity = Decimal('0')
+        raw_quantity = _clean(row.get('quantity'))
+        if raw_quantity:
+            try:
+                quantity = Decimal(raw_quantity)
+            except InvalidOperation:
+                row_errors.append(f'quantity is not a number: {raw_quantity}')
+            else:
+                if quantity < 0:
+                    row_errors.append('quantity cannot be negative')
+
+        if product is None and not raw_id:
+            missing = [field for field in ('name', 'brand', 'category', 'purchase_price', 'selling_price') if field not in fields]
+            if missing and not row_errors:
+                row_errors.append(f"New product needs {', '.join(missing)}")
+
+        if not row_errors:
+            key = product.pk if product is not None else (brand.lower(), name.lower())
+            if key in seen:
+                row_errors.append(f'Same product as row {seen[key]}')
+            else:
+                seen[key] = number
+
+        if row_errors:
+            errors.append({'row': number, 'errors': row_errors})
+        else:
+            plan.append({'row': number, 'product': product, 'quantity': quantity, 'fields': fields})
+    return plan, errors
+
+
+def apply_manifest(plan, user=None, ip_address=None, notes=''):
+    """Write a validated plan in one transaction; returns a summary dict"""
+    from .models import AuditLog, CatalogVersion, InventoryLog, Product, ProductPrice
+
+    with transaction.atomic():
+        version = CatalogVersion.bump()
+        now = timezone.now()
+
+        new_rows = [entry for entry in plan if entry['product'] is None]
+        created = Product.objects.bulk_create([
+            Product(catalog_version=version, current_stock=entry['quantity'], **entry['fields'])
+            for entry in new_rows
+        ])
+        for entry, product in zip(new_rows, created):
+            entry['product'] = product
+            entry['created'] = True
+
+        changed = []
+        changed_fields = {'catalog_version', 'date_updated'}
+        repriced = []
+        for entry in plan:
+            if entry.get('created'):
+                continue
+            product = entry['product']
+            updates = {field: value for field, value in entry['fields'].items()
+                       if field in UPDATABLE_FIELDS + ['name', 'brand'] and getattr(product, field) != value}
+            if not updates:
+                continue
+            for field, value in updates.items():
+                setattr(product, field, value)
+            if 'purchase_price' in updates or 'selling_price' in updates:
+                repriced.append(product)
+            product.catalog_version = version
+            product.date_updated = now
+            changed_fields.update(updates)
+            changed.append(product)
+        if changed:
+            Product.objects.bulk_update(changed, sorted(changed_fields))
+
+        restocks = {entry['product'].pk: entry['quantity'] for entry in plan
+                    if not entry.get('created') and entry['quantity'] > 0}
+        if restocks:
+            Product.objects.filter(pk__in=restocks).update(
+                current_stock=F('current_stock') + Case(
+                    *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in restocks.items()],
+                    output_field=models.DecimalField(max_digits=10, decimal_places=2),
+                ),
+                catalog_version=version,
+                date_updated=now,
+            )
+        # Read back after the increment so old/new reflect concurrent sales too
+        stock = dict(Product.objects.filter(pk__in=[entry['product'].pk for entry in plan]).values_list('id', 'current_stock'))
+
+        logs = []
+        for entry in plan:
+            if entry['quantity'] <= 0:
+                continue
+            new_quantity = stock[entry['product'].pk]
+            logs.append(InventoryLog(
+                product=entry['product'],
+                action='RESTOCK',
+                quantity_change=entry['quantity'],
+                old_quantity=new_quantity - entry['quantity'],
+                new_quantity=new_quantity,
+                user=user,
+                notes=notes or 'Bulk import',
+            ))
+        InventoryLog.objects.bulk_create(logs)
+
+        if created or repriced:
+            ProductPrice.rebuild(products=created + repriced)
+
+        summary = {
+            'created': len(created),
+            'updated': len(changed),
+            'restocked': len(logs),
+            'units': sum((log.quantity_change for log in logs), Decimal('0')),
+        }
+        AuditLog.objects.create(
+            user=user,
+            action='BULK_RESTOCK',
+            object_type='Product',
+            object_id=str(len(plan)),
+            details=(
+                f"Bulk import of {len(plan)} row(s): {summary['created']} created, {summary['updated']} updated, "
+                f"{summary['restocked']} restocked (+{summary['units']} units)" + (f'. Notes: {notes}' if notes else '')
+            ),
+            ip_address=ip_address,
+        )
+
+    summary['rows'] = [
+        {'row': entry['row'], 'product_id': entry['product'].pk, 'created': bool(entry.get('created')),
+         'current_stock': stock[entry['product'].pk]}
+        for entry in plan
+    ]
+    return summary
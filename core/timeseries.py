@@ -0,0 +1,158 @@
+# timeseries.py
+"""Sales time series for the charts, downsampled on the server.
+
+Daily points are read from the SalesRunningTotal day rows and hourly ones
+from the SalesHour rollup, so a long range is one grouped query over a few
+rows per day or hour. Either way the series is cut to a point budget with
+Largest-Triangle-Three-Buckets before it is sent, so the phone draws a few
+hundred points whatever the range.
+
+The heatmap averages the hourly rollup by weekday and hour of day on the
+shop's clock (settings.SHOP_TIME_ZONE).
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+
+from .reports import date_bounds
+
+SERIES = ('revenue', 'collected', 'profit', 'debt')
+# Series only superusers may see
+RESTRICTED_SERIES = ('profit',)
+INTERVALS = ('day', 'hour')
+DEFAULT_POINTS = 300
+MAX_POINTS = 2000
+MAX_DAILY_DAYS = 366 * 10
+MAX_HOURLY_DAYS = 366
+HEATMAP_METRICS = ('sales_count', 'revenue_usd', 'quantity')
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+ZERO = Decimal('0.00')
+
+
+def lttb(values, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps from evenly spaced `values`.
+
+    The first and last points are always kept; every bucket in between
+    keeps the point forming the largest triangle with the previously kept
+    point and the average of the next bucket, which preserves peaks and
+    dips that plain averaging would flatten.
+    """
+    count = len(values)
+    if threshold >= count or threshold < 3:
+        return list(range(count))
+    kept = [0]
+    bucket_size = (count - 2) / (threshold - 2)
+    anchor = 0
+    for bucket in range(threshold - 2):
+        # Average of the next bucket (the last point for the final bucket)
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = sum(values[next_start:next_end]) / (next_end - next_start)
+
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        anchor_y = values[anchor]
+        best, best_area = start, -1.0
+        for index in range(start, end):
+            area = abs((anchor - avg_x) * (values[index] - anchor_y) - (anchor - index) * (avg_y - anchor_y))
+            if area > best_area:
+                best, best_area = index, area
+        kept.append(best)
+        anchor = best
+    kept.append(count - 1)
+    return kept
+
+
+def _daily_points(start_date, end_date):
+    """{day: {series: USD value}} from the running-total day rows"""
+    from .models import SalesRunningTotal
+
+    rows = SalesRunningTotal.objects.filter(day__gte=start_date, day__lte=end_date).values('day').annotate(
+        revenue=Sum('total_amount_usd'), collected=Sum('amount_paid_usd'),
+        profit=Sum('profit_usd'), debt=Sum('debt_amount_usd'),
+    ).order_by()
+    return {row['day']: {name: row[name] or ZERO for name in SERIES} for row in rows}
+
+
+def _hourly_points(start_date, end_date):
+    """{hour: {series: USD value}} from the hourly rollup"""
+    from .models import SalesHour
+
+    start, end = date_bounds(start_date, end_date)
+    rows = SalesHour.objects.filter(hour__gte=start, hour__lt=end).values('hour').annotate(
+        revenue=Sum('revenue_usd'), collected=Sum('amount_paid_usd'), debt=Sum('debt_amount_usd'), cost=Sum('cost_usd'),
+    ).order_by()
+    return {
+        row['hour']: {
+            'revenue': row['revenue'] or ZERO, 'collected': row['collected'] or ZERO, 'debt': row['debt'] or ZERO,
+            'profit': (row['revenue'] or ZERO) - (row['cost'] or ZERO),
+        }
+        for row in rows
+    }
+
+
+def sales_series(start_date, end_date, interval='day', series=SERIES, points=DEFAULT_POINTS, rate=Decimal('1')):
+    """{'raw_points': n, 'series': {name: [(timestamp, value), ...]}} for a date range.
+
+    Every day (or hour) of the range is a point, zero when nothing was sold;
+    each series is then downsampled to `points` on its own. Values are USD
+    multiplied by `rate`.
+    """
+    if interval == 'hour':
+        data = _hourly_points(start_date, end_date)
+        first, _ = date_bounds(start_date, end_date)
+        steps = ((end_date - start_date).days + 1) * 24
+        stamps = [first + timedelta(hours=step) for step in range(steps)]
+    else:
+        data = _daily_points(start_date, end_date)
+        stamps = [start_date + timedelta(days=step) for step in range((end_date - start_date).days + 1)]
+
+    result = {}
+    for name in series:
+        values = [float((data[stamp][name] if stamp in data else ZERO) * rate) for stamp in stamps]
+        result[name] = [(stamps[index], round(values[index], 2)) for index in lttb(values, points)]
+    return {'raw_points': len(stamps), 'series': result}
+
+
+def shop_time_zone():
+    return ZoneInfo(settings.SHOP_TIME_ZONE)
+
+
+def sales_heatmap(start_date, end_date, metric='sales_count'):
+    """Average `metric` per weekday and hour of day, on the shop's clock, over a date range.
+
+    Returns {'cells': 7 rows (Monday first) of 24 averages, 'max', 'days',
+    'time_zone'}.
+    Each cell is the metric's total for that weekday and hour divided by
+    how many of that weekday the range holds, so quiet days count as zero.
+    Hours are the rollup's UTC hours moved to local time, which is exact
+    for zones whose offset is a whole number of hours.
+    """
+    from .models import SalesHour
+
+    zone = shop_time_zone()
+    start = datetime.combine(start_date, time.min, tzinfo=zone)
+    end = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=zone)
+    totals = SalesHour.objects.filter(hour__gte=start, hour__lt=end).annotate(
+        weekday=ExtractIsoWeekDay('hour', tzinfo=zone), local_hour=ExtractHour('hour', tzinfo=zone),
+    ).values('weekday', 'local_hour').annotate(total=Sum(metric)).values_list('weekday', 'local_hour', 'total').order_by()
+
+    weekday_counts = [0] * 7
+    for offset in range((end_date - start_date).days + 1):
+        weekday_counts[(start_date + timedelta(days=offset)).weekday()] += 1
+    cells = [[0.0] * 24 for _ in range(7)]
+    for weekday, hour, total in totals:
+        if weekday_counts[weekday - 1]:
+            cells[weekday - 1][hour] = round(float(total or 0) / weekday_counts[weekday - 1], 2)
+    return {
+        'cells': cells,
+        'max': max(max(row) for row in cells),
+        'days': sum(weekday_counts),
+        'time_zone': settings.SHOP_TIME_ZONE,
+    }
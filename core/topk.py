@@ -0,0 +1,66 @@
+# topk.py
+"""Best-seller rankings over a recent window.
+
+Rankings read the ProductSalesDay rows, which hold one running counter
+per product and day for the last ProductSalesDay.WINDOW_DAYS and are kept
+current as sales are written. A ranking adds up at most that many days per
+product in one grouped query and keeps the best `k` with a heap, so it
+never touches the sale item tables.
+"""
+import heapq
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+
+RANKINGS = {'quantity': 'quantity', 'revenue': 'revenue_usd'}
+MAX_K = 50
+
+
+def _window_rows(days, **filters):
+    from .models import ProductSalesDay
+
+    days = min(max(int(days), 1), ProductSalesDay.WINDOW_DAYS)
+    # `days` days including today
+    since = timezone.now().date() - timedelta(days=days - 1)
+    return ProductSalesDay.objects.filter(day__gte=since, **filters)
+
+
+def _top(rows, k, by):
+    if by not in RANKINGS:
+        raise ValueError(f"Rank by one of {', '.join(RANKINGS)}")
+    field = RANKINGS[by]
+    return heapq.nlargest(min(max(int(k), 1), MAX_K), rows, key=lambda row: (row[field] or Decimal('0'), row['quantity'] or Decimal('0')))
+
+
+def top_products(k=5, days=7, by='quantity', category_id=None):
+    """[{'product', 'quantity', 'revenue_usd'}] for the best `k` products of the last `days` days"""
+    from .models import Product
+
+    filters = {'category_id': category_id} if category_id else {}
+    rows = _window_rows(days, **filters).values('product_id').annotate(
+        quantity=Sum('quantity'), revenue_usd=Sum('revenue_usd'),
+    ).order_by()
+    best = _top(rows, k, by)
+    products = Product.objects.select_related('category').in_bulk([row['product_id'] for row in best])
+    return [
+        {'product': products[row['product_id']], 'quantity': row['quantity'], 'revenue_usd': row['revenue_usd']}
+        for row in best
+        if row['product_id'] in products
+    ]
+
+
+def top_categories(k=5, days=7, by='quantity'):
+    """[{'category', 'quantity', 'revenue_usd'}] for the best `k` categories; category is None for uncategorized sales"""
+    from .models import Category
+
+    rows = _window_rows(days).values('category_id').annotate(
+        quantity=Sum('quantity'), revenue_usd=Sum('revenue_usd'),
+    ).order_by()
+    best = _top(rows, k, by)
+    categories = Category.objects.in_bulk([row['category_id'] for row in best if row['category_id']])
+    return [
+        {'category': categories.get(row['category_id']), 'quantity': row['quantity'], 'revenue_usd': row['revenue_usd']}
+        for row in best
+    ]
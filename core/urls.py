@@ -9,6 +9,8 @@ urlpatterns = [
     
     # Dashboard
     path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('dashboard/events/', views.dashboard_events, name='dashboard_events'),
+    path('api/dashboard/<str:widget>/', views.api_dashboard_widget, name='api_dashboard_widget'),
     
     # Sales
     path('sales/', views.sales_list, name='sales_list'),
@@ -21,6 +23,12 @@ urlpatterns = [
     # Inventory
     path('inventory/', views.inventory_list, name='inventory_list'),
     path('restock-inventory/', views.restock_inventory, name='restock_inventory'),
+    path('api/bulk-restock/', views.api_bulk_restock, name='api_bulk_restock'),
+    path('day-closes/', views.daily_closes, name='daily_closes'),
+    path('stock-takes/', views.stock_takes_list, name='stock_takes_list'),
+    path('stock-takes/<int:stock_take_id>/', views.stock_take_detail, name='stock_take_detail'),
+    path('stock-takes/<int:stock_take_id>/post/', views.stock_take_post, name='stock_take_post'),
+    path('api/stock-takes/<int:stock_take_id>/counts/', views.api_stock_take_counts, name='api_stock_take_counts'),
     
     # Customers
     path('customers/', views.customers_list, name='customers_list'),
@@ -33,6 +41,12 @@ urlpatterns = [
     # New Features: Sales History, Revenue Details, Customer Debt Management
     path('sales-history/', views.sales_history_view, name='sales_history'),
     path('revenue-details/', views.revenue_details_view, name='revenue_details'),
+    path('sales-heatmap/', views.sales_heatmap_view, name='sales_heatmap'),
+    path('api/revenue-details/<int:product_id>/lines/', views.api_revenue_product_lines, name='api_revenue_product_lines'),
+    path('api/sales-totals/', views.api_sales_totals, name='api_sales_totals'),
+    path('api/sales-series/', views.api_sales_series, name='api_sales_series'),
+    path('api/sales-heatmap/', views.api_sales_heatmap, name='api_sales_heatmap'),
+    path('api/top-sellers/', views.api_top_sellers, name='api_top_sellers'),
     path('customers-debt/', views.customers_debt_view, name='customers_debt'),
     
     # Settings
@@ -40,13 +54,22 @@ urlpatterns = [
     
     # API Endpoints for mobile interface
     path('api/search-products/', views.api_search_products, name='api_search_products'),
+    path('api/catalog/', views.api_catalog, name='api_catalog'),
+    path('api/scan/<str:code>/', views.api_scan, name='api_scan'),
     path('api/search-customers/', views.api_search_customers, name='api_search_customers'),
+    path('api/customers/lookup/', views.api_customer_lookup, name='api_customer_lookup'),
     path('api/create-customer/', views.api_create_customer, name='api_create_customer'),
     path('api/create-product/', views.api_create_product, name='api_create_product'),
+    path('api/sync-sales/', views.api_sync_sales, name='api_sync_sales'),
     path('api/product/<int:product_id>/', views.api_get_product_details, name='api_get_product_details'),
     path('api/product/<int:product_id>/update/', views.api_update_product, name='api_update_product'),
     path('api/product/<int:product_id>/delete/', views.api_delete_product, name='api_delete_product'),
     path('detailed-transaction-report/', views.detailed_transaction_report, name='detailed_transaction_report'),
+    
+    # Background jobs
+    path('jobs/', views.jobs_list, name='jobs_list'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
+    path('api/jobs/<int:job_id>/', views.api_job_status, name='api_job_status'),
 
     
     # Debug
@@ -1,29 +1,50 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_http_methods
 from django.contrib import messages
-from django.http import JsonResponse, Http404
-from django.db.models import Sum, Count, Q, F
-from django.db.models.functions import Coalesce
+from django.http import JsonResponse, Http404, FileResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http.request import RawPostDataException
+from django.db.models import Sum, Count, Q, F, Prefetch, Case, When, Value, ExpressionWrapper
+from django.db.models.functions import Coalesce, TruncDate
 from django.core.paginator import Paginator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from django.db import transaction
+from django.db import IntegrityError, models, transaction
 from datetime import datetime, timedelta
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from functools import wraps
+import base64
+import hashlib
 import json
+import os
+import time
+import uuid
 import traceback
 from .models import *
 from .forms import *
+from . import dashboard, live, timeseries, topk
+from .barcodes import lookup_code
+from .closes import DayClosedError, apply_closed_days, check_day_open, close_day, is_closed, period_summary
+from .jobs import JOB_LABELS, enqueue
+from .reports import (
+    COMPARISON_PERIODS, REPORT_CURRENCIES, period_comparison, period_range, product_sale_lines,
+    transaction_report_page, transaction_report_totals,
+)
+from .search import rank_ordering, ranked_customer_ids
+from .stock_import import ManifestError, apply_manifest, parse_manifest, validate_manifest
 from .models import SaleItemUSD, SaleItemSOS, SaleItemETB, Product, CurrencySettings # Import the necessary models
 @login_required
 def detailed_transaction_report(request):
     """
     Displays a detailed report of all sales transactions.
     Shows customer, product, quantity, selling price, purchase price, profit, currency, and date/time.
-    Calculates profit based on actual selling price vs purchase price at the time of sale.
+    Calculates profit based on actual selling price vs the purchase price snapshotted on the item at sale time.
     Allocates transaction-level overpayment to items proportionally and shows final profit.
+    Rows and totals are computed in SQL (see core.reports); rows are paged with an `after` cursor.
     """
     # Get filter parameters from the request
     days = int(request.GET.get('days', 7))  # Default to last 7 days
@@ -44,265 +65,34 @@ def detailed_transaction_report(request):
             # Handle invalid date format if necessary, maybe show an error message
             pass # Or set a default date range
 
-    # Get currency settings for potential conversions (though we'll keep original currency for this report)
-    currency_settings = CurrencySettings.objects.first()
-    # Use default rates if settings not found
-    current_usd_to_etb_rate = currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00')
-    current_usd_to_sos_rate = currency_settings.usd_to_sos_rate if currency_settings else Decimal('8000.00')
-
-    # Build querysets for each currency type
-    base_filters = {
-        'date_created__date__gte': start_date,
-        'date_created__date__lte': end_date,
-    }
-
-    # --- USD Sales (Fetch the sale objects first to get amount_paid and total_amount) ---
-    usd_sales = SaleUSD.objects.filter(**base_filters).select_related(
-        'customer'
-    ).prefetch_related('items__product').order_by('-date_created')
-
-    if product_filter:
-        # Filter sales containing the product, then process items later
-        usd_sales = usd_sales.filter(items__product_id=product_filter)
-
-    if currency_filter and currency_filter != 'ALL':
-        if currency_filter != 'USD':
-             usd_sales = usd_sales.none()
-
-    # --- SOS Sales ---
-    sos_sales = SaleSOS.objects.filter(**base_filters).select_related(
-        'customer'
-    ).prefetch_related('items__product').order_by('-date_created')
-
-    if product_filter:
-         sos_sales = sos_sales.filter(items__product_id=product_filter)
-
-    if currency_filter and currency_filter != 'ALL':
-         if currency_filter != 'SOS':
-             sos_sales = sos_sales.none()
-
-    # --- ETB Sales ---
-    etb_sales = SaleETB.objects.filter(**base_filters).select_related(
-        'customer'
-    ).prefetch_related('items__product').order_by('-date_created')
-
-    if product_filter:
-         etb_sales = etb_sales.filter(items__product_id=product_filter)
-
+    currencies = REPORT_CURRENCIES
     if currency_filter and currency_filter != 'ALL':
-         if currency_filter != 'ETB':
-             etb_sales = etb_sales.none()
-
-    # Combine and format data for the template
-    transaction_data = []
-
-    # Process USD sales
-    for sale in usd_sales:
-        # If product filter was applied at the sale level, items are already filtered implicitly by prefetch_related
-        # Otherwise, get all items for the sale
-        items = list(sale.items.all())
-
-        # Calculate transaction-level overpayment
-        overpayment = max(Decimal('0.00'), sale.amount_paid - sale.total_amount)
-        total_items_value = sale.total_amount
-
-        for item in items:
-            # Calculate item-level profit and surplus
-            profit_per_unit = item.unit_price - item.product.purchase_price
-            profit = profit_per_unit * item.quantity
-            surplus_per_unit = item.unit_price - item.product.selling_price
-            surplus = surplus_per_unit * item.quantity if surplus_per_unit > 0 else Decimal('0.00')
-
-            # Allocate overpayment proportionally to this item's value
-            item_overpayment = Decimal('0.00')
-            if total_items_value > 0:
-                 item_overpayment = (item.total_price / total_items_value) * overpayment
-
-            # Final profit includes item profit + allocated overpayment
-            final_profit = profit + item_overpayment
-
-            # Calculate item profit WITHOUT overpayment (for the template condition)
-            item_profit_without_overpayment = profit
-
-            transaction_data.append({
-                'customer_name': sale.customer.name if sale.customer else "Walk-in Customer",
-                'customer_phone': sale.customer.phone if sale.customer else "",
-                'product_name': item.product.name,
-                'product_brand': item.product.brand,
-                'quantity': item.quantity,
-                'unit_price_sold': item.unit_price,
-                'unit_purchase_price': item.product.purchase_price,
-                'unit_minimum_selling_price': item.product.selling_price,
-                'total_sale_amount': item.total_price, # unit_price_sold * quantity
-                'profit': final_profit, # Includes item profit + allocated overpayment
-                'item_profit_without_overpayment': item_profit_without_overpayment, # Add this new key
-                'surplus': surplus,
-                'allocated_overpayment': item_overpayment,
-                'currency': 'USD',
-                'sale_date': sale.date_created,
-                'transaction_id': sale.transaction_id,
-                'sale_amount_paid': sale.amount_paid, # Total amount paid for the entire sale
-                'sale_total_amount': sale.total_amount, # Original total amount of the sale
-            })
-
-    # Process SOS sales
-    for sale in sos_sales:
-        items = list(sale.items.all())
-
-        # Calculate transaction-level overpayment in SOS
-        overpayment = max(Decimal('0.00'), sale.amount_paid - sale.total_amount)
-        total_items_value = sale.total_amount
-
-        for item in items:
-            # Calculate item-level profit and surplus in SOS
-            # Convert purchase price to SOS using CURRENT rate (as proxy for sale time)
-            purchase_price_in_sos_current = item.product.purchase_price * current_usd_to_sos_rate
-            profit_per_unit_sos = item.unit_price - purchase_price_in_sos_current
-            profit = profit_per_unit_sos * item.quantity
-
-            # Convert minimum selling price to SOS using CURRENT rate
-            minimum_selling_price_in_sos_current = item.product.selling_price * current_usd_to_sos_rate
-            surplus_per_unit_sos = item.unit_price - minimum_selling_price_in_sos_current
-            surplus = surplus_per_unit_sos * item.quantity if surplus_per_unit_sos > 0 else Decimal('0.00')
-
-            # Allocate overpayment proportionally to this item's value
-            item_overpayment = Decimal('0.00')
-            if total_items_value > 0:
-                 item_overpayment = (item.total_price / total_items_value) * overpayment
-
-            # Final profit includes item profit + allocated overpayment
-            final_profit = profit + item_overpayment
-
-            # Calculate item profit WITHOUT overpayment (for the template condition)
-            item_profit_without_overpayment = profit
-
-            transaction_data.append({
-                'customer_name': sale.customer.name if sale.customer else "Walk-in Customer",
-                'customer_phone': sale.customer.phone if sale.customer else "",
-                'product_name': item.product.name,
-                'product_brand': item.product.brand,
-                'quantity': item.quantity,
-                'unit_price_sold': item.unit_price, # Price at time of sale (Actual Selling Price in SOS)
-                'unit_purchase_price': purchase_price_in_sos_current, # Converted using CURRENT rate
-                'unit_minimum_selling_price': minimum_selling_price_in_sos_current, # Converted using CURRENT rate
-                'total_sale_amount': item.total_price, # unit_price_sold * quantity
-                'profit': final_profit, # Includes item profit + allocated overpayment
-                'item_profit_without_overpayment': item_profit_without_overpayment, # Add this new key
-                'surplus': surplus,
-                'allocated_overpayment': item_overpayment,
-                'currency': 'SOS',
-                'sale_date': sale.date_created,
-                'transaction_id': sale.transaction_id,
-                'sale_amount_paid': sale.amount_paid,
-                'sale_total_amount': sale.total_amount,
-            })
-
-    # Process ETB sales
-    for sale in etb_sales:
-        items = list(sale.items.all())
-
-        # Calculate transaction-level overpayment in ETB
-        overpayment = max(Decimal('0.00'), sale.amount_paid - sale.total_amount)
-        total_items_value = sale.total_amount
-
-        for item in items:
-            # Calculate item-level profit and surplus in ETB using the rate at the time of the sale
-            rate_at_sale = item.sale.exchange_rate_at_sale if item.sale.exchange_rate_at_sale else current_usd_to_etb_rate
-            # Convert purchase price to ETB using rate at sale time
-            purchase_price_in_etb_at_sale = item.product.purchase_price * rate_at_sale
-            profit_per_unit_etb = item.unit_price - purchase_price_in_etb_at_sale
-            profit = profit_per_unit_etb * item.quantity
-
-            # Convert minimum selling price to ETB using rate at sale time
-            minimum_selling_price_in_etb_at_sale = item.product.selling_price * rate_at_sale
-            surplus_per_unit_etb = item.unit_price - minimum_selling_price_in_etb_at_sale
-            surplus = surplus_per_unit_etb * item.quantity if surplus_per_unit_etb > 0 else Decimal('0.00')
-
-            # Allocate overpayment proportionally to this item's value
-            item_overpayment = Decimal('0.00')
-            if total_items_value > 0:
-                 item_overpayment = (item.total_price / total_items_value) * overpayment
-
-            # Final profit includes item profit + allocated overpayment
-            final_profit = profit + item_overpayment
-
-            # Calculate item profit WITHOUT overpayment (for the template condition)
-            item_profit_without_overpayment = profit
-
-            transaction_data.append({
-                'customer_name': sale.customer.name if sale.customer else "Walk-in Customer",
-                'customer_phone': sale.customer.phone if sale.customer else "",
-                'product_name': item.product.name,
-                'product_brand': item.product.brand,
-                'quantity': item.quantity,
-                'unit_price_sold': item.unit_price, # Price at time of sale (Actual Selling Price in ETB)
-                'unit_purchase_price': purchase_price_in_etb_at_sale, # Convert purchase price to ETB using rate at sale time
-                'unit_minimum_selling_price': minimum_selling_price_in_etb_at_sale, # Convert minimum price to ETB using rate at sale time
-                'total_sale_amount': item.total_price, # unit_price_sold * quantity
-                'profit': final_profit, # Includes item profit + allocated overpayment
-                'item_profit_without_overpayment': item_profit_without_overpayment, # Add this new key
-                'surplus': surplus,
-                'allocated_overpayment': item_overpayment,
-                'currency': 'ETB',
-                'sale_date': sale.date_created,
-                'transaction_id': sale.transaction_id,
-                'sale_amount_paid': sale.amount_paid,
-                'sale_total_amount': sale.total_amount,
-            })
+        currencies = tuple(currency for currency in REPORT_CURRENCIES if currency == currency_filter)
 
-    # Sort the combined list by date (most recent first)
-    transaction_data.sort(key=lambda x: x['sale_date'], reverse=True)
-
-    # Calculate totals for the filtered results
-    total_quantity = sum(item['quantity'] for item in transaction_data)
-    total_sale_amount_usd = Decimal('0.00')
-    total_sale_amount_sos = Decimal('0.00')
-    total_sale_amount_etb = Decimal('0.00')
-    total_profit_usd = Decimal('0.00')
-    total_profit_sos = Decimal('0.00')
-    total_profit_etb = Decimal('0.00')
-    total_surplus_usd = Decimal('0.00')
-    total_surplus_sos = Decimal('0.00')
-    total_surplus_etb = Decimal('0.00')
-    total_allocated_overpayment_usd = Decimal('0.00')
-    total_allocated_overpayment_sos = Decimal('0.00')
-    total_allocated_overpayment_etb = Decimal('0.00')
-
-    for item in transaction_data:
-        if item['currency'] == 'USD':
-            total_sale_amount_usd += item['total_sale_amount']
-            total_profit_usd += item['profit']
-            total_surplus_usd += item['surplus']
-            total_allocated_overpayment_usd += item['allocated_overpayment']
-        elif item['currency'] == 'SOS':
-            total_sale_amount_sos += item['total_sale_amount']
-            total_profit_sos += item['profit']
-            total_surplus_sos += item['surplus']
-            total_allocated_overpayment_sos += item['allocated_overpayment']
-        elif item['currency'] == 'ETB':
-            total_sale_amount_etb += item['total_sale_amount']
-            total_profit_etb += item['profit']
-            total_surplus_etb += item['surplus']
-            total_allocated_overpayment_etb += item['allocated_overpayment']
+    transaction_data, next_cursor = transaction_report_page(
+        start_date, end_date, currencies, product_filter, cursor=request.GET.get('after'),
+    )
+    totals = transaction_report_totals(start_date, end_date, currencies, product_filter)
+
+    next_page_query = ''
+    if next_cursor:
+        query = request.GET.copy()
+        query['after'] = next_cursor
+        next_page_query = query.urlencode()
+    first_page_query = ''
+    if request.GET.get('after'):
+        query = request.GET.copy()
+        del query['after']
+        first_page_query = query.urlencode()
 
     # Get products for the filter dropdown
     products = Product.objects.filter(is_active=True).order_by('name')
 
     context = {
         'transaction_data': transaction_data,
-        'total_quantity': total_quantity,
-        'total_sale_amount_usd': total_sale_amount_usd,
-        'total_sale_amount_sos': total_sale_amount_sos,
-        'total_sale_amount_etb': total_sale_amount_etb,
-        'total_profit_usd': total_profit_usd,
-        'total_profit_sos': total_profit_sos,
-        'total_profit_etb': total_profit_etb,
-        'total_surplus_usd': total_surplus_usd,
-        'total_surplus_sos': total_surplus_sos,
-        'total_surplus_etb': total_surplus_etb,
-        'total_allocated_overpayment_usd': total_allocated_overpayment_usd,
-        'total_allocated_overpayment_sos': total_allocated_overpayment_sos,
-        'total_allocated_overpayment_etb': total_allocated_overpayment_etb,
+        'total_quantity': sum(totals[currency]['quantity'] for currency in REPORT_CURRENCIES),
+        'next_page_query': next_page_query,
+        'first_page_query': first_page_query,
         # Filters
         'days': days,
         'start_date': start_date.strftime('%Y-%m-%d'),
@@ -311,6 +101,12 @@ def detailed_transaction_report(request):
         'currency_filter': currency_filter,
         'products': products,
     }
+    for currency in REPORT_CURRENCIES:
+        suffix = currency.lower()
+        context[f'total_sale_amount_{suffix}'] = totals[currency]['sale_amount']
+        context[f'total_profit_{suffix}'] = totals[currency]['profit']
+        context[f'total_surplus_{suffix}'] = totals[currency]['surplus']
+        context[f'total_allocated_overpayment_{suffix}'] = totals[currency]['allocated_overpayment']
     return render(request, 'core/detailed_transaction_report.html', context)
 
 
@@ -328,6 +124,162 @@ def superuser_required(view_func):
     return _wrapped_view
 
 
+
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# How long a request may hold its key IN_PROGRESS before a retry may take it over
+IDEMPOTENCY_LEASE = timedelta(minutes=5)
+IDEMPOTENCY_WAIT_SECONDS = 15
+IDEMPOTENCY_POLL_INTERVAL = 0.2
+IDEMPOTENCY_REPLAYED_HEADERS = ('Content-Type', 'Location')
+
+
+def _idempotency_request_hash(request):
+    """Hash the path and payload so a key reused for a different request is rejected"""
+    digest = hashlib.sha256(request.path.encode('utf-8'))
+    try:
+        digest.update(request.body)
+    except RawPostDataException:
+        # Multipart bodies are consumed by the CSRF check; hash the parsed form instead
+        digest.update(json.dumps(sorted(request.POST.lists())).encode('utf-8'))
+        for name, upload in sorted(request.FILES.items()):
+            digest.update(f'{name}:{upload.name}:{upload.size}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _claim_idempotency_key(fingerprint, request_hash):
+    """Insert an IN_PROGRESS row; returns (record, created) or (None, False) if it just vanished.
+
+    An IN_PROGRESS row whose lease has run out belongs to a request that
+    died mid-way; a retry of the same request takes it over with a
+    conditional UPDATE, so only one of several racing retries wins.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                fingerprint=fingerprint,
+                request_hash=request_hash,
+                expires_at=now + IDEMPOTENCY_KEY_TTL,
+                locked_until=now + IDEMPOTENCY_LEASE,
+            )
+        IdempotencyKey.purge_expired()
+        return record, True
+    except IntegrityError:
+        record = IdempotencyKey.objects.filter(fingerprint=fingerprint).first()
+        if record is not None and record.is_expired:
+            record.delete()
+            record = None
+        elif record is not None and record.request_hash == request_hash and record.is_abandoned:
+            lease = Q(locked_until__isnull=True) | Q(locked_until__lte=now)
+            taken = IdempotencyKey.objects.filter(lease, pk=record.pk, status='IN_PROGRESS').update(
+                locked_until=now + IDEMPOTENCY_LEASE, expires_at=now + IDEMPOTENCY_KEY_TTL,
+            )
+            if taken:
+                record.locked_until = now + IDEMPOTENCY_LEASE
+                return record, True
+        return record, False
+
+
+def _replay_idempotent_response(record):
+    response = HttpResponse(bytes(record.response_body), status=record.response_status)
+    for header, value in record.response_headers.items():
+        response[header] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _is_successful_outcome(request, response):
+    """Whether a response records a completed write that a retry must not repeat.
+
+    JSON replies count when they are 2xx with `success: true`. Form posts
+    count when they redirect without an error message queued, since failed
+    form posts here redirect back with messages.error. Anything else (a
+    rejected cart, a validation error, a re-rendered form) is not stored,
+    so the client can fix the request and retry with the same key.
+    """
+    if 200 <= response.status_code < 300 and response.get('Content-Type', '').startswith('application/json'):
+        try:
+            return json.loads(response.content).get('success') is True
+        except (ValueError, AttributeError):
+            return False
+    if 300 <= response.status_code < 400:
+        queued = getattr(getattr(request, '_messages', None), '_queued_messages', [])
+        return not any(message.level >= messages.ERROR for message in queued)
+    return False
+
+
+def idempotent(view_func):
+    """Decorator that makes POSTs carrying an Idempotency-Key safe to retry.
+
+    The first successful response for a key is stored and replayed for
+    later requests with the same key; a duplicate that arrives while the
+    first is still running waits for it instead of running the view twice,
+    unless the first has held the key past IDEMPOTENCY_LEASE, in which case
+    it is taken to have died and the duplicate runs in its place.
+    Failed attempts release the key. Plain HTML forms can send the key as
+    an `idempotency_key` field instead of the header.
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if request.method != 'POST':
+            return view_func(request, *args, **kwargs)
+        key = request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key', '')
+        key = key.strip()
+        if not key:
+            return view_func(request, *args, **kwargs)
+        if len(key) > 255:
+            return JsonResponse({'success': False, 'error': 'Idempotency-Key is too long'}, status=400)
+
+        owner = request.user.pk if request.user.is_authenticated else 'anon'
+        fingerprint = hashlib.sha256(f'{owner}:{key}'.encode('utf-8')).hexdigest()
+        request_hash = _idempotency_request_hash(request)
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record, created = _claim_idempotency_key(fingerprint, request_hash)
+            if created:
+                break
+            if record is None:
+                continue
+            if record.request_hash != request_hash:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Idempotency-Key was already used for a different request',
+                }, status=422)
+            if record.status == 'COMPLETE':
+                return _replay_idempotent_response(record)
+            if time.monotonic() >= deadline:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'A request with this Idempotency-Key is still being processed',
+                }, status=409)
+            time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+        # Release and completion only touch the row while this request still holds its lease
+        held = IdempotencyKey.objects.filter(pk=record.pk, status='IN_PROGRESS', locked_until=record.locked_until)
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            held.delete()
+            raise
+
+        # Failures, server errors and streams are not stored, so the client may retry them
+        if response.streaming or not _is_successful_outcome(request, response):
+            held.delete()
+            return response
+
+        held.update(
+            status='COMPLETE',
+            locked_until=None,
+            response_status=response.status_code,
+            response_headers={
+                header: response[header] for header in IDEMPOTENCY_REPLAYED_HEADERS if response.has_header(header)
+            },
+            response_body=response.content,
+        )
+        return response
+    return _wrapped_view
+
 def log_audit_action(user, action, object_type, object_id, details, ip_address=None):
     """Log audit action - user can be None for anonymous operations"""
     try:
@@ -352,360 +304,70 @@ def home(request):
 
 @login_required
 def dashboard_view(request):
-    """Main dashboard view with comprehensive metrics"""
-    today = timezone.now().date()
-    currency_settings = CurrencySettings.objects.first()
-    
-    # Default rates if settings missing
-    usd_to_sos_rate = currency_settings.usd_to_sos_rate if currency_settings else Decimal('8000.00')
-    usd_to_etb_rate = currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00')
-    
-    # === TOTAL SALES REVENUE (Full transaction value) ===
-    today_sales_usd = SaleUSD.objects.filter(date_created__date=today).aggregate(
-        total=Sum('total_amount')
-    )['total'] or Decimal('0.00')
-    
-    today_sales_sos = SaleSOS.objects.filter(date_created__date=today).aggregate(
-        total=Sum('total_amount')
-    )['total'] or Decimal('0.00')
-    
-    today_sales_etb = SaleETB.objects.filter(date_created__date=today).aggregate(
-        total=Sum('total_amount')
-    )['total'] or Decimal('0.00')
-    
-    # Convert to ETB
-    sales_usd_in_etb = today_sales_usd * usd_to_etb_rate
-    sales_sos_in_etb = Decimal('0.00')
-    if usd_to_sos_rate > 0:
-        sales_sos_in_etb = (today_sales_sos / usd_to_sos_rate) * usd_to_etb_rate
-    
-    total_sales_revenue_etb = sales_usd_in_etb + sales_sos_in_etb + today_sales_etb
-    
-    # === CASH COLLECTED (Actual payments received) ===
-    today_revenue_usd = SaleUSD.objects.filter(date_created__date=today).aggregate(
-        total=Sum('amount_paid')
-    )['total'] or Decimal('0.00')
-    
-    today_revenue_sos = SaleSOS.objects.filter(date_created__date=today).aggregate(
-        total=Sum('amount_paid')
-    )['total'] or Decimal('0.00')
-    
-    today_revenue_etb = SaleETB.objects.filter(date_created__date=today).aggregate(
-        total=Sum('amount_paid')
-    )['total'] or Decimal('0.00')
-    
-    # Conversions
-    revenue_usd_in_etb = today_revenue_usd * usd_to_etb_rate
-    revenue_sos_in_etb = Decimal('0.00')
-    if usd_to_sos_rate > 0:
-        revenue_sos_in_etb = (today_revenue_sos / usd_to_sos_rate) * usd_to_etb_rate
-    
-    cash_collected_etb = revenue_usd_in_etb + revenue_sos_in_etb + today_revenue_etb
-    
-    # === OUTSTANDING DEBT & COLLECTION RATE ===
-    outstanding_debt_today_etb = total_sales_revenue_etb - cash_collected_etb
-    collection_rate = Decimal('0.00')
-    if total_sales_revenue_etb > 0:
-        collection_rate = (cash_collected_etb / total_sales_revenue_etb * 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-    
-    # Transaction Counts
-    today_transactions = (
-        SaleUSD.objects.filter(date_created__date=today).count() +
-        SaleSOS.objects.filter(date_created__date=today).count() +
-        SaleETB.objects.filter(date_created__date=today).count()
-    )
-    
-    # === PROFIT CALCULATION (Superuser Only) ===
-    expected_profit_etb = Decimal('0.00')
-    actual_profit_etb = Decimal('0.00')
-    profit_variance_etb = Decimal('0.00')
-    bonus_profit_etb = Decimal('0.00')
-    overpayment_count = 0
-    total_overpayments_etb = Decimal('0.00')
-    
-    if request.user.is_superuser:
-        # Get all sales for today with prefetched items
-        usd_sales = SaleUSD.objects.filter(date_created__date=today).prefetch_related('items__product')
-        sos_sales = SaleSOS.objects.filter(date_created__date=today).prefetch_related('items__product')
-        etb_sales = SaleETB.objects.filter(date_created__date=today).prefetch_related('items__product')
-        
-        # Expected profit (if all sales paid in full)
-        expected_profit_usd = sum(sale.expected_profit_usd for sale in usd_sales)
-        expected_profit_usd += sum(sale.expected_profit_usd for sale in sos_sales)
-        expected_profit_usd += sum(sale.expected_profit_usd for sale in etb_sales)
-        expected_profit_etb = expected_profit_usd * usd_to_etb_rate
-        
-        # Actual profit (based on amount_paid)
-        actual_profit_usd = sum(sale.actual_profit_usd for sale in usd_sales)
-        actual_profit_usd += sum(sale.actual_profit_usd for sale in sos_sales)
-        actual_profit_usd += sum(sale.actual_profit_usd for sale in etb_sales)
-        actual_profit_etb = actual_profit_usd * usd_to_etb_rate
-        
-        # Profit variance
-        profit_variance_etb = expected_profit_etb - actual_profit_etb
-        
-        # Overpayment tracking
-        overpayment_usd = Decimal('0.00')
-        for sale in usd_sales:
-            if sale.is_overpayment:
-                overpayment_count += 1
-                overpayment_usd += sale.overpayment_amount
-        
-        for sale in sos_sales:
-            if sale.is_overpayment:
-                overpayment_count += 1
-                if usd_to_sos_rate > 0:
-                    overpayment_usd += sale.overpayment_amount / usd_to_sos_rate
-        
-        for sale in etb_sales:
-            if sale.is_overpayment:
-                overpayment_count += 1
-                rate = sale.exchange_rate_at_sale if sale.exchange_rate_at_sale else usd_to_etb_rate
-                if rate > 0:
-                    overpayment_usd += sale.overpayment_amount / rate
-        
-        total_overpayments_etb = overpayment_usd * usd_to_etb_rate
-        bonus_profit_etb = total_overpayments_etb
-    
-    # === DEBT CALCULATION (ETB Centric) ===
-    total_debt_usd = Customer.get_total_debt_usd()
-    total_debt_sos = Customer.get_total_debt_sos()
-    total_debt_etb = Customer.get_total_debt_etb()
-    
-    # Convert all to ETB
-    debt_usd_in_etb = total_debt_usd * usd_to_etb_rate
-    debt_sos_in_etb = Decimal('0.00')
-    if usd_to_sos_rate > 0:
-        debt_sos_in_etb = (total_debt_sos / usd_to_sos_rate) * usd_to_etb_rate
-    
-    total_debt_combined_etb = debt_usd_in_etb + debt_sos_in_etb + total_debt_etb
-    top_debtors = Customer.get_customers_with_debt()[:5]
-    
-    # === WEEKLY SALES CHART (ETB) ===
-    weekly_labels = []
-    weekly_data = []
-    for i in range(6, -1, -1):
-        date = today - timedelta(days=i)
-        
-        # USD -> ETB
-        day_usd = SaleUSD.objects.filter(date_created__date=date).aggregate(
-            total=Sum('amount_paid')
-        )['total'] or Decimal('0.00')
-        val_usd_in_etb = day_usd * usd_to_etb_rate
-        
-        # SOS -> USD -> ETB
-        day_sos = SaleSOS.objects.filter(date_created__date=date).aggregate(
-            total=Sum('amount_paid')
-        )['total'] or Decimal('0.00')
-        val_sos_in_etb = Decimal('0.00')
-        if usd_to_sos_rate > 0:
-            val_sos_in_etb = (day_sos / usd_to_sos_rate) * usd_to_etb_rate
-        
-        # ETB (Native)
-        day_etb = SaleETB.objects.filter(date_created__date=date).aggregate(
-            total=Sum('amount_paid')
-        )['total'] or Decimal('0.00')
-        
-        total_day_etb = val_usd_in_etb + val_sos_in_etb + day_etb
-        weekly_labels.append(date.strftime('%a'))
-        weekly_data.append(float(total_day_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)))
-    
-    # === TOP SELLING PRODUCTS ===
-    week_start = today - timedelta(days=7)
-    
-    # Get all sale items from the past week
-    usd_items = SaleItemUSD.objects.filter(
-        sale__date_created__date__gte=week_start
-    ).select_related('product', 'sale')
-    
-    sos_items = SaleItemSOS.objects.filter(
-        sale__date_created__date__gte=week_start
-    ).select_related('product', 'sale')
-    
-    etb_items = SaleItemETB.objects.filter(
-        sale__date_created__date__gte=week_start
-    ).select_related('product', 'sale')
-    
-    # Aggregate by product
-    product_revenue = {}
-    
-    # Process USD items
-    for item in usd_items:
-        product_id = item.product.id
-        if product_id not in product_revenue:
-            product_revenue[product_id] = {
-                'product': item.product,
-                'total_qty': Decimal('0'),
-                'total_revenue_usd': Decimal('0'),
-            }
-        product_revenue[product_id]['total_qty'] += item.quantity
-        product_revenue[product_id]['total_revenue_usd'] += item.total_price
-    
-    # Process SOS items
-    for item in sos_items:
-        product_id = item.product.id
-        if product_id not in product_revenue:
-            product_revenue[product_id] = {
-                'product': item.product,
-                'total_qty': Decimal('0'),
-                'total_revenue_usd': Decimal('0'),
-            }
-        product_revenue[product_id]['total_qty'] += item.quantity
-        if usd_to_sos_rate > 0:
-            revenue_usd = item.total_price / usd_to_sos_rate
-            product_revenue[product_id]['total_revenue_usd'] += revenue_usd
-    
-    # Process ETB items
-    for item in etb_items:
-        product_id = item.product.id
-        if product_id not in product_revenue:
-            product_revenue[product_id] = {
-                'product': item.product,
-                'total_qty': Decimal('0'),
-                'total_revenue_usd': Decimal('0'),
-            }
-        product_revenue[product_id]['total_qty'] += item.quantity
-        rate = item.sale.exchange_rate_at_sale if item.sale.exchange_rate_at_sale else usd_to_etb_rate
-        if rate > 0:
-            revenue_usd = item.total_price / rate
-            product_revenue[product_id]['total_revenue_usd'] += revenue_usd
-    
-    # Convert to list and calculate ETB revenue
-    for product_id, data in product_revenue.items():
-        data['total_revenue_etb'] = (data['total_revenue_usd'] * usd_to_etb_rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        data['name'] = data['product'].name
-    
-    top_selling_items_data = list(product_revenue.values())
-    top_selling_items_data.sort(key=lambda x: x['total_qty'], reverse=True)
-    top_selling_items = top_selling_items_data[:5]
-    
-    # === RECENT ACTIVITY ===
-    recent_activity = []
-    
-    def add_recent(queryset, currency, conversion_func):
-        for sale in queryset[:10]:
-            val_etb = conversion_func(sale)
-            recent_activity.append({
-                'id': sale.id,
-                'customer': sale.customer if sale.customer else "Walk-in Customer",
-                'user': sale.user,
-                'amount_etb': val_etb,
-                'original_amount': sale.total_amount,
-                'currency': currency,
-                'date_created': sale.date_created,
-                'is_paid': sale.is_completed
-            })
-    
-    # USD Sales
-    add_recent(
-        SaleUSD.objects.select_related('customer', 'user').order_by('-date_created'),
-        'USD',
-        lambda s: s.total_amount * usd_to_etb_rate
-    )
-    
-    # SOS Sales
-    add_recent(
-        SaleSOS.objects.select_related('customer', 'user').order_by('-date_created'),
-        'SOS',
-        lambda s: (s.total_amount / usd_to_sos_rate * usd_to_etb_rate) if usd_to_sos_rate > 0 else Decimal('0.00')
-    )
-    
-    # ETB Sales
-    add_recent(
-        SaleETB.objects.select_related('customer', 'user').order_by('-date_created'),
-        'ETB',
-        lambda s: s.total_amount
-    )
-    
-    recent_activity.sort(key=lambda x: x['date_created'], reverse=True)
-    recent_activity = recent_activity[:10]
-    
-    # === INVENTORY METRICS ===
-    low_stock_products = Product.objects.filter(
-        current_stock__lte=F('low_stock_threshold'),
-        is_active=True
-    ).order_by('current_stock')
-    
-    total_products = Product.objects.filter(is_active=True).count()
-    low_stock_count = low_stock_products.count()
-    out_of_stock_count = Product.objects.filter(current_stock=0, is_active=True).count()
-    categories = Category.objects.all().order_by('name')
-    
+    """Dashboard shell; each widget loads from api_dashboard_widget"""
     context = {
-        # Revenue Metrics
-        'total_sales_revenue_etb': total_sales_revenue_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-        'cash_collected_etb': cash_collected_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-        'outstanding_debt_today_etb': outstanding_debt_today_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-        'collection_rate': collection_rate,
-        'today_transactions': today_transactions,
-        'today_revenue_etb': cash_collected_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),  # Legacy
-        
-        # Debt
-        'total_debt_etb': total_debt_combined_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-        'customers_with_debt': Customer.get_customers_with_debt().count(),
-        
-        # Charts & Lists
-        'weekly_labels': weekly_labels,
-        'weekly_data': weekly_data,
-        'top_selling_items': top_selling_items,
-        'recent_activity': recent_activity,
-        'top_debtors': top_debtors,
-        
-        # Inventory
-        'total_products': total_products,
-        'low_stock_count': low_stock_count,
-        'out_of_stock_count': out_of_stock_count,
-        'low_stock_products': low_stock_products,
-        'categories': categories,
-        
-        # Settings
-        'exchange_rate': usd_to_sos_rate,
-        'usd_to_etb_rate': usd_to_etb_rate,
+        'widgets': [name for name in dashboard.WIDGETS if dashboard.can_view(request.user, name)],
+        'categories': Category.objects.all().order_by('name'),
     }
-    
-    if request.user.is_superuser:
-        context.update({
-            # Profit Metrics
-            'expected_profit_etb': expected_profit_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-            'actual_profit_etb': actual_profit_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-            'profit_variance_etb': profit_variance_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-            'bonus_profit_etb': bonus_profit_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-            'total_overpayments_etb': total_overpayments_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-            'overpayment_count': overpayment_count,
-            'today_profit_in_etb': actual_profit_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),  # Legacy
-        })
-    
     return render(request, 'core/dashboard.html', context)
 
 
+def _dashboard_widget_etag(request, widget):
+    if not dashboard.can_view(request.user, widget):
+        return None
+    return dashboard.widget_etag(widget)
+
+
+@login_required
+@require_http_methods(['GET'])
+@condition(etag_func=_dashboard_widget_etag)
+def api_dashboard_widget(request, widget):
+    """One dashboard widget as JSON: its `data` and rendered `html`.
+
+    The ETag comes from the data versions the widget reads, so a browser
+    revalidating an unchanged widget gets a 304 without it being recomputed.
+    """
+    if widget not in dashboard.WIDGETS:
+        return JsonResponse({'success': False, 'error': 'Unknown widget'}, status=404)
+    if not dashboard.can_view(request.user, widget):
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+    spec = dashboard.WIDGETS[widget]
+    context = spec['handler'](request, CurrencySettings.objects.first())
+    html = render_to_string(spec['template'], context, request=request) if spec['template'] else ''
+    response = JsonResponse({
+        'success': True,
+        'widget': widget,
+        'data': context.get('data', {}),
+        'html': html,
+    })
+    # Always revalidate; the ETag makes that a 304 while nothing has changed
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+@require_http_methods(['GET'])
+async def dashboard_events(request):
+    """Server-Sent Events stream of live dashboard deltas (see core/live.py)"""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be held for the life of the connection
+        return JsonResponse({'success': False, 'error': 'Live updates need the ASGI server'}, status=503)
+    subscription = live.broadcaster.subscribe()
+    response = StreamingHttpResponse(live.event_stream(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @superuser_required
 def sales_list(request):
     """List all sales with filtering and pagination"""
-    # Get sales from all three models
-    usd_sales = SaleUSD.objects.select_related('customer', 'user').order_by('-date_created')
-    sos_sales = SaleSOS.objects.select_related('customer', 'user').order_by('-date_created')
-    etb_sales = SaleETB.objects.select_related('customer', 'user').order_by('-date_created')
-    legacy_sales = Sale.objects.select_related('customer', 'user').order_by('-date_created')
+    sales = Transaction.objects.select_related('customer', 'user').order_by('-date_created')
     
     # Search functionality
     search = request.GET.get('search', '')
     if search:
-        usd_sales = usd_sales.filter(
-            Q(customer__name__icontains=search) |
-            Q(customer__phone__icontains=search) |
-            Q(transaction_id__icontains=search)
-        )
-        sos_sales = sos_sales.filter(
-            Q(customer__name__icontains=search) |
-            Q(customer__phone__icontains=search) |
-            Q(transaction_id__icontains=search)
-        )
-        etb_sales = etb_sales.filter(
-            Q(customer__name__icontains=search) |
-            Q(customer__phone__icontains=search) |
-            Q(transaction_id__icontains=search)
-        )
-        legacy_sales = legacy_sales.filter(
+        sales = sales.filter(
             Q(customer__name__icontains=search) |
             Q(customer__phone__icontains=search) |
             Q(transaction_id__icontains=search)
@@ -713,83 +375,11 @@ def sales_list(request):
     
     # Currency filter
     currency = request.GET.get('currency', '')
-    if currency == 'USD':
-        sos_sales = sos_sales.none()
-        etb_sales = etb_sales.none()
-        legacy_sales = legacy_sales.filter(currency='USD')
-    elif currency == 'SOS':
-        usd_sales = usd_sales.none()
-        etb_sales = etb_sales.none()
-        legacy_sales = legacy_sales.filter(currency='SOS')
-    elif currency == 'ETB':
-        usd_sales = usd_sales.none()
-        sos_sales = sos_sales.none()
-        legacy_sales = legacy_sales.filter(currency='ETB')
-    
-    # Combine all sales into a unified list
-    all_sales = []
-    
-    for sale in usd_sales:
-        all_sales.append({
-            'id': sale.id,
-            'transaction_id': sale.transaction_id,
-            'customer': sale.customer,
-            'user': sale.user,
-            'currency': 'USD',
-            'total_amount': sale.total_amount,
-            'amount_paid': sale.amount_paid,
-            'debt_amount': sale.debt_amount,
-            'date_created': sale.date_created,
-            'type': 'USD Sale'
-        })
-    
-    for sale in sos_sales:
-        all_sales.append({
-            'id': sale.id,
-            'transaction_id': sale.transaction_id,
-            'customer': sale.customer,
-            'user': sale.user,
-            'currency': 'SOS',
-            'total_amount': sale.total_amount,
-            'amount_paid': sale.amount_paid,
-            'debt_amount': sale.debt_amount,
-            'date_created': sale.date_created,
-            'type': 'SOS Sale'
-        })
-    
-    for sale in etb_sales:
-        all_sales.append({
-            'id': sale.id,
-            'transaction_id': sale.transaction_id,
-            'customer': sale.customer,
-            'user': sale.user,
-            'currency': 'ETB',
-            'total_amount': sale.total_amount,
-            'amount_paid': sale.amount_paid,
-            'debt_amount': sale.debt_amount,
-            'date_created': sale.date_created,
-            'type': 'ETB Sale'
-        })
-    
-    for sale in legacy_sales:
-        all_sales.append({
-            'id': sale.id,
-            'transaction_id': sale.transaction_id,
-            'customer': sale.customer,
-            'user': sale.user,
-            'currency': sale.currency,
-            'total_amount': sale.total_amount,
-            'amount_paid': sale.amount_paid,
-            'debt_amount': sale.debt_amount,
-            'date_created': sale.date_created,
-            'type': 'Legacy Sale'
-        })
-    
-    # Sort by date (most recent first)
-    all_sales.sort(key=lambda x: x['date_created'], reverse=True)
+    if currency in ('USD', 'SOS', 'ETB'):
+        sales = sales.filter(currency=currency)
     
     # Pagination
-    paginator = Paginator(all_sales, 20)
+    paginator = Paginator(sales, 20)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
@@ -801,275 +391,275 @@ def sales_list(request):
     return render(request, 'core/sales_list.html', context)
 
 
-def create_sale(request):
-    """Create a new sale - allows unauthenticated access for walk-in sales"""
-    if request.method == 'POST':
+class InsufficientStockError(ValueError):
+    """Raised when a sale asks for more stock than is on hand"""
+
+
+def _parse_sale_products(post_data):
+    """Read products[i][id|quantity|unit_price] form fields into a list of dicts"""
+    products = []
+    product_index = 0
+    while f'products[{product_index}][id]' in post_data:
+        products.append({
+            'id': post_data[f'products[{product_index}][id]'],
+            'quantity': post_data.get(f'products[{product_index}][quantity]'),
+            'unit_price': post_data.get(f'products[{product_index}][unit_price]'),
+        })
+        product_index += 1
+    return products
+
+
+def _record_sale(data, user=None, ip_address=None):
+    """Create a sale with its items, stock movements and debt in one transaction.
+
+    `data` holds currency, customer, amount_paid, pno, products
+    (list of {id, quantity, unit_price}) and an optional client_uuid that
+    becomes the sale's transaction_id. Raises ValueError on invalid input or
+    when today is closed, and InsufficientStockError when stock runs out.
+    """
+    lines = data.get('products') or []
+    if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+        raise ValueError("Products must be a list of {id, quantity, unit_price} objects")
+    currency = data.get('currency') or 'USD'
+    pno = (data.get('pno') or '').strip()
+    
+    # Convert amount_paid safely
+    try:
+        amount_paid = Decimal(str(data.get('amount_paid') or '0.00')).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    except (ValueError, InvalidOperation):
+        amount_paid = Decimal('0.00')
+    
+    # Get currency settings
+    currency_settings = CurrencySettings.objects.first()
+    etb_exchange_rate = currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00')
+    
+    # Get customer (optional)
+    customer = None
+    if data.get('customer'):
         try:
-            is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
-            
-            # Parse form data
-            customer_id = request.POST.get('customer')
-            currency = request.POST.get('currency', 'USD')
-            amount_paid_str = request.POST.get('amount_paid', '0.00')
-            pno = request.POST.get('pno', '').strip()
+            customer = Customer.objects.get(id=data['customer'])
+        except (Customer.DoesNotExist, ValueError):
+            pass
+    
+    sale_fields = {
+        'customer': customer,
+        'user': user,
+        'amount_paid': amount_paid,
+        'total_amount': Decimal('0.00'),
+        'debt_amount': Decimal('0.00'),
+        'pno': pno if pno else None,
+    }
+    if data.get('client_uuid'):
+        try:
+            sale_fields['transaction_id'] = uuid.UUID(str(data['client_uuid']))
+        except ValueError:
+            raise ValueError("Invalid client UUID")
+    
+    # DayClosedError is a ValueError: the POS shows it and a replayed sale is rejected
+    check_day_open(timezone.localtime().date(), user, ip_address=ip_address, action='record a sale')
+    
+    with transaction.atomic():
+        # Create sale using appropriate model
+        if currency == 'USD':
+            sale = SaleUSD.objects.create(**sale_fields)
+        elif currency == 'SOS':
+            sale = SaleSOS.objects.create(**sale_fields)
+        else:  # ETB
+            currency = 'ETB'
+            sale = SaleETB.objects.create(exchange_rate_at_sale=etb_exchange_rate, **sale_fields)
+        
+        # Process products
+        total_amount = Decimal('0.00')
+        products_processed = []
+        line_product_ids = set()
+        for line in lines:
+            try:
+                line_product_ids.add(int(line.get('id')))
+            except (TypeError, ValueError):
+                pass
+        prices = ProductPrice.lookup(line_product_ids, currency)
+        
+        for line in lines:
+            product_id = line.get('id')
+            quantity_str = line.get('quantity')
+            if not product_id or not quantity_str:
+                continue
             
-            # Convert amount_paid safely
             try:
-                amount_paid = Decimal(amount_paid_str).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            except (ValueError, InvalidOperation):
-                amount_paid = Decimal('0.00')
+                product = Product.objects.select_for_update().get(id=product_id)
+                quantity = Decimal(str(quantity_str)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            except (Product.DoesNotExist, ValueError):
+                raise ValueError(f"Product not found")
+            except InvalidOperation:
+                raise ValueError(f"Invalid quantity for {product.name}")
+            
+            if quantity <= 0:
+                continue
             
-            # Get currency settings
-            currency_settings = CurrencySettings.objects.first()
-            exchange_rate = currency_settings.usd_to_sos_rate if currency_settings else Decimal('8000.00')
-            etb_exchange_rate = currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00')
+            # Check stock availability
+            if product.current_stock < quantity:
+                raise InsufficientStockError(f"Not enough stock for {product.name}. Available: {product.current_stock}, Requested: {quantity}")
             
-            # Get customer (optional)
-            customer = None
-            if customer_id:
+            # Get custom unit price or use default
+            custom_unit_price = None
+            if line.get('unit_price') not in (None, ''):
                 try:
-                    customer = Customer.objects.get(id=customer_id)
-                except Customer.DoesNotExist:
-                    pass
+                    custom_unit_price = Decimal(str(line['unit_price']))
+                except (ValueError, InvalidOperation):
+                    custom_unit_price = None
             
-            # Create sale using appropriate model
-            sale_user = request.user if request.user.is_authenticated else None
+            # Default and floor prices come precomputed from ProductPrice
+            if product.id not in prices:
+                prices.update(ProductPrice.lookup([product.id], currency))
+            sell_price, floor_price = prices[product.id]
+            unit_price = custom_unit_price if custom_unit_price is not None else sell_price
             
-            with transaction.atomic():
-                if currency == 'USD':
-                    sale = SaleUSD.objects.create(
-                        customer=customer,
-                        user=sale_user,
-                        amount_paid=amount_paid,
-                        total_amount=Decimal('0.00'),
-                        debt_amount=Decimal('0.00'),
-                        pno=pno if pno else None
-                    )
-                elif currency == 'SOS':
-                    sale = SaleSOS.objects.create(
-                        customer=customer,
-                        user=sale_user,
-                        amount_paid=amount_paid,
-                        total_amount=Decimal('0.00'),
-                        debt_amount=Decimal('0.00'),
-                        pno=pno if pno else None
-                    )
-                else:  # ETB
-                    sale = SaleETB.objects.create(
-                        customer=customer,
-                        user=sale_user,
-                        amount_paid=amount_paid,
-                        total_amount=Decimal('0.00'),
-                        debt_amount=Decimal('0.00'),
-                        exchange_rate_at_sale=etb_exchange_rate,
-                        pno=pno if pno else None
-                    )
-                
-                # Process products
-                total_amount = Decimal('0.00')
-                products_processed = []
-                product_index = 0
-                
-                while True:
-                    product_id_key = f'products[{product_index}][id]'
-                    quantity_key = f'products[{product_index}][quantity]'
-                    
-                    if product_id_key not in request.POST:
-                        break
-                    
-                    product_id = request.POST[product_id_key]
-                    quantity_str = request.POST[quantity_key]
-                    
-                    if product_id and quantity_str:
-                        try:
-                            product = Product.objects.get(id=product_id)
-                            quantity = Decimal(quantity_str).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                            
-                            if quantity > 0:
-                                # Check stock availability
-                                if product.current_stock < quantity:
-                                    raise ValueError(f"Not enough stock for {product.name}. Available: {product.current_stock}, Requested: {quantity}")
-                                
-                                # Get custom unit price or use default
-                                unit_price_key = f'products[{product_index}][unit_price]'
-                                custom_unit_price = None
-                                
-                                if unit_price_key in request.POST:
-                                    try:
-                                        custom_unit_price = Decimal(request.POST[unit_price_key])
-                                    except (ValueError, InvalidOperation):
-                                        custom_unit_price = None
-                                
-                                # Set unit price based on currency
-                                if currency == 'SOS':
-                                    if custom_unit_price is not None:
-                                        unit_price = custom_unit_price
-                                    else:
-                                        unit_price = product.selling_price * exchange_rate
-                                elif currency == 'ETB':
-                                    if custom_unit_price is not None:
-                                        unit_price = custom_unit_price
-                                    else:
-                                        unit_price = product.selling_price * etb_exchange_rate
-                                else:  # USD
-                                    if custom_unit_price is not None:
-                                        unit_price = custom_unit_price
-                                    else:
-                                        unit_price = product.selling_price
-                                
-                                # Validate against purchase price
-                                if currency == 'SOS':
-                                    min_price_sos = product.purchase_price * exchange_rate
-                                    if unit_price < min_price_sos:
-                                        raise ValueError(f"Cannot sell {product.name} at {unit_price:.0f} SOS (below purchase price of {min_price_sos:.0f} SOS)")
-                                elif currency == 'ETB':
-                                    min_price_etb = product.purchase_price * etb_exchange_rate
-                                    if unit_price < min_price_etb:
-                                        raise ValueError(f"Cannot sell {product.name} at {unit_price:.2f} ETB (below purchase price of {min_price_etb:.2f} ETB)")
-                                else:  # USD
-                                    if unit_price < product.purchase_price:
-                                        raise ValueError(f"Cannot sell {product.name} at ${unit_price:.2f} USD (below purchase price of ${product.purchase_price:.2f} USD)")
-                                
-                                # Normalize values
-                                unit_price = unit_price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                                total_price = (unit_price * quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                                
-                                # Create sale item
-                                if currency == 'USD':
-                                    sale_item = SaleItemUSD(
-                                        sale=sale,
-                                        product=product,
-                                        quantity=quantity,
-                                        unit_price=unit_price,
-                                        total_price=total_price
-                                    )
-                                elif currency == 'SOS':
-                                    sale_item = SaleItemSOS(
-                                        sale=sale,
-                                        product=product,
-                                        quantity=quantity,
-                                        unit_price=unit_price,
-                                        total_price=total_price
-                                    )
-                                else:  # ETB
-                                    sale_item = SaleItemETB(
-                                        sale=sale,
-                                        product=product,
-                                        quantity=quantity,
-                                        unit_price=unit_price,
-                                        total_price=total_price
-                                    )
-                                
-                                # Validate and save
-                                sale_item.full_clean()
-                                sale_item.save()
-                                
-                                total_amount += total_price
-                                products_processed.append({
-                                    'product': product.name,
-                                    'quantity': quantity,
-                                    'total_price': float(total_price)
-                                })
-                            
-                        except Product.DoesNotExist:
-                            raise ValueError(f"Product not found")
-                        except ValueError as ve:
-                            raise
-                    else:
-                        pass
-                    
-                    product_index += 1
-                
-                # Update sale totals
-                sale.total_amount = total_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                sale.save()
-                
-                # Update customer debt if applicable
-                if sale.debt_amount > 0 and customer:
-                    old_debt = Decimal('0.00')
-                    if currency == 'USD':
-                        old_debt = customer.total_debt_usd
-                        customer.total_debt_usd += sale.debt_amount
-                    elif currency == 'SOS':
-                        old_debt = customer.total_debt_sos
-                        customer.total_debt_sos += sale.debt_amount
-                    elif currency == 'ETB':
-                        old_debt = customer.total_debt_etb
-                        customer.total_debt_etb += sale.debt_amount
-                    
-                    customer.save()
-                    
-                    # Log debt update
-                    audit_user = request.user if request.user.is_authenticated else None
-                    if audit_user:
-                        log_audit_action(
-                            audit_user, 'DEBT_ADDED', 'Customer', customer.id,
-                            f'Added debt of {sale.debt_amount} {currency} for sale #{sale.transaction_id}',
-                            request.META.get('REMOTE_ADDR')
-                        )
-                
-                # Update inventory
-                for item in sale.items.all():
-                    product = item.product
-                    old_stock = product.current_stock
-                    product.current_stock -= item.quantity
-                    product.save()
-                    
-                    # Log inventory change
-                    log_data = {
-                        'product': product,
-                        'action': 'SALE',
-                        'quantity_change': -item.quantity,
-                        'old_quantity': old_stock,
-                        'new_quantity': product.current_stock,
-                        'user': request.user if request.user.is_authenticated else None,
-                        'notes': f'Sold in Sale #{sale.transaction_id}'
-                    }
-                    
-                    if currency == 'USD':
-                        log_data['related_sale_usd'] = sale
-                    elif currency == 'SOS':
-                        log_data['related_sale_sos'] = sale
-                    elif currency == 'ETB':
-                        log_data['related_sale_etb'] = sale
-                    
-                    InventoryLog.objects.create(**log_data)
-                
-                # Validate sale
-                try:
-                    sale.full_clean()
-                except ValidationError as e:
-                    error_messages = []
-                    for field, errors in e.error_dict.items():
-                        error_messages.extend([f"{field}: {error}" for error in errors])
-                    error_message = "; ".join(error_messages)
-                    sale.delete()
-                    raise ValueError(error_message)
-                
-                # Log audit action
+            # Validate against purchase price
+            if unit_price < floor_price:
+                if currency == 'SOS':
+                    raise ValueError(f"Cannot sell {product.name} at {unit_price:.0f} SOS (below purchase price of {floor_price:.0f} SOS)")
+                elif currency == 'ETB':
+                    raise ValueError(f"Cannot sell {product.name} at {unit_price:.2f} ETB (below purchase price of {floor_price:.2f} ETB)")
+                else:  # USD
+                    raise ValueError(f"Cannot sell {product.name} at ${unit_price:.2f} USD (below purchase price of ${floor_price:.2f} USD)")
+            
+            # Normalize values
+            unit_price = unit_price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            total_price = (unit_price * quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            
+            # Create sale item
+            sale_item = SALE_ITEM_MODELS[currency](
+                sale=sale,
+                product=product,
+                quantity=quantity,
+                unit_price=unit_price,
+                total_price=total_price
+            )
+            
+            # Validate and save
+            try:
+                sale_item.full_clean()
+            except ValidationError as e:
+                raise ValueError("; ".join(e.messages))
+            sale_item.save()
+            
+            total_amount += total_price
+            products_processed.append({
+                'product': product.name,
+                'quantity': quantity,
+                'total_price': float(total_price)
+            })
+        
+        # Update sale totals
+        sale.total_amount = total_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        sale.save()
+        
+        # Update customer debt if applicable
+        if sale.debt_amount > 0 and customer:
+            if currency == 'USD':
+                customer.total_debt_usd += sale.debt_amount
+            elif currency == 'SOS':
+                customer.total_debt_sos += sale.debt_amount
+            elif currency == 'ETB':
+                customer.total_debt_etb += sale.debt_amount
+            
+            customer.save()
+            
+            # Log debt update
+            if user:
                 log_audit_action(
-                    request.user if request.user.is_authenticated else None,
-                    'SALE_CREATED', 'Sale', sale.id,
-                    f'Created sale #{sale.transaction_id} for {sale.total_amount} {currency} with {len(products_processed)} items, Debt: {sale.debt_amount} {currency}',
-                    request.META.get('REMOTE_ADDR')
+                    user, 'DEBT_ADDED', 'Customer', customer.id,
+                    f'Added debt of {sale.debt_amount} {currency} for sale #{sale.transaction_id}',
+                    ip_address
                 )
-                
-                # Return response
-                success_message = f'Sale completed successfully! Transaction ID: {sale.transaction_id}'
-                if is_ajax:
-                    return JsonResponse({
-                        'success': True,
-                        'sale_id': sale.id,
-                        'transaction_id': str(sale.transaction_id),
-                        'message': success_message
-                    })
-                else:
-                    messages.success(request, success_message)
-                    return redirect('core:dashboard')
+        
+        # Update inventory. Stock is part of the catalog delta, so every
+        # product the sale touched is stamped with one catalog version;
+        # update() skips Product.save() and its per-row bump.
+        catalog_version = CatalogVersion.bump()
+        stock = {}
+        for item in sale.items.select_related('product'):
+            product = item.product
+            old_stock = stock.get(product.id, product.current_stock)
+            product.current_stock = stock[product.id] = old_stock - item.quantity
+            Product.objects.filter(pk=product.id).update(
+                current_stock=F('current_stock') - item.quantity,
+                catalog_version=catalog_version,
+                date_updated=timezone.now(),
+            )
+            
+            # Log inventory change
+            log_data = {
+                'product': product,
+                'action': 'SALE',
+                'quantity_change': -item.quantity,
+                'old_quantity': old_stock,
+                'new_quantity': product.current_stock,
+                'user': user,
+                'notes': f'Sold in Sale #{sale.transaction_id}'
+            }
+            
+            if currency == 'USD':
+                log_data['related_sale_usd'] = sale
+            elif currency == 'SOS':
+                log_data['related_sale_sos'] = sale
+            elif currency == 'ETB':
+                log_data['related_sale_etb'] = sale
+            
+            InventoryLog.objects.create(**log_data)
+        
+        # Validate sale
+        try:
+            sale.full_clean()
+        except ValidationError as e:
+            error_messages = []
+            for field, errors in e.error_dict.items():
+                error_messages.extend([f"{field}: {error}" for error in errors])
+            raise ValueError("; ".join(error_messages))
+        
+        # Log audit action
+        log_audit_action(
+            user,
+            'SALE_CREATED', 'Sale', sale.id,
+            f'Created sale #{sale.transaction_id} for {sale.total_amount} {currency} with {len(products_processed)} items, Debt: {sale.debt_amount} {currency}',
+            ip_address
+        )
+    return sale
+
+
+@idempotent
+def create_sale(request):
+    """Create a new sale - allows unauthenticated access for walk-in sales"""
+    if request.method == 'POST':
+        is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+        try:
+            data = {
+                'currency': request.POST.get('currency', 'USD'),
+                'customer': request.POST.get('customer'),
+                'amount_paid': request.POST.get('amount_paid', '0.00'),
+                'pno': request.POST.get('pno', ''),
+                'client_uuid': request.POST.get('client_uuid'),
+                'products': _parse_sale_products(request.POST),
+            }
+            sale_user = request.user if request.user.is_authenticated else None
+            sale = _record_sale(data, sale_user, request.META.get('REMOTE_ADDR'))
+            
+            # Return response
+            success_message = f'Sale completed successfully! Transaction ID: {sale.transaction_id}'
+            if is_ajax:
+                return JsonResponse({
+                    'success': True,
+                    'sale_id': sale.id,
+                    'transaction_id': str(sale.transaction_id),
+                    'message': success_message
+                })
+            else:
+                messages.success(request, success_message)
+                return redirect('core:dashboard')
         
         except Exception as e:
             error_message = str(e)
-            if is_ajax or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            if is_ajax:
                 return JsonResponse({
                     'success': False,
                     'error': error_message
@@ -1086,48 +676,103 @@ def create_sale(request):
     return render(request, 'core/create_sale.html', context)
 
 
+SYNC_SALES_BATCH_LIMIT = 100
+
+
 @login_required
-def sale_detail(request, sale_id, currency=None):
-    """Display detailed sale information"""
-    sale = None
-    sale_type = None
-    
-    # Try to find the sale in all models
-    if currency == 'USD' or currency is None:
+@require_http_methods(['POST'])
+def api_sync_sales(request):
+    """Replay sales queued offline by the POS.
+
+    Body: {"sales": [{client_uuid, currency, customer, amount_paid, pno, products}, ...]}.
+    Each sale commits on its own; a client_uuid that was already recorded is
+    reported as a duplicate instead of being applied twice.
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    queued_sales = payload.get('sales')
+    if not isinstance(queued_sales, list):
+        return JsonResponse({'success': False, 'error': 'Expected a "sales" list'}, status=400)
+    if len(queued_sales) > SYNC_SALES_BATCH_LIMIT:
+        return JsonResponse({'success': False, 'error': f'At most {SYNC_SALES_BATCH_LIMIT} sales per batch'}, status=400)
+
+    client_uuids = set()
+    for entry in queued_sales:
         try:
-            sale = SaleUSD.objects.select_related('customer', 'user').prefetch_related('items__product').get(id=sale_id)
-            sale_type = 'USD'
-        except SaleUSD.DoesNotExist:
+            client_uuids.add(uuid.UUID(str(entry.get('client_uuid'))))
+        except (ValueError, AttributeError):
             pass
-    
-    if sale is None and (currency == 'SOS' or currency is None):
+    # client_uuid -> (sale id, currency) of the sales already recorded
+    already_synced = {
+        transaction_id: (source_id, currency)
+        for transaction_id, source_id, currency in Transaction.objects.filter(
+            transaction_id__in=client_uuids,
+        ).values_list('transaction_id', 'source_id', 'currency')
+    }
+    sale_currencies = {model: code for code, model in SALE_MODELS.items()}
+
+    results = []
+    for entry in queued_sales:
+        if not isinstance(entry, dict):
+            results.append({'client_uuid': None, 'status': 'rejected', 'error': 'Malformed sale'})
+            continue
+        client_uuid = entry.get('client_uuid')
         try:
-            sale = SaleSOS.objects.select_related('customer', 'user').prefetch_related('items__product').get(id=sale_id)
-            sale_type = 'SOS'
-        except SaleSOS.DoesNotExist:
-            pass
-    
-    if sale is None and (currency == 'ETB' or currency is None):
+            parsed_uuid = uuid.UUID(str(client_uuid))
+        except ValueError:
+            results.append({'client_uuid': client_uuid, 'status': 'rejected', 'error': 'Missing or invalid client_uuid'})
+            continue
+
+        existing = already_synced.get(parsed_uuid)
+        if existing is not None:
+            results.append({
+                'client_uuid': client_uuid, 'status': 'duplicate', 'sale_id': existing[0], 'currency': existing[1],
+            })
+            continue
+
         try:
-            sale = SaleETB.objects.select_related('customer', 'user').prefetch_related('items__product').get(id=sale_id)
-            sale_type = 'ETB'
-        except SaleETB.DoesNotExist:
-            pass
+            sale = _record_sale(dict(entry, client_uuid=parsed_uuid), request.user, request.META.get('REMOTE_ADDR'))
+        except InsufficientStockError as e:
+            results.append({'client_uuid': client_uuid, 'status': 'conflict', 'error': str(e)})
+        except IntegrityError:
+            # A concurrent replay of the same sale won the race
+            results.append({'client_uuid': client_uuid, 'status': 'duplicate'})
+        except ValueError as e:
+            results.append({'client_uuid': client_uuid, 'status': 'rejected', 'error': str(e)})
+        else:
+            # _record_sale records an unknown currency as ETB, so report the one it used
+            currency = sale_currencies[type(sale)]
+            already_synced[parsed_uuid] = (sale.id, currency)
+            results.append({
+                'client_uuid': client_uuid, 'status': 'created', 'sale_id': sale.id,
+                'currency': currency, 'transaction_id': str(sale.transaction_id),
+            })
+
+    return JsonResponse({'success': True, 'results': results})
+
+
+@login_required
+def sale_detail(request, sale_id, currency=None):
+    """Display detailed sale information"""
+    sales = Transaction.objects.select_related('customer', 'user').prefetch_related('items__product')
     
-    if sale is None and (currency == 'Legacy' or currency is None):
-        try:
-            sale = Sale.objects.select_related('customer', 'user').prefetch_related('items__product').get(id=sale_id)
-            sale_type = 'Legacy'
-        except Sale.DoesNotExist:
-            pass
+    if currency is not None:
+        sale = sales.filter(source=currency, source_id=sale_id).first()
+    else:
+        # Legacy URL without currency: same precedence as before (USD, SOS, ETB, Legacy)
+        candidates = {t.source: t for t in sales.filter(source_id=sale_id)}
+        sale = next((candidates[s] for s in SALE_MODELS if s in candidates), None)
     
     if sale is None:
         raise Http404("Sale not found")
     
     context = {
         'sale': sale,
-        'sale_type': sale_type,
-        'currency': sale_type,
+        'sale_type': sale.source,
+        'currency': sale.source,
+        'day_closed': is_closed(timezone.localtime(sale.date_created).date()),
     }
     return render(request, 'core/sale_detail.html', context)
 
@@ -1226,6 +871,12 @@ def add_sale_item(request, currency, sale_id):
                 messages.error(request, f"Not enough stock. Available: {product.current_stock}")
                 return redirect('core:sale_detail', currency=currency, sale_id=sale.id)
             
+            check_day_open(
+                timezone.localtime(sale.date_created).date(), request.user,
+                override=bool(request.POST.get('override_close')), ip_address=request.META.get('REMOTE_ADDR'),
+                action=f'add {quantity} x {product.name} to sale #{sale.transaction_id}',
+            )
+            
             # Check if this product is already in the sale
             sale_item, created = item_model_class.objects.get_or_create(
                 sale=sale,
@@ -1270,6 +921,8 @@ def add_sale_item(request, currency, sale_id):
             
             messages.success(request, f'Added {quantity} x {product.name} to sale successfully!')
         
+        except DayClosedError as e:
+            messages.error(request, str(e))
         except (ValueError, Product.DoesNotExist, InvalidOperation) as e:
             messages.error(request, f"Invalid product or quantity: {str(e)}")
         
@@ -1280,6 +933,7 @@ def add_sale_item(request, currency, sale_id):
 
 
 @superuser_required
+@idempotent
 def restock_inventory(request):
     """Restock inventory items"""
     if request.method == 'POST':
@@ -1336,6 +990,217 @@ def restock_inventory(request):
     return render(request, 'core/restock_inventory.html', context)
 
 
+@superuser_required
+@idempotent
+@require_http_methods(['POST'])
+def api_bulk_restock(request):
+    """Restock and create products from a CSV/JSON manifest in one transaction.
+
+    Send a `manifest` file upload, or a JSON body (a list of rows or
+    {"rows": [...], "notes": ..., "dry_run": ...}). All rows are validated
+    first; if any fail nothing is written and the per-row errors come back.
+    """
+    upload = request.FILES.get('manifest')
+    try:
+        if upload is not None:
+            options = request.POST
+            rows = parse_manifest(upload.read(), 'json' if upload.name.lower().endswith('.json') else 'csv')
+        else:
+            try:
+                options = json.loads(request.body or b'null')
+            except (ValueError, UnicodeDecodeError):
+                return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+            options = options if isinstance(options, dict) else {}
+            rows = parse_manifest(request.body, 'json')
+    except ManifestError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    plan, errors = validate_manifest(rows)
+    if errors:
+        return JsonResponse({'success': False, 'error': f'{len(errors)} row(s) failed validation', 'errors': errors}, status=400)
+    if str(options.get('dry_run', '')).lower() in ('1', 'true', 'on'):
+        return JsonResponse({'success': True, 'dry_run': True, 'rows': len(plan)})
+
+    summary = apply_manifest(plan, request.user, request.META.get('REMOTE_ADDR'), str(options.get('notes') or '').strip())
+    summary['units'] = float(summary['units'])
+    for row in summary['rows']:
+        row['current_stock'] = float(row['current_stock'])
+    return JsonResponse({'success': True, **summary})
+
+
+STOCK_TAKE_BATCH_LIMIT = 500
+
+
+@superuser_required
+def stock_takes_list(request):
+    """Start stock takes and list past ones"""
+    if request.method == 'POST':
+        category = Category.objects.filter(pk=request.POST.get('category') or None).first()
+        stock_take = StockTake.start(request.user, category=category, notes=request.POST.get('notes', '').strip())
+        log_audit_action(
+            request.user, 'STOCK_TAKE_STARTED', 'StockTake', stock_take.id,
+            f'Started stock take #{stock_take.id} ({stock_take.lines.count()} products)',
+            request.META.get('REMOTE_ADDR')
+        )
+        return redirect('core:stock_take_detail', stock_take_id=stock_take.id)
+
+    stock_takes = StockTake.objects.select_related('category', 'started_by', 'posted_by').annotate(
+        line_count=Count('lines'),
+        counted_count=Count('lines', filter=Q(lines__counted_quantity__isnull=False)),
+    )[:50]
+    context = {
+        'stock_takes': stock_takes,
+        'categories': Category.objects.order_by('name'),
+    }
+    return render(request, 'core/stock_takes.html', context)
+
+
+@login_required
+def stock_take_detail(request, stock_take_id):
+    """Count entry for an open stock take, variance summary once posted"""
+    stock_take = get_object_or_404(StockTake.objects.select_related('category'), pk=stock_take_id)
+    lines = stock_take.lines.select_related('product').filter(counted_quantity__isnull=False).annotate(
+        difference=F('counted_quantity') - F('expected_quantity')
+    ).order_by('-date_counted')
+    totals = stock_take.lines.aggregate(
+        total=Count('id'),
+        counted=Count('id', filter=Q(counted_quantity__isnull=False)),
+        mismatched=Count('id', filter=Q(counted_quantity__isnull=False) & ~Q(counted_quantity=F('expected_quantity'))),
+    )
+    paginator = Paginator(lines, 100)
+    context = {
+        'stock_take': stock_take,
+        'lines': paginator.get_page(request.GET.get('page')),
+        'totals': totals,
+    }
+    return render(request, 'core/stock_take_detail.html', context)
+
+
+@login_required
+@idempotent
+@require_http_methods(['POST'])
+def api_stock_take_counts(request, stock_take_id):
+    """Record a batch of counts: {"counts": [{"product_id": 1, "quantity": 3, "add": false}, ...]}"""
+    stock_take = get_object_or_404(StockTake, pk=stock_take_id)
+    try:
+        payload = json.loads(request.body)
+        entries = payload['counts']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Expected {"counts": [...]}'}, status=400)
+    if not isinstance(entries, list) or not entries:
+        return JsonResponse({'success': False, 'error': 'No counts given'}, status=400)
+    if len(entries) > STOCK_TAKE_BATCH_LIMIT:
+        return JsonResponse({'success': False, 'error': f'At most {STOCK_TAKE_BATCH_LIMIT} counts per batch'}, status=400)
+
+    counts = []
+    errors = []
+    positions = {}
+    for index, entry in enumerate(entries):
+        try:
+            product_id = int(entry['product_id'])
+            quantity = Decimal(str(entry.get('quantity', 1)))
+        except (KeyError, TypeError, ValueError, AttributeError, InvalidOperation):
+            errors.append({'index': index, 'error': 'product_id and a numeric quantity are required'})
+            continue
+        if quantity < 0:
+            errors.append({'index': index, 'error': 'Quantity cannot be negative'})
+            continue
+        positions.setdefault(product_id, index)
+        counts.append((product_id, quantity, bool(entry.get('add'))))
+    known = set(Product.objects.filter(pk__in=positions).values_list('id', flat=True))
+    errors.extend(
+        {'index': index, 'error': f'Unknown product {product_id}'}
+        for product_id, index in positions.items() if product_id not in known
+    )
+    if errors:
+        return JsonResponse({'success': False, 'error': 'Invalid counts', 'errors': errors}, status=400)
+
+    try:
+        touched = stock_take.record_counts(counts, request.user)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
+    lines = stock_take.lines.filter(product_id__in={product_id for product_id, _quantity, _add in counts})
+    return JsonResponse({
+        'success': True,
+        'recorded': touched,
+        'lines': [
+            {
+                'product_id': product_id,
+                'expected': float(expected),
+                'counted': float(counted),
+            }
+            for product_id, expected, counted in lines.values_list('product_id', 'expected_quantity', 'counted_quantity')
+        ],
+    })
+
+
+@superuser_required
+@idempotent
+@require_http_methods(['POST'])
+def stock_take_post(request, stock_take_id):
+    """Post all variances of a stock take as inventory adjustments"""
+    stock_take = get_object_or_404(StockTake, pk=stock_take_id)
+    if request.POST.get('action') == 'cancel':
+        if StockTake.objects.filter(pk=stock_take.pk, status='OPEN').update(status='CANCELLED'):
+            messages.success(request, f'Stock take #{stock_take.id} cancelled.')
+        else:
+            messages.error(request, f'Stock take #{stock_take.id} is not open.')
+        return redirect('core:stock_take_detail', stock_take_id=stock_take.id)
+
+    try:
+        summary = stock_take.post(request.user, request.META.get('REMOTE_ADDR'))
+    except ValueError as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(
+            request,
+            f"Stock take #{stock_take.id} posted: {summary['adjusted']} of {summary['counted']} counted products adjusted "
+            f"(net {summary['net_change']:+})."
+        )
+    return redirect('core:stock_take_detail', stock_take_id=stock_take.id)
+
+
+DAILY_CLOSE_REPORT_DAYS = 14
+
+
+@superuser_required
+def daily_closes(request):
+    """Close a day (Z-report) and review recent days, closed ones read from their snapshots"""
+    if request.method == 'POST':
+        try:
+            day = datetime.strptime(request.POST.get('day', ''), '%Y-%m-%d').date()
+        except ValueError:
+            messages.error(request, "Invalid date.")
+            return redirect('core:daily_closes')
+        try:
+            close = close_day(day, request.user, ip_address=request.META.get('REMOTE_ADDR'))
+            messages.success(request, f"Closed {close.day}.")
+        except ValueError as e:
+            messages.error(request, str(e))
+        return redirect('core:daily_closes')
+
+    end_date = timezone.now().date()
+    start_date = end_date - timedelta(days=DAILY_CLOSE_REPORT_DAYS - 1)
+    try:
+        if request.GET.get('start_date') and request.GET.get('end_date'):
+            start_date = datetime.strptime(request.GET['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.GET['end_date'], '%Y-%m-%d').date()
+    except ValueError:
+        messages.error(request, "Invalid date range.")
+    rows, totals = period_summary(start_date, end_date)
+    context = {
+        'rows': rows,
+        'totals': totals,
+        'start_date': start_date,
+        'end_date': end_date,
+        'today': timezone.now().date(),
+    }
+    return render(request, 'core/daily_closes.html', context)
+
+
+CUSTOMER_SEARCH_LIST_LIMIT = 500
+
+
 @superuser_required
 def customers_list(request):
     """List all customers with filtering"""
@@ -1344,10 +1209,9 @@ def customers_list(request):
     # Search functionality
     search = request.GET.get('search', '')
     if search:
-        customers = customers.filter(
-            Q(name__icontains=search) |
-            Q(phone__icontains=search)
-        )
+        # Ranked: exact phone, phone prefix/suffix, then name matches
+        ranked_ids = ranked_customer_ids(search, limit=CUSTOMER_SEARCH_LIST_LIMIT)
+        customers = customers.filter(pk__in=ranked_ids).order_by(rank_ordering(ranked_ids))
     
     # Debt filter
     debt_filter = request.GET.get('debt_filter', '')
@@ -1453,112 +1317,25 @@ def edit_customer(request, customer_id):
 
 @superuser_required
 def customer_detail(request, customer_id):
-    """Display detailed customer information"""
-    try:
-        customer = get_object_or_404(Customer, id=customer_id)
-        
-        # Get currency settings
-        currency_settings = CurrencySettings.objects.first()
-        if not currency_settings:
-            currency_settings = CurrencySettings.objects.create()
-        
-        # Get sales from all models
-        usd_sales = SaleUSD.objects.filter(customer=customer).select_related('user').prefetch_related('items')
-        sos_sales = SaleSOS.objects.filter(customer=customer).select_related('user').prefetch_related('items')
-        etb_sales = SaleETB.objects.filter(customer=customer).select_related('user').prefetch_related('items')
-        legacy_sales = Sale.objects.filter(customer=customer).select_related('user').prefetch_related('items')
-        
-        # Combine and annotate sales
-        all_sales_list = []
-        
-        for s in usd_sales:
-            s.currency = 'USD'
-            s.total_amount_usd = s.total_amount
-            s.amount_paid_usd = s.amount_paid
-            s.debt_amount_usd = s.debt_amount
-            all_sales_list.append(s)
-        
-        for s in sos_sales:
-            s.currency = 'SOS'
-            s.total_amount_usd = currency_settings.convert_sos_to_usd(s.total_amount)
-            s.amount_paid_usd = currency_settings.convert_sos_to_usd(s.amount_paid)
-            s.debt_amount_usd = currency_settings.convert_sos_to_usd(s.debt_amount)
-            all_sales_list.append(s)
-        
-        for s in etb_sales:
-            s.currency = 'ETB'
-            s.total_amount_usd = currency_settings.convert_etb_to_usd(s.total_amount)
-            s.amount_paid_usd = currency_settings.convert_etb_to_usd(s.amount_paid)
-            s.debt_amount_usd = currency_settings.convert_etb_to_usd(s.debt_amount)
-            all_sales_list.append(s)
-        
-        for s in legacy_sales:
-            if s.currency == 'SOS':
-                s.total_amount_usd = currency_settings.convert_sos_to_usd(s.total_amount)
-                s.amount_paid_usd = currency_settings.convert_sos_to_usd(s.amount_paid)
-                s.debt_amount_usd = currency_settings.convert_sos_to_usd(s.debt_amount)
-            elif s.currency == 'ETB':
-                s.total_amount_usd = currency_settings.convert_etb_to_usd(s.total_amount)
-                s.amount_paid_usd = currency_settings.convert_etb_to_usd(s.amount_paid)
-                s.debt_amount_usd = currency_settings.convert_etb_to_usd(s.debt_amount)
-            else:
-                s.total_amount_usd = s.total_amount
-                s.amount_paid_usd = s.amount_paid
-                s.debt_amount_usd = s.debt_amount
-            all_sales_list.append(s)
-        
-        # Sort sales by date
-        all_sales_list.sort(key=lambda x: x.date_created, reverse=True)
-        sales = all_sales_list
-        
-        # Get payments
-        usd_payments = DebtPaymentUSD.objects.filter(customer=customer)
-        sos_payments = DebtPaymentSOS.objects.filter(customer=customer)
-        etb_payments = DebtPaymentETB.objects.filter(customer=customer)
-        legacy_payments = DebtPayment.objects.filter(customer=customer)
-        
-        all_payments_list = []
-        
-        for p in usd_payments:
-            p.original_currency = 'USD'
-            p.original_amount = p.amount
-            all_payments_list.append(p)
-        
-        for p in sos_payments:
-            p.original_currency = 'SOS'
-            p.original_amount = p.amount
-            all_payments_list.append(p)
-        
-        for p in etb_payments:
-            p.original_currency = 'ETB'
-            p.original_amount = p.amount
-            all_payments_list.append(p)
-        
-        for p in legacy_payments:
-            if not hasattr(p, 'original_currency'):
-                p.original_currency = 'USD'
-            p.original_amount = p.amount
-            all_payments_list.append(p)
-        
-        all_payments_list.sort(key=lambda x: x.date_created, reverse=True)
-        payments = all_payments_list
+    """Display detailed customer information"""
+    try:
+        customer = get_object_or_404(Customer, id=customer_id)
         
-        # Calculate metrics
-        total_spent_usd = sum(s.total_amount_usd for s in sales)
+        # Get currency settings
+        currency_settings = CurrencySettings.objects.first()
+        if not currency_settings:
+            currency_settings = CurrencySettings.objects.create()
         
-        total_products_bought = 0
-        for sale in sales:
-            if hasattr(sale, 'items'):
-                total_products_bought += sum(item.quantity for item in sale.items.all())
+        # Sales and payments across all currencies come from the unified ledger
+        sales = list(
+            customer.transactions.select_related('user').prefetch_related('items__product').order_by('-date_created')
+        )
+        payments = list(customer.ledger_payments.select_related('user').order_by('-date_created'))
         
-        total_debt_paid_usd = Decimal('0.00')
-        for payment in payments:
-            if payment.original_currency == 'USD':
-                total_debt_paid_usd += payment.amount
-            elif payment.original_currency == 'SOS':
-                total_debt_paid_usd += currency_settings.convert_sos_to_usd(payment.amount)
-            elif payment.original_currency == 'ETB':
-                total_debt_paid_usd += currency_settings.convert_etb_to_usd(payment.amount)
+        # Calculate metrics from the normalized USD columns
+        total_spent_usd = sum((s.total_amount_usd for s in sales), Decimal('0.00'))
+        total_products_bought = sum(item.quantity for sale in sales for item in sale.items.all())
+        total_debt_paid_usd = sum((p.amount_usd for p in payments), Decimal('0.00'))
         
         # Calculate current debt in USD
         current_debt_usd = customer.total_debt_usd
@@ -1599,7 +1376,49 @@ def customer_detail(request, customer_id):
         return redirect('core:customers_list')
 
 
+def _settle_debt(customer, currency, amount, user, override=False, ip_address=None):
+    """Take a debt payment off the customer's balance and pay off their oldest sales first.
+
+    The payment lands on today and raises the amount paid on every older
+    sale it reaches, so each of those days must be open or overridden;
+    DayClosedError rolls the caller's transaction back. Call it inside
+    transaction.atomic(). Returns (old_debt, new_debt).
+    """
+    today = timezone.localtime().date()
+    check_day_open(
+        today, user, override=override, ip_address=ip_address,
+        action=f'debt payment of {amount} {currency} from {customer.name}',
+    )
+    checked_days = {today}
+
+    debt_field = f'total_debt_{currency.lower()}'
+    old_debt = getattr(customer, debt_field)
+    setattr(customer, debt_field, max(old_debt - amount, Decimal('0.00')))
+    customer.save()
+
+    remaining_payment = amount
+    sales_model = SALE_MODELS[currency]
+    for sale in sales_model.objects.filter(customer=customer, debt_amount__gt=0).order_by('date_created'):
+        if remaining_payment <= 0:
+            break
+
+        sale_day = timezone.localtime(sale.date_created).date()
+        if sale_day not in checked_days:
+            check_day_open(
+                sale_day, user, override=override, ip_address=ip_address,
+                action=f'debt payment applied to sale #{sale.transaction_id}',
+            )
+            checked_days.add(sale_day)
+
+        paid = min(sale.debt_amount, remaining_payment)
+        sale.amount_paid += paid
+        remaining_payment -= paid
+        sale.save()
+    return old_debt, getattr(customer, debt_field)
+
+
 @superuser_required
+@idempotent
 def record_debt_payment(request, customer_id):
     """Record a debt payment for a customer"""
     customer = get_object_or_404(Customer, id=customer_id)
@@ -1634,86 +1453,26 @@ def record_debt_payment(request, customer_id):
                 messages.error(request, f'Payment amount ({payment.amount} {currency}) cannot exceed total debt ({customer_debt} {currency})')
                 return redirect('core:record_debt_payment', customer_id=customer.id)
             
-            with transaction.atomic():
-                # Save the payment
-                payment.save()
-                
-                # Update customer debt
-                old_debt = Decimal('0.00')
-                if currency == 'USD':
-                    old_debt = customer.total_debt_usd
-                    customer.total_debt_usd -= payment.amount
-                    if customer.total_debt_usd < 0:
-                        customer.total_debt_usd = Decimal('0.00')
-                elif currency == 'SOS':
-                    old_debt = customer.total_debt_sos
-                    customer.total_debt_sos -= payment.amount
-                    if customer.total_debt_sos < 0:
-                        customer.total_debt_sos = Decimal('0.00')
-                elif currency == 'ETB':
-                    old_debt = customer.total_debt_etb
-                    customer.total_debt_etb -= payment.amount
-                    if customer.total_debt_etb < 0:
-                        customer.total_debt_etb = Decimal('0.00')
-                
-                customer.save()
-                
-                # Apply payment to sales with debt (oldest first)
-                remaining_payment = payment.amount
-                
-                if currency == 'USD':
-                    sales_model = SaleUSD
-                elif currency == 'SOS':
-                    sales_model = SaleSOS
-                elif currency == 'ETB':
-                    sales_model = SaleETB
-                else:
-                    sales_model = Sale
-                
-                if sales_model == Sale:
-                    customer_sales_with_debt = sales_model.objects.filter(
-                        customer=customer,
-                        debt_amount__gt=0,
-                        currency=currency
-                    ).order_by('date_created')
-                else:
-                    customer_sales_with_debt = sales_model.objects.filter(
-                        customer=customer,
-                        debt_amount__gt=0
-                    ).order_by('date_created')
-                
-                for sale in customer_sales_with_debt:
-                    if remaining_payment <= 0:
-                        break
+            try:
+                with transaction.atomic():
+                    old_debt, new_debt = _settle_debt(
+                        customer, currency, payment.amount, request.user,
+                        override=bool(request.POST.get('override_close')), ip_address=request.META.get('REMOTE_ADDR'),
+                    )
+                    payment.save()
                     
-                    if sale.debt_amount <= remaining_payment:
-                        sale.amount_paid += sale.debt_amount
-                        remaining_payment -= sale.debt_amount
-                        sale.save()
-                    else:
-                        sale.amount_paid += remaining_payment
-                        remaining_payment = Decimal('0.00')
-                        sale.save()
-                
-                # Get new debt amount
-                if currency == 'USD':
-                    new_debt = customer.total_debt_usd
-                elif currency == 'SOS':
-                    new_debt = customer.total_debt_sos
-                elif currency == 'ETB':
-                    new_debt = customer.total_debt_etb
-                else:
-                    new_debt = Decimal('0.00')
-                
-                # Log audit action
-                log_audit_action(
-                    request.user, 'DEBT_PAID', 'Customer', customer.id,
-                    f'Recorded payment of {payment.amount} {currency}. Debt reduced from {old_debt} to {new_debt} {currency}',
-                    request.META.get('REMOTE_ADDR')
-                )
-                
-                messages.success(request, f'Payment of {payment.amount} {currency} recorded successfully! Debt reduced to {new_debt} {currency}')
-                return redirect('core:customer_detail', customer_id=customer.id)
+                    # Log audit action
+                    log_audit_action(
+                        request.user, 'DEBT_PAID', 'Customer', customer.id,
+                        f'Recorded payment of {payment.amount} {currency}. Debt reduced from {old_debt} to {new_debt} {currency}',
+                        request.META.get('REMOTE_ADDR')
+                    )
+                    
+                    messages.success(request, f'Payment of {payment.amount} {currency} recorded successfully! Debt reduced to {new_debt} {currency}')
+                    return redirect('core:customer_detail', customer_id=customer.id)
+            except DayClosedError as e:
+                messages.error(request, f'{e}. Tick the override to record this payment.')
+                return redirect('core:record_debt_payment', customer_id=customer.id)
     else:
         form = DebtPaymentForm(customer=customer)
     
@@ -1727,6 +1486,10 @@ def record_debt_payment(request, customer_id):
         'current_debt_usd': current_debt_usd,
         'current_debt_sos': current_debt_sos,
         'current_debt_etb': customer.total_debt_etb,
+        'day_closed': DailyClose.objects.filter(
+            Q(day=timezone.localtime().date())
+            | Q(day__in=Transaction.objects.filter(customer=customer, debt_amount__gt=0).dates('date_created', 'day'))
+        ).exists(),
     }
     return render(request, 'core/record_debt_payment.html', context)
 
@@ -1836,6 +1599,22 @@ def currency_settings_view(request):
 # API ENDPOINTS
 # ========================================
 
+@login_required
+@require_http_methods(['GET'])
+def api_scan(request, code):
+    """Product and per-currency prices for a scanned barcode or SKU"""
+    result = lookup_code(code)
+    if result is None or not result['product']['is_active']:
+        return JsonResponse({'success': False, 'error': f'No product with code {code}'}, status=404)
+    return JsonResponse({
+        'success': True,
+        'code': code.strip(),
+        'pack_quantity': float(result['pack_quantity']),
+        'label': result['label'],
+        'product': result['product'],
+    })
+
+
 @login_required
 def api_search_products(request):
     """API endpoint to search products"""
@@ -1851,14 +1630,15 @@ def api_search_products(request):
             is_active=True
         )[:10]
     
-    # Get currency settings
-    currency_settings = CurrencySettings.objects.first()
+    products = list(products.select_related('category'))
+    price_map = ProductPrice.sell_price_map(product.id for product in products)
     
     data = []
     for product in products:
+        prices = price_map.get(product.id, {})
         selling_price_usd = float(product.selling_price)
-        selling_price_sos = float(currency_settings.convert_usd_to_sos(product.selling_price)) if currency_settings else 0
-        selling_price_etb = float(currency_settings.convert_usd_to_etb(product.selling_price)) if currency_settings else 0
+        selling_price_sos = float(prices.get('SOS', 0))
+        selling_price_etb = float(prices.get('ETB', 0))
         
         data.append({
             'id': product.id,
@@ -1879,6 +1659,165 @@ def api_search_products(request):
     return JsonResponse(data, safe=False)
 
 
+
+def _catalog_since(request):
+    try:
+        return max(0, int(request.GET.get('since', 0)))
+    except ValueError:
+        return 0
+
+
+def _catalog_etag(request):
+    return f'catalog-{_catalog_since(request)}-{CatalogVersion.current()}'
+
+
+@login_required
+@gzip_page
+@condition(etag_func=_catalog_etag)
+def api_catalog(request):
+    """Products, categories and prices changed since a catalog version, for the POS's local cache.
+
+    `since=0` returns the full active catalog. Later calls pass the returned
+    `version` back as `since` and receive only changed rows, plus `deleted`
+    ids for products and categories that were removed or deactivated.
+    """
+    since = _catalog_since(request)
+    version = CatalogVersion.current()
+    currency_settings = CurrencySettings.objects.first()
+    sos_rate = currency_settings.usd_to_sos_rate if currency_settings else Decimal('0')
+    etb_rate = currency_settings.usd_to_etb_rate if currency_settings else Decimal('0')
+
+    if since:
+        products = Product.objects.filter(catalog_version__gt=since)
+        categories = Category.objects.filter(catalog_version__gt=since)
+    else:
+        products = Product.objects.filter(is_active=True)
+        categories = Category.objects.all()
+    products = products.order_by('id')
+    categories = categories.order_by('id')
+
+    products = list(products.values(
+        'id', 'name', 'brand', 'category_id', 'purchase_price', 'selling_price', 'current_stock',
+        'low_stock_threshold', 'selling_unit', 'minimum_sale_length', 'is_active',
+    ))
+    price_map = ProductPrice.sell_price_map(product['id'] for product in products if product['is_active'])
+
+    product_rows = []
+    deleted_products = []
+    for product in products:
+        if not product['is_active']:
+            deleted_products.append(product['id'])
+            continue
+        selling_price = product['selling_price']
+        prices = price_map.get(product['id'], {})
+        product_rows.append({
+            'id': product['id'],
+            'name': product['name'],
+            'brand': product['brand'],
+            'category_id': product['category_id'],
+            'purchase_price': float(product['purchase_price'] or 0),
+            'selling_price': float(selling_price),
+            'selling_price_usd': float(selling_price),
+            'selling_price_sos': float(prices.get('SOS', 0)),
+            'selling_price_etb': float(prices.get('ETB', 0)),
+            'current_stock': float(product['current_stock']),
+            'low_stock_threshold': float(product['low_stock_threshold']),
+            'selling_unit': product['selling_unit'],
+            'minimum_sale_length': float(product['minimum_sale_length']) if product['minimum_sale_length'] else None,
+        })
+
+    deleted_categories = []
+    if since:
+        for object_type, object_id in CatalogTombstone.objects.filter(
+            catalog_version__gt=since
+        ).values_list('object_type', 'object_id'):
+            if object_type == 'product':
+                deleted_products.append(object_id)
+            else:
+                deleted_categories.append(object_id)
+
+    response = JsonResponse({
+        'version': version,
+        'full': not since,
+        'rates': {'usd_to_sos': float(sos_rate), 'usd_to_etb': float(etb_rate)},
+        'categories': list(categories.values('id', 'name')),
+        'products': product_rows,
+        'deleted': {'products': deleted_products, 'categories': deleted_categories},
+    })
+    # Always revalidate; unchanged catalogs come back as a 304 with no body
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+CUSTOMER_LOOKUP_PAGE_SIZE = 20
+CUSTOMER_LOOKUP_MAX_RANKED = 200
+
+
+def _encode_customer_cursor(name_key, customer_id):
+    raw = json.dumps([name_key, customer_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_customer_cursor(cursor):
+    try:
+        name_key, customer_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(name_key), int(customer_id)
+    except (ValueError, TypeError):
+        return None
+
+
+@login_required
+def api_customer_lookup(request):
+    """Cursor-paginated customer picker source.
+
+    Without `q`, customers are listed by name with a keyset cursor. With `q`,
+    results come ranked from the customer search index and the cursor is an
+    offset into that ranking (capped at CUSTOMER_LOOKUP_MAX_RANKED).
+    """
+    query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor', '')
+    try:
+        page_size = min(max(int(request.GET.get('limit', CUSTOMER_LOOKUP_PAGE_SIZE)), 1), 100)
+    except ValueError:
+        page_size = CUSTOMER_LOOKUP_PAGE_SIZE
+    customers = Customer.objects.all()
+    if request.GET.get('active') == '1':
+        customers = customers.filter(is_active=True)
+
+    if query:
+        try:
+            offset = max(int(cursor or 0), 0)
+        except ValueError:
+            offset = 0
+        ranked_ids = ranked_customer_ids(query, limit=min(offset + page_size + 1, CUSTOMER_LOOKUP_MAX_RANKED))
+        page_ids = ranked_ids[offset:offset + page_size]
+        page = list(customers.filter(pk__in=page_ids).order_by(rank_ordering(page_ids)))
+        has_more = len(ranked_ids) > offset + page_size
+        next_cursor = str(offset + page_size) if has_more else None
+    else:
+        customers = customers.order_by('name_key', 'id')
+        position = _decode_customer_cursor(cursor) if cursor else None
+        if position:
+            name_key, customer_id = position
+            customers = customers.filter(Q(name_key__gt=name_key) | Q(name_key=name_key, id__gt=customer_id))
+        page = list(customers[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        next_cursor = _encode_customer_cursor(page[-1].name_key, page[-1].id) if has_more else None
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': customer.id,
+                'text': customer_label(customer),
+                'name': customer.name,
+                'phone': customer.phone,
+            }
+            for customer in page
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
 @login_required
 def api_search_customers(request):
     """API endpoint to search customers"""
@@ -1887,10 +1826,7 @@ def api_search_customers(request):
     if len(query) < 2:
         customers = Customer.objects.all()[:10]
     else:
-        customers = Customer.objects.filter(
-            Q(name__icontains=query) |
-            Q(phone__icontains=query)
-        )[:10]
+        customers = Customer.search(query, limit=10)
     
     data = []
     for customer in customers:
@@ -1907,6 +1843,7 @@ def api_search_customers(request):
 
 
 @login_required
+@idempotent
 def api_create_customer(request):
     """API endpoint to create a customer"""
     if request.method != 'POST':
@@ -1955,6 +1892,7 @@ def api_create_customer(request):
 
 
 @superuser_required
+@idempotent
 def api_create_product(request):
     """API endpoint to create a product"""
     if request.method != 'POST':
@@ -2160,6 +2098,7 @@ def edit_sale(request, currency, sale_id):
         return redirect('core:sales_list')
     
     sale = get_object_or_404(model_class, id=sale_id)
+    sale_day = timezone.localtime(sale.date_created).date()
     
     if request.method == 'POST':
         new_customer_id = request.POST.get('customer', '').strip()
@@ -2167,6 +2106,11 @@ def edit_sale(request, currency, sale_id):
         
         try:
             with transaction.atomic():
+                check_day_open(
+                    sale_day, request.user, override=bool(request.POST.get('override_close')),
+                    ip_address=request.META.get('REMOTE_ADDR'), action=f'edit sale #{sale.transaction_id}',
+                )
+                
                 # Store old values
                 old_debt = sale.debt_amount
                 old_customer = sale.customer
@@ -2219,7 +2163,7 @@ def edit_sale(request, currency, sale_id):
             return redirect('core:edit_sale', currency=currency, sale_id=sale.id)
     
     # GET request - prepare context
-    customers = Customer.objects.all().order_by('name')
+    customer_picker = CustomerPickerWidget(attrs={'id': 'customerSelect'}).render('customer', sale.customer_id)
     currency_settings = CurrencySettings.objects.first()
     
     usd_to_etb_rate = currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00')
@@ -2265,7 +2209,7 @@ def edit_sale(request, currency, sale_id):
     context = {
         'sale': sale,
         'currency': currency,
-        'customers': customers,
+        'customer_picker': customer_picker,
         'total_amount_etb': total_amount_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
         'amount_paid_etb': amount_paid_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
         'debt_amount_etb': debt_amount_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
@@ -2275,6 +2219,7 @@ def edit_sale(request, currency, sale_id):
         'usd_to_etb_rate': usd_to_etb_rate,
         'usd_to_sos_rate': usd_to_sos_rate,
         'etb_exchange_rate': etb_exchange_rate,
+        'day_closed': is_closed(sale_day),
     }
     
     return render(request, 'core/edit_sale.html', context)
@@ -2308,104 +2253,37 @@ def sales_history_view(request):
     # Get currency settings
     currency_settings = CurrencySettings.objects.first()
     usd_to_etb_rate = currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00')
-    usd_to_sos_rate = currency_settings.usd_to_sos_rate if currency_settings else Decimal('8000.00')
-    
-    # Query sales
-    usd_sales = SaleUSD.objects.filter(
-        date_created__date__gte=start_date,
-        date_created__date__lte=end_date,
-    ).select_related('customer', 'user')
-    
-    sos_sales = SaleSOS.objects.filter(
-        date_created__date__gte=start_date,
-        date_created__date__lte=end_date,
-    ).select_related('customer', 'user')
     
-    etb_sales = SaleETB.objects.filter(
+    # Query sales; amount_etb is native for ETB sales and from the stored USD equivalents otherwise
+    sales = Transaction.objects.exclude(source='Legacy').filter(
         date_created__date__gte=start_date,
         date_created__date__lte=end_date,
-    ).select_related('customer', 'user')
+    ).select_related('customer', 'user').annotate(amount_etb=Transaction.amount_etb(usd_to_etb_rate))
     
     # Apply currency filter
-    if currency_filter == 'USD':
-        sos_sales = sos_sales.none()
-        etb_sales = etb_sales.none()
-    elif currency_filter == 'SOS':
-        usd_sales = usd_sales.none()
-        etb_sales = etb_sales.none()
-    elif currency_filter == 'ETB':
-        usd_sales = usd_sales.none()
-        sos_sales = sos_sales.none()
+    if currency_filter in ('USD', 'SOS', 'ETB'):
+        sales = sales.filter(currency=currency_filter)
     
     # Apply customer search
     if customer_search:
-        usd_sales = usd_sales.filter(Q(customer__name__icontains=customer_search) | Q(customer__phone__icontains=customer_search))
-        sos_sales = sos_sales.filter(Q(customer__name__icontains=customer_search) | Q(customer__phone__icontains=customer_search))
-        etb_sales = etb_sales.filter(Q(customer__name__icontains=customer_search) | Q(customer__phone__icontains=customer_search))
+        sales = sales.filter(Q(customer__name__icontains=customer_search) | Q(customer__phone__icontains=customer_search))
     
     # Apply transaction ID search
     if transaction_search:
-        usd_sales = usd_sales.filter(transaction_id__icontains=transaction_search)
-        sos_sales = sos_sales.filter(transaction_id__icontains=transaction_search)
-        etb_sales = etb_sales.filter(transaction_id__icontains=transaction_search)
-    
-    # Combine all sales
-    all_sales = []
-    
-    for sale in usd_sales:
-        amount_for_conversion = sale.total_amount if sale.total_amount > 0 else sale.amount_paid
-        all_sales.append({
-            'id': sale.id,
-            'transaction_id': sale.transaction_id,
-            'customer': sale.customer,
-            'user': sale.user,
-            'currency': 'USD',
-            'total_amount': sale.total_amount,
-            'amount_paid': sale.amount_paid,
-            'debt_amount': sale.debt_amount,
-            'date_created': sale.date_created,
-            'is_completed': sale.is_completed,
-            'amount_etb': amount_for_conversion * usd_to_etb_rate,
-        })
-    
-    for sale in sos_sales:
-        amount_for_conversion = sale.total_amount if sale.total_amount > 0 else sale.amount_paid
-        amount_etb = (amount_for_conversion / usd_to_sos_rate) * usd_to_etb_rate if usd_to_sos_rate > 0 else Decimal('0.00')
-        all_sales.append({
-            'id': sale.id,
-            'transaction_id': sale.transaction_id,
-            'customer': sale.customer,
-            'user': sale.user,
-            'currency': 'SOS',
-            'total_amount': sale.total_amount,
-            'amount_paid': sale.amount_paid,
-            'debt_amount': sale.debt_amount,
-            'date_created': sale.date_created,
-            'is_completed': sale.is_completed,
-            'amount_etb': amount_etb,
-        })
-    
-    for sale in etb_sales:
-        amount_for_conversion = sale.total_amount if sale.total_amount > 0 else sale.amount_paid
-        all_sales.append({
-            'id': sale.id,
-            'transaction_id': sale.transaction_id,
-            'customer': sale.customer,
-            'user': sale.user,
-            'currency': 'ETB',
-            'total_amount': sale.total_amount,
-            'amount_paid': sale.amount_paid,
-            'debt_amount': sale.debt_amount,
-            'date_created': sale.date_created,
-            'is_completed': sale.is_completed,
-            'amount_etb': amount_for_conversion,
-        })
-    
-    # Sort by date
-    all_sales.sort(key=lambda x: x['date_created'], reverse=True)
+        sales = sales.filter(transaction_id__icontains=transaction_search)
     
     # Pagination
-    paginator = Paginator(all_sales, 20)
+    paginator = Paginator(sales, 20)
+    range_totals = None
+    if not customer_search and not transaction_search:
+        # The running totals already hold the range's count; no COUNT(*) over the rows
+        totals_key = currency_filter if currency_filter in ('USD', 'SOS', 'ETB') else 'ALL'
+        live_totals = SalesRunningTotal.range_totals(start_date, end_date)
+        if live_totals[totals_key]['sales_count']:
+            # An empty range (or rollup rows not built yet) is left to COUNT(*), which is cheap then
+            paginator.count = live_totals[totals_key]['sales_count']
+        # The listed rows are live; the totals shown keep closed days at their Z-report figures
+        range_totals = apply_closed_days(live_totals, start_date, end_date)[totals_key]
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
@@ -2415,7 +2293,8 @@ def sales_history_view(request):
         'currency_filter': currency_filter,
         'customer_search': customer_search,
         'transaction_search': transaction_search,
-        'total_sales': len(all_sales),
+        'total_sales': paginator.count,
+        'range_totals': range_totals,
         'start_date': start_date,
         'end_date': end_date,
     }
@@ -2444,103 +2323,47 @@ def revenue_details_view(request):
     # Get currency settings
     currency_settings = CurrencySettings.objects.first()
     usd_to_etb_rate = currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00')
-    usd_to_sos_rate = currency_settings.usd_to_sos_rate if currency_settings else Decimal('8000.00')
-    
-    # Query sale items
-    usd_items = SaleItemUSD.objects.filter(
-        sale__date_created__date__gte=start_date,
-        sale__date_created__date__lte=end_date,
-    ).select_related('product', 'sale', 'product__category')
-    
-    sos_items = SaleItemSOS.objects.filter(
-        sale__date_created__date__gte=start_date,
-        sale__date_created__date__lte=end_date,
-    ).select_related('product', 'sale', 'product__category')
-    
-    etb_items = SaleItemETB.objects.filter(
-        sale__date_created__date__gte=start_date,
-        sale__date_created__date__lte=end_date,
-    ).select_related('product', 'sale', 'product__category')
     
+    # Per-product totals come from the pre-aggregated fact cube
+    fact_filters = {}
     if category_filter:
-        usd_items = usd_items.filter(product__category_id=category_filter)
-        sos_items = sos_items.filter(product__category_id=category_filter)
-        etb_items = etb_items.filter(product__category_id=category_filter)
-    
-    # Aggregate by product
-    product_revenue = {}
-    
-    for item in usd_items:
-        product_id = item.product.id
-        if product_id not in product_revenue:
-            product_revenue[product_id] = {
-                'product': item.product,
-                'total_qty': Decimal('0'),
-                'total_revenue_etb': Decimal('0'),
-                'items': []
-            }
-        product_revenue[product_id]['total_qty'] += item.quantity
-        product_revenue[product_id]['total_revenue_etb'] += item.total_price * usd_to_etb_rate
-        product_revenue[product_id]['items'].append({
-            'quantity': item.quantity,
-            'unit_price': item.unit_price,
-            'total_price': item.total_price,
-            'currency': 'USD',
-            'date': item.sale.date_created
-        })
-    
-    for item in sos_items:
-        product_id = item.product.id
-        if product_id not in product_revenue:
-            product_revenue[product_id] = {
-                'product': item.product,
-                'total_qty': Decimal('0'),
-                'total_revenue_etb': Decimal('0'),
-                'items': []
-            }
-        product_revenue[product_id]['total_qty'] += item.quantity
-        revenue_etb = (item.total_price / usd_to_sos_rate) * usd_to_etb_rate if usd_to_sos_rate > 0 else Decimal('0')
-        product_revenue[product_id]['total_revenue_etb'] += revenue_etb
-        product_revenue[product_id]['items'].append({
-            'quantity': item.quantity,
-            'unit_price': item.unit_price,
-            'total_price': item.total_price,
-            'currency': 'SOS',
-            'date': item.sale.date_created
-        })
-    
-    for item in etb_items:
-        product_id = item.product.id
-        if product_id not in product_revenue:
-            product_revenue[product_id] = {
-                'product': item.product,
-                'total_qty': Decimal('0'),
-                'total_revenue_etb': Decimal('0'),
-                'items': []
-            }
-        product_revenue[product_id]['total_qty'] += item.quantity
-        product_revenue[product_id]['total_revenue_etb'] += item.total_price
-        product_revenue[product_id]['items'].append({
-            'quantity': item.quantity,
-            'unit_price': item.unit_price,
-            'total_price': item.total_price,
-            'currency': 'ETB',
-            'date': item.sale.date_created
-        })
-    
-    # Convert to list and sort
-    revenue_items = list(product_revenue.values())
+        fact_filters['category_id'] = category_filter
+    order_by = {
+        'quantity': ['-total_quantity'],
+        'date': ['-last_day'],
+    }.get(sort_by, ['-total_revenue_usd'])
+    # Revenue is normalized to USD on the fact rows; the ETB figure is one more column in SQL
+    product_rows = list(SalesFact.summarize(
+        ['product'], start_date=start_date, end_date=end_date, order_by=order_by, **fact_filters
+    ).annotate(
+        total_revenue_etb=ExpressionWrapper(
+            F('total_revenue_usd') * Value(usd_to_etb_rate),
+            output_field=models.DecimalField(max_digits=20, decimal_places=2),
+        ),
+    ))
+    products = Product.objects.select_related('category').in_bulk([row['product_id'] for row in product_rows])
+    
+    # Line items are loaded per product on expand, from api_revenue_product_lines
+    revenue_items = [
+        {
+            'product': products[row['product_id']],
+            'total_qty': row['total_quantity'],
+            'total_revenue_etb': row['total_revenue_etb'],
+            'line_count': row['total_line_count'],
+            'last_sold': row['last_day'],
+        }
+        for row in product_rows
+        if row['product_id'] in products
+    ]
     
-    if sort_by == 'quantity':
-        revenue_items.sort(key=lambda x: x['total_qty'], reverse=True)
-    elif sort_by == 'date':
-        revenue_items.sort(key=lambda x: max([i['date'] for i in x['items']]), reverse=True)
+    # Calculate totals; without a category filter they come from the running totals, closed days from their Z-reports
+    if fact_filters:
+        totals = SalesFact.summarize(start_date=start_date, end_date=end_date, **fact_filters)
     else:
-        revenue_items.sort(key=lambda x: x['total_revenue_etb'], reverse=True)
-    
-    # Calculate totals
-    total_revenue_etb = sum(item['total_revenue_etb'] for item in revenue_items)
-    total_items_sold = sum(item['total_qty'] for item in revenue_items)
+        range_totals = apply_closed_days(SalesRunningTotal.range_totals(start_date, end_date), start_date, end_date)['ALL']
+        totals = {'total_revenue_usd': range_totals['revenue_usd'], 'total_quantity': range_totals['quantity']}
+    total_revenue_etb = (totals['total_revenue_usd'] or Decimal('0')) * usd_to_etb_rate
+    total_items_sold = totals['total_quantity'] or Decimal('0')
     avg_sale_value = total_revenue_etb / len(revenue_items) if revenue_items else Decimal('0')
     
     categories = Category.objects.all().order_by('name')
@@ -2561,6 +2384,271 @@ def revenue_details_view(request):
 
 
 @login_required
+@require_http_methods(['GET'])
+def api_revenue_product_lines(request, product_id):
+    """Paginated sale lines of one product for the revenue details drill-down"""
+    try:
+        start_date = datetime.strptime(request.GET.get('start_date', ''), "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.GET.get('end_date', ''), "%Y-%m-%d").date()
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'start_date and end_date (YYYY-MM-DD) are required'}, status=400)
+    lines, has_next = product_sale_lines(product_id, start_date, end_date, page)
+    return JsonResponse({
+        'success': True,
+        'page': page,
+        'has_next': has_next,
+        'lines': [
+            {
+                'quantity': float(line['quantity']),
+                'unit_price': float(line['unit_price']),
+                'total_price': float(line['total_price']),
+                'currency': line['currency'],
+                'date': line['date'].isoformat(),
+            }
+            for line in lines
+        ],
+    })
+
+
+SALES_TOTALS_DEFAULT_DAYS = 7
+
+
+@login_required
+@require_http_methods(['GET'])
+def api_sales_totals(request):
+    """Sales totals for a date range, compared with the previous period and the same dates last year.
+
+    `period` is 'week' or 'month' (to date), or 'custom' with start_date and
+    end_date. Totals come from the running totals, so any range answers in
+    a fixed number of queries. Cost and profit are for superusers only.
+    """
+    period = request.GET.get('period', 'custom')
+    if period not in COMPARISON_PERIODS:
+        return JsonResponse({'success': False, 'error': f"period must be one of {', '.join(COMPARISON_PERIODS)}"}, status=400)
+    if period == 'custom':
+        try:
+            end_date = timezone.now().date()
+            if request.GET.get('end_date'):
+                end_date = datetime.strptime(request.GET['end_date'], "%Y-%m-%d").date()
+            start_date = end_date - timedelta(days=SALES_TOTALS_DEFAULT_DAYS - 1)
+            if request.GET.get('start_date'):
+                start_date = datetime.strptime(request.GET['start_date'], "%Y-%m-%d").date()
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+        if start_date > end_date:
+            return JsonResponse({'success': False, 'error': 'start_date must not be after end_date'}, status=400)
+    else:
+        start_date, end_date = period_range(period)
+
+    hidden = () if request.user.is_superuser else ('cost_usd', 'profit_usd')
+
+    def serialize(block):
+        data = {
+            'start_date': block['start_date'].isoformat(),
+            'end_date': block['end_date'].isoformat(),
+            'totals': {
+                currency: {
+                    metric: value if metric == 'sales_count' else float(value)
+                    for metric, value in figures.items() if metric not in hidden
+                }
+                for currency, figures in block['totals'].items()
+            },
+        }
+        if 'change' in block:
+            data['change'] = {metric: value for metric, value in block['change'].items() if metric not in hidden}
+        return data
+
+    comparison = period_comparison(start_date, end_date, period)
+    return JsonResponse({
+        'success': True,
+        'period': period,
+        **{name: serialize(block) for name, block in comparison.items()},
+    })
+
+
+def _sales_series_etag(request):
+    versions = DataVersion.current('sales', 'settings')
+    return hashlib.sha256(
+        f"{versions['sales']}-{versions['settings']}-{request.user.is_superuser}-{timezone.now().date()}-"
+        f"{request.GET.urlencode()}".encode('utf-8')
+    ).hexdigest()
+
+
+@login_required
+@require_http_methods(['GET'])
+@condition(etag_func=_sales_series_etag)
+def api_sales_series(request):
+    """Daily or hourly sales series for the charts, downsampled to a point budget.
+
+    Query parameters: interval ('day' or 'hour'), start_date and end_date,
+    series (comma separated, from timeseries.SERIES), points (the budget)
+    and currency ('USD', or 'ETB' at the current rate). Profit is for
+    superusers only.
+    """
+    interval = request.GET.get('interval', 'day')
+    if interval not in timeseries.INTERVALS:
+        return JsonResponse({'success': False, 'error': "interval must be 'day' or 'hour'"}, status=400)
+    allowed = [name for name in timeseries.SERIES if request.user.is_superuser or name not in timeseries.RESTRICTED_SERIES]
+    series = [name for name in request.GET.get('series', '').split(',') if name] or allowed
+    if any(name not in allowed for name in series):
+        return JsonResponse({'success': False, 'error': f"series must be among {', '.join(allowed)}"}, status=400)
+    try:
+        points = min(max(int(request.GET.get('points', timeseries.DEFAULT_POINTS)), 3), timeseries.MAX_POINTS)
+        end_date = timezone.now().date()
+        if request.GET.get('end_date'):
+            end_date = datetime.strptime(request.GET['end_date'], "%Y-%m-%d").date()
+        start_date = end_date - timedelta(days=6 if interval == 'hour' else 364)
+        if request.GET.get('start_date'):
+            start_date = datetime.strptime(request.GET['start_date'], "%Y-%m-%d").date()
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Dates must be YYYY-MM-DD and points a number'}, status=400)
+    max_days = timeseries.MAX_HOURLY_DAYS if interval == 'hour' else timeseries.MAX_DAILY_DAYS
+    if start_date > end_date or (end_date - start_date).days >= max_days:
+        return JsonResponse({
+            'success': False, 'error': f'The range must run forwards and cover at most {max_days} days for this interval',
+        }, status=400)
+
+    currency = request.GET.get('currency', 'USD')
+    rate = Decimal('1')
+    if currency == 'ETB':
+        currency_settings = CurrencySettings.objects.first()
+        rate = currency_settings.usd_to_etb_rate if currency_settings else Decimal('100.00')
+    elif currency != 'USD':
+        return JsonResponse({'success': False, 'error': "currency must be 'USD' or 'ETB'"}, status=400)
+
+    result = timeseries.sales_series(start_date, end_date, interval, series, points, rate)
+    response = JsonResponse({
+        'success': True,
+        'interval': interval,
+        'currency': currency,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'raw_points': result['raw_points'],
+        'series': {
+            name: [[stamp.isoformat(), value] for stamp, value in values]
+            for name, values in result['series'].items()
+        },
+    })
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+@require_http_methods(['GET'])
+def api_top_sellers(request):
+    """Best sellers of the last `days` days (up to the 90-day window), by product or by category.
+
+    Query parameters: k, days, by ('quantity' or 'revenue'), level
+    ('product' or 'category') and, for products, an optional category.
+    """
+    level = request.GET.get('level', 'product')
+    by = request.GET.get('by', 'quantity')
+    if level not in ('product', 'category') or by not in topk.RANKINGS:
+        return JsonResponse({'success': False, 'error': "level must be 'product' or 'category' and by 'quantity' or 'revenue'"}, status=400)
+    try:
+        k = int(request.GET.get('k', 5))
+        days = int(request.GET.get('days', 7))
+        category_id = int(request.GET['category']) if request.GET.get('category') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'k, days and category must be numbers'}, status=400)
+
+    if level == 'category':
+        items = [
+            {
+                'id': row['category'].id if row['category'] else None,
+                'name': row['category'].name if row['category'] else 'Uncategorized',
+                'quantity': float(row['quantity']),
+                'revenue_usd': float(row['revenue_usd']),
+            }
+            for row in topk.top_categories(k, days, by)
+        ]
+    else:
+        items = [
+            {
+                'id': row['product'].id,
+                'name': row['product'].name,
+                'category': row['product'].category.name if row['product'].category else None,
+                'quantity': float(row['quantity']),
+                'revenue_usd': float(row['revenue_usd']),
+            }
+            for row in topk.top_products(k, days, by, category_id)
+        ]
+    return JsonResponse({'success': True, 'level': level, 'by': by, 'days': days, 'items': items})
+
+
+HEATMAP_DEFAULT_DAYS = 84
+
+
+def _heatmap_params(request):
+    """(start_date, end_date, metric) from the query string; raises ValueError on bad input"""
+    metric = request.GET.get('metric', 'sales_count')
+    if metric not in timeseries.HEATMAP_METRICS:
+        raise ValueError(f"metric must be one of {', '.join(timeseries.HEATMAP_METRICS)}")
+    end_date = timezone.localdate(timezone=timeseries.shop_time_zone())
+    if request.GET.get('end_date'):
+        end_date = datetime.strptime(request.GET['end_date'], "%Y-%m-%d").date()
+    start_date = end_date - timedelta(days=HEATMAP_DEFAULT_DAYS - 1)
+    if request.GET.get('start_date'):
+        start_date = datetime.strptime(request.GET['start_date'], "%Y-%m-%d").date()
+    if start_date > end_date:
+        raise ValueError("start_date must not be after end_date")
+    return start_date, end_date, metric
+
+
+@login_required
+def sales_heatmap_view(request):
+    """Average sales by weekday and hour of day, for planning who works when"""
+    try:
+        start_date, end_date, metric = _heatmap_params(request)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('core:sales_heatmap')
+    heatmap = timeseries.sales_heatmap(start_date, end_date, metric)
+    rows = [
+        {
+            'weekday': weekday,
+            'cells': [
+                {'hour': hour, 'value': value, 'alpha': round(value / heatmap['max'], 2) if heatmap['max'] else 0}
+                for hour, value in enumerate(values)
+            ],
+        }
+        for weekday, values in zip(timeseries.WEEKDAYS, heatmap['cells'])
+    ]
+    context = {
+        'rows': rows,
+        'hours': range(24),
+        'metric': metric,
+        'metrics': timeseries.HEATMAP_METRICS,
+        'start_date': start_date,
+        'end_date': end_date,
+        'days': heatmap['days'],
+        'time_zone': heatmap['time_zone'],
+    }
+    return render(request, 'core/sales_heatmap.html', context)
+
+
+@login_required
+@require_http_methods(['GET'])
+def api_sales_heatmap(request):
+    """The sales heatmap as JSON: 7 rows (Monday first) of 24 hourly averages"""
+    try:
+        start_date, end_date, metric = _heatmap_params(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    heatmap = timeseries.sales_heatmap(start_date, end_date, metric)
+    return JsonResponse({
+        'success': True,
+        'metric': metric,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'weekdays': timeseries.WEEKDAYS,
+        **heatmap,
+    })
+
+
+@login_required
+@idempotent
 def customers_debt_view(request):
     """Display customers with debt and handle debt additions/payments"""
     if request.method == 'POST':
@@ -2570,6 +2658,9 @@ def customers_debt_view(request):
         currency = request.POST.get('currency', 'USD')
         notes = request.POST.get('notes', '')
         
+        if not customer_id:
+            messages.error(request, 'Please select a customer.')
+            return redirect('core:customers_debt')
         customer = get_object_or_404(Customer, id=customer_id)
         
         if action == 'add_debt':
@@ -2591,6 +2682,10 @@ def customers_debt_view(request):
                 messages.success(request, f'Debt of {amount} {currency} added successfully to {customer.name}!')
         
         elif action == 'record_payment':
+            if currency not in SALE_MODELS:
+                messages.error(request, f'Unknown currency {currency}')
+                return redirect('core:customers_debt')
+            
             # Get customer debt
             if currency == 'USD':
                 customer_debt = customer.total_debt_usd
@@ -2605,133 +2700,57 @@ def customers_debt_view(request):
                 messages.error(request, f'Payment amount ({amount} {currency}) cannot exceed total debt ({customer_debt} {currency})')
                 return redirect('core:customers_debt')
             
-            with transaction.atomic():
-                old_debt = customer_debt
-                
-                if currency == 'USD':
-                    customer.total_debt_usd -= amount
-                    if customer.total_debt_usd < 0:
-                        customer.total_debt_usd = Decimal('0.00')
-                elif currency == 'SOS':
-                    customer.total_debt_sos -= amount
-                    if customer.total_debt_sos < 0:
-                        customer.total_debt_sos = Decimal('0.00')
-                elif currency == 'ETB':
-                    customer.total_debt_etb -= amount
-                    if customer.total_debt_etb < 0:
-                        customer.total_debt_etb = Decimal('0.00')
-                
-                customer.save()
-                
-                # Apply payment to sales
-                remaining_payment = amount
-                
-                if currency == 'USD':
-                    sales_model = SaleUSD
-                elif currency == 'SOS':
-                    sales_model = SaleSOS
-                elif currency == 'ETB':
-                    sales_model = SaleETB
-                else:
-                    sales_model = None
-                
-                if sales_model:
-                    customer_sales_with_debt = sales_model.objects.filter(
-                        customer=customer,
-                        debt_amount__gt=0
-                    ).order_by('date_created')
+            try:
+                with transaction.atomic():
+                    old_debt, new_debt = _settle_debt(
+                        customer, currency, amount, request.user,
+                        override=bool(request.POST.get('override_close')), ip_address=request.META.get('REMOTE_ADDR'),
+                    )
                     
-                    for sale in customer_sales_with_debt:
-                        if remaining_payment <= 0:
-                            break
-                        
-                        if sale.debt_amount <= remaining_payment:
-                            sale.amount_paid += sale.debt_amount
-                            remaining_payment -= sale.debt_amount
-                            sale.save()
-                        else:
-                            sale.amount_paid += remaining_payment
-                            remaining_payment = Decimal('0.00')
-                            sale.save()
+                    # Create debt payment record
+                    if currency == 'USD':
+                        DebtPaymentUSD.objects.create(
+                            customer=customer,
+                            user=request.user,
+                            amount=amount,
+                            notes=notes
+                        )
+                    elif currency == 'SOS':
+                        DebtPaymentSOS.objects.create(
+                            customer=customer,
+                            user=request.user,
+                            amount=amount,
+                            notes=notes
+                        )
+                    elif currency == 'ETB':
+                        DebtPaymentETB.objects.create(
+                            customer=customer,
+                            user=request.user,
+                            amount=amount,
+                            notes=notes
+                        )
                 
-                # Create debt payment record
-                if currency == 'USD':
-                    DebtPaymentUSD.objects.create(
-                        customer=customer,
-                        user=request.user,
-                        amount=amount,
-                        notes=notes
-                    )
-                elif currency == 'SOS':
-                    DebtPaymentSOS.objects.create(
-                        customer=customer,
-                        user=request.user,
-                        amount=amount,
-                        notes=notes
+                    log_audit_action(
+                        request.user, 'DEBT_PAID', 'Customer', customer.id,
+                        f'Recorded payment of {amount} {currency}. Debt reduced from {old_debt} to {new_debt} {currency}. Notes: {notes}',
+                        request.META.get('REMOTE_ADDR')
                     )
-                elif currency == 'ETB':
-                    DebtPaymentETB.objects.create(
-                        customer=customer,
-                        user=request.user,
-                        amount=amount,
-                        notes=notes
-                    )
-                
-                new_debt = customer_debt - amount
-                
-                log_audit_action(
-                    request.user, 'DEBT_PAID', 'Customer', customer.id,
-                    f'Recorded payment of {amount} {currency}. Debt reduced from {old_debt} to {new_debt} {currency}. Notes: {notes}',
-                    request.META.get('REMOTE_ADDR')
-                )
                 
-                messages.success(request, f'Payment of {amount} {currency} recorded successfully! Debt reduced to {new_debt} {currency}')
+                    messages.success(request, f'Payment of {amount} {currency} recorded successfully! Debt reduced to {new_debt} {currency}')
+            except DayClosedError as e:
+                messages.error(request, f'{e}. Tick the override to record this payment.')
         
         return redirect('core:customers_debt')
     
-    # GET request
-    customers_with_debt = Customer.get_customers_with_debt()
-    
-    # Attach detailed outstanding sales to each customer
-    for customer in customers_with_debt:
-        outstanding_sales = []
-        
-        # USD Sales
-        usd_sales = SaleUSD.objects.filter(
-            customer=customer, 
-            debt_amount__gt=0
-        ).prefetch_related('items', 'items__product').order_by('-date_created')
-        
-        for sale in usd_sales:
-            sale.currency_code = 'USD'
-            sale.items_summary = ", ".join([f"{item.product.name} ({item.quantity})" for item in sale.items.all()])
-            outstanding_sales.append(sale)
-            
-        # SOS Sales
-        sos_sales = SaleSOS.objects.filter(
-            customer=customer, 
-            debt_amount__gt=0
-        ).prefetch_related('items', 'items__product').order_by('-date_created')
-        
-        for sale in sos_sales:
-            sale.currency_code = 'SOS'
-            sale.items_summary = ", ".join([f"{item.product.name} ({item.quantity})" for item in sale.items.all()])
-            outstanding_sales.append(sale)
-            
-        # ETB Sales
-        etb_sales = SaleETB.objects.filter(
-            customer=customer, 
-            debt_amount__gt=0
-        ).prefetch_related('items', 'items__product').order_by('-date_created')
-        
-        for sale in etb_sales:
-            sale.currency_code = 'ETB'
-            sale.items_summary = ", ".join([f"{item.product.name} ({item.quantity})" for item in sale.items.all()])
-            outstanding_sales.append(sale)
-            
-        # Sort all outstanding sales by date (newest first)
-        outstanding_sales.sort(key=lambda x: x.date_created, reverse=True)
-        customer.outstanding_sales = outstanding_sales
+    # GET request - outstanding sales for every debtor come from one prefetch query
+    customers_with_debt = Customer.get_customers_with_debt().prefetch_related(
+        Prefetch(
+            'transactions',
+            queryset=Transaction.objects.filter(debt_amount__gt=0).exclude(source='Legacy')
+            .prefetch_related('items__product').order_by('-date_created'),
+            to_attr='outstanding_sales',
+        )
+    )
 
     currency_settings = CurrencySettings.objects.first()
     
@@ -2746,11 +2765,11 @@ def customers_debt_view(request):
     debt_sos_in_etb = (total_debt_sos / usd_to_sos_rate) * usd_to_etb_rate if usd_to_sos_rate > 0 else Decimal('0.00')
     total_debt_combined_etb = debt_usd_in_etb + debt_sos_in_etb + total_debt_etb
     
-    all_customers = Customer.objects.filter(is_active=True).order_by('name')
+    customer_picker = CustomerPickerWidget(attrs={'required': True}, active_only=True).render('customer_id', None)
     
     context = {
         'customers_with_debt': customers_with_debt,
-        'all_customers': all_customers,
+        'customer_picker': customer_picker,
         'total_debt_etb': total_debt_combined_etb.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
         'total_debt_usd': total_debt_usd,
         'total_debt_sos': total_debt_sos,
@@ -2807,13 +2826,11 @@ def api_update_product(request, product_id):
             request.META.get('REMOTE_ADDR')
         )
         
-        # Get currency settings
-        currency_settings = CurrencySettings.objects.first()
-        
-        # Calculate derived prices
+        # Derived prices were rebuilt by product.save()
         selling_price_usd = product.selling_price
-        selling_price_sos = currency_settings.convert_usd_to_sos(selling_price_usd) if currency_settings else Decimal('0.00')
-        selling_price_etb = currency_settings.convert_usd_to_etb(selling_price_usd) if currency_settings else Decimal('0.00')
+        prices = ProductPrice.sell_price_map([product.id]).get(product.id, {})
+        selling_price_sos = prices.get('SOS', Decimal('0.00'))
+        selling_price_etb = prices.get('ETB', Decimal('0.00'))
         
         return JsonResponse({
             'success': True,
@@ -2867,4 +2884,69 @@ def api_delete_product(request, product_id):
         })
     
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+# === Background jobs ===
+
+def _job_payload(job):
+    return {
+        'id': job.id,
+        'job_type': job.job_type,
+        'label': JOB_LABELS.get(job.job_type, job.job_type),
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'attempts': job.attempts,
+        'date_created': job.date_created.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'download_url': reverse('core:job_download', args=[job.id]) if job.result_file else None,
+    }
+
+
+@superuser_required
+def jobs_list(request):
+    """Queue background jobs and show their status"""
+    if request.method == 'POST':
+        job_type = request.POST.get('job_type', '')
+        params = {
+            key: value for key, value in request.POST.items()
+            if key not in ('csrfmiddlewaretoken', 'job_type') and value
+        }
+        try:
+            job = enqueue(job_type, user=request.user, **params)
+        except ValueError as e:
+            messages.error(request, str(e))
+        else:
+            log_audit_action(
+                request.user, 'JOB_QUEUED', 'Job', job.id,
+                f'Queued {job_type} with {params}',
+                request.META.get('REMOTE_ADDR')
+            )
+            messages.success(request, f'{JOB_LABELS[job_type]} queued (job #{job.id}).')
+        return redirect('core:jobs_list')
+
+    jobs = list(Job.objects.select_related('created_by')[:50])
+    for job in jobs:
+        job.label = JOB_LABELS.get(job.job_type, job.job_type)
+    context = {
+        'jobs': jobs,
+        'job_types': sorted(JOB_LABELS.items(), key=lambda item: item[1]),
+    }
+    return render(request, 'core/jobs.html', context)
+
+
+@superuser_required
+def api_job_status(request, job_id):
+    """Poll a job's progress"""
+    job = get_object_or_404(Job, id=job_id)
+    return JsonResponse(_job_payload(job))
+
+
+@superuser_required
+def job_download(request, job_id):
+    """Download a finished job's result file"""
+    job = get_object_or_404(Job, id=job_id)
+    if not job.result_file:
+        raise Http404("This job has no result file")
+    return FileResponse(job.result_file.open('rb'), as_attachment=True, filename=os.path.basename(job.result_file.name))
@@ -0,0 +1,80 @@
+// Local copy of the product catalog kept current through /api/catalog/?since=.
+// The POS searches this copy directly; the server only sends what changed
+// since the stored version (or a 304 when nothing did).
+(function (scope) {
+    const STORAGE_KEY = 'carwo-deeqsan-catalog';
+    const CATALOG_URL = '/api/catalog/';
+    const RESULT_LIMIT = 10;
+
+    let catalog = load();
+
+    function empty() {
+        return { version: 0, products: {}, categories: {} };
+    }
+
+    function load() {
+        try {
+            return JSON.parse(localStorage.getItem(STORAGE_KEY)) || empty();
+        } catch (error) {
+            return empty();
+        }
+    }
+
+    function save() {
+        try {
+            localStorage.setItem(STORAGE_KEY, JSON.stringify(catalog));
+        } catch (error) {
+            console.warn('Could not store product catalog', error);
+        }
+    }
+
+    function apply(delta) {
+        if (delta.full) {
+            catalog = empty();
+        }
+        delta.categories.forEach((category) => { catalog.categories[category.id] = category.name; });
+        delta.products.forEach((product) => { catalog.products[product.id] = product; });
+        delta.deleted.products.forEach((id) => { delete catalog.products[id]; });
+        delta.deleted.categories.forEach((id) => { delete catalog.categories[id]; });
+        catalog.version = delta.version;
+        save();
+    }
+
+    async function sync() {
+        const response = await fetch(`${CATALOG_URL}?since=${catalog.version}`, {
+            credentials: 'same-origin',
+            headers: { 'X-Requested-With': 'XMLHttpRequest' },
+        });
+        if (response.status === 304) {
+            return catalog.version;
+        }
+        if (!response.ok) {
+            throw new Error(`Catalog sync failed (${response.status})`);
+        }
+        apply(await response.json());
+        return catalog.version;
+    }
+
+    // Same result shape as /api/search-products/
+    function search(query) {
+        const needle = query.trim().toLowerCase();
+        const results = [];
+        for (const product of Object.values(catalog.products)) {
+            const category = catalog.categories[product.category_id] || '';
+            const haystack = `${product.name} ${product.brand} ${category}`.toLowerCase();
+            if (!needle || haystack.includes(needle)) {
+                results.push(Object.assign({ category }, product));
+                if (results.length >= RESULT_LIMIT) {
+                    break;
+                }
+            }
+        }
+        return results;
+    }
+
+    function isReady() {
+        return catalog.version > 0;
+    }
+
+    scope.CatalogCache = { sync, search, isReady };
+})(window);
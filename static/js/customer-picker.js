@@ -0,0 +1,120 @@
+// Customer picker: type to search /api/customers/lookup/, scroll for more.
+// Markup comes from core/widgets/customer_picker.html; the hidden input keeps
+// the selected customer id and fires "change" when it is set or cleared.
+(function () {
+    const DEBOUNCE_MS = 250;
+
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text == null ? '' : text;
+        return div.innerHTML;
+    }
+
+    function init(picker) {
+        if (picker.dataset.ready) {
+            return;
+        }
+        picker.dataset.ready = '1';
+
+        const hidden = picker.querySelector('input[type="hidden"]');
+        const search = picker.querySelector('.customer-picker-search');
+        const results = picker.querySelector('.customer-picker-results');
+        const clear = picker.querySelector('.customer-picker-clear');
+        let nextCursor = null;
+        let currentQuery = '';
+        let timer = null;
+        let loading = false;
+
+        function lookup(append) {
+            const params = new URLSearchParams();
+            if (currentQuery) params.set('q', currentQuery);
+            if (append && nextCursor) params.set('cursor', nextCursor);
+            if (picker.dataset.activeOnly) params.set('active', '1');
+            loading = true;
+            fetch(`${picker.dataset.lookupUrl}?${params}`, { credentials: 'same-origin' })
+                .then((response) => response.json())
+                .then((data) => {
+                    nextCursor = data.next_cursor;
+                    const rows = data.results.map((customer) => `
+                        <button type="button" class="list-group-item list-group-item-action"
+                            data-id="${customer.id}" data-text="${escapeHtml(customer.text)}">
+                            ${escapeHtml(customer.text)}
+                        </button>`).join('');
+                    if (append) {
+                        results.insertAdjacentHTML('beforeend', rows);
+                    } else {
+                        results.innerHTML = rows || '<div class="list-group-item text-muted">No customers found</div>';
+                    }
+                    results.style.display = 'block';
+                })
+                .catch((error) => console.error('Customer lookup failed', error))
+                .finally(() => { loading = false; });
+        }
+
+        function select(id, text) {
+            hidden.value = id;
+            search.value = text;
+            results.style.display = 'none';
+            hidden.dispatchEvent(new Event('change', { bubbles: true }));
+        }
+
+        search.addEventListener('input', () => {
+            clearTimeout(timer);
+            currentQuery = search.value.trim();
+            if (hidden.value) {
+                hidden.value = '';
+                hidden.dispatchEvent(new Event('change', { bubbles: true }));
+            }
+            timer = setTimeout(() => lookup(false), DEBOUNCE_MS);
+        });
+        search.addEventListener('focus', () => {
+            if (!hidden.value) {
+                currentQuery = search.value.trim();
+                lookup(false);
+            }
+        });
+        results.addEventListener('click', (event) => {
+            const item = event.target.closest('[data-id]');
+            if (item) {
+                select(item.dataset.id, item.dataset.text);
+            }
+        });
+        // Next page when the list is scrolled to the bottom
+        results.addEventListener('scroll', () => {
+            if (nextCursor && !loading && results.scrollTop + results.clientHeight >= results.scrollHeight - 20) {
+                lookup(true);
+            }
+        });
+        clear.addEventListener('click', () => {
+            select('', '');
+            search.focus();
+        });
+        document.addEventListener('click', (event) => {
+            if (!picker.contains(event.target)) {
+                results.style.display = 'none';
+            }
+        });
+
+        picker.customerPicker = { select };
+    }
+
+    function initAll(root) {
+        (root || document).querySelectorAll('.customer-picker').forEach(init);
+    }
+
+    window.CustomerPicker = {
+        initAll,
+        // Set the picker that owns the hidden input with this id
+        set(inputId, id, text) {
+            const picker = document.getElementById(inputId).closest('.customer-picker');
+            init(picker);
+            picker.customerPicker.select(id, text);
+        },
+    };
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', () => initAll());
+    } else {
+        initAll();
+    }
+})();
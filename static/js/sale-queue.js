@@ -0,0 +1,136 @@
+// Offline sale queue shared by the POS page and the service worker.
+// Sales that cannot reach the server are stored in IndexedDB and replayed
+// in batches against /api/sync-sales/. Every sale carries a client_uuid so
+// the server ignores a sale it has already recorded.
+(function (scope) {
+    const DB_NAME = 'carwo-deeqsan-pos';
+    const STORE = 'pending-sales';
+    const SYNC_URL = '/api/sync-sales/';
+    const SYNC_TAG = 'sync-sales';
+    const BATCH_SIZE = 25;
+
+    function openDb() {
+        return new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(STORE, { keyPath: 'client_uuid' });
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function withStore(mode, callback) {
+        return openDb().then((db) => new Promise((resolve, reject) => {
+            const tx = db.transaction(STORE, mode);
+            const result = callback(tx.objectStore(STORE));
+            tx.oncomplete = () => resolve(result && 'result' in result ? result.result : undefined);
+            tx.onerror = () => reject(tx.error);
+        }));
+    }
+
+    function newClientUuid() {
+        if (scope.crypto && scope.crypto.randomUUID) {
+            return scope.crypto.randomUUID();
+        }
+        return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, (c) => {
+            const r = Math.random() * 16 | 0;
+            return (c === 'x' ? r : (r & 0x3 | 0x8)).toString(16);
+        });
+    }
+
+    function enqueue(sale, csrfToken) {
+        const record = Object.assign({}, sale, {
+            client_uuid: sale.client_uuid || newClientUuid(),
+            queued_at: new Date().toISOString(),
+            csrf_token: csrfToken,
+        });
+        return withStore('readwrite', (store) => store.put(record)).then(() => {
+            if (scope.navigator && scope.navigator.serviceWorker && 'SyncManager' in scope) {
+                scope.navigator.serviceWorker.ready
+                    .then((registration) => registration.sync.register(SYNC_TAG))
+                    .catch(() => {});
+            }
+            return record;
+        });
+    }
+
+    function pending() {
+        return withStore('readonly', (store) => store.getAll());
+    }
+
+    function remove(clientUuids) {
+        return withStore('readwrite', (store) => clientUuids.forEach((id) => store.delete(id)));
+    }
+
+    function update(record) {
+        return withStore('readwrite', (store) => store.put(record));
+    }
+
+    // Send queued sales in batches. Created and duplicate sales leave the
+    // queue; conflicts and rejections stay with the server's error attached
+    // so the cashier can review them.
+    async function flush() {
+        const records = (await pending()).filter((record) => !record.error);
+        const summary = { created: 0, duplicate: 0, failed: 0 };
+        for (let start = 0; start < records.length; start += BATCH_SIZE) {
+            const batch = records.slice(start, start + BATCH_SIZE);
+            const response = await fetch(SYNC_URL, {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': batch[batch.length - 1].csrf_token || '',
+                    'X-Requested-With': 'XMLHttpRequest',
+                },
+                body: JSON.stringify({
+                    sales: batch.map(({ csrf_token, queued_at, error, ...sale }) => sale),
+                }),
+            });
+            const contentType = response.headers.get('Content-Type') || '';
+            if (!response.ok || !contentType.includes('application/json')) {
+                throw new Error(`Sale sync failed (${response.status})`);
+            }
+            const data = await response.json();
+            const done = [];
+            for (const result of data.results) {
+                if (result.status === 'created' || result.status === 'duplicate') {
+                    summary[result.status] += 1;
+                    done.push(result.client_uuid);
+                } else {
+                    summary.failed += 1;
+                    const record = batch.find((item) => item.client_uuid === result.client_uuid);
+                    if (record) {
+                        await update(Object.assign(record, { error: result.error || result.status }));
+                    }
+                }
+            }
+            await remove(done);
+        }
+        return summary;
+    }
+
+    // Clear a failed sale's error so the next flush sends it again
+    async function retry(clientUuid) {
+        const record = (await pending()).find((item) => item.client_uuid === clientUuid);
+        if (record) {
+            delete record.error;
+            await update(record);
+        }
+        return flush();
+    }
+
+    function discard(clientUuid) {
+        return remove([clientUuid]);
+    }
+
+    scope.SaleQueue = { SYNC_TAG, enqueue, pending, flush, retry, discard, newClientUuid };
+
+    if (scope.document) {
+        scope.addEventListener('online', () => {
+            flush()
+                .catch((error) => console.warn(error))
+                .then(() => scope.dispatchEvent(new Event('salequeuechange')));
+        });
+    }
+})(self);
@@ -1,7 +1,11 @@
-const CACHE_NAME = 'carwo-deeqsan-v3';
+importScripts('/static/js/sale-queue.js');
+
+const CACHE_NAME = 'carwo-deeqsan-v5';
 const STATIC_ASSETS = [
     '/static/manifest.json',
     '/offline/',
+    '/static/js/sale-queue.js',
+    '/static/js/catalog-cache.js',
     '/static/images/icons/icon-192x192.png',
     '/static/images/icons/icon-512x512.png',
     'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
@@ -101,3 +105,10 @@ self.addEventListener('fetch', (event) => {
     // Default: Network only
     event.respondWith(fetch(event.request));
 });
+
+// Replay sales queued while the POS was offline
+self.addEventListener('sync', (event) => {
+    if (event.tag === self.SaleQueue.SYNC_TAG) {
+        event.waitUntil(self.SaleQueue.flush());
+    }
+});
@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.admin import EstimatedCountPaginator
+from core.models import Category, CurrencySettings, Customer, Product, SaleSOS, SaleUSD
+from decimal import Decimal
+
+
+class AdminChangelistTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.customer = Customer.objects.create(name="Test Cust", phone="1234")
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_sale_changelist_query_count_does_not_grow_with_rows(self):
+        url = reverse('admin:core_saleusd_changelist')
+        SaleUSD.objects.create(user=self.user, customer=self.customer, total_amount=Decimal('10'), amount_paid=Decimal('4'))
+        baseline = self.changelist_queries(url)
+        for amount in range(20):
+            SaleUSD.objects.create(user=self.user, customer=self.customer, total_amount=Decimal(amount), amount_paid=0)
+        self.assertEqual(self.changelist_queries(url), baseline)
+
+    def test_etb_equivalents_are_annotated_and_sortable(self):
+        SaleSOS.objects.create(user=self.user, customer=self.customer, total_amount=Decimal('80000'), amount_paid=Decimal('8000'))
+        SaleSOS.objects.create(user=self.user, customer=self.customer, total_amount=Decimal('16000'), amount_paid=0)
+        # Column 6 is total_amount_etb
+        response = self.client.get(reverse('admin:core_salesos_changelist'), {'o': '6'})
+        content = response.content.decode()
+        self.assertIn('1,000.00 ETB', content)
+        self.assertLess(content.index('200.00 ETB'), content.index('1,000.00 ETB'))
+
+    def test_product_margin_and_low_stock_filter(self):
+        category = Category.objects.create(name="Fabrics")
+        Product.objects.create(name="Silk", brand="Acme", category=category, current_stock=2, selling_price=5, purchase_price=3)
+        Product.objects.create(name="Cotton", brand="Acme", category=category, current_stock=50, selling_price=4, purchase_price=1)
+        response = self.client.get(reverse('admin:core_product_changelist'), {'low_stock': 'yes'})
+        self.assertContains(response, 'Silk')
+        self.assertNotContains(response, 'Cotton')
+        # Sorted by margin (column 8), descending
+        content = self.client.get(reverse('admin:core_product_changelist'), {'o': '-8'}).content.decode()
+        self.assertLess(content.index('Cotton'), content.index('Silk'))
+
+    def test_customer_debt_equivalent_filter(self):
+        Customer.objects.create(name="Debtor", phone="5678", total_debt_sos=Decimal('16000'))
+        response = self.client.get(reverse('admin:core_customer_changelist'), {'has_debt': 'yes'})
+        self.assertContains(response, '$2.00')
+        self.assertNotContains(response, 'Test Cust')
+
+    def test_paginator_estimates_past_the_exact_limit(self):
+        for amount in range(6):
+            SaleUSD.objects.create(user=self.user, total_amount=Decimal(amount), amount_paid=0)
+        highest = SaleUSD.objects.order_by('-pk').first().pk
+        with mock.patch('core.admin.ADMIN_EXACT_COUNT_LIMIT', 3):
+            self.assertEqual(EstimatedCountPaginator(SaleUSD.objects.order_by('pk'), 2).count, max(4, highest))
+            self.assertEqual(EstimatedCountPaginator(SaleUSD.objects.filter(total_amount__gte=1).order_by('pk'), 2).count, 4)
+            self.assertEqual(EstimatedCountPaginator(SaleUSD.objects.filter(total_amount__gte=4).order_by('pk'), 2).count, 2)
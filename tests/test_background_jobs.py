@@ -0,0 +1,74 @@
+import shutil
+import tempfile
+
+from django.test import TransactionTestCase, Client, override_settings
+from django.urls import reverse
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.jobs import JOB_HANDLERS, enqueue, register_job, run_job
+from core.models import Customer, CurrencySettings, Job, SaleUSD
+from decimal import Decimal
+from io import StringIO
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class BackgroundJobTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+
+    def test_worker_runs_export_and_page_serves_result(self):
+        SaleUSD.objects.create(user=self.user, customer=Customer.objects.create(name="Cust", phone="1"),
+                               total_amount=Decimal('10'), amount_paid=Decimal('10'))
+        response = self.client.post(reverse('core:jobs_list'), {'job_type': 'sales_export_csv', 'currency': 'USD'})
+        self.assertRedirects(response, reverse('core:jobs_list'))
+        job = Job.objects.get()
+        self.assertEqual(job.params, {'currency': 'USD'})
+
+        call_command('run_worker', '--once', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'SUCCEEDED')
+        self.assertEqual(job.progress, 100)
+        status = self.client.get(reverse('core:api_job_status', args=[job.id])).json()
+        self.assertEqual(status['status'], 'SUCCEEDED')
+        download = self.client.get(status['download_url'])
+        content = b''.join(download.streaming_content).decode()
+        download.close()
+        self.assertIn('Cust', content)
+        self.assertEqual(self.client.get(reverse('core:jobs_list')).status_code, 200)
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        calls = []
+
+        @register_job('always_fails', 'Always fails')
+        def always_fails(job, params):
+            calls.append(job.attempts)
+            raise RuntimeError('boom')
+
+        try:
+            job = enqueue('always_fails', max_attempts=2)
+            run_job(Job.claim_next('test'))
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'PENDING')
+            self.assertGreater(job.run_after, job.date_created)
+            self.assertIsNone(Job.claim_next('test'))
+
+            Job.objects.filter(pk=job.pk).update(run_after=job.date_created)
+            run_job(Job.claim_next('test'))
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'FAILED')
+            self.assertIn('boom', job.error)
+            self.assertEqual(calls, [1, 2])
+        finally:
+            JOB_HANDLERS.pop('always_fails', None)
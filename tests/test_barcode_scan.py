@@ -0,0 +1,56 @@
+from django.db import IntegrityError
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.barcodes import lookup_code, scan_cache
+from core.models import Category, CurrencySettings, Product, ProductBarcode
+from decimal import Decimal
+
+
+class BarcodeScanTest(TestCase):
+    def setUp(self):
+        scan_cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.product = Product.objects.create(
+            name="Thread", brand="Acme", category=Category.objects.create(name="Notions"),
+            current_stock=50, selling_price=Decimal('1.25'), purchase_price=Decimal('0.50'),
+        )
+        ProductBarcode.objects.create(product=self.product, code="6291041500213", label="Unit")
+        ProductBarcode.objects.create(product=self.product, code=" BOX-12 ", label="Box of 12", pack_quantity=12)
+
+    def test_scan_returns_product_prices_and_pack_quantity(self):
+        response = self.client.get(reverse('core:api_scan', args=['6291041500213']))
+        data = response.json()
+        self.assertEqual(data['product']['id'], self.product.id)
+        self.assertEqual(data['product']['selling_price_usd'], 1.25)
+        self.assertEqual(data['product']['selling_price_etb'], 125.0)
+        self.assertEqual(data['pack_quantity'], 1.0)
+
+        data = self.client.get(reverse('core:api_scan', args=['BOX-12'])).json()
+        self.assertEqual((data['pack_quantity'], data['label']), (12.0, "Box of 12"))
+        self.assertEqual(self.client.get(reverse('core:api_scan', args=['0000'])).status_code, 404)
+
+    def test_cache_hit_is_one_query_and_follows_changes(self):
+        with self.assertNumQueries(2):
+            lookup_code('6291041500213')
+        with self.assertNumQueries(1):
+            self.assertEqual(lookup_code('6291041500213')['product']['current_stock'], 50.0)
+
+        # Stock is re-read on every hit; price changes drop the entry
+        Product.objects.filter(pk=self.product.pk).update(current_stock=40)
+        self.assertEqual(lookup_code('6291041500213')['product']['current_stock'], 40.0)
+        self.product.refresh_from_db()
+        self.product.selling_price = Decimal('2.00')
+        self.product.save()
+        self.assertEqual(lookup_code('6291041500213')['product']['selling_price_usd'], 2.0)
+
+        ProductBarcode.objects.get(code='6291041500213').delete()
+        self.assertIsNone(lookup_code('6291041500213'))
+
+    def test_codes_are_unique(self):
+        with self.assertRaises(IntegrityError):
+            ProductBarcode.objects.create(product=self.product, code="BOX-12")
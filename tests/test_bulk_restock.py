@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import AuditLog, CatalogVersion, Category, CurrencySettings, InventoryLog, Product, ProductPrice
+from decimal import Decimal
+
+
+class BulkRestockTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.category = Category.objects.create(name="Fabrics")
+        self.silk = Product.objects.create(
+            name="Silk", brand="Acme", category=self.category, current_stock=10, selling_price=5, purchase_price=3,
+        )
+        self.cotton = Product.objects.create(
+            name="Cotton", brand="Acme", category=self.category, current_stock=2, selling_price=4, purchase_price=2,
+        )
+        self.url = reverse('core:api_bulk_restock')
+
+    def post_rows(self, rows, **options):
+        return self.client.post(self.url, json.dumps({'rows': rows, **options}), content_type='application/json')
+
+    def test_json_manifest_restocks_updates_and_creates(self):
+        version = CatalogVersion.current()
+        response = self.post_rows([
+            {'id': self.silk.id, 'quantity': 5},
+            {'brand': 'acme', 'name': 'cotton', 'quantity': '3.5', 'selling_price': '6'},
+            {'brand': 'Acme', 'name': 'Linen', 'category': 'fabrics', 'purchase_price': 4, 'selling_price': 7, 'quantity': 20},
+        ], notes="Delivery 42")
+        data = response.json()
+        self.assertTrue(data['success'], data)
+        self.assertEqual((data['created'], data['updated'], data['restocked']), (1, 1, 3))
+
+        self.silk.refresh_from_db()
+        self.cotton.refresh_from_db()
+        linen = Product.objects.get(name="Linen")
+        self.assertEqual(self.silk.current_stock, Decimal('15.00'))
+        self.assertEqual(self.cotton.current_stock, Decimal('5.50'))
+        self.assertEqual(self.cotton.selling_price, Decimal('6.00'))
+        self.assertEqual(linen.current_stock, Decimal('20.00'))
+        self.assertGreater(self.silk.catalog_version, version)
+
+        log = InventoryLog.objects.get(product=self.cotton)
+        self.assertEqual((log.old_quantity, log.new_quantity, log.notes), (Decimal('2.00'), Decimal('5.50'), "Delivery 42"))
+        self.assertEqual(ProductPrice.lookup([self.cotton.id, linen.id], 'USD'),
+                         {self.cotton.id: (Decimal('6.00'), Decimal('2.00')), linen.id: (Decimal('7.00'), Decimal('4.00'))})
+        self.assertEqual(AuditLog.objects.filter(action='BULK_RESTOCK').count(), 1)
+
+    def test_any_invalid_row_rejects_the_whole_manifest(self):
+        response = self.post_rows([
+            {'id': self.silk.id, 'quantity': 5},
+            {'id': 999999, 'quantity': 1},
+            {'brand': 'Acme', 'name': 'Wool', 'quantity': 'lots'},
+            {'id': self.silk.id, 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = {error['row']: error['errors'] for error in response.json()['errors']}
+        self.assertEqual(set(errors), {2, 3, 4})
+        self.assertIn('Unknown product id 999999', errors[2])
+        self.assertIn('Same product as row 1', errors[4])
+        self.silk.refresh_from_db()
+        self.assertEqual(self.silk.current_stock, Decimal('10.00'))
+        self.assertFalse(InventoryLog.objects.exists())
+
+    def test_csv_upload_and_dry_run(self):
+        manifest = f"id,quantity\n{self.silk.id},4\n{self.cotton.id},1\n".encode()
+        response = self.client.post(self.url, {'manifest': SimpleUploadedFile('delivery.csv', manifest), 'dry_run': 'true'})
+        self.assertEqual(response.json(), {'success': True, 'dry_run': True, 'rows': 2})
+        self.assertFalse(InventoryLog.objects.exists())
+
+        response = self.client.post(self.url, {'manifest': SimpleUploadedFile('delivery.csv', manifest)})
+        self.assertEqual(response.json()['restocked'], 2)
+        self.silk.refresh_from_db()
+        self.assertEqual(self.silk.current_stock, Decimal('14.00'))
+
+    def test_import_stock_command(self):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as manifest:
+            manifest.write(f"id,quantity\n{self.silk.id},2\nbad,1\n")
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('import_stock', path, stdout=out)
+        self.assertIn('Row 2: Unknown product id bad', out.getvalue())
+
+        with open(path, 'w') as manifest:
+            manifest.write(f"id,quantity\n{self.silk.id},2\n")
+        call_command('import_stock', path, '--user', 'admin', stdout=out)
+        self.silk.refresh_from_db()
+        self.assertEqual(self.silk.current_stock, Decimal('12.00'))
+        self.assertEqual(InventoryLog.objects.get().user, self.user)
@@ -0,0 +1,92 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import CatalogVersion, Category, CurrencySettings, InventoryLog, Product
+from decimal import Decimal
+
+
+class CatalogDeltaSyncTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.settings = CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.category = Category.objects.create(name="Fabrics")
+        self.product = self.make_product("Cotton")
+        self.other = self.make_product("Silk")
+
+    def make_product(self, name):
+        return Product.objects.create(
+            name=name, brand="Brand", category=self.category,
+            current_stock=10, selling_price=5, purchase_price=3,
+        )
+
+    def fetch(self, since=0, **headers):
+        return self.client.get(reverse('core:api_catalog'), {'since': since}, **headers)
+
+    def test_full_then_delta(self):
+        full = self.fetch().json()
+        self.assertTrue(full['full'])
+        self.assertEqual({p['id'] for p in full['products']}, {self.product.id, self.other.id})
+        self.assertEqual(full['products'][0]['selling_price_etb'], 500.0)
+        self.assertEqual(full['categories'], [{'id': self.category.id, 'name': 'Fabrics'}])
+
+        self.assertEqual(self.fetch(full['version']).json()['products'], [])
+
+        self.product.selling_price = Decimal('6.00')
+        self.product.save()
+        self.other.is_active = False
+        self.other.save()
+        third = self.make_product("Linen")
+        third_id = third.id
+        third.delete()
+
+        delta = self.fetch(full['version']).json()
+        self.assertFalse(delta['full'])
+        self.assertEqual([p['id'] for p in delta['products']], [self.product.id])
+        self.assertEqual(delta['products'][0]['selling_price'], 6.0)
+        self.assertEqual(sorted(delta['deleted']['products']), sorted([self.other.id, third_id]))
+        self.assertGreater(delta['version'], full['version'])
+
+    def test_rate_change_resends_prices(self):
+        version = self.fetch().json()['version']
+        self.settings.usd_to_etb_rate = Decimal('120.00')
+        self.settings.save()
+        delta = self.fetch(version).json()
+        self.assertEqual(len(delta['products']), 2)
+        self.assertEqual(delta['products'][0]['selling_price_etb'], 600.0)
+
+    def test_etag_and_gzip(self):
+        first = self.fetch()
+        etag = first['ETag']
+        self.assertEqual(self.fetch(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.product.save()
+        self.assertEqual(self.fetch(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        for index in range(30):
+            self.make_product(f"Product {index}")
+        compressed = self.fetch(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+
+    def test_sale_stamps_its_products_with_one_version(self):
+        version = self.fetch().json()['version']
+        self.client.post(reverse('core:create_sale'), {
+            'currency': 'USD',
+            'amount_paid': '20.00',
+            'products[0][id]': self.product.id,
+            'products[0][quantity]': '1',
+            'products[1][id]': self.other.id,
+            'products[1][quantity]': '2',
+            'products[2][id]': self.product.id,
+            'products[2][quantity]': '1',
+        })
+        self.assertEqual(CatalogVersion.current(), version + 1)
+
+        delta = self.fetch(version).json()
+        self.assertEqual({p['id']: p['current_stock'] for p in delta['products']}, {self.product.id: 8.0, self.other.id: 8.0})
+        self.assertEqual(
+            list(InventoryLog.objects.filter(product=self.product).order_by('id').values_list('old_quantity', 'new_quantity')),
+            [(Decimal('10'), Decimal('9')), (Decimal('9'), Decimal('8'))],
+        )
@@ -0,0 +1,72 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.dedupe import candidate_pairs, find_duplicates, merge_plan, soundex
+from core.models import (
+    AuditLog, Customer, CustomerNameToken, DebtCorrection, DebtPaymentUSD,
+    SaleUSD, Transaction, TransactionPayment,
+)
+from decimal import Decimal
+
+
+class CustomerDedupeTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.original = Customer.objects.create(name="Amina Yusuf", phone="+252 63 400 1234", total_debt_usd=Decimal('10'))
+        self.reformatted = Customer.objects.create(name="Amina Yusuf", phone="063-400-1234", total_debt_usd=Decimal('5'), total_debt_sos=Decimal('8000'))
+        self.typo = Customer.objects.create(name="Amina Yusef", phone="0634001234")
+        self.relative = Customer.objects.create(name="Hodan Farah", phone="0634001234")
+        self.namesake = Customer.objects.create(name="Amina Yusuf", phone="0615550000")
+
+    def test_soundex(self):
+        self.assertEqual(soundex('mohamed'), soundex('muhammad'))
+        self.assertEqual(soundex('robert'), 'r163')
+        self.assertNotEqual(soundex('amina'), soundex('hodan'))
+
+    def test_blocking_only_pairs_customers_sharing_a_key(self):
+        customers = {1: ('amina yusuf', '634001234'), 2: ('hodan farah', '615550000'), 3: ('amina yusef', '')}
+        self.assertEqual(candidate_pairs(customers), {(1, 3)})
+
+    def test_finds_formatting_and_typo_duplicates_only(self):
+        pairs = {(first, second) for _score, first, second in find_duplicates()}
+        self.assertIn((self.original.id, self.reformatted.id), pairs)
+        self.assertIn((self.original.id, self.typo.id), pairs)
+        # Same phone with another name, or same name with another phone, is not a duplicate
+        self.assertFalse(any(self.relative.id in pair or self.namesake.id in pair for pair in pairs))
+        self.assertEqual(merge_plan(find_duplicates()), {self.reformatted.id: self.original.id, self.typo.id: self.original.id})
+
+    def test_merge_moves_references_and_sums_debt(self):
+        sale = SaleUSD.objects.create(user=self.user, customer=self.reformatted, total_amount=Decimal('10'), amount_paid=Decimal('5'))
+        payment = DebtPaymentUSD.objects.create(customer=self.typo, user=self.user, amount=Decimal('2'))
+        correction = DebtCorrection.objects.create(
+            customer=self.reformatted, currency='USD', old_debt_amount=0, new_debt_amount=5, adjustment_amount=5, reason="Opening balance",
+        )
+        AuditLog.objects.create(user=self.user, action='DEBT_PAID', object_type='Customer', object_id=str(self.typo.id))
+
+        out = StringIO()
+        call_command('dedupe_customers', '--apply', stdout=out)
+        self.assertIn('Merged 2 duplicate customer(s) into 1 record(s)', out.getvalue())
+
+        self.assertFalse(Customer.objects.filter(pk__in=[self.reformatted.id, self.typo.id]).exists())
+        self.assertEqual(Customer.objects.count(), 3)
+        for obj in (sale, payment, correction):
+            obj.refresh_from_db()
+            self.assertEqual(obj.customer_id, self.original.id)
+        self.assertEqual(Transaction.objects.get(source='USD', source_id=sale.id).customer_id, self.original.id)
+        self.assertEqual(TransactionPayment.objects.get(source='USD', source_id=payment.id).customer_id, self.original.id)
+        self.assertTrue(AuditLog.objects.filter(action='DEBT_PAID', object_id=str(self.original.id)).exists())
+        self.assertTrue(AuditLog.objects.filter(action='CUSTOMERS_MERGED', object_id=str(self.original.id)).exists())
+
+        self.original.refresh_from_db()
+        self.assertEqual(self.original.total_debt_usd, Decimal('15.00'))
+        self.assertEqual(self.original.total_debt_sos, Decimal('8000.00'))
+        self.assertEqual(set(CustomerNameToken.objects.filter(customer=self.original).values_list('token', flat=True)), {'amina', 'yusuf'})
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('dedupe_customers', stdout=out)
+        self.assertIn('DRY RUN', out.getvalue())
+        self.assertEqual(Customer.objects.count(), 5)
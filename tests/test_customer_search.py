@@ -0,0 +1,101 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import Customer, CustomerNameToken, SaleUSD
+from decimal import Decimal
+
+
+class CustomerSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.exact = Customer.objects.create(name="Amina Yusuf", phone="+252 63 400 1234")
+        self.prefix = Customer.objects.create(name="Hodan Ali", phone="252634001234999")
+        self.suffix = Customer.objects.create(name="Ahmed Farah", phone="0634 555 678")
+        self.other = Customer.objects.create(name="Mohamed Abdi", phone="0612222222")
+
+    def names(self, query):
+        return [customer.name for customer in Customer.search(query)]
+
+    def test_phone_keys_are_normalized(self):
+        self.assertEqual(self.exact.phone_key, '252634001234')
+        self.assertEqual(self.exact.phone_key_reversed, self.exact.phone_key[::-1])
+        self.assertEqual(set(self.exact.name_tokens.values_list('token', flat=True)), {'amina', 'yusuf'})
+
+    def test_exact_phone_ranks_before_prefix(self):
+        self.assertEqual(self.names('252634001234'), ["Amina Yusuf", "Hodan Ali"])
+        self.assertEqual(self.names('+252 63 400'), ["Amina Yusuf", "Hodan Ali"])
+
+    def test_last_digits_match(self):
+        self.assertEqual(self.names('555 678'), ["Ahmed Farah"])
+
+    def test_name_prefix_tokens_and_typos(self):
+        self.assertEqual(self.names('amina'), ["Amina Yusuf"])
+        self.assertEqual(self.names('farah'), ["Ahmed Farah"])
+        self.assertEqual(self.names('moh abd'), ["Mohamed Abdi"])
+        self.assertEqual(self.names('mohamad'), ["Mohamed Abdi"])
+
+    def test_rename_rebuilds_tokens(self):
+        self.other.name = "Mohamed Warsame"
+        self.other.save()
+        self.assertEqual(
+            set(CustomerNameToken.objects.filter(customer=self.other).values_list('token', flat=True)),
+            {'mohamed', 'warsame'},
+        )
+
+    def test_search_endpoints(self):
+        response = self.client.get(reverse('core:api_search_customers'), {'q': '063 4555'})
+        self.assertEqual([row['id'] for row in response.json()], [self.suffix.id])
+        response = self.client.get(reverse('core:api_search_customers'), {'q': '4555678'})
+        self.assertEqual([row['id'] for row in response.json()], [self.suffix.id])
+
+        response = self.client.get(reverse('core:customers_list'), {'search': '+252 63 400'})
+        self.assertEqual([customer.id for customer in response.context['customers']], [self.exact.id, self.prefix.id])
+
+
+class CustomerLookupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        for index in range(25):
+            Customer.objects.create(name=f"Customer {index:02d}", phone=f"06100000{index:02d}")
+
+    def test_cursor_pages_cover_every_customer_once(self):
+        url = reverse('core:api_customer_lookup')
+        seen = []
+        cursor = ''
+        while True:
+            data = self.client.get(url, {'cursor': cursor, 'limit': 10}).json()
+            seen.extend(row['id'] for row in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        self.assertEqual(seen, list(Customer.objects.order_by('name_key', 'id').values_list('id', flat=True)))
+
+        data = self.client.get(url, {'q': '0610000', 'limit': 20}).json()
+        self.assertEqual(len(data['results']), 20)
+        data = self.client.get(url, {'q': '0610000', 'limit': 20, 'cursor': data['next_cursor']}).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNone(data['next_cursor'])
+
+    def test_pages_render_picker_instead_of_every_customer(self):
+        response = self.client.get(reverse('core:customers_debt'))
+        self.assertContains(response, 'customer-picker')
+        self.assertNotContains(response, 'Customer 24')
+
+        customer = Customer.objects.get(name="Customer 03")
+        sale = SaleUSD.objects.create(customer=customer, user=self.user, total_amount=Decimal('10'), amount_paid=Decimal('4'))
+        response = self.client.get(reverse('core:edit_sale', kwargs={'currency': 'USD', 'sale_id': sale.id}))
+        self.assertContains(response, 'value="Customer 03 (0610000003)"')
+        self.assertNotContains(response, 'Customer 24')
+
+    def test_admin_autocomplete_uses_index(self):
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'core', 'model_name': 'saleusd', 'field_name': 'customer', 'term': '0610000024',
+        })
+        self.assertEqual([row['text'] for row in response.json()['results']], ['Customer 24 (0610000024)'])
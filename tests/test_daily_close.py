@@ -0,0 +1,173 @@
+from datetime import timedelta
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.closes import DayClosedError, check_day_open, close_day, period_summary
+from core.models import (
+    AuditLog, Category, CurrencySettings, Customer, DailyClose, DebtPayment, DebtPaymentUSD, InventoryLog, Product,
+    SaleItemETB, SaleItemUSD, SaleETB, SaleUSD,
+)
+from decimal import Decimal
+
+
+class DailyCloseTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.settings = CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.product = Product.objects.create(
+            name="Silk", brand="Acme", category=Category.objects.create(name="Fabrics"),
+            current_stock=10, selling_price=5, purchase_price=3,
+        )
+        self.customer = Customer.objects.create(name="Amina", phone="1234")
+        self.today = timezone.now().date()
+
+    def sell(self):
+        sale = SaleUSD.objects.create(user=self.user, customer=self.customer, total_amount=Decimal('0'), amount_paid=Decimal('4'))
+        SaleItemUSD.objects.create(sale=sale, product=self.product, quantity=2, unit_price=Decimal('5'), total_price=0)
+        sale.calculate_total()
+        etb = SaleETB.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('500'), exchange_rate_at_sale=Decimal('100'))
+        SaleItemETB.objects.create(sale=etb, product=self.product, quantity=1, unit_price=Decimal('500'), total_price=0)
+        etb.calculate_total()
+        DebtPaymentUSD.objects.create(customer=self.customer, amount=Decimal('3'), user=self.user)
+        InventoryLog.objects.create(product=self.product, action='RESTOCK', quantity_change=5, old_quantity=10, new_quantity=15)
+        InventoryLog.objects.create(product=self.product, action='SALE', quantity_change=-3, old_quantity=15, new_quantity=12)
+        return sale
+
+    def test_close_freezes_the_day(self):
+        self.sell()
+        close = close_day(self.today, self.user)
+        totals = {total.currency: total for total in close.totals.all()}
+        usd = totals['USD']
+        self.assertEqual((usd.sales_count, usd.total_sales, usd.cash_collected, usd.debt_created), (1, Decimal('10.00'), Decimal('4.00'), Decimal('6.00')))
+        self.assertEqual((usd.payments_received, usd.cost_usd, usd.profit_usd), (Decimal('3.00'), Decimal('6.00'), Decimal('4.00')))
+        self.assertEqual((totals['ETB'].total_sales, totals['ETB'].total_sales_usd), (Decimal('500.00'), Decimal('5.00')))
+        self.assertEqual((close.stock_restocked, close.stock_sold), (Decimal('5.00'), Decimal('3.00')))
+        self.assertTrue(close.is_intact)
+        self.assertTrue(AuditLog.objects.filter(action='DAY_CLOSED').exists())
+
+        with self.assertRaises(DayClosedError):
+            close_day(self.today)
+        with self.assertRaises(ValueError):
+            close.save()
+
+        # Later rate and price moves (and a later sale) leave the closed figures alone
+        self.settings.usd_to_etb_rate = Decimal('150.00')
+        self.settings.save()
+        SaleUSD.objects.create(user=self.user, total_amount=Decimal('7'), amount_paid=Decimal('7'))
+        rows, grand = period_summary(self.today - timedelta(days=2), self.today)
+        self.assertEqual([row['closed'] for row in rows], [True, False, False])
+        self.assertEqual(grand['USD']['total_sales'], Decimal('10.00'))
+        self.assertEqual(rows[0]['all_currencies']['total_sales_usd'], Decimal('15.00'))
+
+        DailyClose.objects.filter(pk=close.pk).update(stock_sold=Decimal('1'))
+        self.assertFalse(DailyClose.objects.get(pk=close.pk).is_intact)
+
+    def test_edits_to_closed_days_need_a_superuser_override(self):
+        sale = self.sell()
+        close_day(self.today, self.user)
+        staff = User.objects.create_user('clerk', 'clerk@example.com', 'password')
+        with self.assertRaises(DayClosedError):
+            check_day_open(self.today, staff, override=True)
+        with self.assertRaises(DayClosedError):
+            check_day_open(self.today, self.user)
+        check_day_open(self.today, self.user, override=True, action='test')
+        self.assertTrue(AuditLog.objects.filter(action='CLOSED_DAY_OVERRIDE').exists())
+
+        url = reverse('core:edit_sale', args=['USD', sale.id])
+        self.assertTrue(self.client.get(url).context['day_closed'])
+        self.client.post(url, {'customer': self.customer.id, 'amount_paid': '10'})
+        self.assertEqual(SaleUSD.objects.get(pk=sale.pk).amount_paid, Decimal('4.00'))
+        self.client.post(url, {'customer': self.customer.id, 'amount_paid': '10', 'override_close': '1'})
+        self.assertEqual(SaleUSD.objects.get(pk=sale.pk).amount_paid, Decimal('10.00'))
+
+    def test_close_page(self):
+        response = self.client.post(reverse('core:daily_closes'), {'day': self.today.isoformat()})
+        self.assertRedirects(response, reverse('core:daily_closes'))
+        self.assertTrue(DailyClose.objects.filter(day=self.today).exists())
+        response = self.client.post(reverse('core:daily_closes'), {'day': (self.today + timedelta(days=1)).isoformat()})
+        self.assertEqual(DailyClose.objects.count(), 1)
+        response = self.client.get(reverse('core:daily_closes'))
+        self.assertEqual(len(response.context['rows']), 14)
+        self.assertTrue(response.context['rows'][0]['closed'])
+
+    def test_closed_days_are_locked_on_every_write_path(self):
+        sale = self.sell()
+        close_day(self.today, self.user)
+
+        # Adding an item needs the override the sale page now offers
+        detail = self.client.get(reverse('core:sale_detail', args=['USD', sale.id]))
+        self.assertContains(detail, 'name="override_close"')
+        add_url = reverse('core:add_sale_item', args=['USD', sale.id])
+        self.client.post(add_url, {'product_id': self.product.id, 'quantity': '1'})
+        self.assertEqual(sale.items.count(), 1)
+        self.client.post(add_url, {'product_id': self.product.id, 'quantity': '1', 'override_close': '1'})
+        self.assertEqual(sale.items.get().quantity, Decimal('3.00'))
+
+        # A debt payment lands on today and pays off the closed sale
+        Customer.objects.filter(pk=self.customer.pk).update(total_debt_usd=Decimal('6.00'))
+        pay_url = reverse('core:record_debt_payment', args=[self.customer.id])
+        self.assertTrue(self.client.get(pay_url).context['day_closed'])
+        payment = {'amount': '2', 'currency': 'USD', 'pno': 'P-1', 'notes': ''}
+        response = self.client.post(pay_url, payment, follow=True)
+        self.assertContains(response, 'is closed')
+        self.assertFalse(DebtPayment.objects.exists())
+        self.client.post(pay_url, dict(payment, override_close='1'))
+        self.assertEqual(DebtPayment.objects.count(), 1)
+
+        # Offline replays and new sales are refused on a closed day
+        data = self.client.post(reverse('core:api_sync_sales'), {'sales': [{
+            'client_uuid': '6f1c1b1e-1d3a-4c55-9a43-1e3b7d7f0a11', 'currency': 'USD', 'amount_paid': '5',
+            'products': [{'id': self.product.id, 'quantity': '1', 'unit_price': '5'}],
+        }]}, content_type='application/json').json()
+        self.assertEqual(data['results'][0]['status'], 'rejected')
+
+        # The admin refuses deletes and unticked edits
+        self.assertEqual(self.client.get(reverse('admin:core_saleusd_delete', args=[sale.id])).status_code, 403)
+        payment = DebtPaymentUSD.objects.first()
+        change_url = reverse('admin:core_debtpaymentusd_change', args=[payment.id])
+        response = self.client.post(change_url, {'customer': self.customer.id, 'amount': '1', 'notes': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(DebtPaymentUSD.objects.get(pk=payment.pk).amount, payment.amount)
+        self.client.post(change_url, {'customer': self.customer.id, 'amount': '1', 'notes': '', 'override_close': 'on'})
+        self.assertEqual(DebtPaymentUSD.objects.get(pk=payment.pk).amount, Decimal('1.00'))
+        self.assertEqual(AuditLog.objects.filter(action='CLOSED_DAY_OVERRIDE').count(), 3)
+
+    def test_debt_page_payments_respect_closed_days(self):
+        yesterday = self.today - timedelta(days=1)
+        sale = SaleUSD.objects.create(user=self.user, customer=self.customer, total_amount=Decimal('0'), amount_paid=Decimal('0'))
+        SaleItemUSD.objects.create(sale=sale, product=self.product, quantity=1, unit_price=Decimal('5'), total_price=0)
+        sale.calculate_total()
+        SaleUSD.objects.filter(pk=sale.pk).update(date_created=timezone.now() - timedelta(days=1))
+        Customer.objects.filter(pk=self.customer.pk).update(total_debt_usd=Decimal('5.00'))
+        close_day(yesterday, self.user)
+
+        payment = {'action': 'record_payment', 'customer_id': self.customer.id, 'amount': '2', 'currency': 'USD', 'notes': ''}
+        response = self.client.post(reverse('core:customers_debt'), payment, follow=True)
+        self.assertContains(response, 'is closed')
+        self.assertEqual(SaleUSD.objects.get(pk=sale.pk).amount_paid, Decimal('0.00'))
+        self.assertEqual(Customer.objects.get(pk=self.customer.pk).total_debt_usd, Decimal('5.00'))
+        self.assertFalse(DebtPaymentUSD.objects.exists())
+
+        self.client.post(reverse('core:customers_debt'), dict(payment, override_close='1'))
+        self.assertEqual(SaleUSD.objects.get(pk=sale.pk).amount_paid, Decimal('2.00'))
+        self.assertEqual(Customer.objects.get(pk=self.customer.pk).total_debt_usd, Decimal('3.00'))
+        self.assertEqual(DebtPaymentUSD.objects.count(), 1)
+        self.assertTrue(AuditLog.objects.filter(action='CLOSED_DAY_OVERRIDE', object_id=yesterday.isoformat()).exists())
+
+    def test_reports_read_closed_days_from_the_close(self):
+        sale = self.sell()
+        close_day(self.today, self.user)
+        self.client.post(reverse('core:edit_sale', args=['USD', sale.id]), {
+            'customer': self.customer.id, 'amount_paid': '10', 'override_close': '1',
+        })
+
+        history = self.client.get(reverse('core:sales_history'), {'days': 7}).context
+        self.assertEqual(history['range_totals']['amount_paid_usd'], Decimal('9.00'))
+        self.assertEqual(history['total_sales'], 2)
+        revenue = self.client.get(reverse('core:revenue_details'), {'days': 7}).context
+        self.assertEqual(revenue['total_revenue_etb'], Decimal('1500.00'))
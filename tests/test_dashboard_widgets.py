@@ -0,0 +1,74 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.dashboard import WIDGETS
+from core.models import Category, CurrencySettings, Customer, Product, SaleItemUSD, SaleUSD
+from decimal import Decimal
+
+
+class DashboardWidgetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.product = Product.objects.create(
+            name="Silk", brand="Acme", category=Category.objects.create(name="Fabrics"),
+            current_stock=10, selling_price=5, purchase_price=3, low_stock_threshold=5,
+        )
+
+    def widget(self, name, client=None, **headers):
+        return (client or self.client).get(reverse('core:api_dashboard_widget', args=[name]), headers=headers)
+
+    def test_every_widget_loads(self):
+        for name in WIDGETS:
+            response = self.widget(name)
+            self.assertEqual(response.status_code, 200, name)
+            self.assertTrue(response.json()['success'])
+            self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertEqual(self.widget('nope').status_code, 404)
+
+    def test_unchanged_widget_revalidates_to_304(self):
+        response = self.widget('sales')
+        etag = response['ETag']
+        self.assertEqual(response.json()['data']['transactions'], 0)
+        self.assertEqual(self.widget('sales', if_none_match=etag).status_code, 304)
+
+        sale = SaleUSD.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('10'))
+        SaleItemUSD.objects.create(sale=sale, product=self.product, quantity=2, unit_price=Decimal('5'), total_price=0)
+        sale.calculate_total()
+        response = self.widget('sales', if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['transactions'], 1)
+        self.assertIn('1000 ETB', response.json()['html'])
+
+        # Sales leave the debt widget's version alone
+        debt_etag = self.widget('debt')['ETag']
+        SaleUSD.objects.create(user=self.user, total_amount=Decimal('5'), amount_paid=Decimal('5'))
+        self.assertEqual(self.widget('debt', if_none_match=debt_etag).status_code, 304)
+        Customer.objects.create(name="Amina", phone="1234", total_debt_usd=Decimal('3'))
+        self.assertEqual(self.widget('debt', if_none_match=debt_etag).status_code, 200)
+
+    def test_top_sellers_revalidate_once_the_rollups_are_written(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            sale = SaleUSD.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('10'))
+            SaleItemUSD.objects.create(sale=sale, product=self.product, quantity=2, unit_price=Decimal('5'), total_price=0)
+            # A request between the sale and its commit sees the old ranking under the same ETag
+            etag = self.widget('top_sellers')['ETag']
+            self.assertEqual(self.widget('top_sellers', if_none_match=etag).status_code, 304)
+        for callback in callbacks:
+            callback()
+        response = self.widget('top_sellers', if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Silk', response.json()['html'])
+
+    def test_profit_widgets_are_superuser_only(self):
+        staff = User.objects.create_user('clerk', 'clerk@example.com', 'password')
+        client = Client()
+        client.force_login(staff)
+        self.assertEqual(self.widget('profit', client).status_code, 403)
+        self.assertEqual(self.widget('sales', client).status_code, 200)
+        page = client.get(reverse('core:dashboard'))
+        self.assertNotIn('profit', page.context['widgets'])
+        self.assertNotIn('data-widget="profit"', page.content.decode())
@@ -0,0 +1,116 @@
+import hashlib
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import Category, Customer, IdempotencyKey, Product, SaleUSD
+from decimal import Decimal
+
+
+class IdempotencyKeyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('core:api_create_customer')
+
+    def create_customer(self, key, name='Amina'):
+        return self.client.post(
+            self.url, json.dumps({'name': name, 'phone': f'06{len(name)}1111111'}),
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_first_response(self):
+        first = self.create_customer('key-1')
+        second = self.create_customer('key-1')
+        self.assertEqual(Customer.objects.count(), 1)
+        self.assertEqual(second.status_code, first.status_code)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+
+        self.create_customer('key-2', name='Hodan Ali')
+        self.assertEqual(Customer.objects.count(), 2)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.create_customer('key-1')
+        response = self.create_customer('key-1', name='Hodan')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_rejected_request_releases_the_key(self):
+        rejected = self.client.post(
+            self.url, json.dumps({'name': '', 'phone': ''}), content_type='application/json', HTTP_IDEMPOTENCY_KEY='key-1',
+        )
+        self.assertEqual(rejected.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        response = self.create_customer('key-1')
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_form_field_key_on_create_sale(self):
+        product = Product.objects.create(
+            name="Test Fabric", brand="Brand", category=Category.objects.create(name="Fabrics"),
+            current_stock=10, selling_price=5, purchase_price=3,
+        )
+        data = {
+            'idempotency_key': 'form-key',
+            'currency': 'USD',
+            'amount_paid': '5.00',
+            'products[0][id]': product.id,
+            'products[0][quantity]': '1',
+            'products[0][unit_price]': '5.00',
+        }
+        # Not enough stock: the failure is not stored, so the corrected cart goes through
+        self.client.post(reverse('core:create_sale'), dict(data, **{'products[0][quantity]': '50'}))
+        self.assertFalse(IdempotencyKey.objects.exists())
+        first = self.client.post(reverse('core:create_sale'), data)
+        second = self.client.post(reverse('core:create_sale'), data)
+        self.assertEqual(second.status_code, 302)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(SaleUSD.objects.count(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.current_stock, Decimal('9'))
+
+    def test_in_flight_duplicate_waits_then_gives_up(self):
+        fingerprint = hashlib.sha256(f'{self.user.pk}:busy'.encode('utf-8')).hexdigest()
+        with mock.patch('core.views._idempotency_request_hash', return_value='hash'):
+            IdempotencyKey.objects.create(
+                fingerprint=fingerprint, request_hash='hash', expires_at=timezone.now() + timedelta(hours=1),
+                locked_until=timezone.now() + timedelta(minutes=5),
+            )
+            with mock.patch('core.views.IDEMPOTENCY_WAIT_SECONDS', 0.3):
+                response = self.create_customer('busy')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Customer.objects.count(), 0)
+
+    def test_abandoned_key_is_taken_over_after_its_lease(self):
+        fingerprint = hashlib.sha256(f'{self.user.pk}:crashed'.encode('utf-8')).hexdigest()
+        with mock.patch('core.views._idempotency_request_hash', return_value='hash'):
+            # The worker that claimed the key died before finishing
+            IdempotencyKey.objects.create(
+                fingerprint=fingerprint, request_hash='hash', expires_at=timezone.now() + timedelta(hours=23),
+                locked_until=timezone.now() - timedelta(seconds=1),
+            )
+            first = self.create_customer('crashed')
+            second = self.create_customer('crashed')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Customer.objects.count(), 1)
+        record = IdempotencyKey.objects.get(fingerprint=fingerprint)
+        self.assertEqual(record.status, 'COMPLETE')
+        self.assertIsNone(record.locked_until)
+
+    def test_expired_keys_are_evicted(self):
+        IdempotencyKey.objects.create(
+            fingerprint='old', request_hash='hash', status='COMPLETE',
+            expires_at=timezone.now() - timedelta(minutes=1),
+        )
+        self.create_customer('fresh')
+        self.assertFalse(IdempotencyKey.objects.filter(fingerprint='old').exists())
+        self.assertEqual(IdempotencyKey.objects.get().status, 'COMPLETE')
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, Client, AsyncClient
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.live import broadcaster, format_event
+from core.models import Category, CurrencySettings, Customer, DebtPaymentUSD, InventoryLog, Product, SaleItemUSD, SaleUSD
+from decimal import Decimal
+
+
+class LiveDashboardTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.product = Product.objects.create(
+            name="Silk", brand="Acme", category=Category.objects.create(name="Fabrics"),
+            current_stock=10, selling_price=5, purchase_price=3, low_stock_threshold=5,
+        )
+        self.loop = asyncio.new_event_loop()
+        self.subscription = self.loop.run_until_complete(self._subscribe())
+        self.addCleanup(self.loop.close)
+        self.addCleanup(broadcaster.unsubscribe, self.subscription)
+
+    async def _subscribe(self):
+        return broadcaster.subscribe()
+
+    def events(self):
+        # Let the loop run the call_soon_threadsafe deliveries
+        self.loop.run_until_complete(asyncio.sleep(0))
+        events = []
+        while not self.subscription.queue.empty():
+            events.append(self.subscription.queue.get_nowait())
+        return events
+
+    def test_sale_publishes_deltas_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = SaleUSD.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('6'))
+            SaleItemUSD.objects.create(sale=sale, product=self.product, quantity=2, unit_price=Decimal('6'), total_price=0)
+            sale.calculate_total()
+        sales = [event for event in self.events() if event['type'] == 'sale']
+        self.assertEqual(sum(event['count_delta'] for event in sales), 1)
+        self.assertEqual(sum(event['total_usd_delta'] for event in sales), Decimal('12.00'))
+        self.assertEqual(sum(event['paid_usd_delta'] for event in sales), Decimal('6.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.delete()
+        removal = [event for event in self.events() if event['type'] == 'sale']
+        self.assertEqual([(e['count_delta'], e['total_usd_delta']) for e in removal], [(-1, Decimal('-12.00'))])
+
+    def test_payment_and_stock_alerts(self):
+        customer = Customer.objects.create(name="Amina", phone="1234")
+        with self.captureOnCommitCallbacks(execute=True):
+            DebtPaymentUSD.objects.create(customer=customer, amount=Decimal('20'), user=self.user)
+            InventoryLog.objects.create(product=self.product, action='SALE', quantity_change=-3, old_quantity=10, new_quantity=7)
+            InventoryLog.objects.create(product=self.product, action='SALE', quantity_change=-7, old_quantity=7, new_quantity=0)
+        events = self.events()
+        payment = next(event for event in events if event['type'] == 'payment')
+        self.assertEqual((payment['customer'], payment['amount_usd']), ("Amina", Decimal('20.00')))
+        alerts = [event for event in events if event['type'] == 'stock_alert']
+        self.assertEqual([(a['low_stock_delta'], a['out_of_stock_delta']) for a in alerts], [(1, 1)])
+        self.assertEqual(json.loads(format_event(alerts[0]).split('data: ')[1])['current_stock'], 0.0)
+
+    def test_rolled_back_writes_publish_nothing(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            SaleUSD.objects.create(user=self.user, total_amount=Decimal('5'), amount_paid=Decimal('5'))
+        self.assertTrue(callbacks)
+        self.assertEqual(self.events(), [])
+
+    def test_stream_requires_asgi(self):
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(client.get(reverse('core:dashboard_events')).status_code, 503)
+        self.assertIn('dashboard-widgets', client.get(reverse('core:dashboard')).content.decode())
+
+
+class LiveStreamTest(TestCase):
+    async def test_stream_sends_published_events(self):
+        user = await sync_to_async(User.objects.create_superuser)('admin', 'admin@example.com', 'password')
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(user)
+        response = await client.get(reverse('core:dashboard_events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+        broadcaster.publish({'type': 'stock_alert', 'product': 'Silk'})
+        message = (await anext(chunks)).decode()
+        self.assertTrue(message.startswith('event: stock_alert\n'))
+        # The ASGI handler cancels the body on disconnect, which unsubscribes
+        for subscription in list(broadcaster._subscriptions):
+            broadcaster.unsubscribe(subscription)
@@ -0,0 +1,95 @@
+import json
+import uuid
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import Category, CurrencySettings, Product, SaleUSD, InventoryLog, Transaction
+from decimal import Decimal
+
+
+class OfflineSaleSyncTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.product = Product.objects.create(
+            name="Test Fabric",
+            brand="Brand",
+            category=Category.objects.create(name="Fabrics"),
+            current_stock=5,
+            selling_price=5,
+            purchase_price=3,
+        )
+
+    def queued_sale(self, quantity=2):
+        return {
+            'client_uuid': str(uuid.uuid4()),
+            'currency': 'USD',
+            'amount_paid': str(quantity * 5),
+            'products': [{'id': self.product.id, 'quantity': quantity, 'unit_price': '5.00'}],
+        }
+
+    def sync(self, sales):
+        response = self.client.post(
+            reverse('core:api_sync_sales'), data=json.dumps({'sales': sales}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [result['status'] for result in response.json()['results']]
+
+    def test_replayed_batch_is_recorded_once(self):
+        sale = self.queued_sale()
+        self.assertEqual(self.sync([sale]), ['created'])
+        self.assertEqual(self.sync([sale, sale]), ['duplicate', 'duplicate'])
+
+        recorded = SaleUSD.objects.get()
+        self.assertEqual(str(recorded.transaction_id), sale['client_uuid'])
+        self.assertEqual(recorded.total_amount, Decimal('10.00'))
+        self.assertTrue(Transaction.objects.filter(transaction_id=recorded.transaction_id).exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 3)
+        self.assertEqual(InventoryLog.objects.filter(action='SALE').count(), 1)
+
+    def test_stock_conflict_does_not_block_other_sales(self):
+        statuses = self.sync([self.queued_sale(4), self.queued_sale(4), {'currency': 'USD'}])
+        self.assertEqual(statuses, ['created', 'conflict', 'rejected'])
+        self.assertEqual(SaleUSD.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 1)
+
+    def test_malformed_entries_are_rejected_one_by_one(self):
+        unknown_currency = dict(
+            self.queued_sale(1), currency='EUR', amount_paid='500', products=[{'id': self.product.id, 'quantity': 1, 'unit_price': '500'}],
+        )
+        bad_lines = dict(self.queued_sale(1), products=['not a line'])
+        bad_products = dict(self.queued_sale(1), products={'id': self.product.id})
+        sale = self.queued_sale(1)
+        response = self.client.post(
+            reverse('core:api_sync_sales'),
+            data=json.dumps({'sales': [unknown_currency, bad_lines, bad_products, sale, sale]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'rejected', 'rejected', 'created', 'duplicate'])
+        # An unknown currency is recorded as ETB, and the result says so
+        self.assertEqual(results[0]['currency'], 'ETB')
+        self.assertEqual(results[4]['currency'], 'USD')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 3)
+
+    def test_create_sale_accepts_client_uuid(self):
+        client_uuid = str(uuid.uuid4())
+        response = self.client.post(reverse('core:create_sale'), {
+            'client_uuid': client_uuid,
+            'currency': 'USD',
+            'amount_paid': '5.00',
+            'products[0][id]': self.product.id,
+            'products[0][quantity]': '1',
+            'products[0][unit_price]': '5.00',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(response.json()['transaction_id'], client_uuid)
+        self.assertEqual(self.sync([{**self.queued_sale(1), 'client_uuid': client_uuid}]), ['duplicate'])
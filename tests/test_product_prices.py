@@ -0,0 +1,70 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import Category, CurrencySettings, Product, ProductPrice, SaleSOS
+from decimal import Decimal
+
+
+class ProductPriceTableTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.settings = CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.product = Product.objects.create(
+            name="Test Fabric",
+            brand="Brand",
+            category=Category.objects.create(name="Fabrics"),
+            current_stock=10,
+            selling_price=Decimal('5.03'),
+            purchase_price=Decimal('3.00'),
+        )
+
+    def prices(self, currency):
+        return ProductPrice.lookup([self.product.id], currency)[self.product.id]
+
+    def test_rebuilt_on_product_and_rate_change(self):
+        self.assertEqual(self.prices('USD'), (Decimal('5.03'), Decimal('3.00')))
+        self.assertEqual(self.prices('SOS'), (Decimal('40240.00'), Decimal('24000.00')))
+
+        self.product.selling_price = Decimal('6.00')
+        self.product.save()
+        self.assertEqual(self.prices('ETB'), (Decimal('600.00'), Decimal('300.00')))
+
+        self.settings.sos_price_step = Decimal('500')
+        self.settings.usd_to_sos_rate = Decimal('8100.00')
+        self.settings.save()
+        self.assertEqual(self.prices('SOS'), (Decimal('49000.00'), Decimal('24300.00')))
+
+    def test_rounding_goes_up_to_step(self):
+        self.assertEqual(
+            ProductPrice.compute(Decimal('3.01'), Decimal('3.00'), Decimal('8000'), Decimal('500')),
+            (Decimal('24500.00'), Decimal('24000.00')),
+        )
+        self.assertEqual(
+            ProductPrice.compute(Decimal('3.125'), Decimal('3.00'), Decimal('100.00'), Decimal('0.01')),
+            (Decimal('312.50'), Decimal('300.00')),
+        )
+
+    def test_sale_uses_rounded_default_and_floor(self):
+        self.settings.sos_price_step = Decimal('500')
+        self.settings.save()
+        response = self.client.post(reverse('core:create_sale'), {
+            'currency': 'SOS',
+            'amount_paid': '40500',
+            'products[0][id]': self.product.id,
+            'products[0][quantity]': '1',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTrue(response.json()['success'], response.json())
+        self.assertEqual(SaleSOS.objects.get().total_amount, Decimal('40500.00'))
+
+        response = self.client.post(reverse('core:create_sale'), {
+            'currency': 'SOS',
+            'amount_paid': '20000',
+            'products[0][id]': self.product.id,
+            'products[0][quantity]': '1',
+            'products[0][unit_price]': '20000',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertFalse(response.json()['success'])
+        self.assertIn('below purchase price of 24000 SOS', response.json()['error'])
@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import (
+    Category, CurrencySettings, Product, SaleUSD, SaleItemUSD, SaleSOS, SaleItemSOS, SalesFact, SalesRunningTotal,
+    Transaction,
+)
+from core.reports import comparison_ranges
+from decimal import Decimal
+
+
+class SalesRunningTotalTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.product = Product.objects.create(
+            name="Silk", brand="Acme", category=Category.objects.create(name="Fabrics"),
+            current_stock=20, selling_price=5, purchase_price=3,
+        )
+        self.today = timezone.now().date()
+
+    def _sell(self, quantity=2, paid='5'):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = SaleUSD.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal(paid))
+            SaleItemUSD.objects.create(sale=sale, product=self.product, quantity=quantity, unit_price=Decimal('6'), total_price=0)
+            sale.calculate_total()
+        return sale
+
+    def _backdate(self, sale, days):
+        moved = timezone.now() - timedelta(days=days)
+        SaleUSD.objects.filter(pk=sale.pk).update(date_created=moved)
+        Transaction.objects.filter(source='USD', source_id=sale.pk).update(date_created=moved)
+        SalesFact.rebuild()
+        SalesRunningTotal.rebuild()
+
+    def test_writes_keep_the_running_sums_current(self):
+        sale = self._sell()
+        with self.captureOnCommitCallbacks(execute=True):
+            sos_sale = SaleSOS.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('0'))
+            SaleItemSOS.objects.create(sale=sos_sale, product=self.product, quantity=1, unit_price=Decimal('44000'), total_price=0)
+
+        totals = SalesRunningTotal.range_totals(self.today, self.today)
+        usd = totals['USD']
+        self.assertEqual((usd['sales_count'], usd['total_amount'], usd['amount_paid']), (1, Decimal('12.00'), Decimal('5.00')))
+        self.assertEqual((usd['quantity'], usd['cost_usd'], usd['profit_usd']), (Decimal('2.00'), Decimal('6.00'), Decimal('6.00')))
+        self.assertEqual(totals['SOS']['revenue_usd'], Decimal('5.50'))
+        self.assertEqual(totals['ALL']['revenue_usd'], Decimal('17.50'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.items.first().delete()
+        self.assertEqual(SalesRunningTotal.range_totals(self.today, self.today)['USD']['quantity'], Decimal('0.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            sos_sale.delete()
+        self.assertEqual(SalesRunningTotal.range_totals(self.today, self.today)['ALL']['sales_count'], 1)
+
+    def test_edits_to_an_earlier_day_shift_later_sums(self):
+        old_sale = self._sell()
+        self._backdate(old_sale, 8)
+        self._sell(quantity=1)
+
+        week = SalesRunningTotal.range_totals(self.today - timedelta(days=6), self.today)['USD']
+        self.assertEqual((week['sales_count'], week['quantity']), (1, Decimal('1.00')))
+        fortnight = SalesRunningTotal.range_totals(self.today - timedelta(days=13), self.today)['USD']
+        self.assertEqual((fortnight['sales_count'], fortnight['quantity']), (2, Decimal('3.00')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SaleItemUSD.objects.create(sale=old_sale, product=self.product, quantity=4, unit_price=Decimal('6'), total_price=0)
+        self.assertEqual(SalesRunningTotal.range_totals(self.today - timedelta(days=13), self.today)['USD']['quantity'], Decimal('7.00'))
+        self.assertEqual(SalesRunningTotal.range_totals(self.today, self.today)['USD']['quantity'], Decimal('1.00'))
+
+        incremental = list(SalesRunningTotal.objects.order_by('day').values_list('day', 'cum_quantity', 'cum_total_amount'))
+        SalesRunningTotal.rebuild()
+        self.assertEqual(incremental, list(SalesRunningTotal.objects.order_by('day').values_list('day', 'cum_quantity', 'cum_total_amount')))
+
+    def test_comparison_api(self):
+        old_sale = self._sell()
+        self._backdate(old_sale, 7)
+        self._sell(quantity=1, paid='6')
+
+        start = self.today - timedelta(days=self.today.weekday())
+        self.assertEqual(comparison_ranges(start, self.today, 'week')['previous'], (start - timedelta(days=7), self.today - timedelta(days=7)))
+        response = self.client.get(reverse('core:api_sales_totals'), {'period': 'week'})
+        data = response.json()
+        self.assertEqual(data['current']['totals']['ALL']['sales_count'], 1)
+        self.assertEqual(data['previous']['totals']['ALL']['sales_count'], 1)
+        self.assertEqual(data['previous']['change']['total_amount_usd'], -50.0)
+        self.assertIsNone(data['last_year']['change']['sales_count'])
+        self.assertIn('profit_usd', data['current']['totals']['USD'])
+
+        clerk = User.objects.create_user('clerk', 'clerk@example.com', 'password')
+        self.client.force_login(clerk)
+        data = self.client.get(reverse('core:api_sales_totals'), {
+            'start_date': (self.today - timedelta(days=7)).isoformat(), 'end_date': self.today.isoformat(),
+        }).json()
+        self.assertEqual(data['current']['totals']['USD']['quantity'], 3.0)
+        self.assertNotIn('profit_usd', data['current']['totals']['USD'])
+        self.assertEqual(self.client.get(reverse('core:api_sales_totals'), {'period': 'year'}).status_code, 400)
+
+        response = self.client.get(reverse('core:sales_history'), {'days': 30})
+        self.assertEqual(response.context['total_sales'], 2)
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_sales_history_counts_rows_without_running_totals(self):
+        self._sell()
+        self._sell(quantity=1)
+        SalesRunningTotal.objects.all().delete()
+
+        response = self.client.get(reverse('core:sales_history'), {'days': 30})
+        self.assertEqual(response.context['total_sales'], 2)
+        self.assertEqual(len(response.context['page_obj']), 2)
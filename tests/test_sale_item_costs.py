@@ -0,0 +1,59 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import Category, CurrencySettings, Product, SaleUSD, SaleItemUSD, SaleETB, SaleItemETB
+from decimal import Decimal
+from io import StringIO
+
+
+class SaleItemCostSnapshotTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.product = Product.objects.create(
+            name="Test Fabric",
+            brand="Brand",
+            category=Category.objects.create(name="Fabrics"),
+            current_stock=10,
+            selling_price=5,
+            purchase_price=3,
+        )
+
+    def test_profit_is_stable_after_product_reprice(self):
+        sale = SaleUSD.objects.create(user=self.user, total_amount=Decimal('12'), amount_paid=Decimal('12'))
+        item = SaleItemUSD.objects.create(sale=sale, product=self.product, quantity=2, unit_price=Decimal('6'), total_price=0)
+        self.assertEqual(item.unit_cost_usd, Decimal('3'))
+        self.assertEqual(item.min_price_usd, Decimal('5'))
+
+        self.product.purchase_price = Decimal('4.50')
+        self.product.selling_price = Decimal('6.00')
+        self.product.save()
+
+        item = SaleItemUSD.objects.get(pk=item.pk)
+        self.assertEqual(item.get_base_profit_usd(), Decimal('4.00'))
+        self.assertEqual(item.get_profit_usd(), Decimal('6.00'))
+        self.assertEqual(SaleItemUSD.cost_totals(sale=sale), {
+            'cost_usd': Decimal('6.00'),
+            'expected_profit_usd': Decimal('4.00'),
+        })
+
+        response = self.client.get(reverse('core:api_dashboard_widget', args=['profit']))
+        self.assertEqual(response.context['expected_profit_etb'], Decimal('400.00'))
+        self.assertEqual(response.context['actual_profit_etb'], Decimal('600.00'))
+
+    def test_backfill_command_fills_missing_snapshots(self):
+        sale = SaleETB.objects.create(user=self.user, total_amount=Decimal('600'), amount_paid=Decimal('600'), exchange_rate_at_sale=Decimal('100'))
+        item = SaleItemETB.objects.create(sale=sale, product=self.product, quantity=1, unit_price=Decimal('600'), total_price=0)
+        SaleItemETB.objects.filter(pk=item.pk).update(unit_cost_usd=None, min_price_usd=None)
+        # Until the backfill runs, the profit properties read the product's prices
+        self.assertEqual(sale.expected_profit_usd, Decimal('2.00'))
+
+        call_command('backfill_sale_item_costs', stdout=StringIO())
+
+        item.refresh_from_db()
+        self.assertEqual(item.unit_cost_usd, Decimal('3.00'))
+        self.assertEqual(item.min_price_usd, Decimal('5.00'))
@@ -0,0 +1,116 @@
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import (
+    Category, CurrencySettings, Product, SaleUSD, SaleItemUSD, SaleSOS, SaleItemSOS, SalesFact,
+)
+from core.reports import product_sale_lines
+from decimal import Decimal
+
+
+class SalesFactTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.category = Category.objects.create(name="Fabrics")
+        self.product = Product.objects.create(
+            name="Test Fabric", brand="Brand", category=self.category,
+            current_stock=10, selling_price=5, purchase_price=3,
+        )
+        self.other = Product.objects.create(
+            name="Other Fabric", brand="Brand", category=Category.objects.create(name="Other"),
+            current_stock=10, selling_price=2, purchase_price=1,
+        )
+
+    def _sell(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            usd_sale = SaleUSD.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('0'))
+            SaleItemUSD.objects.create(sale=usd_sale, product=self.product, quantity=2, unit_price=Decimal('6'), total_price=0)
+            SaleItemUSD.objects.create(sale=usd_sale, product=self.other, quantity=1, unit_price=Decimal('2'), total_price=0)
+            sos_sale = SaleSOS.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('0'))
+            SaleItemSOS.objects.create(sale=sos_sale, product=self.product, quantity=1, unit_price=Decimal('44000'), total_price=0)
+        return usd_sale, sos_sale
+
+    def test_cells_refresh_once_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            sale = SaleUSD.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('0'))
+            for product in (self.product, self.other, self.product):
+                SaleItemUSD.objects.create(sale=sale, product=product, quantity=1, unit_price=Decimal('6'), total_price=0)
+            sale.calculate_total()
+        # Nothing is recomputed per item; one batch waits for the commit
+        self.assertFalse(SalesFact.objects.exists())
+        with mock.patch.object(SalesFact, 'refresh_cells', wraps=SalesFact.refresh_cells) as refresh_cells:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(refresh_cells.call_count, 1)
+        self.assertEqual(
+            dict(SalesFact.objects.values_list('product_id', 'quantity')),
+            {self.product.id: Decimal('2.00'), self.other.id: Decimal('1.00')},
+        )
+
+    def test_a_cell_is_stored_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = SaleUSD.objects.create(total_amount=Decimal('0'), amount_paid=Decimal('0'))
+            SaleItemUSD.objects.create(sale=sale, product=self.product, quantity=1, unit_price=Decimal('6'), total_price=0)
+        fact = SalesFact.objects.get()
+        self.assertIsNone(fact.user_id)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SalesFact.objects.create(day=fact.day, product=self.product, currency='USD')
+
+        # A refresh over a cell another refresh already wrote replaces it
+        SalesFact.refresh_cells(fact.day, 'USD', [self.product.id])
+        self.assertEqual(SalesFact.objects.get().quantity, Decimal('1.00'))
+
+    def test_cells_are_updated_incrementally(self):
+        usd_sale, sos_sale = self._sell()
+
+        fact = SalesFact.objects.get(product=self.product, currency='USD')
+        self.assertEqual(fact.quantity, Decimal('2'))
+        self.assertEqual(fact.revenue_usd, Decimal('12.00'))
+        self.assertEqual(fact.profit_usd, Decimal('6.00'))
+        self.assertEqual(SalesFact.objects.get(product=self.product, currency='SOS').revenue_usd, Decimal('5.50'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            usd_sale.items.get(product=self.other).delete()
+        self.assertFalse(SalesFact.objects.filter(product=self.other).exists())
+
+        by_category = {
+            row['category_id']: row['total_revenue_usd']
+            for row in SalesFact.summarize(['category'], start_date=fact.day)
+        }
+        self.assertEqual(by_category, {self.category.id: Decimal('17.50')})
+
+    def test_rebuild_matches_incremental_and_views_read_cube(self):
+        self._sell()
+        incremental = sorted(SalesFact.objects.values_list('product_id', 'currency', 'quantity', 'revenue_usd', 'cost_usd'))
+        self.assertEqual(SalesFact.rebuild(), 3)
+        rebuilt = sorted(SalesFact.objects.values_list('product_id', 'currency', 'quantity', 'revenue_usd', 'cost_usd'))
+        self.assertEqual(incremental, rebuilt)
+
+        response = self.client.get(reverse('core:api_dashboard_widget', args=['top_sellers']))
+        top = response.context['top_selling_items'][0]
+        self.assertEqual(top['name'], self.product.name)
+        self.assertEqual(top['total_qty'], Decimal('3'))
+
+        response = self.client.get(reverse('core:revenue_details'), {'category': self.category.id})
+        self.assertEqual(len(response.context['revenue_items']), 1)
+        self.assertEqual(response.context['total_revenue_etb'], Decimal('1750.00'))
+        self.assertEqual(response.context['revenue_items'][0]['line_count'], 2)
+
+        # Line items are fetched per product when a row is expanded
+        today = response.context['end_date'].isoformat()
+        url = reverse('core:api_revenue_product_lines', args=[self.product.id])
+        data = self.client.get(url, {'start_date': today, 'end_date': today}).json()
+        self.assertEqual([line['currency'] for line in data['lines']], ['SOS', 'USD'])
+        self.assertFalse(data['has_next'])
+        day = response.context['end_date']
+        first, has_next = product_sale_lines(self.product.id, day, day, page=1, page_size=1)
+        second, has_more = product_sale_lines(self.product.id, day, day, page=2, page_size=1)
+        self.assertEqual(([line['currency'] for line in first + second], has_next, has_more), (['SOS', 'USD'], True, False))
+        self.assertEqual(self.client.get(url, {'start_date': 'yesterday'}).status_code, 400)
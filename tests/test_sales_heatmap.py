@@ -0,0 +1,69 @@
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import Category, CurrencySettings, Product, SaleUSD, SaleItemUSD, SalesHour, Transaction
+from decimal import Decimal
+
+
+@override_settings(SHOP_TIME_ZONE='Africa/Mogadishu')
+class SalesHeatmapTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.product = Product.objects.create(
+            name="Silk", brand="Acme", category=Category.objects.create(name="Fabrics"),
+            current_stock=20, selling_price=5, purchase_price=3,
+        )
+
+    def _sell(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = SaleUSD.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('5'))
+            SaleItemUSD.objects.create(sale=sale, product=self.product, quantity=2, unit_price=Decimal('6'), total_price=0)
+            sale.calculate_total()
+        return sale
+
+    def test_hour_buckets_follow_writes(self):
+        sale = self._sell()
+        bucket = SalesHour.objects.get()
+        self.assertEqual(bucket.hour, timezone.now().replace(minute=0, second=0, microsecond=0))
+        self.assertEqual((bucket.sales_count, bucket.revenue_usd, bucket.quantity), (1, Decimal('12.00'), Decimal('2.00')))
+        self.assertEqual((bucket.amount_paid_usd, bucket.debt_amount_usd, bucket.cost_usd), (Decimal('5.00'), Decimal('7.00'), Decimal('6.00')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.items.get().delete()
+        self.assertEqual(SalesHour.objects.get().quantity, Decimal('0.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.delete()
+        self.assertFalse(SalesHour.objects.exists())
+
+    def test_heatmap_uses_the_shop_clock(self):
+        sale = self._sell()
+        # Monday 07:30 UTC is 10:30 in Mogadishu
+        moved = datetime(2026, 10, 12, 7, 30, tzinfo=dt_timezone.utc)
+        SaleUSD.objects.filter(pk=sale.pk).update(date_created=moved)
+        Transaction.objects.filter(source='USD', source_id=sale.pk).update(date_created=moved)
+        self.assertEqual(SalesHour.rebuild(), 1)
+
+        response = self.client.get(reverse('core:api_sales_heatmap'), {
+            'start_date': '2026-10-05', 'end_date': '2026-10-18', 'metric': 'revenue_usd',
+        })
+        data = response.json()
+        self.assertEqual(data['days'], 14)
+        self.assertEqual(data['cells'][0][10], 6.0)
+        self.assertEqual(sum(map(sum, data['cells'])), 6.0)
+        self.assertEqual(self.client.get(reverse('core:api_sales_heatmap'), {'metric': 'profit'}).status_code, 400)
+
+        response = self.client.get(reverse('core:sales_heatmap'), {'start_date': '2026-10-12', 'end_date': '2026-10-12'})
+        self.assertEqual(response.context['rows'][0]['cells'][10]['value'], 1.0)
+        self.assertEqual(response.context['rows'][0]['cells'][10]['alpha'], 1.0)
+
+        series = self.client.get(reverse('core:api_sales_series'), {
+            'interval': 'hour', 'series': 'revenue', 'start_date': '2026-10-12', 'end_date': '2026-10-12', 'points': 24,
+        }).json()['series']['revenue']
+        self.assertIn([moved.replace(minute=0).isoformat(), 12.0], series)
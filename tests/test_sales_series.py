@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import (
+    Category, CurrencySettings, Product, SaleUSD, SaleItemUSD, SalesFact, SalesHour, SalesRunningTotal, Transaction,
+)
+from core.timeseries import lttb
+from decimal import Decimal
+
+
+class SalesSeriesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.product = Product.objects.create(
+            name="Silk", brand="Acme", category=Category.objects.create(name="Fabrics"),
+            current_stock=20, selling_price=5, purchase_price=3,
+        )
+        self.today = timezone.now().date()
+
+    def _sell(self, days_ago=0, quantity=2, paid='5'):
+        sale = SaleUSD.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal(paid))
+        SaleItemUSD.objects.create(sale=sale, product=self.product, quantity=quantity, unit_price=Decimal('6'), total_price=0)
+        sale.calculate_total()
+        if days_ago:
+            moved = timezone.now() - timedelta(days=days_ago)
+            SaleUSD.objects.filter(pk=sale.pk).update(date_created=moved)
+            Transaction.objects.filter(source='USD', source_id=sale.pk).update(date_created=moved)
+        return sale
+
+    def test_lttb_keeps_the_ends_and_the_peaks(self):
+        values = [0.0] * 1000
+        values[437] = 50.0
+        values[812] = -20.0
+        kept = lttb(values, 20)
+        self.assertEqual(len(kept), 20)
+        self.assertEqual((kept[0], kept[-1]), (0, 999))
+        self.assertIn(437, kept)
+        self.assertIn(812, kept)
+        self.assertEqual(kept, sorted(kept))
+        self.assertEqual(lttb([1.0, 2.0], 300), [0, 1])
+
+    def test_series_api(self):
+        self._sell()
+        self._sell(days_ago=400, quantity=1, paid='6')
+        SalesFact.rebuild()
+        SalesHour.rebuild()
+        SalesRunningTotal.rebuild()
+
+        url = reverse('core:api_sales_series')
+        response = self.client.get(url, {
+            'start_date': (self.today - timedelta(days=729)).isoformat(), 'points': 100, 'currency': 'ETB',
+        })
+        data = response.json()
+        self.assertEqual(data['raw_points'], 730)
+        self.assertEqual(len(data['series']['collected']), 100)
+        self.assertEqual(data['series']['collected'][-1], [self.today.isoformat(), 500.0])
+        self.assertIn([(self.today - timedelta(days=400)).isoformat(), 600.0], data['series']['collected'])
+        self.assertEqual(data['series']['debt'][-1][1], 700.0)
+        self.assertEqual(data['series']['profit'][-1][1], 600.0)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], data={
+            'start_date': (self.today - timedelta(days=729)).isoformat(), 'points': 100, 'currency': 'ETB',
+        }).status_code, 304)
+
+        hourly = self.client.get(url, {'interval': 'hour', 'series': 'revenue'}).json()
+        self.assertEqual(hourly['raw_points'], 7 * 24)
+        self.assertEqual(sum(value for _, value in hourly['series']['revenue']), 12.0)
+        self.assertEqual(self.client.get(url, {'interval': 'hour', 'start_date': '2020-01-01'}).status_code, 400)
+
+        clerk = User.objects.create_user('clerk', 'clerk@example.com', 'password')
+        self.client.force_login(clerk)
+        self.assertEqual(self.client.get(url, {'series': 'profit'}).status_code, 400)
+        self.assertNotIn('profit', self.client.get(url).json()['series'])
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.live import broadcaster
+from core.models import AuditLog, CatalogVersion, Category, InventoryLog, Product, StockTake
+from decimal import Decimal
+
+
+class StockTakeTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name="Fabrics")
+        self.silk = Product.objects.create(
+            name="Silk", brand="Acme", category=self.category, current_stock=10, selling_price=5, purchase_price=3,
+        )
+        self.cotton = Product.objects.create(
+            name="Cotton", brand="Acme", category=self.category, current_stock=4, selling_price=4, purchase_price=2,
+        )
+        self.wool = Product.objects.create(
+            name="Wool", brand="Acme", category=Category.objects.create(name="Yarn"), current_stock=7, selling_price=4, purchase_price=2,
+        )
+
+    def count(self, stock_take, counts):
+        return self.client.post(
+            reverse('core:api_stock_take_counts', args=[stock_take.id]),
+            json.dumps({'counts': counts}),
+            content_type='application/json',
+        )
+
+    def test_start_snapshots_stock_in_scope(self):
+        response = self.client.post(reverse('core:stock_takes_list'), {'category': self.category.id})
+        stock_take = StockTake.objects.get()
+        self.assertRedirects(response, reverse('core:stock_take_detail', args=[stock_take.id]))
+        self.assertEqual(
+            dict(stock_take.lines.values_list('product_id', 'expected_quantity')),
+            {self.silk.id: Decimal('10.00'), self.cotton.id: Decimal('4.00')},
+        )
+        stock_take.record_counts([(self.silk.id, Decimal('9'), False)], self.user)
+        self.assertContains(self.client.get(reverse('core:stock_take_detail', args=[stock_take.id])), '1 / 2 counted')
+        self.assertContains(self.client.get(reverse('core:stock_takes_list')), 'Fabrics')
+
+    def test_batched_counts_add_and_set(self):
+        stock_take = StockTake.start(self.user)
+        response = self.count(stock_take, [
+            {'product_id': self.silk.id, 'quantity': 1, 'add': True},
+            {'product_id': self.silk.id, 'quantity': 2, 'add': True},
+            {'product_id': self.cotton.id, 'quantity': 3},
+        ])
+        self.assertTrue(response.json()['success'])
+        self.count(stock_take, [{'product_id': self.silk.id, 'quantity': 5, 'add': True}])
+        counted = dict(stock_take.lines.values_list('product_id', 'counted_quantity'))
+        self.assertEqual(counted[self.silk.id], Decimal('8.00'))
+        self.assertEqual(counted[self.cotton.id], Decimal('3.00'))
+        self.assertIsNone(counted[self.wool.id])
+
+        response = self.count(stock_take, [{'product_id': 999999, 'quantity': 1}, {'product_id': self.silk.id, 'quantity': -1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual({error['index'] for error in response.json()['errors']}, {0, 1})
+
+    async def _subscribe(self):
+        return broadcaster.subscribe()
+
+    def test_counts_apply_in_order(self):
+        stock_take = StockTake.start(self.user)
+        stock_take.record_counts([
+            (self.silk.id, Decimal('3'), True), (self.silk.id, Decimal('5'), False), (self.silk.id, Decimal('1'), True),
+            (self.cotton.id, Decimal('2'), True),
+        ], self.user)
+        stock_take.record_counts([(self.cotton.id, Decimal('1'), True)], self.user)
+        counted = dict(stock_take.lines.values_list('product_id', 'counted_quantity'))
+        self.assertEqual((counted[self.silk.id], counted[self.cotton.id]), (Decimal('6.00'), Decimal('3.00')))
+
+    def test_post_bumps_the_catalog_and_publishes_stock_alerts(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscription = loop.run_until_complete(self._subscribe())
+        self.addCleanup(broadcaster.unsubscribe, subscription)
+        stock_take = StockTake.start(self.user)
+        stock_take.record_counts([(self.cotton.id, Decimal('0'), False)], self.user)
+        version = CatalogVersion.current()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stock_take.post(self.user)
+        self.cotton.refresh_from_db()
+        self.assertGreater(self.cotton.catalog_version, version)
+        self.assertGreater(CatalogVersion.current(), version)
+        loop.run_until_complete(asyncio.sleep(0))
+        alert = subscription.queue.get_nowait()
+        self.assertEqual((alert['type'], alert['product_id'], alert['out_of_stock_delta']), ('stock_alert', self.cotton.id, 1))
+
+    def test_post_applies_variance_on_top_of_sales_made_while_counting(self):
+        stock_take = StockTake.start(self.user)
+        stock_take.record_counts([(self.silk.id, Decimal('8'), False), (self.cotton.id, Decimal('4'), False)], self.user)
+        # A sale after the snapshot must survive the posting
+        Product.objects.filter(pk=self.silk.id).update(current_stock=Decimal('9'))
+
+        response = self.client.post(reverse('core:stock_take_post', args=[stock_take.id]))
+        self.assertRedirects(response, reverse('core:stock_take_detail', args=[stock_take.id]))
+        self.silk.refresh_from_db()
+        self.wool.refresh_from_db()
+        self.assertEqual(self.silk.current_stock, Decimal('7.00'))
+        self.assertEqual(self.wool.current_stock, Decimal('7.00'))
+
+        log = InventoryLog.objects.get()
+        self.assertEqual((log.product_id, log.action, log.quantity_change), (self.silk.id, 'ADJUSTMENT', Decimal('-2.00')))
+        self.assertEqual((log.old_quantity, log.new_quantity), (Decimal('9.00'), Decimal('7.00')))
+        stock_take.refresh_from_db()
+        self.assertEqual(stock_take.status, 'POSTED')
+        self.assertEqual(stock_take.lines.get(product=self.silk).variance, Decimal('-2.00'))
+        self.assertTrue(AuditLog.objects.filter(action='STOCK_TAKE_POSTED', object_id=str(stock_take.id)).exists())
+
+        # Posting twice or counting after posting is refused
+        self.client.post(reverse('core:stock_take_post', args=[stock_take.id]))
+        self.assertEqual(InventoryLog.objects.count(), 1)
+        self.assertEqual(self.count(stock_take, [{'product_id': self.silk.id, 'quantity': 1}]).status_code, 409)
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import Category, CurrencySettings, Product, ProductSalesDay, SaleUSD, SaleItemUSD, SaleSOS, SaleItemSOS
+from core.topk import top_categories, top_products
+from decimal import Decimal
+
+
+class TopSellersTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.fabrics = Category.objects.create(name="Fabrics")
+        self.silk = Product.objects.create(
+            name="Silk", brand="Acme", category=self.fabrics, current_stock=50, selling_price=5, purchase_price=3,
+        )
+        self.cotton = Product.objects.create(
+            name="Cotton", brand="Acme", category=self.fabrics, current_stock=50, selling_price=1, purchase_price=1,
+        )
+        self.perfume = Product.objects.create(
+            name="Oud", brand="Acme", category=Category.objects.create(name="Perfume"),
+            current_stock=50, selling_price=20, purchase_price=10,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = SaleUSD.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('0'))
+            SaleItemUSD.objects.create(sale=sale, product=self.silk, quantity=2, unit_price=Decimal('6'), total_price=0)
+            SaleItemUSD.objects.create(sale=sale, product=self.cotton, quantity=10, unit_price=Decimal('1'), total_price=0)
+            SaleItemUSD.objects.create(sale=sale, product=self.perfume, quantity=1, unit_price=Decimal('30'), total_price=0)
+            sos_sale = SaleSOS.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('0'))
+            SaleItemSOS.objects.create(sale=sos_sale, product=self.silk, quantity=1, unit_price=Decimal('48000'), total_price=0)
+
+    def test_rankings_add_up_currencies(self):
+        self.assertEqual(ProductSalesDay.objects.count(), 3)
+        by_quantity = top_products(k=2)
+        self.assertEqual([row['product'] for row in by_quantity], [self.cotton, self.silk])
+        self.assertEqual((by_quantity[1]['quantity'], by_quantity[1]['revenue_usd']), (Decimal('3.00'), Decimal('18.00')))
+        self.assertEqual([row['product'] for row in top_products(k=3, by='revenue')], [self.perfume, self.silk, self.cotton])
+        self.assertEqual([row['category'] for row in top_categories()], [self.fabrics, self.perfume.category])
+        self.assertEqual([row['category'] for row in top_categories(by='revenue')], [self.perfume.category, self.fabrics])
+        self.assertEqual(top_products(category_id=self.perfume.category_id)[0]['product'], self.perfume)
+
+        self.silk.sales_days.update(day=timezone.now().date() - timedelta(days=20))
+        self.assertEqual([row['product'] for row in top_products(k=5, days=7)], [self.cotton, self.perfume])
+        self.assertEqual(len(top_products(k=5, days=30)), 3)
+
+    def test_window_counts_today_as_its_first_day(self):
+        today = timezone.now().date()
+        self.silk.sales_days.update(day=today - timedelta(days=6))
+        self.cotton.sales_days.update(day=today - timedelta(days=7))
+        self.assertEqual([row['product'] for row in top_products(k=5, days=7)], [self.silk, self.perfume])
+        self.assertEqual([row['product'] for row in top_products(k=5, days=1)], [self.perfume])
+        self.assertEqual(ProductSalesDay.window_start(), today - timedelta(days=ProductSalesDay.WINDOW_DAYS - 1))
+
+    def test_window_expires_and_api(self):
+        ProductSalesDay.objects.create(
+            day=timezone.now().date() - timedelta(days=ProductSalesDay.WINDOW_DAYS + 1), product=self.perfume, quantity=99,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = SaleUSD.objects.create(user=self.user, total_amount=Decimal('0'), amount_paid=Decimal('0'))
+            SaleItemUSD.objects.create(sale=sale, product=self.perfume, quantity=1, unit_price=Decimal('30'), total_price=0)
+        self.assertFalse(ProductSalesDay.objects.filter(quantity=99).exists())
+        self.assertEqual(ProductSalesDay.rebuild(), 3)
+
+        data = self.client.get(reverse('core:api_top_sellers'), {'by': 'revenue', 'k': 1}).json()
+        self.assertEqual(data['items'], [{'id': self.perfume.id, 'name': 'Oud', 'category': 'Perfume', 'quantity': 2.0, 'revenue_usd': 60.0}])
+        data = self.client.get(reverse('core:api_top_sellers'), {'level': 'category'}).json()
+        self.assertEqual([item['name'] for item in data['items']], ['Fabrics', 'Perfume'])
+        self.assertEqual(self.client.get(reverse('core:api_top_sellers'), {'by': 'profit'}).status_code, 400)
+
+        response = self.client.get(reverse('core:api_dashboard_widget', args=['top_sellers']))
+        self.assertContains(response, 'Cotton')
@@ -0,0 +1,98 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import (
+    Category, Customer, CurrencySettings, Product,
+    SaleSOS, SaleItemSOS, SaleUSD, DebtPaymentUSD, Transaction, TransactionItem, TransactionPayment,
+)
+from decimal import Decimal
+
+
+class TransactionLedgerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.customer = Customer.objects.create(name="Test Cust", phone="1234")
+        self.product = Product.objects.create(
+            name="Test Fabric",
+            brand="Brand",
+            category=Category.objects.create(name="Fabrics"),
+            current_stock=10,
+            selling_price=5,
+            purchase_price=3,
+        )
+
+    def test_sale_is_mirrored_with_items_and_usd_amounts(self):
+        sale = SaleSOS.objects.create(user=self.user, customer=self.customer, total_amount=Decimal('0'), amount_paid=Decimal('40000'))
+        SaleItemSOS.objects.create(sale=sale, product=self.product, quantity=2, unit_price=Decimal('40000'), total_price=0)
+        sale.calculate_total()
+
+        ledger = Transaction.objects.get(source='SOS', source_id=sale.id)
+        self.assertEqual(ledger.currency, 'SOS')
+        self.assertEqual(ledger.total_amount, Decimal('80000.00'))
+        self.assertEqual(ledger.total_amount_usd, Decimal('10.00'))
+        self.assertEqual(ledger.debt_amount_usd, Decimal('5.00'))
+        self.assertEqual(ledger.items.get().quantity, Decimal('2'))
+
+        # Rate captured at sale time survives a later rate change
+        settings = CurrencySettings.objects.first()
+        settings.usd_to_sos_rate = Decimal('10000.00')
+        settings.save()
+        sale.amount_paid = Decimal('80000')
+        sale.save()
+        ledger.refresh_from_db()
+        self.assertEqual(ledger.amount_paid_usd, Decimal('10.00'))
+
+        sale.delete()
+        self.assertFalse(Transaction.objects.filter(source='SOS', source_id=sale.id).exists())
+
+    def test_payment_is_mirrored(self):
+        payment = DebtPaymentUSD.objects.create(customer=self.customer, user=self.user, amount=Decimal('7.50'))
+        ledger = TransactionPayment.objects.get(source='USD', source_id=payment.id)
+        self.assertEqual(ledger.amount_usd, Decimal('7.50'))
+
+    def test_views_read_from_ledger(self):
+        sale = SaleUSD.objects.create(user=self.user, customer=self.customer, total_amount=Decimal('10'), amount_paid=Decimal('4'))
+        self.customer.total_debt_usd = Decimal('6')
+        self.customer.save()
+
+        response = self.client.get(reverse('core:sale_detail', kwargs={'currency': 'USD', 'sale_id': sale.id}))
+        self.assertContains(response, str(sale.transaction_id))
+        response = self.client.get(reverse('core:sale_detail_legacy', kwargs={'sale_id': sale.id}))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(reverse('core:sales_list'), {'currency': 'USD'})
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+        response = self.client.get(reverse('core:customer_detail', kwargs={'customer_id': self.customer.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['sales_count'], 1)
+
+        response = self.client.get(reverse('core:customers_debt'))
+        customer = response.context['customers_with_debt'][0]
+        self.assertEqual([t.source_id for t in customer.outstanding_sales], [sale.id])
+
+    def test_reconcile_catches_and_repairs_drift(self):
+        sale = SaleSOS.objects.create(user=self.user, customer=self.customer, total_amount=Decimal('0'), amount_paid=Decimal('0'))
+        item = SaleItemSOS.objects.create(sale=sale, product=self.product, quantity=1, unit_price=Decimal('40000'), total_price=0)
+        payment = DebtPaymentUSD.objects.create(customer=self.customer, user=self.user, amount=Decimal('3'))
+        call_command('reconcile_ledger', stdout=StringIO())
+
+        # update() skips the signals that keep the ledger in step
+        SaleSOS.objects.filter(pk=sale.pk).update(amount_paid=Decimal('40000'))
+        SaleItemSOS.objects.filter(pk=item.pk).update(quantity=2)
+        DebtPaymentUSD.objects.filter(pk=payment.pk).update(amount=Decimal('4'))
+        with self.assertRaises(CommandError):
+            call_command('reconcile_ledger', stdout=StringIO())
+
+        call_command('reconcile_ledger', fix=True, stdout=StringIO())
+        self.assertEqual(Transaction.objects.get(source='SOS', source_id=sale.pk).amount_paid, Decimal('40000.00'))
+        self.assertEqual(TransactionItem.objects.get(source_item_id=item.pk).quantity, Decimal('2.00'))
+        self.assertEqual(TransactionPayment.objects.get(source='USD', source_id=payment.pk).amount, Decimal('4.00'))
+        call_command('reconcile_ledger', stdout=StringIO())
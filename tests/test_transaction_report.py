@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import Category, CurrencySettings, Product, SaleETB, SaleItemETB, SaleItemUSD, SaleUSD
+from core.reports import transaction_report_page, transaction_report_totals
+from decimal import Decimal
+
+
+class TransactionReportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        category = Category.objects.create(name="Fabrics")
+        self.silk = Product.objects.create(name="Silk", brand="Acme", category=category, current_stock=100, selling_price=4, purchase_price=3)
+        self.cotton = Product.objects.create(name="Cotton", brand="Acme", category=category, current_stock=100, selling_price=2, purchase_price=1)
+        self.today = timezone.localdate()
+
+    def usd_sale(self, paid, *lines):
+        sale = SaleUSD.objects.create(user=self.user, total_amount=sum(q * p for _, q, p in lines), amount_paid=paid)
+        for product, quantity, price in lines:
+            SaleItemUSD.objects.create(sale=sale, product=product, quantity=quantity, unit_price=price, total_price=0)
+        return sale
+
+    def test_rows_allocate_overpayment_in_proportion(self):
+        self.usd_sale(Decimal('50'), (self.silk, 2, Decimal('5')), (self.cotton, 10, Decimal('3')))
+        sale = SaleETB.objects.create(user=self.user, total_amount=Decimal('500'), amount_paid=Decimal('500'), exchange_rate_at_sale=Decimal('110'))
+        SaleItemETB.objects.create(sale=sale, product=self.silk, quantity=1, unit_price=Decimal('500'), total_price=0)
+
+        rows, cursor = transaction_report_page(self.today, self.today)
+        self.assertIsNone(cursor)
+        by_product = {(row['currency'], row['product_name']): row for row in rows}
+        silk = by_product[('USD', 'Silk')]
+        self.assertEqual(silk['allocated_overpayment'], Decimal('2.50'))
+        self.assertEqual(silk['item_profit_without_overpayment'], Decimal('4.00'))
+        self.assertEqual(silk['profit'], Decimal('6.50'))
+        self.assertEqual(silk['surplus'], Decimal('2.00'))
+        self.assertEqual(by_product[('USD', 'Cotton')]['allocated_overpayment'], Decimal('7.50'))
+
+        # ETB rows convert the USD snapshots at the rate stored on the sale
+        etb = by_product[('ETB', 'Silk')]
+        self.assertEqual(etb['unit_purchase_price'], Decimal('330.00'))
+        self.assertEqual(etb['profit'], Decimal('170.00'))
+
+        totals = transaction_report_totals(self.today, self.today)
+        self.assertEqual(totals['USD']['profit'], Decimal('34.00'))
+        self.assertEqual(totals['USD']['allocated_overpayment'], Decimal('10.00'))
+        self.assertEqual(totals['ETB']['sale_amount'], Decimal('500.00'))
+        self.assertEqual(totals['SOS']['profit'], Decimal('0.00'))
+
+        product_totals = transaction_report_totals(self.today, self.today, ('USD',), product_id=self.cotton.id)
+        self.assertEqual(product_totals['USD']['profit'], Decimal('27.50'))
+
+    def test_keyset_pages_cover_every_row_once(self):
+        for _ in range(7):
+            self.usd_sale(Decimal('0'), (self.silk, 1, Decimal('4')), (self.cotton, 1, Decimal('2')))
+        sale = SaleETB.objects.create(user=self.user, total_amount=Decimal('400'), amount_paid=Decimal('400'))
+        SaleItemETB.objects.create(sale=sale, product=self.silk, quantity=1, unit_price=Decimal('400'), total_price=0)
+        old = self.usd_sale(Decimal('4'), (self.silk, 1, Decimal('4')))
+        SaleUSD.objects.filter(pk=old.pk).update(date_created=timezone.now() - timedelta(days=40))
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = transaction_report_page(self.today - timedelta(days=7), self.today, cursor=cursor, limit=4)
+            seen.extend((row['currency'], row['item_id']) for row in rows)
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 15)
+        self.assertEqual(len(set(seen)), 15)
+        self.assertIn(('ETB', SaleItemETB.objects.get().id), seen)
+
+    def test_view_pages_and_filters(self):
+        for _ in range(3):
+            self.usd_sale(Decimal('4'), (self.silk, 1, Decimal('4')))
+        response = self.client.get(reverse('core:detailed_transaction_report'), {'currency': 'USD'})
+        self.assertEqual(len(response.context['transaction_data']), 3)
+        self.assertEqual(response.context['total_profit_usd'], Decimal('3.00'))
+        self.assertEqual(response.context['next_page_query'], '')
+
+        response = self.client.get(reverse('core:detailed_transaction_report'), {'currency': 'ETB'})
+        self.assertEqual(response.context['transaction_data'], [])
+        self.assertEqual(response.context['total_profit_usd'], Decimal('0.00'))
@@ -0,0 +1,90 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+User = get_user_model()
+from core.models import (
+    Customer, CurrencySettings, SaleSOS, SaleETB, SaleUSD, DebtPaymentSOS, Transaction,
+)
+from decimal import Decimal
+from io import StringIO
+
+
+class USDEquivalentColumnsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.settings = CurrencySettings.objects.create(usd_to_sos_rate=Decimal('8000.00'), usd_to_etb_rate=Decimal('100.00'))
+        self.customer = Customer.objects.create(name="Test Cust", phone="1234")
+
+    def test_columns_use_rate_in_effect_at_sale_time(self):
+        sale = SaleSOS.objects.create(user=self.user, total_amount=Decimal('80000'), amount_paid=Decimal('40000'))
+        self.assertEqual(sale.exchange_rate_at_sale, Decimal('8000.00'))
+        self.assertEqual(sale.total_amount_usd_equiv, Decimal('10.00'))
+        self.assertEqual(sale.debt_amount_usd_equiv, Decimal('5.00'))
+
+        self.settings.usd_to_sos_rate = Decimal('10000.00')
+        self.settings.save()
+        sale.amount_paid = Decimal('80000')
+        sale.save()
+        self.assertEqual(sale.amount_paid_usd_equiv, Decimal('10.00'))
+        self.assertEqual(sale.debt_amount_usd_equiv, Decimal('0.00'))
+
+        payment = DebtPaymentSOS.objects.create(customer=self.customer, user=self.user, amount=Decimal('20000'))
+        self.assertEqual(payment.amount_usd_equiv, Decimal('2.00'))
+
+    def test_backfill_command_fills_missing_columns(self):
+        sale = SaleETB.objects.create(
+            user=self.user, total_amount=Decimal('500'), amount_paid=Decimal('500'), exchange_rate_at_sale=Decimal('125.00')
+        )
+        SaleETB.objects.filter(pk=sale.pk).update(total_amount_usd_equiv=None, amount_paid_usd_equiv=None)
+        Transaction.objects.filter(source='ETB', source_id=sale.pk).update(total_amount_usd=0)
+
+        call_command('backfill_usd_equivalents', stdout=StringIO())
+
+        sale.refresh_from_db()
+        self.assertEqual(sale.total_amount_usd_equiv, Decimal('4.00'))
+        self.assertEqual(sale.amount_paid_usd_equiv, Decimal('4.00'))
+        self.assertEqual(Transaction.objects.get(source='ETB', source_id=sale.pk).total_amount_usd, Decimal('4.00'))
+
+    def test_dashboard_totals_sum_stored_equivalents(self):
+        SaleUSD.objects.create(user=self.user, total_amount=Decimal('10'), amount_paid=Decimal('10'))
+        SaleSOS.objects.create(user=self.user, total_amount=Decimal('80000'), amount_paid=Decimal('40000'))
+        self.customer.total_debt_usd = Decimal('1')
+        self.customer.total_debt_sos = Decimal('8000')
+        self.customer.total_debt_etb = Decimal('100')
+        self.customer.save()
+
+        # A later rate change must not move today's historical totals
+        self.settings.usd_to_sos_rate = Decimal('16000.00')
+        self.settings.save()
+
+        response = self.client.get(reverse('core:api_dashboard_widget', args=['sales']))
+        self.assertEqual(response.context['total_sales_revenue_etb'], Decimal('2000.00'))
+        self.assertEqual(response.context['cash_collected_etb'], Decimal('1500.00'))
+        self.assertEqual(response.context['today_transactions'], 2)
+        response = self.client.get(reverse('core:api_dashboard_widget', args=['debt']))
+        self.assertEqual(response.context['total_debt_etb'], Decimal('250.00'))
+
+        response = self.client.get(reverse('core:sales_history'))
+        self.assertEqual(response.context['total_sales'], 2)
+        self.assertEqual(
+            sorted(sale.amount_etb for sale in response.context['page_obj']),
+            [Decimal('1000.00'), Decimal('1000.00')],
+        )
+
+    def test_etb_sales_keep_their_native_amount(self):
+        SaleETB.objects.create(
+            user=self.user, total_amount=Decimal('500'), amount_paid=Decimal('500'), exchange_rate_at_sale=Decimal('125.00')
+        )
+        SaleUSD.objects.create(user=self.user, total_amount=Decimal('10'), amount_paid=Decimal('10'))
+        self.settings.usd_to_etb_rate = Decimal('200.00')
+        self.settings.save()
+
+        response = self.client.get(reverse('core:sales_history'))
+        amounts = {sale.currency: sale.amount_etb for sale in response.context['page_obj']}
+        self.assertEqual(amounts, {'ETB': Decimal('500.00'), 'USD': Decimal('2000.00')})
+        response = self.client.get(reverse('core:api_dashboard_widget', args=['recent_activity']))
+        amounts = {row['currency']: row['amount_etb'] for row in response.context['recent_activity']}
+        self.assertEqual(amounts, {'ETB': Decimal('500.00'), 'USD': Decimal('2000.00')})
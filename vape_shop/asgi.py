@@ -3,6 +3,11 @@ ASGI config for vape_shop project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live dashboard stream (core.views.dashboard_events) is an async view
+that holds its connection open, so it is only served under ASGI, e.g.
+``uvicorn vape_shop.asgi:application``. Its broadcaster is in-process; see
+core/live.py before running more than one worker.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -120,6 +120,8 @@ AUTH_PASSWORD_VALIDATORS = [
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
+# The shop's own clock, for reports by hour of day; the database stays in UTC
+SHOP_TIME_ZONE = 'Africa/Mogadishu'
 USE_I18N = True
 USE_TZ = True
 